@@ -3,6 +3,7 @@ const path = require('path');
 const fs = require('fs');
 const os = require('os');
 const { exec } = require('child_process');
+const { PythonSidecar } = require('./sidecar');
 
 // Simple JSON store
 let SETTINGS_PATH;
@@ -75,6 +76,28 @@ function createWindow() {
   mainWindow.on('closed', () => { mainWindow = null; });
 }
 
+// ===== Python skill worker =====
+// One warm AssistantAPI (assistant/sidecar.py) for the skills that need Python
+const sidecar = new PythonSidecar();
+
+async function callPython(method, ...params) {
+  const result = await sidecar.call(method, params);
+  return typeof result === 'string' ? JSON.parse(result) : result;
+}
+
+// The sidecar keeps its own settings.json; these feed its backend router (assistant/router.py)
+const SIDECAR_SETTINGS = ['apiUrl', 'apiUrls', 'hedgeMs', 'probeInterval'];
+
+async function syncSidecarSetting(key, value) {
+  if (!SIDECAR_SETTINGS.includes(key) || value === undefined) return;
+  try {
+    const current = await sidecar.call('get_setting', [key]);
+    if (JSON.stringify(current) !== JSON.stringify(value)) await sidecar.call('set_setting', [key, value]);
+  } catch (err) {
+    console.warn(`[sidecar] could not sync ${key}:`, err.message);
+  }
+}
+
 // ===== System Skills (IPC Handlers) =====
 
 ipcMain.handle('skill:open-path', async (event, filePath) => {
@@ -107,25 +130,41 @@ ipcMain.handle('skill:run-command', async (event, command) => {
   });
 });
 
-ipcMain.handle('skill:launch-app', async (event, appName) => {
-  const appMap = {
-    'notepad': 'notepad.exe',
-    '記事本': 'notepad.exe',
-    'calculator': 'calc.exe',
-    '計算機': 'calc.exe',
-    'browser': 'start https://www.google.com',
-    '瀏覽器': 'start https://www.google.com',
-    'explorer': 'explorer.exe',
-    '檔案總管': 'explorer.exe',
-    'cmd': 'cmd.exe',
-    'terminal': 'wt.exe',
-    '終端機': 'wt.exe',
-    'vscode': 'code',
-    'spotify': 'start spotify:',
-    'discord': 'start discord:',
-  };
+// Background commands run in the Python sidecar (assistant/processes.py):
+// no timeout, output streamed to the renderer as 'command' events
+sidecar.on('command', (payload) => mainWindow?.webContents.send('assistant-event', 'command', payload));
 
-  const cmd = appMap[appName.toLowerCase()] || appName;
+for (const [channel, method] of [['start-command', 'start_command'], ['poll-command', 'poll_command'],
+                                 ['tail-command', 'tail_command'], ['kill-command', 'kill_command']]) {
+  ipcMain.handle(`skill:${channel}`, async (event, ...args) => {
+    try {
+      return await callPython(method, ...args.filter((a) => a !== undefined));
+    } catch (err) {
+      return { success: false, message: `指令管理失敗: ${err.message}` };
+    }
+  });
+}
+
+// Built once (assistant/intents.py APP_COMMANDS is the Python twin)
+const APP_MAP = {
+  'notepad': 'notepad.exe',
+  '記事本': 'notepad.exe',
+  'calculator': 'calc.exe',
+  '計算機': 'calc.exe',
+  'browser': 'start https://www.google.com',
+  '瀏覽器': 'start https://www.google.com',
+  'explorer': 'explorer.exe',
+  '檔案總管': 'explorer.exe',
+  'cmd': 'cmd.exe',
+  'terminal': 'wt.exe',
+  '終端機': 'wt.exe',
+  'vscode': 'code',
+  'spotify': 'start spotify:',
+  'discord': 'start discord:',
+};
+
+ipcMain.handle('skill:launch-app', async (event, appName) => {
+  const cmd = APP_MAP[appName.toLowerCase()] || appName;
   return new Promise((resolve) => {
     exec(`start "" "${cmd}"`, { shell: true }, (err) => {
       if (err) {
@@ -141,6 +180,12 @@ ipcMain.handle('skill:launch-app', async (event, appName) => {
 });
 
 ipcMain.handle('skill:system-info', async () => {
+  try {
+    const result = await callPython('system_info');
+    if (result.success) return result;
+  } catch (err) {
+    console.warn('[sidecar] system_info failed, falling back:', err.message);
+  }
   return {
     success: true,
     message: JSON.stringify({
@@ -168,6 +213,12 @@ const WORKSPACE = path.join(os.homedir(), 'Desktop', 'AssistantOutput');
 if (!fs.existsSync(WORKSPACE)) fs.mkdirSync(WORKSPACE, { recursive: true });
 
 ipcMain.handle('skill:create-docx', async (event, title, content) => {
+  try {
+    const result = await callPython('create_docx', title, content);
+    if (result.success) return result;
+  } catch (err) {
+    console.warn('[sidecar] create_docx failed, falling back:', err.message);
+  }
   try {
     const { execSync } = require('child_process');
     const filename = `${title.replace(/[^\w\s]/g, '_')}_${Date.now()}.docx`;
@@ -200,7 +251,23 @@ ipcMain.handle('skill:create-docx', async (event, title, content) => {
   }
 });
 
-ipcMain.handle('skill:create-ppt', async (event, title, slidesJson) => {
+ipcMain.handle('skill:create-documents', async (event, title, content, formats = 'pptx,docx', theme = 'dark') => {
+  // Python only (assistant/documents.py renders the formats in parallel)
+  try {
+    return await callPython('create_documents', title, content, String(formats), theme);
+  } catch (err) {
+    return { success: false, message: `建立文件失敗: ${err.message}` };
+  }
+});
+
+ipcMain.handle('skill:create-ppt', async (event, title, slidesJson, theme = 'dark') => {
+  try {
+    const json = typeof slidesJson === 'string' ? slidesJson : JSON.stringify(slidesJson);
+    const result = await callPython('create_ppt', title, json, theme);
+    if (result.success) return result;
+  } catch (err) {
+    console.warn('[sidecar] create_ppt failed, falling back:', err.message);
+  }
   try {
     const slides = typeof slidesJson === 'string' ? JSON.parse(slidesJson) : slidesJson;
     const filename = `${title.replace(/[^\w\s]/g, '_')}_${Date.now()}.txt`;
@@ -218,6 +285,13 @@ ipcMain.handle('skill:create-ppt', async (event, title, slidesJson) => {
 });
 
 ipcMain.handle('skill:create-xlsx', async (event, title, dataJson) => {
+  try {
+    const json = typeof dataJson === 'string' ? dataJson : JSON.stringify(dataJson);
+    const result = await callPython('create_xlsx', title, json);
+    if (result.success) return result;
+  } catch (err) {
+    console.warn('[sidecar] create_xlsx failed, falling back:', err.message);
+  }
   try {
     const data = typeof dataJson === 'string' ? JSON.parse(dataJson) : dataJson;
     const filename = `${title.replace(/[^\w\s]/g, '_')}_${Date.now()}.csv`;
@@ -241,7 +315,12 @@ ipcMain.handle('skill:write-file', async (event, filename, content) => {
   }
 });
 
-ipcMain.handle('skill:read-file', async (event, filepath) => {
+ipcMain.handle('skill:read-file', async (event, filepath, offset, length) => {
+  try {
+    return await callPython('read_file', filepath, offset || 0, length || 10000);
+  } catch (err) {
+    console.warn('[sidecar] read_file failed, falling back:', err.message);
+  }
   try {
     const content = fs.readFileSync(filepath, 'utf8').substring(0, 10000);
     return { success: true, message: content };
@@ -250,13 +329,37 @@ ipcMain.handle('skill:read-file', async (event, filepath) => {
   }
 });
 
-ipcMain.handle('skill:list-files', async (event, directory) => {
+ipcMain.handle('skill:read-lines', async (event, filepath, start, count) => {
+  try {
+    return await callPython('read_lines', filepath, start || 1, count || 100);
+  } catch (err) {
+    return { success: false, message: `讀取檔案失敗: ${err.message}` };
+  }
+});
+
+ipcMain.handle('skill:tail-file', async (event, filepath, lines) => {
+  try {
+    return await callPython('tail_file', filepath, lines || 50);
+  } catch (err) {
+    return { success: false, message: `讀取檔案失敗: ${err.message}` };
+  }
+});
+
+ipcMain.handle('skill:list-files', async (event, directory, offset, limit, sort) => {
+  try {
+    return await callPython('list_files', directory || '', offset || 0, limit || 50, sort || '');
+  } catch (err) {
+    console.warn('[sidecar] list_files failed, falling back:', err.message);
+  }
   try {
     const dir = directory || WORKSPACE;
     const items = fs.readdirSync(dir).slice(0, 50).map(name => {
       const full = path.join(dir, name);
-      const stat = fs.statSync(full);
-      const size = stat.isDirectory() ? '[DIR]' : `${stat.size}`.padStart(8);
+      let size = '[?]';   // broken link, no permission or removed meanwhile
+      try {
+        const stat = fs.statSync(full);
+        size = stat.isDirectory() ? '[DIR]' : `${stat.size}`.padStart(8);
+      } catch { /* listed as unreadable */ }
       return `${size} ${name}`;
     });
     return { success: true, message: items.join('\n') || '(empty)' };
@@ -265,6 +368,14 @@ ipcMain.handle('skill:list-files', async (event, directory) => {
   }
 });
 
+ipcMain.handle('skill:search-files', async (event, query, kind, days, limit) => {
+  try {
+    return await callPython('search_files', query, kind || '', days || 0, limit || 10);
+  } catch (err) {
+    return { success: false, message: `搜尋檔案失敗: ${err.message}` };
+  }
+});
+
 ipcMain.handle('skill:take-screenshot', async () => {
   try {
     const { execSync } = require('child_process');
@@ -302,18 +413,9 @@ ipcMain.handle('skill:search-web', async (event, query) => {
 });
 
 ipcMain.handle('skill:fetch-news', async (event, query, maxResults = '5') => {
+  // Electron doesn't have duckduckgo-search: ask the Python worker
   try {
-    // Use Python script to fetch news (since Electron doesn't have duckduckgo-search)
-    const { execSync } = require('child_process');
-    const scriptPath = path.join(__dirname, '..', 'main.py');
-    const pythonCmd = `python -c "from main import AssistantAPI; api = AssistantAPI(); print(api.fetch_news('${query.replace(/'/g, "\\'")}', '${maxResults}'))"`;
-    
-    const result = execSync(pythonCmd, { 
-      encoding: 'utf8', 
-      timeout: 30000,
-      cwd: path.join(__dirname, '..')
-    });
-    return JSON.parse(result.trim());
+    return await callPython('fetch_news', String(query), String(maxResults));
   } catch (err) {
     return { success: false, message: `搜尋失敗: ${err.message}` };
   }
@@ -365,8 +467,48 @@ ipcMain.handle('skill:notify', async (event, title, message) => {
   }
 });
 
+// MCP servers are hosted by the Python sidecar (assistant/mcp.py), which keeps
+// them connected and caches their tool lists; it sends an 'mcp' event when they change
+sidecar.on('mcp', (payload) => mainWindow?.webContents.send('assistant-event', 'mcp', payload));
+
+ipcMain.handle('skill:mcp-tools', async () => {
+  try {
+    return await callPython('mcp_tools');
+  } catch (err) {
+    return { success: false, message: `MCP 無法使用: ${err.message}`, skills: [] };
+  }
+});
+
+ipcMain.handle('skill:mcp-call', async (event, name, argsJson) => {
+  try {
+    const result = await sidecar.call('mcp_call', [String(name), String(argsJson || '{}')], { timeout: 90000 });
+    return typeof result === 'string' ? JSON.parse(result) : result;
+  } catch (err) {
+    return { success: false, message: `MCP 工具執行失敗: ${err.message}` };
+  }
+});
+
+ipcMain.handle('skill:run-plan', async (event, stepsJson) => {
+  // The Python worker runs the steps (assistant/plan.py); a plan may chain
+  // several slow skills, so it gets a longer deadline than a single call
+  try {
+    const result = await sidecar.call('run_plan', [String(stepsJson)], { timeout: 180000 });
+    return typeof result === 'string' ? JSON.parse(result) : result;
+  } catch (err) {
+    return { success: false, message: `計畫執行失敗: ${err.message}` };
+  }
+});
+
 // AI Chat
-ipcMain.handle('skill:chat-with-ai', async (event, messagesJson, skillsJson) => {
+ipcMain.handle('skill:chat-with-ai', async (event, messagesJson, skillsJson, traceId) => {
+  // The sidecar routes across apiUrl + apiUrls (assistant/router.py) with failover
+  try {
+    const messages = typeof messagesJson === 'string' ? messagesJson : JSON.stringify(messagesJson);
+    const skills = typeof skillsJson === 'string' ? skillsJson : JSON.stringify(skillsJson);
+    return JSON.stringify(await callPython('chat_with_ai', messages, skills, traceId || ''));
+  } catch (err) {
+    console.warn('[sidecar] chat_with_ai failed, falling back:', err.message);
+  }
   const fetch = require('node-fetch');
   settings = loadSettings();
   const apiUrl = settings.apiUrl || '';
@@ -381,7 +523,7 @@ ipcMain.handle('skill:chat-with-ai', async (event, messagesJson, skillsJson) =>
     
     const response = await fetch(`${apiUrl}/chat`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'X-Trace-Id': traceId || '' },
       body: JSON.stringify({ messages, skills })
     });
 
@@ -399,6 +541,11 @@ ipcMain.handle('skill:chat-with-ai', async (event, messagesJson, skillsJson) =>
 });
 
 ipcMain.handle('skill:check-health', async () => {
+  try {
+    return JSON.stringify(await callPython('check_health'));
+  } catch (err) {
+    console.warn('[sidecar] check_health failed, falling back:', err.message);
+  }
   const fetch = require('node-fetch');
   settings = loadSettings();
   const apiUrl = settings.apiUrl || '';
@@ -420,6 +567,11 @@ ipcMain.handle('skill:check-health', async () => {
   return JSON.stringify({ connected: false, message: '未連線 - 請啟動 Colab' });
 });
 
+ipcMain.handle('skill:intent-table', async () => {
+  settings = loadSettings();
+  return await callPython('get_intent_table', settings.shortcuts || []);
+});
+
 // Window controls
 ipcMain.handle('window:minimize', () => { mainWindow?.minimize(); });
 ipcMain.handle('window:close', () => { mainWindow?.close(); });
@@ -441,17 +593,23 @@ ipcMain.handle('settings:set', (event, key, value) => {
   settings = loadSettings();
   settings[key] = value;
   saveSettings(settings);
+  syncSidecarSetting(key, value);
 });
 
 // ===== App Lifecycle =====
 app.whenReady().then(() => {
   createWindow();
+  sidecar.start();
+  const saved = loadSettings();
+  SIDECAR_SETTINGS.forEach((key) => syncSidecarSetting(key, saved[key]));
 
   app.on('activate', () => {
     if (BrowserWindow.getAllWindows().length === 0) createWindow();
   });
 });
 
+app.on('will-quit', () => sidecar.stop());
+
 app.on('window-all-closed', () => {
   if (process.platform !== 'darwin') app.quit();
 });
@@ -10,6 +10,12 @@ contextBridge.exposeInMainWorld('electronAPI', {
   openPath: (p) => ipcRenderer.invoke('skill:open-path', p),
   openUrl: (url) => ipcRenderer.invoke('skill:open-url', url),
   runCommand: (cmd) => ipcRenderer.invoke('skill:run-command', cmd),
+  start_command: (cmd, cwd) => ipcRenderer.invoke('skill:start-command', cmd, cwd),
+  poll_command: (id) => ipcRenderer.invoke('skill:poll-command', id),
+  tail_command: (id, since, limit) => ipcRenderer.invoke('skill:tail-command', id, since, limit),
+  kill_command: (id) => ipcRenderer.invoke('skill:kill-command', id),
+  // Python sidecar events (streamed command output), same shape as PyWebView's onAssistantEvent
+  onAssistantEvent: (callback) => ipcRenderer.on('assistant-event', (event, channel, payload) => callback(channel, payload)),
   launchApp: (name) => ipcRenderer.invoke('skill:launch-app', name),
   systemInfo: () => ipcRenderer.invoke('skill:system-info'),
   clipboardRead: () => ipcRenderer.invoke('skill:clipboard-read'),
@@ -17,11 +23,15 @@ contextBridge.exposeInMainWorld('electronAPI', {
 
   // File operations
   create_docx: (title, content) => ipcRenderer.invoke('skill:create-docx', title, content),
-  create_ppt: (title, slidesJson) => ipcRenderer.invoke('skill:create-ppt', title, slidesJson),
+  create_ppt: (title, slidesJson, theme) => ipcRenderer.invoke('skill:create-ppt', title, slidesJson, theme),
   create_xlsx: (title, dataJson) => ipcRenderer.invoke('skill:create-xlsx', title, dataJson),
+  create_documents: (title, content, formats, theme) => ipcRenderer.invoke('skill:create-documents', title, content, formats, theme),
   write_file: (filename, content) => ipcRenderer.invoke('skill:write-file', filename, content),
-  read_file: (filepath) => ipcRenderer.invoke('skill:read-file', filepath),
-  list_files: (directory) => ipcRenderer.invoke('skill:list-files', directory),
+  read_file: (filepath, offset, length) => ipcRenderer.invoke('skill:read-file', filepath, offset, length),
+  read_lines: (filepath, start, count) => ipcRenderer.invoke('skill:read-lines', filepath, start, count),
+  tail_file: (filepath, lines) => ipcRenderer.invoke('skill:tail-file', filepath, lines),
+  list_files: (directory, offset, limit, sort) => ipcRenderer.invoke('skill:list-files', directory, offset, limit, sort),
+  search_files: (query, kind, days, limit) => ipcRenderer.invoke('skill:search-files', query, kind, days, limit),
 
   // Utility
   take_screenshot: () => ipcRenderer.invoke('skill:take-screenshot'),
@@ -31,10 +41,14 @@ contextBridge.exposeInMainWorld('electronAPI', {
   kill_process: (processName) => ipcRenderer.invoke('skill:kill-process', processName),
   set_volume: (level) => ipcRenderer.invoke('skill:set-volume', level),
   notify: (title, message) => ipcRenderer.invoke('skill:notify', title, message),
+  run_plan: (stepsJson) => ipcRenderer.invoke('skill:run-plan', stepsJson),
+  mcpTools: () => ipcRenderer.invoke('skill:mcp-tools'),
+  mcpCall: (name, argsJson) => ipcRenderer.invoke('skill:mcp-call', name, argsJson),
 
   // AI Chat
-  chat_with_ai: (messagesJson, skillsJson) => ipcRenderer.invoke('skill:chat-with-ai', messagesJson, skillsJson),
+  chat_with_ai: (messagesJson, skillsJson, traceId) => ipcRenderer.invoke('skill:chat-with-ai', messagesJson, skillsJson, traceId),
   check_health: () => ipcRenderer.invoke('skill:check-health'),
+  get_intent_table: () => ipcRenderer.invoke('skill:intent-table'),
 
   // Settings
   getSetting: (key) => ipcRenderer.invoke('settings:get', key),
@@ -0,0 +1,161 @@
+// ===== Persistent Python skill worker (client for assistant/sidecar.py) =====
+// Spawns one `python -u -m assistant.sidecar` and talks newline-delimited
+// JSON-RPC over its stdio. Calls carry ids and may be in flight concurrently;
+// the process is pinged periodically and restarted (with backoff) if it
+// exits or stops answering.
+
+const { spawn } = require('child_process');
+const { EventEmitter } = require('events');
+const path = require('path');
+const readline = require('readline');
+
+const DEFAULTS = {
+  python: process.env.ASSISTANT_PYTHON || (process.platform === 'win32' ? 'python' : 'python3'),
+  cwd: path.join(__dirname, '..'),
+  callTimeout: 60000,     // ms per call (document generation can be slow)
+  pingInterval: 15000,    // ms between health pings
+  pingTimeout: 5000,      // ms before a ping counts as missed
+  maxMissedPings: 2,      // restart after this many missed pings in a row
+  restartDelay: 500,      // ms, doubled per consecutive failure
+  maxRestartDelay: 30000,
+};
+
+class PythonSidecar extends EventEmitter {
+  constructor(options = {}) {
+    super();
+    this.opts = { ...DEFAULTS, ...options };
+    this.proc = null;
+    this.ready = null;         // Promise resolved with the ready event
+    this.info = null;          // last ready event (pid, startup_ms, methods)
+    this.pending = new Map();  // id -> { resolve, reject, timer, method }
+    this.nextId = 1;
+    this.failures = 0;
+    this.missedPings = 0;
+    this.pingTimer = null;
+    this.restartTimer = null;
+    this.stopped = false;
+  }
+
+  start() {
+    if (this.proc) return this.ready;
+    this.stopped = false;
+    const spawnedAt = Date.now();
+    const proc = spawn(this.opts.python, ['-u', '-m', 'assistant.sidecar'], {
+      cwd: this.opts.cwd,
+      env: { ...process.env, PYTHONIOENCODING: 'utf-8', PYTHONUNBUFFERED: '1' },
+      stdio: ['pipe', 'pipe', 'pipe'],
+      windowsHide: true,
+    });
+    this.proc = proc;
+
+    this.ready = new Promise((resolve, reject) => {
+      const onReady = (info) => {
+        info.startup_ms = { ...info.startup_ms, spawn_to_ready: Date.now() - spawnedAt };
+        this.info = info;
+        this.failures = 0;
+        console.log(`[sidecar] ready pid=${info.pid} in ${info.startup_ms.spawn_to_ready} ms`, info.startup_ms);
+        this.startPings();
+        resolve(info);
+      };
+      this.once('ready', onReady);
+      const onFail = () => {
+        this.removeListener('ready', onReady);
+        reject(new Error('Python sidecar exited during startup'));
+      };
+      proc.once('exit', onFail);
+      proc.once('error', onFail);
+    });
+    this.ready.catch(() => {});   // surfaced through call() instead
+
+    proc.stdin.on('error', () => {});   // EPIPE while it is dying; onExit rejects the calls
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => this.onLine(line));
+    readline.createInterface({ input: proc.stderr }).on('line', (line) => console.log('[sidecar]', line));
+    proc.on('error', (err) => {
+      console.error('[sidecar] spawn failed:', err.message);
+      this.onExit(proc, null, err.code);
+    });
+    proc.on('exit', (code, signal) => this.onExit(proc, code, signal));
+    return this.ready;
+  }
+
+  async call(method, params = [], { timeout } = {}) {
+    if (!this.proc) this.start();
+    await this.ready;
+    if (!this.proc) throw new Error('Python sidecar is not running');
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`sidecar call ${method} timed out`));
+      }, timeout || this.opts.callTimeout);
+      this.pending.set(id, { resolve, reject, timer, method });
+      this.proc.stdin.write(JSON.stringify({ id, method, params }) + '\n');
+    });
+  }
+
+  ping() {
+    return this.call('ping', [], { timeout: this.opts.pingTimeout });
+  }
+
+  stop() {
+    this.stopped = true;
+    clearInterval(this.pingTimer);
+    clearTimeout(this.restartTimer);
+    if (this.proc) {
+      try { this.proc.stdin.write(JSON.stringify({ id: 0, method: 'shutdown' }) + '\n'); } catch { }
+      const proc = this.proc;
+      setTimeout(() => proc.exitCode === null && proc.kill(), 2000);
+    }
+  }
+
+  // --- internals ---
+  onLine(line) {
+    let msg;
+    try { msg = JSON.parse(line); } catch { return; }
+    if (msg.event) {
+      this.emit(msg.event, msg.event === 'ready' ? msg : msg.payload);
+      return;
+    }
+    const call = this.pending.get(msg.id);
+    if (!call) return;
+    this.pending.delete(msg.id);
+    clearTimeout(call.timer);
+    if (msg.error) call.reject(new Error(msg.error.message || msg.error.code));
+    else call.resolve(msg.result);
+  }
+
+  onExit(proc, code, signal) {
+    if (proc !== this.proc) return;
+    this.proc = null;
+    clearInterval(this.pingTimer);
+    for (const [id, call] of this.pending) {
+      clearTimeout(call.timer);
+      call.reject(new Error(`sidecar exited during ${call.method}`));
+      this.pending.delete(id);
+    }
+    if (this.stopped) return;
+    this.failures++;
+    const delay = Math.min(this.opts.restartDelay * 2 ** (this.failures - 1), this.opts.maxRestartDelay);
+    console.warn(`[sidecar] exited (code=${code}, signal=${signal}); restarting in ${delay} ms`);
+    this.restartTimer = setTimeout(() => this.start(), delay);
+  }
+
+  startPings() {
+    clearInterval(this.pingTimer);
+    this.missedPings = 0;
+    this.pingTimer = setInterval(async () => {
+      try {
+        await this.ping();
+        this.missedPings = 0;
+      } catch {
+        if (++this.missedPings >= this.opts.maxMissedPings && this.proc) {
+          console.warn('[sidecar] not answering pings; killing it');
+          this.proc.kill();   // onExit restarts it
+        }
+      }
+    }, this.opts.pingInterval);
+    this.pingTimer.unref?.();
+  }
+}
+
+module.exports = { PythonSidecar };
@@ -0,0 +1,3 @@
+"""
+Digital Assistant - Python backend subsystems used by main.py
+"""
@@ -0,0 +1,478 @@
+"""
+Parse once, export many: one intermediate representation for every document format.
+
+The model's markdown-ish content (# / ## / ### headings, - bullets, | table |
+rows, plain paragraphs) is parsed once into a tuple of blocks:
+
+    ('heading', level, text)   level 1-3
+    ('para', text)
+    ('bullet', text)
+    ('table', rows)            rows: tuple of tuples of str, the first is the header
+
+Each backend renders from those blocks:
+
+- pptx: sections at the top heading level become slides (assistant/ppt.py templates)
+- docx: a pre-styled base document (fonts, headings, margins) built once per process
+- xlsx: one sheet per table; without tables, an outline of the sections
+- md / html: plain text, rendered in the calling process
+
+DocumentPipeline renders the heavy formats concurrently in a persistent process
+pool whose workers keep their templates warm, so asking for several formats
+costs about as long as the slowest one:
+
+    pipeline = DocumentPipeline(max_workers=3)
+    out = pipeline.export('AI 趨勢', content, ['pptx', 'docx', 'md'], directory=workspace)
+    # {'files': [{'format': 'pptx', 'path': ..., 'ms': ...}, ...], 'elapsed_ms', 'serial_ms', 'parse_ms'}
+
+A single document is rendered in-process with render(), which keeps the job
+progress reports of create_docx working.
+"""
+import datetime
+import html
+import io
+import itertools
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+DEFAULT_WORKERS = min(3, os.cpu_count() or 1)   # one per heavy format; 1 renders in-process
+DEFAULT_THEME = 'dark'
+SLIDE_LINES = 8            # lines per slide before a section continues on the next one
+FONT = 'Microsoft JhengHei'
+ACCENT = '533CD4'          # same accent as the PPT themes and the xlsx header
+
+FORMAT_ALIASES = {'ppt': 'pptx', 'powerpoint': 'pptx', 'doc': 'docx', 'word': 'docx',
+                  'excel': 'xlsx', 'xls': 'xlsx', 'markdown': 'md', 'htm': 'html'}
+INLINE_FORMATS = ('md', 'html')   # cheaper to render than to send to a worker
+
+_HEADING = re.compile(r'(#{1,6})\s+(.*)')
+_TABLE_RULE = re.compile(r'\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?')
+
+
+# ===== Parsing =====
+
+def parse(content):
+    """Markdown-ish text -> tuple of blocks (see the module docstring)."""
+    blocks, table = [], []
+
+    def flush():
+        if table:
+            width = max(len(r) for r in table)
+            blocks.append(('table', tuple(tuple(r) + ('',) * (width - len(r)) for r in table)))
+            table.clear()
+
+    for line in str(content or '').split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('|') and stripped.count('|') >= 2:
+            if not _TABLE_RULE.fullmatch(stripped):
+                table.append([cell.strip() for cell in stripped.strip('|').split('|')])
+            continue
+        flush()
+        if not stripped:
+            continue
+        m = _HEADING.match(stripped)
+        if m:
+            blocks.append(('heading', min(len(m.group(1)), 3), m.group(2).strip()))
+        elif stripped.startswith(('-', '*', '>', '•')):
+            blocks.append(('bullet', stripped.lstrip('-*>• ').strip()))
+        else:
+            blocks.append(('para', stripped))
+    flush()
+    return tuple(blocks)
+
+
+def normalize_formats(formats):
+    """'pptx, docx' / ['ppt', 'Word'] -> ['pptx', 'docx'], known formats only, first mention wins."""
+    if isinstance(formats, str):
+        formats = re.split(r'[\s,;/、，]+', formats.strip('[]'))
+    out = []
+    for f in formats or []:
+        f = FORMAT_ALIASES.get(str(f).strip().strip('"\'.').lower(), str(f).strip().strip('"\'.').lower())
+        if f in RENDERERS and f not in out:
+            out.append(f)
+    return out
+
+
+_claimed = set()           # output paths handed out by output_stem in this process
+_claimed_lock = threading.Lock()
+
+
+def output_stem(directory, title, exts):
+    """File stem '<title>_<HHMMSS>' for new files directory/<stem>.<ext>, with _2, _3, ...
+    appended while a file with that stem exists or another job in this process has
+    claimed it, so documents created in the same second don't overwrite each other."""
+    base = f"{title.replace(' ', '_')}_{datetime.datetime.now().strftime('%H%M%S')}"
+    with _claimed_lock:
+        for n in itertools.count(1):
+            stem = base if n == 1 else f'{base}_{n}'
+            paths = [os.path.join(directory, f'{stem}.{ext}') for ext in exts]
+            if not any(p in _claimed or os.path.exists(p) for p in paths):
+                _claimed.update(paths)
+                return stem
+
+
+def to_slides(title, blocks):
+    """create_ppt slides: one per section at the top heading level, long sections split."""
+    levels = [b[1] for b in blocks if b[0] == 'heading']
+    top = min(levels) if levels else None
+    preamble = [title, []]     # text before the first heading goes under the title
+    sections = [preamble]
+    for block in blocks:
+        kind = block[0]
+        current = sections[-1]
+        if kind == 'heading' and block[1] == top:
+            if current is preamble and not preamble[1]:
+                sections.clear()
+            sections.append([block[2], []])
+        elif kind == 'heading':
+            current[1].append(block[2])
+        elif kind == 'bullet':
+            current[1].append(f'- {block[1]}')
+        elif kind == 'para':
+            current[1].append(block[1])
+        else:
+            current[1].extend(' | '.join(row) for row in block[1])
+
+    slides = []
+    for heading, lines in sections:
+        for i in range(0, max(len(lines), 1), SLIDE_LINES):
+            slides.append({'title': heading if i == 0 else f'{heading}（續）',
+                           'content': '\n'.join(lines[i:i + SLIDE_LINES])})
+    return slides
+
+
+# ===== Backends =====
+
+def render_pptx(title, blocks, path, theme=DEFAULT_THEME, progress=None):
+    from assistant.ppt import render_deck
+
+    render_deck(title, to_slides(title, blocks), theme, progress=progress).save(path)
+
+
+_docx_base = None
+_docx_lock = threading.Lock()
+
+
+def docx_base():
+    """The styled, empty base document as .docx bytes, built once per process."""
+    global _docx_base
+    with _docx_lock:
+        if _docx_base is None:
+            _docx_base = _build_docx_base()
+        return _docx_base
+
+
+def _build_docx_base():
+    from docx import Document
+    from docx.shared import Cm, Pt, RGBColor
+
+    doc = Document()
+
+    # Page setup
+    section = doc.sections[0]
+    section.top_margin = Cm(2.5)
+    section.bottom_margin = Cm(2.5)
+    section.left_margin = Cm(2.8)
+    section.right_margin = Cm(2.8)
+
+    # Style: Normal
+    style_normal = doc.styles['Normal']
+    style_normal.font.name = FONT
+    style_normal.font.size = Pt(11)
+    style_normal.font.color.rgb = RGBColor(0x33, 0x33, 0x33)
+    style_normal.paragraph_format.space_after = Pt(6)
+    style_normal.paragraph_format.line_spacing = 1.5
+
+    # Style: Title
+    style_title = doc.styles['Title']
+    style_title.font.name = FONT
+    style_title.font.size = Pt(26)
+    style_title.font.bold = True
+    style_title.font.color.rgb = RGBColor(0x1A, 0x1A, 0x2E)
+    style_title.paragraph_format.space_after = Pt(4)
+
+    # Style: Headings
+    sizes = {1: 20, 2: 16, 3: 13}
+    for level in range(1, 4):
+        h_style = doc.styles[f'Heading {level}']
+        h_style.font.name = FONT
+        h_style.font.color.rgb = RGBColor(0x2D, 0x2D, 0x5E)
+        h_style.font.bold = True
+        h_style.font.size = Pt(sizes[level])
+        h_style.paragraph_format.space_before = Pt(18 if level == 1 else 12)
+        h_style.paragraph_format.space_after = Pt(8)
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def render_docx(title, blocks, path, theme=None, progress=None):
+    """Cover page, content and footer on a copy of the base document.
+    progress(done, total) is called every 50 blocks."""
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Cm, Pt, RGBColor
+
+    doc = Document(io.BytesIO(docx_base()))
+    # python-docx resolves a style name by scanning every style on each use;
+    # look the ids up once and set them on the paragraph XML directly
+    style_ids = {name: doc.styles[name].style_id
+                 for name in ('Heading 1', 'Heading 2', 'Heading 3', 'List Bullet', 'Table Grid')}
+
+    def paragraph(text, style=None):
+        p = doc.add_paragraph(text)
+        if style:
+            p._p.style = style_ids[style]
+        return p
+
+    # ── Cover section ──
+    for _ in range(3):
+        doc.add_paragraph('')
+    p_title = doc.add_paragraph(title, style='Title')
+    p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    p_line = doc.add_paragraph()
+    p_line.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p_line.add_run('━' * 30)
+    run.font.color.rgb = RGBColor.from_string(ACCENT)
+    run.font.size = Pt(10)
+
+    p_date = doc.add_paragraph()
+    p_date.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p_date.add_run(datetime.datetime.now().strftime('%Y-%m-%d'))
+    run.font.size = Pt(11)
+    run.font.color.rgb = RGBColor(0x88, 0x88, 0x99)
+    doc.add_page_break()
+
+    # ── Content ──
+    for i, block in enumerate(blocks):
+        if progress and i % 50 == 0:
+            progress(i, len(blocks))
+        kind = block[0]
+        if kind == 'heading':
+            paragraph(block[2], f'Heading {block[1]}')
+        elif kind == 'bullet':
+            paragraph(block[1], 'List Bullet').paragraph_format.left_indent = Cm(1)
+        elif kind == 'para':
+            paragraph(block[1])
+        else:
+            rows = block[1]
+            table = doc.add_table(rows=len(rows), cols=len(rows[0]))
+            table._tbl.tblPr.style = style_ids['Table Grid']
+            for r, (tr, row) in enumerate(zip(table.rows, rows)):
+                for cell, text in zip(tr.cells, row):
+                    if text:
+                        cell.paragraphs[0].add_run(text).bold = (r == 0) or None   # header row
+            paragraph('')
+
+    # ── Footer ──
+    footer_para = doc.sections[0].footer.paragraphs[0]
+    footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = footer_para.add_run(f'{title}  |  Generated by Digital Assistant')
+    run.font.size = Pt(8)
+    run.font.color.rgb = RGBColor(0xAA, 0xAA, 0xBB)
+    run.font.name = FONT
+    doc.save(path)
+
+
+def render_xlsx(title, blocks, path, theme=None, progress=None):
+    """One sheet per table, named after the heading above it."""
+    from openpyxl import Workbook
+
+    from assistant.xlsx_export import sheet_title, write_sheet
+
+    wb = Workbook(write_only=True)
+    heading, names = title, set()
+    tables = [b for b in blocks if b[0] in ('heading', 'table')]
+    for block in tables:
+        if block[0] == 'heading':
+            heading = block[2]
+            continue
+        name, n = sheet_title(heading), 2
+        while name.lower() in names:
+            name = f'{sheet_title(heading)[:28]}_{n}'
+            n += 1
+        names.add(name.lower())
+        write_sheet(wb, [list(r) for r in block[1]], title=name)
+    if not names:   # no tables: the outline, one row per line under its section
+        rows, heading = [['章節', '內容']], title
+        for block in blocks:
+            if block[0] == 'heading':
+                heading = block[2]
+            else:
+                rows.append([heading, block[1]])
+        write_sheet(wb, rows, title=title)
+    wb.save(path)
+
+
+def to_markdown(title, blocks):
+    """Normalised markdown; content headings move one level down under the title."""
+    lines = [f'# {title}', '']
+    for block in blocks:
+        kind = block[0]
+        if kind == 'heading':
+            lines += ['', f"{'#' * (block[1] + 1)} {block[2]}", '']
+        elif kind == 'bullet':
+            lines.append(f'- {block[1]}')
+        elif kind == 'para':
+            lines += [block[1], '']
+        else:
+            rows = block[1]
+            lines.append('| ' + ' | '.join(rows[0]) + ' |')
+            lines.append('|' + '---|' * len(rows[0]))
+            lines += ['| ' + ' | '.join(row) + ' |' for row in rows[1:]]
+            lines.append('')
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+
+
+def render_md(title, blocks, path, theme=None, progress=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(to_markdown(title, blocks))
+
+
+def to_html(title, blocks):
+    """A standalone page with the same typography as the Word export."""
+    e = html.escape
+    body, in_list = [], False
+    for block in blocks:
+        kind = block[0]
+        if kind == 'bullet' and not in_list:
+            body.append('<ul>')
+        elif kind != 'bullet' and in_list:
+            body.append('</ul>')
+        in_list = kind == 'bullet'
+        if kind == 'heading':
+            body.append(f'<h{block[1] + 1}>{e(block[2])}</h{block[1] + 1}>')
+        elif kind == 'bullet':
+            body.append(f'<li>{e(block[1])}</li>')
+        elif kind == 'para':
+            body.append(f'<p>{e(block[1])}</p>')
+        else:
+            rows = block[1]
+            head = ''.join(f'<th>{e(c)}</th>' for c in rows[0])
+            cells = ''.join('<tr>' + ''.join(f'<td>{e(c)}</td>' for c in row) + '</tr>' for row in rows[1:])
+            body.append(f'<table><thead><tr>{head}</tr></thead><tbody>{cells}</tbody></table>')
+    if in_list:
+        body.append('</ul>')
+    date = datetime.datetime.now().strftime('%Y-%m-%d')
+    return f'''<!DOCTYPE html>
+<html lang="zh-Hant"><head><meta charset="utf-8"><title>{e(title)}</title>
+<style>
+body {{ font-family: "{FONT}", sans-serif; color: #333; line-height: 1.6; max-width: 860px; margin: 40px auto; padding: 0 24px; }}
+h1 {{ color: #1A1A2E; border-bottom: 3px solid #{ACCENT}; padding-bottom: 8px; }}
+h2, h3, h4 {{ color: #2D2D5E; }}
+table {{ border-collapse: collapse; margin: 12px 0; }}
+th {{ background: #{ACCENT}; color: #fff; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; }}
+.date {{ color: #889; }}
+</style></head>
+<body>
+<h1>{e(title)}</h1>
+<p class="date">{date}</p>
+{chr(10).join(body)}
+</body></html>
+'''
+
+
+def render_html(title, blocks, path, theme=None, progress=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(to_html(title, blocks))
+
+
+RENDERERS = {
+    'pptx': render_pptx,
+    'docx': render_docx,
+    'xlsx': render_xlsx,
+    'md': render_md,
+    'html': render_html,
+}
+
+
+def render(fmt, title, blocks, path, theme=DEFAULT_THEME, progress=None):
+    """Render one format -> {'format', 'path', 'ms'}. Runs in pool workers too."""
+    start = time.perf_counter()
+    RENDERERS[fmt](title, blocks, path, theme=theme, progress=progress)
+    return {'format': fmt, 'path': path, 'ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+def _warm_worker(theme):
+    """Pool initializer: import the libraries and build the templates once per worker."""
+    from assistant.ppt import get_template
+
+    docx_base()
+    get_template(theme)
+    import openpyxl  # noqa: F401
+
+
+# ===== Pipeline =====
+
+class DocumentPipeline:
+    """Exports one content string to several formats at once; see the module docstring."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, theme=DEFAULT_THEME):
+        self.max_workers = max_workers
+        self.theme = theme       # template the workers pre-build
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 initializer=_warm_worker, initargs=(self.theme,))
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def export(self, title, content, formats, directory, theme=DEFAULT_THEME, stem=None):
+        """Write title/content in every format to directory/<stem>.<ext>.
+
+        Each file entry has 'path' and 'ms', or 'error' when that format failed;
+        the others are still written."""
+        start = time.perf_counter()
+        blocks = parse(content)
+        parse_ms = (time.perf_counter() - start) * 1000
+        formats = normalize_formats(formats)
+        if not formats:
+            raise ValueError('沒有可用的輸出格式（pptx, docx, xlsx, md, html）')
+        stem = stem or output_stem(directory, title, formats)
+        paths = {fmt: os.path.join(directory, f'{stem}.{fmt}') for fmt in formats}
+
+        heavy = [f for f in formats if f not in INLINE_FORMATS]
+        futures = {}
+        if self.max_workers > 1 and len(heavy) > 1:
+            try:
+                pool = self._get_pool()
+                futures = {f: pool.submit(render, f, title, blocks, paths[f], theme) for f in heavy}
+            except (BrokenProcessPool, OSError, RuntimeError):
+                self.close()
+                futures = {}
+
+        files = {}
+        for fmt in formats:
+            if fmt not in futures:
+                files[fmt] = self._attempt(lambda: render(fmt, title, blocks, paths[fmt], theme), fmt, paths[fmt])
+        for fmt, future in futures.items():
+            files[fmt] = self._attempt(future.result, fmt, paths[fmt])
+            if 'error' in files[fmt] and isinstance(future.exception(), BrokenProcessPool):
+                self.close()   # a worker died; the next export starts a fresh pool
+
+        out = [files[f] for f in formats]
+        return {'files': out, 'parse_ms': round(parse_ms, 2),
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+                'serial_ms': round(sum(f.get('ms', 0) for f in out), 1)}
+
+    @staticmethod
+    def _attempt(call, fmt, path):
+        try:
+            return call()
+        except Exception as e:
+            return {'format': fmt, 'path': path, 'error': str(e) or type(e).__name__}
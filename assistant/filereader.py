@@ -0,0 +1,249 @@
+"""
+Paged reads of arbitrarily large text files for read_file / read_lines / tail_file.
+
+Nothing is loaded whole: each call memory-maps the file, decodes only the
+requested window and unmaps it again (so Windows never sees the file as
+locked between calls). Line access goes through a sparse line index, the
+line count at the start of every BLOCK bytes, built once per file with
+C-speed newline counting and cached until the file's size or mtime changes:
+
+    reader = FileReader()
+    reader.read('big.log', offset=-4096, length=4096)   # last 4 KB
+    reader.lines('big.log', start=1_000_000, count=50)  # lines 1,000,000..1,000,049
+    reader.tail('big.log', 100)                          # no index needed
+
+Finding a line is a binary search over the blocks plus a scan of at most one
+block, so a multi-GB log is navigable at interactive speed. Encoding is
+detected once per file from a sample (BOM, then UTF-8, then the usual
+Traditional Chinese Windows code pages).
+"""
+import bisect
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+BLOCK = 64 * 1024          # bytes per line-index entry
+SAMPLE = 64 * 1024         # bytes sniffed for the encoding
+MAX_INDEXES = 16           # files whose index is kept
+MAX_LENGTH = 1024 * 1024   # largest window returned by one call
+FALLBACK_ENCODINGS = ('cp950', 'big5hkscs', 'gb18030')
+
+_BOMS = (
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16-le'),
+    (b'\xfe\xff', 'utf-16-be'),
+)
+
+
+class BinaryFile(ValueError):
+    pass
+
+
+def detect_encoding(sample):
+    """-> (encoding, bom_length) for a byte sample from the start of a file."""
+    for bom, enc in _BOMS:
+        if sample.startswith(bom):
+            return enc, len(bom)
+    if b'\x00' in sample:
+        raise BinaryFile('看起來是二進位檔，無法以文字讀取')
+    for enc in ('utf-8',) + FALLBACK_ENCODINGS:
+        try:
+            sample.decode(enc)
+            return enc, 0
+        except UnicodeDecodeError as e:
+            if enc == 'utf-8' and e.start >= len(sample) - 3:   # sample cut mid-character
+                return enc, 0
+    return 'latin-1', 0
+
+
+class _Index:
+    """Per-file state: identity, encoding and the sparse line index."""
+
+    __slots__ = ('key', 'size', 'encoding', 'bom', 'newline', 'width', 'counts', 'lines', 'lock')
+
+    def __init__(self, key, size, encoding, bom):
+        self.key = key
+        self.size = size
+        self.encoding = encoding
+        self.bom = bom
+        codec = encoding.replace('-sig', '')
+        self.newline = '\n'.encode(codec)
+        self.width = len(self.newline)   # code unit size (2 for UTF-16)
+        self.counts = None               # array: newlines before block i
+        self.lines = None                # total line count
+        self.lock = threading.Lock()
+
+    def decode(self, data):
+        return data.decode(self.encoding.replace('-sig', ''), errors='replace')
+
+
+class _Mapped:
+    """Context manager giving an mmap (or b'' for empty files)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.file = open(self.path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:   # empty file
+            self.map = b''
+        return self.map
+
+    def __exit__(self, *exc):
+        if self.map != b'':
+            self.map.close()
+        self.file.close()
+
+
+class FileReader:
+    """Paged, index-backed reader shared by the read_file family of skills."""
+
+    def __init__(self, max_indexes=MAX_INDEXES):
+        self.max_indexes = max_indexes
+        self._indexes = OrderedDict()   # path -> _Index, most recently used last
+        self._lock = threading.Lock()
+
+    # --- public ---
+    def read(self, path, offset=0, length=10000):
+        """Decode up to length bytes from byte offset (negative: from the end)."""
+        info = self._info(path)
+        length = max(1, min(int(length), MAX_LENGTH))
+        offset = int(offset)
+        if offset < 0:
+            offset = max(info.bom, info.size + offset)
+        offset = max(info.bom, min(offset, info.size))
+        with _Mapped(path) as mm:
+            start = self._align(mm, info, offset)
+            end = self._align(mm, info, min(info.size, start + length))
+            if end == start and start < info.size:   # window shorter than one character
+                end = self._align(mm, info, min(info.size, start + 4))
+            text = info.decode(mm[start:end])
+        return {'text': text, 'offset': start, 'next_offset': end, 'size': info.size,
+                'encoding': info.encoding, 'eof': end >= info.size}
+
+    def lines(self, path, start=1, count=100):
+        """Lines start..start+count-1 (1-based; negative start counts from the end)."""
+        info = self._info(path)
+        self._ensure_index(path, info)
+        total = info.lines
+        start = int(start)
+        if start < 0:
+            start = max(1, total + start + 1)
+        start = max(1, start)
+        count = max(0, int(count))
+        if start > total or count == 0:
+            return {'lines': [], 'start': start, 'end': start - 1, 'total_lines': total,
+                    'encoding': info.encoding}
+        with _Mapped(path) as mm:
+            begin = self._line_offset(mm, info, start)
+            stop = min(total + 1, start + count)
+            end = self._line_offset(mm, info, stop) if stop <= total else info.size
+            text = info.decode(mm[begin:end])
+        lines = text.split('\n')
+        if lines and lines[-1] == '':
+            lines.pop()
+        lines = [l[:-1] if l.endswith('\r') else l for l in lines]
+        return {'lines': lines, 'start': start, 'end': start + len(lines) - 1,
+                'total_lines': total, 'encoding': info.encoding}
+
+    def tail(self, path, count=50):
+        """Last count lines, found by scanning backwards (no index build)."""
+        info = self._info(path)
+        count = max(1, int(count))
+        nl, w = info.newline, info.width
+        with _Mapped(path) as mm:
+            end = pos = info.size
+            if end - w >= info.bom and mm[end - w:end] == nl:   # ignore the final newline
+                pos = end - w
+            for _ in range(count):
+                hit = mm.rfind(nl, info.bom, pos)
+                if hit < 0:
+                    begin = info.bom
+                    break
+                pos = hit
+            else:
+                begin = pos + w
+            text = info.decode(mm[begin:end])
+        lines = [l[:-1] if l.endswith('\r') else l for l in text.split('\n')]
+        if lines and lines[-1] == '':
+            lines.pop()
+        return {'lines': lines, 'size': info.size, 'encoding': info.encoding}
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(os.path.abspath(path), None)
+
+    # --- internals ---
+    def _info(self, path):
+        """Cached _Index for path, replaced when size or mtime changed."""
+        path = os.path.abspath(path)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f'找不到檔案: {path}')
+        st = os.stat(path)
+        key = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            info = self._indexes.get(path)
+            if info is not None and info.key == key:
+                self._indexes.move_to_end(path)
+                return info
+        with open(path, 'rb') as f:
+            sample = f.read(SAMPLE)
+        info = _Index(key, st.st_size, *detect_encoding(sample))
+        with self._lock:
+            self._indexes[path] = info
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return info
+
+    def _ensure_index(self, path, info):
+        with info.lock:
+            if info.counts is not None:
+                return
+            counts = array('q')
+            total = 0
+            nl = info.newline
+            with _Mapped(path) as mm:
+                for block_start in range(0, info.size, BLOCK):
+                    counts.append(total)
+                    total += mm[block_start:block_start + BLOCK].count(nl)
+                # a last line without a trailing newline still counts
+                if info.size > info.bom and mm[info.size - info.width:info.size] != nl:
+                    total += 1
+            info.counts = counts
+            info.lines = total
+
+    def _line_offset(self, mm, info, line):
+        """Byte offset where 1-based line starts."""
+        if line <= 1:
+            return info.bom
+        need = line - 1                        # newlines that precede the line
+        block = bisect.bisect_left(info.counts, need) - 1
+        pos = block * BLOCK
+        seen = info.counts[block]
+        nl, w = info.newline, info.width
+        while seen < need:
+            hit = mm.find(nl, pos)
+            if hit < 0:
+                return info.size
+            pos = hit + w
+            seen += 1
+        return pos
+
+    def _align(self, mm, info, pos):
+        """Move pos forward to a character boundary."""
+        if pos >= info.size:
+            return info.size
+        if info.width > 1:
+            return pos + (pos - info.bom) % info.width
+        if info.encoding.startswith('utf-8'):
+            limit = min(info.size, pos + 3)
+            while pos < limit and 0x80 <= mm[pos] < 0xC0:   # continuation byte
+                pos += 1
+        return pos
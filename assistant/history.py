@@ -0,0 +1,138 @@
+"""
+Token-budgeted conversation history (Python side of public/history.js).
+
+compact_history() keeps the messages sent to /chat under a token budget:
+
+1. old fetch_news results ("已搜尋到以下資料…") are shrunk to titles + links
+2. old turns are rolled into one compact summary message
+3. recent tool outputs are shrunk too (except the latest message)
+4. only then are turns dropped (oldest first, never the latest message)
+
+When the budget is exceeded it compacts down to a low-water mark instead of
+just under the limit, so the rewritten prefix stays stable for several turns
+(and the server's prefix KV cache keeps hitting).
+Both implementations must stay in sync.
+"""
+import math
+import re
+
+DEFAULT_BUDGET = 6000        # approx. tokens for the whole history
+KEEP_RECENT = 6              # newest messages that are never shrunk or rolled
+MAX_MESSAGES = 20            # the server only reads the last 20 messages
+LOW_WATER = 0.75             # compact to 75% of the budget / message cap once triggered
+SUMMARY_MAX_LINES = 30
+SUMMARY_LINE_CHARS = 80
+
+TOOL_PREFIX = '已搜尋到以下資料'
+SHRUNK_MARK = '（內文已省略）'
+SUMMARY_PREFIX = '（先前對話摘要）'
+
+_CJK = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """Rough token count: ~1 token per CJK char, ~4 chars per token otherwise,
+    plus a few tokens of chat-template overhead per message."""
+    text = text or ''
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4) + 4
+
+
+def is_tool_output(msg):
+    return msg.get('role') == 'assistant' and (msg.get('content') or '').startswith(TOOL_PREFIX)
+
+
+def shrink_tool_output(content):
+    """Keep the '[n] title' and '來源: href' lines of a fetch_news result."""
+    if SHRUNK_MARK in content:
+        return content
+    kept = [TOOL_PREFIX + SHRUNK_MARK]
+    for line in content.split('\n')[1:]:
+        line = line.strip()
+        if re.match(r'^\[\d+\]', line) or line.startswith('來源:'):
+            kept.append(line)
+    return '\n'.join(kept)
+
+
+def _summary_line(msg):
+    content = msg.get('content') or ''
+    who = '使用者' if msg.get('role') == 'user' else '助理'
+    if is_tool_output(msg):
+        titles = [l.strip() for l in content.split('\n') if re.match(r'^\s*\[\d+\]', l)]
+        content = '搜尋結果 ' + '；'.join(t.split('] ', 1)[-1] for t in titles)
+    content = ' '.join(content.split())
+    if len(content) > SUMMARY_LINE_CHARS:
+        content = content[:SUMMARY_LINE_CHARS] + '…'
+    return f'{who}: {content}'
+
+
+def _is_summary(msg):
+    return (msg.get('content') or '').startswith(SUMMARY_PREFIX)
+
+
+def _summary_message(lines):
+    return {'role': 'user', 'content': SUMMARY_PREFIX + '\n' + '\n'.join(lines[-SUMMARY_MAX_LINES:])}
+
+
+def compact_history(messages, budget=DEFAULT_BUDGET, keep_recent=KEEP_RECENT, max_messages=MAX_MESSAGES):
+    """Return (messages, stats) with the history under budget tokens.
+
+    stats = {'before', 'after', 'saved', 'budget', 'shrunk', 'summarized', 'dropped'}
+    """
+    msgs = [dict(m) for m in messages]
+    before = sum(estimate_tokens(m.get('content')) for m in msgs)
+    stats = {'before': before, 'after': before, 'saved': 0, 'budget': budget,
+             'shrunk': 0, 'summarized': 0, 'dropped': 0}
+    if before <= budget and len(msgs) <= max_messages:
+        return msgs, stats
+
+    target = int(budget * LOW_WATER)
+    target_count = max(keep_recent + 1, int(max_messages * LOW_WATER))
+
+    def total():
+        return sum(estimate_tokens(m.get('content')) for m in msgs)
+
+    def done():
+        return total() <= target and len(msgs) <= target_count
+
+    # 1. Shrink old tool outputs
+    for m in msgs[:max(0, len(msgs) - keep_recent)]:
+        if is_tool_output(m) and SHRUNK_MARK not in m['content']:
+            m['content'] = shrink_tool_output(m['content'])
+            stats['shrunk'] += 1
+
+    # 2. Roll the oldest turns into the summary
+    if not done():
+        lines = []
+        if msgs and _is_summary(msgs[0]):
+            lines = msgs.pop(0)['content'].split('\n')[1:]
+        head_len = max(0, len(msgs) - keep_recent)
+        head, tail = msgs[:head_len], msgs[head_len:]
+        while head:
+            lines.append(_summary_line(head.pop(0)))
+            stats['summarized'] += 1
+            msgs = [_summary_message(lines)] + head + tail
+            if done():
+                break
+        if lines and not head:
+            msgs = [_summary_message(lines)] + tail
+
+    # 3. Shrink recent tool outputs as well, except the latest message
+    if not done():
+        for m in msgs[:-1]:
+            if is_tool_output(m) and SHRUNK_MARK not in m['content']:
+                m['content'] = shrink_tool_output(m['content'])
+                stats['shrunk'] += 1
+
+    # 4. Last resort: drop turns after the summary, keeping the latest message
+    while not done() and len(msgs) > 1:
+        if _is_summary(msgs[0]) and len(msgs) > 2:
+            msgs.pop(1)
+        else:
+            msgs.pop(0)
+        stats['dropped'] += 1
+
+    after = total()
+    stats['after'] = after
+    stats['saved'] = before - after
+    return msgs, stats
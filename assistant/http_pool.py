@@ -0,0 +1,193 @@
+"""
+Pooled keep-alive HTTP client for talking to the Colab LLM backend.
+
+One PooledClient is owned by AssistantAPI and reused for every /chat and
+/health call, so turns after the first skip the TCP + TLS handshake through
+the trycloudflare tunnel.
+"""
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.3
+RETRY_STATUSES = (502, 503, 504, 530)   # 530 = cloudflare tunnel origin down
+
+# Connect time of the most recent new connection made on this thread, and the
+# CancelHandle of the request in flight on it. Requests are synchronous, so the
+# connection is opened and used on the caller's thread.
+_local = threading.local()
+
+
+class CancelHandle:
+    """Lets another thread abort a request in flight (e.g. the losing side of a
+    hedged request). cancel() shuts the connection's socket down, so the server
+    sees the client go away and the blocked request raises ConnectionError."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        with self._lock:
+            self._conn = conn
+            if self.cancelled:
+                self._shutdown()
+                raise ConnectionAbortedError('request cancelled')
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            self._shutdown()
+
+    def _shutdown(self):
+        sock = getattr(self._conn, 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _attach(conn):
+    handle = getattr(_local, 'cancel', None)
+    if handle is not None:
+        handle.attach(conn)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _local.connect = getattr(_local, 'connect', 0.0) + time.perf_counter() - start
+        _attach(self)
+
+    def request(self, *args, **kwargs):
+        _attach(self)
+        super().request(*args, **kwargs)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()   # TCP + TLS handshake
+        _local.connect = getattr(_local, 'connect', 0.0) + time.perf_counter() - start
+        _attach(self)
+
+    def request(self, *args, **kwargs):
+        _attach(self)
+        super().request(*args, **kwargs)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class PooledClient:
+    """Long-lived requests.Session bound to one base URL.
+
+    pool_size: max keep-alive connections kept per host
+    retries:   connect-error retries, and gateway-error retries (502/503/504/530)
+               for GET only: a POST /chat answered with a 502 may still be
+               generating, and repeating it would run the turn twice
+    backoff:   urllib3 backoff factor between retries (seconds)
+    """
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+
+        retry = Retry(
+            total=retries, connect=retries, read=0, status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET'}),   # connect errors are retried for every method
+            raise_on_status=False,
+        )
+        adapter = _TimedAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update({'Connection': 'keep-alive'})
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, cancel=None, **kwargs):
+        """Send a request and return (response, timing).
+
+        timing = {'connect': ms, 'ttfb': ms, 'total': ms, 'reused': bool}
+        connect is 0 when a pooled connection was reused. cancel is an optional
+        CancelHandle another thread can use to abort the request.
+        """
+        _local.connect = 0.0
+        _local.cancel = cancel
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', stream=True, **kwargs)
+            ttfb = time.perf_counter() - start
+            response.content   # read the body so the connection goes back to the pool
+        finally:
+            _local.cancel = None
+        total = time.perf_counter() - start
+        connect = _local.connect
+        timing = {
+            'connect': round(connect * 1000, 1),
+            'ttfb': round(ttfb * 1000, 1),
+            'total': round(total * 1000, 1),
+            'reused': connect == 0.0,
+        }
+        return response, timing
+
+    def open_stream(self, method, path, cancel=None, **kwargs):
+        """Send a request and return (response, timing) with the body left unread.
+
+        The caller iterates the body (e.g. SSE) and must close the response;
+        timing only has 'connect', 'ttfb' and 'reused' at this point. cancel
+        aborts the request until the headers are in; after that, close the response.
+        """
+        _local.connect = 0.0
+        _local.cancel = cancel
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', stream=True, **kwargs)
+        finally:
+            _local.cancel = None
+        connect = _local.connect
+        timing = {
+            'connect': round(connect * 1000, 1),
+            'ttfb': round((time.perf_counter() - start) * 1000, 1),
+            'reused': connect == 0.0,
+        }
+        return response, timing
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,217 @@
+"""
+Local intent matching for skill shortcuts (Python side of public/intents.js).
+
+Intents are declared once, below, as data. Each intent has trigger phrases,
+the skill it runs and its args. Optionally it also has:
+- capture: the text after the phrase becomes an arg;
+- arg_pattern: a regex the captured text must match;
+- unless: a regex that vetoes the intent.
+
+compile_table() turns the list into an Aho-Corasick automaton. The whole
+message is then matched against every phrase in one pass, however many
+shortcuts there are:
+
+    matcher = IntentMatcher()                  # built-ins (+ custom shortcuts)
+    matcher.match('幫我打開記事本')              # {'skill': 'launch_app', 'args': {'name': 'notepad'}, ...}
+    matcher.match('搜尋 台北天氣')               # {'skill': 'search_web', 'args': {'query': '台北天氣'}, ...}
+    matcher.table                              # JSON-able table for public/intents.js
+
+When several phrases match, the intent declared first wins, and for the same
+intent the earliest phrase. This is the order the old if-chain in
+tryLocalSkill checked them in. Only ASCII letters are case-folded, so match
+offsets are the same in the original text. Both implementations must stay
+in sync.
+
+    python -m assistant.intents --export public/intent_table.json
+"""
+import hashlib
+import json
+import re
+from collections import deque
+
+TABLE_VERSION = 1
+LAUNCH_VERBS = ('開啟', '打開', 'open ')
+
+# key -> command for launch_app, trigger aliases and display name
+APPS = {
+    'notepad':    {'command': 'notepad.exe', 'aliases': ('記事本', 'notepad'), 'label': '記事本'},
+    'calculator': {'command': 'calc.exe', 'aliases': ('計算機', 'calculator'), 'label': '計算機'},
+    'explorer':   {'command': 'explorer.exe', 'aliases': ('檔案總管', 'explorer'), 'label': '檔案總管'},
+    'browser':    {'command': 'start https://www.google.com', 'aliases': ('瀏覽器', 'browser'), 'label': '瀏覽器'},
+    'vscode':     {'command': 'code', 'aliases': ('vscode', '編輯器'), 'label': 'VSCode'},
+    'terminal':   {'command': 'wt.exe', 'aliases': ('終端', 'terminal'), 'label': '終端機'},
+    'cmd':        {'command': 'cmd.exe', 'aliases': ('cmd',), 'label': '命令提示字元'},
+    'discord':    {'command': 'start discord:', 'aliases': ('discord',), 'label': 'Discord'},
+    'spotify':    {'command': 'start spotify:', 'aliases': ('spotify',), 'label': 'Spotify'},
+}
+
+# Any name launch_app accepts (key, alias or display name) -> command; built once
+APP_COMMANDS = {}
+for _key, _app in APPS.items():
+    for _name in (_key, _app['label'], *_app['aliases']):
+        APP_COMMANDS.setdefault(_name.lower(), _app['command'])
+APP_COMMANDS['終端機'] = APPS['terminal']['command']
+
+DOC_FOLLOWUP = r'(?:然後|再|接著|並|且).*(?:做成|製作|建立|產生).*(?:簡報|文件|報告|PPT|Word|Excel)'
+
+BUILTIN_INTENTS = [
+    *({'id': f'launch:{key}', 'skill': 'launch_app', 'args': {'name': key}, 'label': app['label'],
+       'patterns': [f'{verb}{alias}' for alias in app['aliases'] for verb in LAUNCH_VERBS]}
+      for key, app in APPS.items()),
+    {'id': 'system_info', 'skill': 'system_info',
+     'patterns': ['系統狀態', '系統資訊', 'system info', '電腦狀態']},
+    {'id': 'clipboard_read', 'skill': 'clipboard_read',
+     'patterns': ['讀取剪貼簿', '剪貼簿內容', 'clipboard', '貼上內容']},
+    {'id': 'take_screenshot', 'skill': 'take_screenshot',
+     'patterns': ['截圖', '螢幕截圖', 'screenshot', '截取畫面']},
+    {'id': 'get_datetime', 'skill': 'get_datetime',
+     'patterns': ['現在幾點', '目前時間', '今天日期', '幾號', 'what time', 'what date', '現在時間']},
+    # "搜尋XX然後做成簡報" is left to the AI (fetch_news + create_ppt)
+    {'id': 'search_web', 'skill': 'search_web', 'capture': 'query', 'unless': DOC_FOLLOWUP,
+     'patterns': ['搜尋', '搜索', '查詢', 'search', '幫我查', '幫我搜']},
+    {'id': 'list_files', 'skill': 'list_files',
+     'patterns': ['列出檔案', '檔案列表', 'list files', '查看檔案']},
+    {'id': 'open_url', 'skill': 'open_url', 'capture': 'url', 'arg_pattern': r'^\s*(https?://\S+)',
+     'patterns': ['開啟', '打開', 'open']},
+]
+
+_ASCII_LOWER = {c: c + 32 for c in range(ord('A'), ord('Z') + 1)}
+
+
+def fold(text):
+    """Lower-case ASCII letters only (length-preserving, same as intents.js)."""
+    return text.translate(_ASCII_LOWER)
+
+
+def compile_table(intents):
+    """Intent list -> JSON-able Aho-Corasick table shared with the UI."""
+    meta, patterns = [], []
+    goto, fail, out = [{}], [0], [[]]
+    for idx, intent in enumerate(intents):
+        meta.append({k: v for k, v in intent.items() if k != 'patterns'})
+        for phrase in dict.fromkeys(fold(p) for p in intent['patterns'] if p):
+            state = 0
+            for ch in phrase:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                state = nxt
+            out[state].append(len(patterns))
+            patterns.append([idx, len(phrase)])
+
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0)
+            out[nxt] = out[nxt] + out[fail[nxt]]
+
+    body = {'version': TABLE_VERSION, 'intents': meta, 'patterns': patterns,
+            'goto': goto, 'fail': fail, 'out': out}
+    body['hash'] = hashlib.sha1(json.dumps(body, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+    return body
+
+
+class IntentMatcher:
+    """Matches text against a compiled intent table."""
+
+    def __init__(self, custom=(), intents=BUILTIN_INTENTS):
+        self.table = compile_table(list(custom) + list(intents))
+        self._goto = self.table['goto']
+        self._fail = self.table['fail']
+        self._out = self.table['out']
+        self._patterns = self.table['patterns']
+        self._intents = self.table['intents']
+        self._regex = {}
+        for intent in self._intents:
+            for key in ('arg_pattern', 'unless'):
+                if intent.get(key):
+                    self._regex[intent[key]] = re.compile(intent[key], re.I)
+
+    def candidates(self, text):
+        """-> sorted [(intent index, start, end)] of every phrase found in text."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        found = []
+        state = 0
+        for i, ch in enumerate(fold(text)):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                idx, length = patterns[pid]
+                found.append((idx, i + 1 - length, i + 1))
+        found.sort()
+        return found
+
+    def match(self, text):
+        """-> {'intent', 'skill', 'args', 'label', 'reply', 'span'} for the winning intent, or None."""
+        vetoed = set()
+        for idx, start, end in self.candidates(text):
+            if idx in vetoed:
+                continue
+            intent = self._intents[idx]
+            unless = intent.get('unless')
+            if unless and self._regex[unless].search(text):
+                vetoed.add(idx)
+                continue
+            args = dict(intent.get('args') or {})
+            if intent.get('capture'):
+                rest = text[end:]
+                if intent.get('arg_pattern'):
+                    m = self._regex[intent['arg_pattern']].search(rest)
+                    if not m:
+                        continue
+                    rest = m.group(1)
+                rest = rest.strip()
+                if not rest:
+                    continue
+                args[intent['capture']] = rest
+            return {'intent': intent['id'], 'skill': intent['skill'], 'args': args,
+                    'label': intent.get('label', ''), 'reply': intent.get('reply', ''), 'span': [start, end]}
+        return None
+
+
+def normalize_shortcuts(raw):
+    """User shortcuts from settings (list or JSON string) -> intent dicts."""
+    if isinstance(raw, str):
+        raw = json.loads(raw) if raw.strip() else []
+    intents = []
+    for i, item in enumerate(raw or []):
+        patterns = item.get('patterns') or ([item['pattern']] if item.get('pattern') else [])
+        if not patterns or not item.get('skill'):
+            continue
+        intent = {'id': item.get('id') or f'custom:{i}', 'skill': item['skill'],
+                  'args': item.get('args') or {}, 'patterns': list(patterns)}
+        for key in ('label', 'capture', 'arg_pattern', 'unless', 'reply'):
+            if item.get(key):
+                intent[key] = item[key]
+        intents.append(intent)
+    return intents
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser(description='Compile the built-in intent table.')
+    ap.add_argument('--export', help='write the compiled table to this file')
+    ap.add_argument('text', nargs='*', help='match this text instead')
+    args = ap.parse_args()
+    matcher = IntentMatcher()
+    if args.text:
+        print(json.dumps(matcher.match(' '.join(args.text)), ensure_ascii=False))
+    elif args.export:
+        with open(args.export, 'w', encoding='utf-8') as f:
+            json.dump(matcher.table, f, ensure_ascii=False, separators=(',', ':'))
+            f.write('\n')
+        print(f'{args.export}: {len(matcher.table["patterns"])} phrases, '
+              f'{len(matcher.table["goto"])} states, hash {matcher.table["hash"]}')
+    else:
+        json.dump(matcher.table, sys.stdout, ensure_ascii=False)
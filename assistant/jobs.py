@@ -0,0 +1,170 @@
+"""
+Background job queue for long-running skills (document generation).
+
+    queue = JobQueue(emit=lambda payload: api._emit('job', payload), max_workers=2)
+    job_id = queue.submit('ppt', build_ppt, title='...', slides_json='[...]')
+    queue.status(job_id)   # {'id', 'kind', 'state', 'progress', 'stage', 'result', ...}
+    queue.cancel(job_id)
+
+A job function returns the skill's usual JSON string ({'success', 'message'});
+it becomes the job's result unchanged. While it runs it may call report():
+
+    from assistant.jobs import report
+    report(0.4, '第 4 / 10 頁')
+
+report() is a no-op outside a job, so the same code serves direct calls.
+Inside a job it pushes a throttled 'progress' event and raises JobCancelled
+once cancel() has been requested, which stops the build at the next
+checkpoint.
+
+Events (emit payloads): {'type': 'queued' | 'started' | 'progress' | 'done', 'id', 'kind', ...};
+'done' carries 'state' ('done', 'failed', 'cancelled') and 'result'.
+"""
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+MAX_PENDING = 16           # queued + running jobs accepted at once
+KEEP_FINISHED = 50         # finished jobs kept for job_status
+PROGRESS_INTERVAL = 0.1    # s between progress events for one job
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def report(fraction, stage=''):
+    """Report progress for the job running on this thread (no-op otherwise)."""
+    job = getattr(_local, 'job', None)
+    if job is not None:
+        job.queue._progress(job, fraction, stage)
+
+
+class Job:
+    __slots__ = ('id', 'kind', 'state', 'progress', 'stage', 'result', 'future',
+                 'cancel_requested', 'created', 'started', 'finished', 'last_emit', 'queue')
+
+    def __init__(self, job_id, kind, queue):
+        self.id = job_id
+        self.kind = kind
+        self.state = 'queued'
+        self.progress = 0.0
+        self.stage = ''
+        self.result = None
+        self.future = None
+        self.cancel_requested = False
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.last_emit = 0.0
+        self.queue = queue
+
+    def snapshot(self):
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0
+        return {
+            'id': self.id, 'kind': self.kind, 'state': self.state,
+            'progress': round(self.progress, 3), 'stage': self.stage,
+            'result': self.result, 'elapsed_ms': round(elapsed * 1000, 1),
+        }
+
+
+class JobQueue:
+    """Bounded thread pool running jobs, with status, cancel and pushed events."""
+
+    def __init__(self, emit=None, max_workers=DEFAULT_WORKERS, max_pending=MAX_PENDING):
+        self.emit = emit or (lambda payload: None)
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.jobs = OrderedDict()   # id -> Job, oldest first
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # --- public ---
+    def submit(self, kind, fn, *args, **kwargs):
+        with self._lock:
+            active = sum(1 for j in self.jobs.values() if j.state in ('queued', 'running'))
+            if active >= self.max_pending:
+                raise QueueFull(f'目前已有 {active} 個工作在排隊，請稍後再試')
+            job = Job(f'job{next(self._ids)}', kind, self)
+            self.jobs[job.id] = job
+            self._trim()
+        self.emit({'type': 'queued', 'id': job.id, 'kind': kind})
+        job.future = self.executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def list(self):
+        return [job.snapshot() for job in list(self.jobs.values())]
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or a running one at its next report()."""
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in ('queued', 'running'):
+            return False
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._finish(job, 'cancelled', {'success': False, 'message': '已取消'})
+        return True
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            if job.state in ('queued', 'running'):
+                self.cancel(job.id)
+        self.executor.shutdown(wait=False)
+
+    # --- internals ---
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:   # cancelled before the pool picked it up
+            self._finish(job, 'cancelled', {'success': False, 'message': '已取消'})
+            return
+        job.state = 'running'
+        job.started = time.time()
+        self.emit({'type': 'started', 'id': job.id, 'kind': job.kind})
+        _local.job = job
+        try:
+            raw = fn(*args, **kwargs)
+            result = json.loads(raw) if isinstance(raw, str) else raw
+        except Exception as e:
+            result = {'success': False, 'message': str(e)}
+        finally:
+            _local.job = None
+        if job.cancel_requested:
+            self._finish(job, 'cancelled', {'success': False, 'message': '已取消'})
+        else:
+            job.progress = 1.0
+            self._finish(job, 'done' if result.get('success') else 'failed', result)
+
+    def _progress(self, job, fraction, stage):
+        if job.cancel_requested:
+            raise JobCancelled(job.id)
+        job.progress = max(job.progress, min(1.0, float(fraction)))
+        job.stage = stage or job.stage
+        now = time.perf_counter()
+        if now - job.last_emit >= PROGRESS_INTERVAL:
+            job.last_emit = now
+            self.emit({'type': 'progress', 'id': job.id, 'kind': job.kind,
+                       'progress': round(job.progress, 3), 'stage': job.stage})
+
+    def _finish(self, job, state, result):
+        job.state = state
+        job.result = result
+        job.finished = time.time()
+        self.emit(dict(job.snapshot(), type='done'))
+
+    def _trim(self):
+        finished = [j.id for j in self.jobs.values() if j.state not in ('queued', 'running')]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job_id]
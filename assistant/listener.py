@@ -0,0 +1,455 @@
+"""
+Always-on speech listener: one capture thread, a rolling ring buffer, an
+adaptive noise floor, energy VAD and a recognizer pool.
+
+The microphone is opened once and kept open. Every 30 ms frame goes into a
+ring buffer and through the VAD, so pressing the mic button costs nothing.
+The utterance is cut out of audio that is already there, including up to
+PREROLL seconds spoken just before the press:
+
+    listener = SpeechListener(MicrophoneSource(), emit=lambda e: api._emit('speech', e))
+    listener.start()                  # capture thread (calibrates while it runs)
+    press = listener.press('zh-TW')   # arm push-to-talk
+    # -> {'type': 'speech_start'}, {'type': 'partial', 'text'}, ..., {'type': 'final', 'text'}
+    listener.release()                # optional: end the utterance now
+    listener.wait_final(press)        # or block for the final of that press's utterance
+
+Events are queued while the capture lock is held and emitted after it is
+released, so a slow emit (evaluate_js into the UI) never stalls capture.
+
+In mode='always' every utterance is transcribed without a press. Sources are
+pluggable; WavSource feeds a file through the same pipeline, so the whole
+thing runs on a machine without a microphone, and so does the recognizer:
+
+    python -m assistant.listener speech.wav --fake
+"""
+import itertools
+import math
+import threading
+import time
+import wave
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+RING_SECONDS = 10.0        # audio kept in the ring buffer
+PREROLL = 0.4              # s of audio before speech onset / the press kept in the utterance
+START_MS = 90              # voiced audio needed to open an utterance
+PAUSE_MS = 800             # silence that closes it
+MIN_UTTERANCE_MS = 250
+MAX_UTTERANCE_S = 30.0
+NO_SPEECH_TIMEOUT = 10.0   # s after a press without speech
+PARTIAL_INTERVAL = 1.0     # s of new audio between partial transcripts
+CALIBRATION_MS = 300       # first frames only train the noise floor
+SPEECH_RATIO = 3.0         # voiced when energy > floor * ratio
+MIN_ENERGY = 120.0         # ...and above this RMS (16-bit)
+RECOGNIZER_WORKERS = 2
+MAX_WAITERS = 16           # presses whose final wait_final can still collect
+
+
+# ===== Audio sources =====
+# A source has sample_rate, frame_bytes and read() -> one frame of 16-bit mono
+# PCM (b'' at end of input), plus close().
+
+class MicrophoneSource:
+    """Default input device through PyAudio (what speech_recognition uses)."""
+
+    def __init__(self, device_index=None, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+        import pyaudio
+
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(format=pyaudio.paInt16, channels=1, rate=sample_rate, input=True,
+                                     input_device_index=device_index, frames_per_buffer=self.frame_samples)
+
+    def read(self):
+        return self._stream.read(self.frame_samples, exception_on_overflow=False)
+
+    def close(self):
+        try:
+            self._stream.stop_stream()
+            self._stream.close()
+        finally:
+            self._pa.terminate()
+
+
+class WavSource:
+    """A 16-bit WAV file as a source. realtime=True paces reads like a live mic;
+    tail adds that many seconds of silence at the end so a trailing utterance closes."""
+
+    def __init__(self, path, realtime=False, frame_ms=FRAME_MS, tail=1.0):
+        self._wav = wave.open(path, 'rb')
+        if self._wav.getsampwidth() != 2:
+            raise ValueError('WavSource needs 16-bit PCM')
+        self.channels = self._wav.getnchannels()
+        self.sample_rate = self._wav.getframerate()
+        self.frame_samples = self.sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.realtime = realtime
+        self._tail_frames = int(tail * 1000 / frame_ms)
+        self._next = None
+
+    def read(self):
+        if self.realtime:
+            now = time.perf_counter()
+            self._next = (self._next or now) + self.frame_samples / self.sample_rate
+            if self._next > now:
+                time.sleep(self._next - now)
+        data = self._wav.readframes(self.frame_samples)
+        if self.channels > 1 and data:
+            samples = array('h', data)
+            data = samples[::self.channels].tobytes()
+        if len(data) < self.frame_bytes:
+            if not data and self._tail_frames <= 0:
+                return b''
+            if not data:
+                self._tail_frames -= 1
+            data += bytes(self.frame_bytes - len(data))
+        return data
+
+    def close(self):
+        self._wav.close()
+
+
+# ===== Recognizers =====
+# A recognizer is a callable (pcm, sample_rate, lang) -> text ('' if nothing recognised).
+
+class GoogleRecognizer:
+    """speech_recognition's free Google Web Speech endpoint, one Recognizer reused."""
+
+    def __init__(self):
+        import speech_recognition as sr
+
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+
+    def __call__(self, pcm, sample_rate, lang):
+        audio = self._sr.AudioData(pcm, sample_rate, 2)
+        try:
+            return self._recognizer.recognize_google(audio, language=lang)
+        except self._sr.UnknownValueError:
+            return ''
+
+
+def fake_recognizer(pcm, sample_rate, lang):
+    """Recognizer stand-in for tests: reports the audio length."""
+    return f'<{len(pcm) * 1000 // (2 * sample_rate)} ms>'
+
+
+def rms(frame):
+    samples = array('h', frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+# ===== Listener =====
+
+class _Utterance:
+    __slots__ = ('id', 'lang', 'frames', 'start_frame', 'silence', 'next_partial', 'seq', 'shown_seq',
+                 'ended', 'presses')
+
+    def __init__(self, utt_id, lang, frames, start_frame, presses):
+        self.id = utt_id
+        self.lang = lang
+        self.frames = list(frames)
+        self.start_frame = start_frame
+        self.silence = 0
+        self.next_partial = 0
+        self.seq = 0           # partial requests sent
+        self.shown_seq = 0     # newest partial emitted
+        self.ended = None      # perf_counter when the VAD closed it
+        self.presses = presses   # press ids this utterance answers (none: hands-free)
+
+
+class SpeechListener:
+    """Background capture + VAD + pooled recognition, reporting through emit(event)."""
+
+    def __init__(self, source, emit=None, recognizer=None, mode='ptt', lang='zh-TW',
+                 workers=RECOGNIZER_WORKERS, partials=True):
+        self.source = source
+        self.emit = emit or (lambda event: None)
+        self.recognizer = recognizer or GoogleRecognizer()
+        self.mode = mode
+        self.lang = lang
+        self.partials = partials
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stt')
+
+        self.frame_ms = source.frame_samples * 1000 / source.sample_rate
+        self.ring = deque(maxlen=int(RING_SECONDS * 1000 / self.frame_ms))
+        self.noise_floor = None
+        self.frame_no = 0
+        self.voiced_run = 0              # consecutive voiced frames
+        self.silent_run = 0
+        self.speech_since = None         # frame where the current voiced stretch began
+        self.armed_at = None             # frame of the last press (ptt)
+        self.presses = []                # press ids waiting for the next utterance
+        self.utterance = None
+        self.running = False
+        self.stats = {'utterances': 0, 'partials': 0, 'recognition_ms': [], 'errors': 0}
+
+        self._ids = itertools.count(1)
+        self._press_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._emit_lock = threading.Lock()   # keeps queued events in order across threads
+        self._events = []                # emitted once _lock is released (_flush_events)
+        self._thread = None
+        self._waiters = {}               # press id -> [Event, final event] for wait_final()
+
+    # --- control ---
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self._thread = threading.Thread(target=self._capture, name='listener', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.executor.shutdown(wait=False)
+
+    def press(self, lang=None):
+        """Arm push-to-talk; the next utterance (or the one in progress) is transcribed.
+        Returns the press id, for wait_final."""
+        with self._lock:
+            if lang:
+                self.lang = lang
+            press_id = next(self._press_ids)
+            self._waiters[press_id] = [threading.Event(), None]
+            while len(self._waiters) > MAX_WAITERS:   # presses nobody waited on (listen_start)
+                del self._waiters[next(iter(self._waiters))]
+            self.armed_at = self.frame_no
+            if self.utterance is not None:
+                self.utterance.presses.append(press_id)
+            else:
+                self.presses.append(press_id)
+                if self.speech_since is not None:
+                    self._open(self.speech_since, pressed=True)   # already talking when pressed
+            self._events.append({'type': 'listening', 'lang': self.lang,
+                                 'noise_floor': round(self.noise_floor or 0, 1)})
+        self._flush_events()
+        return press_id
+
+    def release(self):
+        """End the utterance now (button released) or disarm if none started."""
+        with self._lock:
+            if self.utterance is not None:
+                self._close()
+            else:
+                self.armed_at = None
+                self._answer(self.presses, {'type': 'final', 'text': '', 'error': '未偵測到語音', 'utterance': None})
+                self.presses = []
+        self._flush_events()
+
+    def wait_final(self, press_id, timeout=NO_SPEECH_TIMEOUT + MAX_UTTERANCE_S + 10):
+        """Block until the final event of the utterance press_id armed; returns it (or None on timeout)."""
+        with self._lock:
+            waiter = self._waiters.get(press_id)
+        if waiter is None:
+            return None
+        try:
+            waiter[0].wait(timeout)
+            return waiter[1]
+        finally:
+            with self._lock:
+                self._waiters.pop(press_id, None)
+
+    def status(self):
+        rec = sorted(self.stats['recognition_ms'])
+        return {
+            'running': self.running, 'mode': self.mode, 'armed': self.armed_at is not None,
+            'in_utterance': self.utterance is not None,
+            'noise_floor': round(self.noise_floor or 0, 1), 'threshold': round(self._threshold(), 1),
+            'buffered_s': round(len(self.ring) * self.frame_ms / 1000, 2),
+            'utterances': self.stats['utterances'], 'partials': self.stats['partials'],
+            'errors': self.stats['errors'],
+            'recognition_p50_ms': rec[len(rec) // 2] if rec else None,
+        }
+
+    # --- capture thread ---
+    def _capture(self):
+        try:
+            while self.running:
+                frame = self.source.read()
+                if not frame:
+                    break
+                with self._lock:
+                    self._process(frame)
+                if self._events:
+                    self._flush_events()
+        except Exception as e:
+            self.emit({'type': 'error', 'error': f'麥克風錯誤: {e}'})
+        finally:
+            with self._lock:
+                if self.utterance is not None:
+                    self._close()
+            self._flush_events()
+            self.running = False
+            self.source.close()
+            self.emit({'type': 'stopped'})
+
+    def _threshold(self):
+        return max(MIN_ENERGY, (self.noise_floor or 0) * SPEECH_RATIO)
+
+    def _process(self, frame):
+        self.frame_no += 1
+        self.ring.append(frame)
+        energy = rms(frame)
+
+        # Noise floor: seeded by the first frames, then follows the quiet
+        # parts, dropping fast and rising slowly
+        if self.frame_no * self.frame_ms <= CALIBRATION_MS:
+            n = self.frame_no
+            self.noise_floor = energy if n == 1 else self.noise_floor + (energy - self.noise_floor) / n
+            return
+        voiced = energy > self._threshold()
+        if not voiced:
+            rate = 0.1 if energy < self.noise_floor else 0.01
+            self.noise_floor += (energy - self.noise_floor) * rate
+
+        # speech_since marks the onset of the current stretch of speech, kept
+        # through short gaps, so a press in mid-sentence still gets its start
+        if voiced:
+            self.voiced_run += 1
+            self.silent_run = 0
+            if self.speech_since is None and self.voiced_run * self.frame_ms >= START_MS:
+                self.speech_since = self.frame_no - self.voiced_run + 1
+        else:
+            self.voiced_run = 0
+            self.silent_run += 1
+            if self.silent_run * self.frame_ms >= PAUSE_MS:
+                self.speech_since = None
+
+        utt = self.utterance
+        if utt is None:
+            if self.speech_since is not None and (self.mode == 'always' or self.armed_at is not None):
+                self._open(self.speech_since, pressed=self.armed_at is not None)
+            elif self.armed_at is not None and (self.frame_no - self.armed_at) * self.frame_ms > NO_SPEECH_TIMEOUT * 1000:
+                self.armed_at = None
+                self._finish({'type': 'final', 'text': '', 'error': '未偵測到語音', 'utterance': None}, self.presses)
+                self.presses = []
+            return
+
+        utt.frames.append(frame)
+        utt.silence = 0 if voiced else utt.silence + 1
+        duration = len(utt.frames) * self.frame_ms
+        if utt.silence * self.frame_ms >= PAUSE_MS or duration >= MAX_UTTERANCE_S * 1000:
+            self._close()
+        elif self.partials and not utt.silence and duration >= utt.next_partial:
+            utt.next_partial = duration + PARTIAL_INTERVAL * 1000
+            if duration >= PARTIAL_INTERVAL * 1000:
+                self._submit(utt, final=False)
+
+    def _open(self, speech_frame, pressed):
+        """Start an utterance at speech_frame, with PREROLL before it (and before the press)."""
+        first = speech_frame - int(PREROLL * 1000 / self.frame_ms)
+        if pressed and self.armed_at is not None:
+            first = max(first, self.armed_at - int(PREROLL * 1000 / self.frame_ms))
+        first = max(first, self.frame_no - len(self.ring) + 1)
+        frames = list(itertools.islice(self.ring, first - (self.frame_no - len(self.ring) + 1), None))
+        self.utterance = _Utterance(next(self._ids), self.lang, frames, first, self.presses if pressed else [])
+        self.utterance.next_partial = PARTIAL_INTERVAL * 1000
+        if pressed:
+            self.presses = []
+        self._events.append({'type': 'speech_start', 'utterance': self.utterance.id,
+                             'preroll_ms': round((speech_frame - first) * self.frame_ms)})
+
+    def _close(self):
+        utt, self.utterance = self.utterance, None
+        self.armed_at = None
+        self.speech_since = None
+        self.voiced_run = 0
+        utt.ended = time.perf_counter()
+        # trailing silence is not worth sending
+        frames = utt.frames[:len(utt.frames) - utt.silence] if utt.silence else utt.frames
+        if len(frames) * self.frame_ms < MIN_UTTERANCE_MS:
+            self._finish({'type': 'final', 'text': '', 'error': '語音太短', 'utterance': utt.id}, utt.presses)
+            return
+        utt.frames = frames
+        self._submit(utt, final=True)
+
+    # --- recognition ---
+    def _submit(self, utt, final):
+        utt.seq += 1
+        seq = utt.seq
+        pcm = b''.join(utt.frames)
+        self.executor.submit(self._recognize, utt, seq, pcm, final)
+
+    def _recognize(self, utt, seq, pcm, final):
+        start = time.perf_counter()
+        try:
+            text = self.recognizer(pcm, self.source.sample_rate, utt.lang)
+            error = None if text or not final else '無法辨識語音'
+        except Exception as e:
+            text, error = '', str(e)
+            self.stats['errors'] += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        audio_ms = round(len(pcm) * 1000 / (2 * self.source.sample_rate))
+        if final:
+            self.stats['utterances'] += 1
+            self.stats['recognition_ms'] = (self.stats['recognition_ms'] + [round(elapsed, 1)])[-100:]
+            with self._lock:
+                self._finish({'type': 'final', 'utterance': utt.id, 'pressed': bool(utt.presses), 'text': text,
+                              'error': error, 'audio_ms': audio_ms, 'recognition_ms': round(elapsed, 1),
+                              'latency_ms': round((time.perf_counter() - utt.ended) * 1000, 1)}, utt.presses)
+            self._flush_events()
+        else:
+            with self._lock:
+                if utt.ended is not None or seq <= utt.shown_seq or not text:
+                    return   # final already on its way, or an older partial
+                utt.shown_seq = seq
+                self._events.append({'type': 'partial', 'utterance': utt.id, 'text': text, 'audio_ms': audio_ms})
+            self.stats['partials'] += 1
+            self._flush_events()
+
+    # --- events (call with _lock held, then _flush_events once it is released) ---
+    def _finish(self, event, presses):
+        self._events.append(event)
+        self._answer(presses, event)
+
+    def _answer(self, presses, event):
+        """Wake wait_final for these presses with event."""
+        for press_id in presses:
+            waiter = self._waiters.get(press_id)
+            if waiter is not None:
+                waiter[1] = event
+                waiter[0].set()
+
+    def _flush_events(self):
+        with self._emit_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            for event in events:
+                self.emit(event)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description='Run the listener over a WAV file (or the microphone).')
+    ap.add_argument('wav', nargs='?', help='16-bit WAV file; omit to use the microphone')
+    ap.add_argument('--fake', action='store_true', help='report utterance lengths instead of calling Google')
+    ap.add_argument('--lang', default='zh-TW')
+    ap.add_argument('--realtime', action='store_true', help='pace the WAV like a live microphone')
+    args = ap.parse_args()
+
+    source = WavSource(args.wav, realtime=args.realtime) if args.wav else MicrophoneSource()
+    listener = SpeechListener(source, emit=lambda e: print(json.dumps(e, ensure_ascii=False), flush=True),
+                              recognizer=fake_recognizer if args.fake else GoogleRecognizer(),
+                              mode='always', lang=args.lang, partials=not args.fake)
+    listener.start()
+    try:
+        while listener.running:
+            time.sleep(0.1)
+        listener.executor.shutdown(wait=True)
+    except KeyboardInterrupt:
+        listener.stop()
+    print(json.dumps(listener.status()))
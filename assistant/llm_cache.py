@@ -0,0 +1,188 @@
+"""
+Client-side cache for /chat replies.
+
+Repeated turns such as "幫我做一份關於AI的簡報", or the same
+fetch_news-then-PPT workflow, still cost seconds of Colab GPU time. Repeats
+are answered here instead. The key is a hash of:
+- the normalised tail of the (already compacted) conversation;
+- the skills schema;
+- the model id reported by /health.
+
+Lookups go to an in-memory LRU first, then to an on-disk SQLite tier that
+survives restarts and is itself trimmed LRU-style:
+
+    cache = ResponseCache('llm_cache.db', ttl=6 * 3600)
+    key = cache.make_key(messages, skills, model='qwen2.5-7b')
+    reply = cache.get(key)            # None on a miss
+    ...
+    cache.put(key, reply, elapsed_ms=2300)   # ignored unless the reply is cacheable
+
+A reply is only cached if it is not an error and its skill (if any) is
+side-effect free. The model choosing launch_app or create_ppt is an action
+and is never replayed, unless that skill was opted in with cacheable_skills.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_TTL = 6 * 3600      # seconds
+MEMORY_ENTRIES = 256
+DISK_ENTRIES = 5000
+TAIL_MESSAGES = 6           # conversation context that makes two turns "the same"
+
+# Skills whose call only reads state: replaying the model's decision is harmless
+READ_ONLY_SKILLS = frozenset({
+    'system_info', 'get_datetime', 'clipboard_read', 'read_file', 'read_lines', 'tail_file',
+    'list_files', 'search_files', 'fetch_news',
+})
+
+_SPACE = re.compile(r'\s+')
+_PER_TURN = ('timing', 'history', 'cached', 'trace_id', 'server_timing')   # not part of a stored reply
+
+
+def normalize_text(text):
+    return _SPACE.sub(' ', unicodedata.normalize('NFKC', str(text))).strip().lower()
+
+
+def canonical_tail(messages, tail=TAIL_MESSAGES):
+    """Last `tail` messages as [[role, normalised content], ...]; the system prompt is kept
+    separately because it changes what the model does with the same question."""
+    system = [[m.get('role'), normalize_text(m.get('content', ''))] for m in messages if m.get('role') == 'system']
+    rest = [[m.get('role'), normalize_text(m.get('content', ''))] for m in messages if m.get('role') != 'system']
+    return system + rest[-tail:]
+
+
+def is_cacheable(reply, extra_skills=()):
+    """Errors and side-effecting skill calls are not cached."""
+    if not isinstance(reply, dict) or str(reply.get('text', '')).startswith('[Error]'):
+        return False
+    skill = reply.get('skill') or ''
+    return not skill or skill in READ_ONLY_SKILLS or skill in extra_skills
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) TTL cache of chat replies. Safe to share between threads."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, memory_entries=MEMORY_ENTRIES,
+                 disk_entries=DISK_ENTRIES, cacheable_skills=()):
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.cacheable_skills = frozenset(cacheable_skills or ())
+        self._memory = OrderedDict()   # key -> (created, elapsed_ms, reply)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS replies ('
+                             'key TEXT PRIMARY KEY, created REAL, used REAL, elapsed_ms REAL, payload TEXT)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS replies_used ON replies(used)')
+        self.stats = {'lookups': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0,
+                      'uncacheable': 0, 'evictions': 0, 'saved_ms': 0.0}
+
+    @staticmethod
+    def make_key(messages, skills, model='', tail=TAIL_MESSAGES):
+        raw = json.dumps([canonical_tail(messages, tail), skills, model or ''],
+                         sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """-> a copy of the cached reply with 'cached': True, or None."""
+        now = time.time()
+        with self._lock:
+            self.stats['lookups'] += 1
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+            else:
+                if entry is not None:
+                    del self._memory[key]
+                entry = self._disk_get(key, now)
+                if entry is None:
+                    self.stats['misses'] += 1
+                    return None
+                self._remember(key, entry)
+                self.stats['disk_hits'] += 1
+            self.stats['saved_ms'] += entry[1]
+        return dict(json.loads(entry[2]), cached=True)
+
+    def put(self, key, reply, elapsed_ms=0.0):
+        """Store a reply if it is cacheable; returns whether it was stored."""
+        if not is_cacheable(reply, self.cacheable_skills):
+            with self._lock:
+                self.stats['uncacheable'] += 1
+            return False
+        body = {k: v for k, v in reply.items() if k not in _PER_TURN}
+        entry = (time.time(), float(elapsed_ms or 0), json.dumps(body, ensure_ascii=False))
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?, ?)',
+                                 (key, entry[0], entry[0], entry[1], entry[2]))
+                self._trim_disk()
+            self.stats['stores'] += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM replies')
+
+    def purge(self):
+        """Drop expired disk rows; returns how many were removed."""
+        if self._db is None:
+            return 0
+        with self._lock:
+            cur = self._db.execute('DELETE FROM replies WHERE created < ?', (time.time() - self.ttl,))
+        return cur.rowcount
+
+    def summary(self):
+        with self._lock:
+            s = dict(self.stats)
+            s['memory_size'] = len(self._memory)
+            if self._db is not None:
+                s['disk_size'] = self._db.execute('SELECT COUNT(*) FROM replies').fetchone()[0]
+        hits = s['memory_hits'] + s['disk_hits']
+        s['hit_rate'] = round(hits / s['lookups'], 3) if s['lookups'] else 0.0
+        s['saved_ms'] = round(s['saved_ms'], 1)
+        return s
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- internals (called with the lock held) ---
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        row = self._db.execute('SELECT created, elapsed_ms, payload FROM replies WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row[0] > self.ttl:
+            self._db.execute('DELETE FROM replies WHERE key = ?', (key,))
+            return None
+        self._db.execute('UPDATE replies SET used = ? WHERE key = ?', (now, key))
+        return row
+
+    def _trim_disk(self):
+        cur = self._db.execute('DELETE FROM replies WHERE key IN (SELECT key FROM replies ORDER BY used DESC '
+                               'LIMIT -1 OFFSET ?)', (self.disk_entries,))
+        self.stats['evictions'] += max(cur.rowcount, 0)
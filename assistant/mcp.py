@@ -0,0 +1,517 @@
+"""
+MCP host: persistent connections to the tool servers in src/mcp/mcp-config.json.
+
+Each entry of "mcpServers" is reached over stdio (command + args + env:
+JSON-RPC messages, one per line, on the child's stdin / stdout) or, when it
+has a "url", over MCP's streamable HTTP transport (JSON-RPC POSTs on one
+keep-alive session). All servers connect in parallel at startup and stay
+connected:
+
+- initialize and tools/list run once per connection. The tool list is
+  cached until the server restarts or sends notifications/tools/list_changed;
+- every message carries a JSON-RPC id, so concurrent tools/call requests
+  share one stdio pipe and a reader thread hands each reply to its caller.
+  A call costs one local round trip;
+- a stdio server that exits is started again right away (at most
+  MAX_RESTARTS times per RESTART_WINDOW seconds) and its tools are re-listed.
+
+Only entries without "disabled": true are started; the shipped config's
+example servers are disabled until the user turns them on.
+
+The tools are offered to the model as skills named mcp_<server>_<tool>,
+with app.js-style params derived from each tool's inputSchema. When two
+tools map to the same name (server "a_b" + tool "c" and server "a" + tool
+"b_c"), each gets a short hash of its server and tool appended.
+
+    host = MCPHost.from_file('src/mcp/mcp-config.json').start()   # connects in the background
+    host.wait(10)
+    host.skills()                               # [{'name', 'description', 'params'}, ...]
+    host.call('mcp_stub_echo', {'text': 'hi'})  # {'success', 'message'}
+    host.status()                               # per server: status, tools, calls, restarts
+
+    python bench/stub_mcp.py                    # stub server for tests (see bench/mcp_host.py)
+"""
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+PROTOCOL_VERSION = '2025-03-26'
+CLIENT_INFO = {'name': 'DigitalAssistant', 'version': '1.0'}
+CONNECT_TIMEOUT = 60.0     # s for initialize + tools/list (npx may download the server first)
+CALL_TIMEOUT = 60.0
+MAX_RESTARTS = 3
+RESTART_WINDOW = 60.0
+STDERR_LINES = 50          # kept per server for error messages
+SKILL_PREFIX = 'mcp_'
+
+
+class MCPError(Exception):
+    """A JSON-RPC error from the server, or the connection failing."""
+
+
+# ===== Transports =====
+
+class StdioTransport:
+    """Child process speaking newline-delimited JSON-RPC on stdin / stdout."""
+
+    def __init__(self, command, args=(), env=None, cwd=None, on_message=None, on_close=None):
+        self.on_message = on_message
+        self.on_close = on_close
+        self.stderr = deque(maxlen=STDERR_LINES)
+        self._write_lock = threading.Lock()
+        try:
+            self.proc = subprocess.Popen(
+                [shutil.which(command) or command, *args],   # which() finds npx.cmd on Windows
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                env={**os.environ, **{k: str(v) for k, v in (env or {}).items()}}, cwd=cwd or None,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+            )
+        except OSError as e:
+            raise MCPError(f'無法啟動 {command}: {e}') from e
+        threading.Thread(target=self._read, name=f'mcp-stdio-{self.proc.pid}', daemon=True).start()
+        threading.Thread(target=self._read_stderr, name=f'mcp-stderr-{self.proc.pid}', daemon=True).start()
+
+    def send(self, message):
+        data = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        try:
+            with self._write_lock:
+                self.proc.stdin.write(data)
+                self.proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise MCPError(f'伺服器已結束{self._last_stderr()}') from e
+
+    def _read(self):
+        for line in self.proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue   # stray output that isn't protocol
+            self.on_message(message)
+        self.on_close(f'伺服器已結束{self._last_stderr()}')
+
+    def _read_stderr(self):
+        for line in self.proc.stderr:
+            self.stderr.append(line.decode('utf-8', 'replace').rstrip())
+
+    def _last_stderr(self):
+        return f'：{self.stderr[-1]}' if self.stderr else ''
+
+    def close(self):
+        try:
+            self.proc.stdin.close()   # MCP servers exit on EOF
+            self.proc.wait(timeout=2)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.proc.kill()
+
+
+class HTTPTransport:
+    """MCP streamable HTTP: each message is a POST; replies come back as JSON or SSE."""
+
+    def __init__(self, url, headers=None, on_message=None, on_close=None):
+        from assistant.http_pool import PooledClient
+
+        self.client = PooledClient(url, retries=0)
+        self.headers = dict(headers or {})
+        self.session_id = None
+        self.on_message = on_message
+        self.on_close = on_close
+
+    def send(self, message):
+        import requests
+        from assistant.streaming import iter_sse
+
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json, text/event-stream', **self.headers}
+        if self.session_id:
+            headers['Mcp-Session-Id'] = self.session_id
+        try:
+            response, _ = self.client.open_stream('POST', '', json=message, headers=headers,
+                                                  timeout=(10, CALL_TIMEOUT))
+            with response:
+                if response.status_code == 404 and self.session_id:
+                    self.on_close('工作階段已失效')   # server restarted: start a new session
+                    raise MCPError('工作階段已失效')
+                if response.status_code >= 400:
+                    raise MCPError(f'HTTP {response.status_code}')
+                self.session_id = response.headers.get('Mcp-Session-Id', self.session_id)
+                if response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                    for event, data in iter_sse(response):
+                        if event == 'message':
+                            self.on_message(json.loads(data))
+                elif response.content:
+                    body = response.json()
+                    for item in body if isinstance(body, list) else [body]:
+                        self.on_message(item)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise MCPError(str(e)) from e
+
+    def close(self):
+        if self.session_id:
+            try:
+                self.client.session.delete(self.client.base_url, headers={'Mcp-Session-Id': self.session_id}, timeout=2)
+            except Exception:
+                pass
+        self.client.close()
+
+
+# ===== JSON-RPC session =====
+
+class Connection:
+    """JSON-RPC over one transport: request ids, pending replies, server requests and notifications."""
+
+    def __init__(self, make_transport, on_notification=None, on_close=None):
+        self._ids = itertools.count(1)
+        self._pending = {}   # id -> Future
+        self._lock = threading.Lock()
+        self._on_notification = on_notification
+        self._on_close = on_close
+        self.closed = False
+        self.transport = make_transport(self._receive, self._closed)
+
+    def request(self, method, params=None, timeout=CALL_TIMEOUT):
+        future = Future()
+        with self._lock:
+            if self.closed:
+                raise MCPError('連線已關閉')
+            msg_id = next(self._ids)
+            self._pending[msg_id] = future
+        try:
+            self.transport.send({'jsonrpc': '2.0', 'id': msg_id, 'method': method, 'params': params or {}})
+            return future.result(timeout)
+        except FutureTimeout:
+            self.notify('notifications/cancelled', {'requestId': msg_id, 'reason': 'timeout'})
+            raise MCPError(f'{method} 逾時（{timeout:.0f} 秒）') from None
+        finally:
+            with self._lock:
+                self._pending.pop(msg_id, None)
+
+    def notify(self, method, params=None):
+        message = {'jsonrpc': '2.0', 'method': method}
+        if params:
+            message['params'] = params
+        try:
+            self.transport.send(message)
+        except MCPError:
+            pass
+
+    def _receive(self, message):
+        if not isinstance(message, dict):
+            return
+        if 'id' in message and ('result' in message or 'error' in message):
+            with self._lock:
+                future = self._pending.get(message['id'])
+            if future is not None and not future.done():
+                if 'error' in message:
+                    error = message['error'] or {}
+                    future.set_exception(MCPError(error.get('message') or str(error)))
+                else:
+                    future.set_result(message['result'])
+        elif 'method' in message and 'id' in message:
+            # Server -> client request: answer ping, decline the rest (no sampling / roots here)
+            reply = {'jsonrpc': '2.0', 'id': message['id']}
+            if message['method'] == 'ping':
+                reply['result'] = {}
+            else:
+                reply['error'] = {'code': -32601, 'message': f"Method not found: {message['method']}"}
+            try:
+                self.transport.send(reply)
+            except MCPError:
+                pass
+        elif 'method' in message and self._on_notification is not None:
+            self._on_notification(message['method'], message.get('params') or {})
+
+    def _closed(self, reason):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            pending = list(self._pending.values())
+        for future in pending:
+            if not future.done():
+                future.set_exception(MCPError(reason))
+        if self._on_close is not None:
+            self._on_close(self, reason)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        self.transport.close()
+
+
+# ===== Servers and host =====
+
+def skill_name(server_id, tool_name, unique=False):
+    """mcp_<server>_<tool>; unique=True appends a hash of the pair, for names that collide."""
+    name = re.sub(r'\W', '_', f'{SKILL_PREFIX}{server_id}_{tool_name}')
+    if unique:
+        name += '_' + hashlib.sha1(f'{server_id}\0{tool_name}'.encode('utf-8')).hexdigest()[:6]
+    return name
+
+
+def param_spec(prop, required=False):
+    """app.js-style spec for one inputSchema property: 'string(...)', 'number(...)',
+    'a|b|c' or '<type>(...)' (see param_node in colab/json_grammar.py)."""
+    enum = prop.get('enum')
+    if enum and all(isinstance(v, str) and re.fullmatch(r'[\w-]+', v) for v in enum):
+        return '|'.join(enum)
+    kind = prop.get('type')
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != 'null'), None)
+    base = {'integer': 'number'}.get(kind, kind or 'any')   # boolean / object / array: any JSON value
+    note = (prop.get('description') or '').replace('(', '（').replace(')', '）').strip()[:80]
+    if not required:
+        note = f'{note}，選填' if note else '選填'
+    return f'{base}({note})' if note else base
+
+
+def result_payload(result):
+    """tools/call result -> {'success', 'message'} like every other skill."""
+    parts = []
+    for item in result.get('content') or []:
+        kind = item.get('type')
+        if kind == 'text':
+            parts.append(item.get('text', ''))
+        elif kind == 'resource':
+            resource = item.get('resource') or {}
+            parts.append(resource.get('text') or resource.get('uri', ''))
+        else:
+            parts.append(f"[{kind} {item.get('mimeType', '')}]".replace(' ]', ']'))
+    if not parts and result.get('structuredContent') is not None:
+        parts.append(json.dumps(result['structuredContent'], ensure_ascii=False))
+    return {'success': not result.get('isError'), 'message': '\n'.join(parts)}
+
+
+class MCPServer:
+    """One configured server: its connection, cached tool list and statistics."""
+
+    def __init__(self, server_id, config, on_change=None):
+        self.id = server_id
+        self.config = config
+        self.name = config.get('name') or server_id
+        self.status = 'registered'   # connecting | connected | exited | error | closed
+        self.error = ''
+        self.tools = None            # cached tools/list; None until listed or after invalidation
+        self.server_info = {}
+        self.ready = threading.Event()   # first connection attempt finished
+        self.stats = {'calls': 0, 'errors': 0, 'call_ms': 0.0, 'connect_ms': None, 'restarts': 0}
+        self._restarts = deque()
+        self._conn = None
+        self._lock = threading.Lock()    # one connect at a time
+        self._on_change = on_change
+
+    def connect(self):
+        """Return the live connection, (re)starting the server if needed."""
+        conn = self._conn
+        if conn is not None and not conn.closed:
+            return conn
+        with self._lock:
+            if self._conn is not None and not self._conn.closed:
+                return self._conn
+            if self._conn is not None:   # it was connected before: this is a restart
+                now = time.time()
+                while self._restarts and now - self._restarts[0] > RESTART_WINDOW:
+                    self._restarts.popleft()
+                if len(self._restarts) >= MAX_RESTARTS:
+                    raise MCPError(f'{self.name} 短時間內重啟太多次')
+                self._restarts.append(now)
+                self.stats['restarts'] += 1
+            self.status = 'connecting'
+            start = time.perf_counter()
+            conn = None
+            try:
+                conn = Connection(self._transport, self._notification, self._closed)
+                result = conn.request('initialize', {'protocolVersion': PROTOCOL_VERSION, 'capabilities': {},
+                                                     'clientInfo': CLIENT_INFO}, timeout=CONNECT_TIMEOUT)
+                conn.notify('notifications/initialized')
+                self.server_info = result.get('serverInfo') or {}
+                self.tools = self._list_tools(conn)
+            except MCPError as e:
+                if conn is not None:
+                    conn.close()
+                self.status, self.error = 'error', str(e)
+                self.ready.set()
+                raise
+            self._conn = conn
+            self.status, self.error = 'connected', ''
+            self.stats['connect_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self.ready.set()
+        self._changed()
+        return conn
+
+    def _transport(self, on_message, on_close):
+        config = self.config
+        if config.get('url'):
+            return HTTPTransport(config['url'], config.get('headers'), on_message, on_close)
+        if not config.get('command'):
+            raise MCPError(f'{self.name} 沒有設定 command 或 url')
+        return StdioTransport(config['command'], config.get('args') or [], config.get('env'),
+                              config.get('cwd'), on_message, on_close)
+
+    @staticmethod
+    def _list_tools(conn):
+        tools, cursor = [], None
+        while True:
+            result = conn.request('tools/list', {'cursor': cursor} if cursor else {}, timeout=CONNECT_TIMEOUT)
+            tools.extend(result.get('tools') or [])
+            cursor = result.get('nextCursor')
+            if not cursor:
+                return tools
+
+    def refresh_tools(self):
+        try:
+            self.tools = self._list_tools(self.connect())
+        except MCPError as e:
+            self.error = str(e)
+        self._changed()
+
+    def _notification(self, method, params):
+        if method == 'notifications/tools/list_changed':
+            self.tools = None
+            # not on the reader thread: it has to read the reply
+            threading.Thread(target=self.refresh_tools, name=f'mcp-tools-{self.id}', daemon=True).start()
+
+    def _closed(self, conn, reason):
+        if conn is not self._conn or self.status == 'closed':
+            return
+        self.status, self.error = 'exited', reason
+        self.tools = None   # whatever starts next may offer different tools
+        self._changed()
+        threading.Thread(target=self.reconnect, name=f'mcp-{self.id}', daemon=True).start()
+
+    def reconnect(self):
+        """connect() for background threads: failures only show up in snapshot()."""
+        try:
+            self.connect()
+        except MCPError:
+            pass
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def call(self, tool, arguments, timeout=CALL_TIMEOUT):
+        conn = self.connect()
+        start = time.perf_counter()
+        try:
+            return conn.request('tools/call', {'name': tool, 'arguments': arguments or {}}, timeout=timeout)
+        except MCPError:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.stats['calls'] += 1
+            self.stats['call_ms'] += (time.perf_counter() - start) * 1000
+
+    def snapshot(self):
+        calls = self.stats['calls']
+        return {
+            'name': self.name, 'status': self.status, 'error': self.error,
+            'transport': 'http' if self.config.get('url') else 'stdio',
+            'server': self.server_info.get('name', ''), 'tools': len(self.tools or []),
+            'calls': calls, 'errors': self.stats['errors'], 'restarts': self.stats['restarts'],
+            'avg_call_ms': round(self.stats['call_ms'] / calls, 1) if calls else None,
+            'connect_ms': self.stats['connect_ms'],
+        }
+
+    def close(self):
+        self.status = 'closed'
+        if self._conn is not None:
+            self._conn.close()
+
+
+class MCPHost:
+    """All configured MCP servers, their tools as skills, and calls by skill name."""
+
+    def __init__(self, servers, on_change=None):
+        self.servers = {sid: MCPServer(sid, config, self._server_changed)
+                        for sid, config in (servers or {}).items() if not config.get('disabled')}
+        self._on_change = on_change   # () -> None when any server's tools or status change
+        self._skills = None           # name -> (server, tool dict); rebuilt after a change
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, on_change=None):
+        """Host for a claude_desktop_config.json-style file ({"mcpServers": {...}})."""
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('mcpServers') or {}, on_change)
+
+    def start(self):
+        """Connect every server in parallel, in the background."""
+        for server in self.servers.values():
+            threading.Thread(target=server.reconnect, name=f'mcp-{server.id}', daemon=True).start()
+        atexit.register(self.close)   # don't leave stdio servers behind
+        return self
+
+    def wait(self, timeout=None):
+        """Block until every server's first connection attempt finished; -> True if all did."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for server in self.servers.values():
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not server.ready.wait(left):
+                return False
+        return True
+
+    def _server_changed(self, server):
+        with self._lock:
+            self._skills = None
+        if self._on_change is not None:
+            self._on_change()
+
+    def _index(self):
+        with self._lock:
+            if self._skills is None:
+                entries = [(server, tool) for server in self.servers.values() for tool in (server.tools or [])]
+                counts = Counter(skill_name(server.id, tool['name']) for server, tool in entries)
+                self._skills = {}
+                for server, tool in entries:
+                    name = skill_name(server.id, tool['name'])
+                    self._skills[skill_name(server.id, tool['name'], unique=counts[name] > 1)] = (server, tool)
+            return self._skills
+
+    def skills(self):
+        """Skill schemas for getSkillSchemas(): the cached tools of every connected server."""
+        out = []
+        for name, (server, tool) in self._index().items():
+            schema = tool.get('inputSchema') or {}
+            required = set(schema.get('required') or [])
+            out.append({
+                'name': name,
+                'description': f"[{server.name}] {tool.get('description') or tool['name']}"[:300],
+                'params': {key: param_spec(prop, key in required)
+                           for key, prop in (schema.get('properties') or {}).items()},
+            })
+        return out
+
+    def tools(self):
+        """[{'skill', 'server', 'tool'}] for looking a skill up by server and tool name."""
+        return [{'skill': name, 'server': server.id, 'tool': tool['name']}
+                for name, (server, tool) in self._index().items()]
+
+    def call(self, name, arguments=None, timeout=CALL_TIMEOUT):
+        """Run the tool behind skill `name` -> {'success', 'message'}."""
+        found = self._index().get(name)
+        if found is None:
+            return {'success': False, 'message': f'未知的 MCP 工具: {name}'}
+        server, tool = found
+        try:
+            return result_payload(server.call(tool['name'], arguments, timeout))
+        except MCPError as e:
+            return {'success': False, 'message': f'MCP 工具執行失敗（{server.name}）: {e}'}
+
+    def status(self):
+        return {sid: server.snapshot() for sid, server in self.servers.items()}
+
+    def close(self):
+        for server in self.servers.values():
+            server.close()
@@ -0,0 +1,256 @@
+"""
+Multi-skill plans, run as a dependency graph.
+
+A reply can carry one skill. For compound requests the model answers with
+the run_plan skill, whose args hold a list of steps:
+
+    {"text": "正在搜尋兩個主題並製作簡報", "skill": "run_plan", "args": {"steps": [
+        {"id": "a", "skill": "fetch_news", "args": {"query": "AI 晶片", "max_results": 5}},
+        {"id": "b", "skill": "fetch_news", "args": {"query": "生成式 AI"}},
+        {"id": "now", "skill": "get_datetime"},
+        {"id": "deck", "skill": "create_ppt", "after": ["a", "b"],
+         "args": {"title": "AI 趨勢", "slides_json": {"from": ["a", "b"]}}},
+        {"id": "done", "skill": "notify", "args": {"title": "簡報完成 ${now}", "message": "${deck}"}}
+    ]}}
+
+A step starts on a thread pool as soon as every step in its "after" list
+has succeeded, so a, b and now run concurrently, deck waits for a and b,
+and done waits for now and deck.
+The whole plan costs one LLM round trip. Step args may use earlier results:
+
+- "${id}" inside a string is replaced by that step's result text when id
+  names a step of the plan; anything else (e.g. "echo ${HOME}") is left as is;
+- {"from": [ids]} as create_ppt's slides_json or the content of
+  create_docx / create_documents builds slides / sections from those
+  steps' results; fetch_news hits become bullet points with their sources.
+
+A reference implies a dependency even if "after" does not list it. When a
+step fails, the steps that depend on it are skipped and the others still run.
+
+    runner = PlanRunner(call=lambda skill, args: {...payload...}, max_workers=4)
+    runner.run(steps)   # {'success', 'message', 'steps': [...], 'elapsed_ms', 'serial_ms'}
+"""
+import json
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_WORKERS = 4
+MAX_STEPS = 16
+SLIDE_POINTS = 5           # search hits per generated slide
+
+# Skills a plan may call (public/app.js getSkillSchemas, minus run_plan itself)
+SKILLS = frozenset({
+    'launch_app', 'open_url', 'open_path', 'run_command', 'clipboard_write', 'clipboard_read', 'system_info',
+    'create_ppt', 'create_docx', 'create_documents', 'create_xlsx', 'write_file', 'read_file', 'read_lines', 'tail_file',
+    'list_files', 'search_files', 'take_screenshot', 'get_datetime', 'search_web', 'fetch_news',
+    'kill_process', 'set_volume', 'notify', 'tail_command', 'kill_command',
+})
+
+_REF = re.compile(r'\$\{([\w-]+)\}')
+
+
+class PlanError(ValueError):
+    pass
+
+
+def references(value, step_ids):
+    """Step ids a value refers to through ${id} (ids in step_ids only) or {"from": [...]}."""
+    if isinstance(value, str):
+        return set(_REF.findall(value)) & step_ids
+    if isinstance(value, dict):
+        if set(value) == {'from'}:
+            ids = value['from']
+            return {str(i) for i in (ids if isinstance(ids, list) else [ids])}
+        return set().union(*(references(v, step_ids) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(references(v, step_ids) for v in value)) if value else set()
+    return set()
+
+
+def parse_steps(steps, skills=SKILLS):
+    """Validate a plan -> [{'id', 'skill', 'args', 'after'}] in dependency order."""
+    if isinstance(steps, str):
+        steps = json.loads(steps)
+    if isinstance(steps, dict):
+        steps = steps.get('steps')
+    if not isinstance(steps, list) or not steps:
+        raise PlanError('計畫沒有步驟')
+    if len(steps) > MAX_STEPS:
+        raise PlanError(f'步驟太多（最多 {MAX_STEPS} 個）')
+
+    for n, raw in enumerate(steps):
+        if not isinstance(raw, dict):
+            raise PlanError(f'第 {n + 1} 個步驟格式錯誤')
+    step_ids = {str(raw.get('id') or f's{n + 1}') for n, raw in enumerate(steps)}
+
+    parsed = {}
+    for n, raw in enumerate(steps):
+        step_id = str(raw.get('id') or f's{n + 1}')
+        if step_id in parsed:
+            raise PlanError(f'步驟 id 重複: {step_id}')
+        skill = raw.get('skill') or ''
+        if skill not in skills:
+            raise PlanError(f'未知技能: {skill}')
+        args = raw.get('args') or {}
+        if not isinstance(args, dict):
+            raise PlanError(f'步驟 {step_id} 的 args 必須是物件')
+        after = raw.get('after') or []
+        after = [after] if isinstance(after, str) else after
+        parsed[step_id] = {'id': step_id, 'skill': skill, 'args': args,
+                           'after': sorted({str(a) for a in after} | references(args, step_ids))}
+    for step in parsed.values():
+        for dep in step['after']:
+            if dep not in parsed:
+                raise PlanError(f'步驟 {step["id"]} 依賴不存在的步驟: {dep}')
+            if dep == step['id']:
+                raise PlanError(f'步驟 {dep} 依賴自己')
+
+    # Kahn's algorithm; keeps the model's order among independent steps
+    order, placed = [], set()
+    while len(order) < len(parsed):
+        ready = [s for s in parsed.values() if s['id'] not in placed and all(d in placed for d in s['after'])]
+        if not ready:
+            raise PlanError('步驟之間有循環依賴')
+        order.extend(ready)
+        placed.update(s['id'] for s in ready)
+    return order
+
+
+def result_text(skill, payload):
+    """A step's result as text, the way app.js shows it (get_datetime -> its 'full' field)."""
+    message = str(payload.get('message', ''))
+    if skill == 'get_datetime':
+        try:
+            return json.loads(message)['full']
+        except (ValueError, KeyError, TypeError):
+            pass
+    return message
+
+
+def slides_from(sources):
+    """create_ppt slides from (skill, payload) pairs: one slide per search, plus a sources slide."""
+    slides, links = [], []
+    for skill, payload in sources:
+        hits = payload.get('results') or []
+        if hits:
+            points = [f"{h.get('title', '').strip()}：{h.get('body', '').strip()[:60]}" for h in hits[:SLIDE_POINTS]]
+            links.extend(h['href'] for h in hits[:SLIDE_POINTS] if h.get('href'))
+            slides.append({'title': payload.get('query') or '搜尋結果', 'content': '\n'.join(points)})
+        else:
+            lines = [line for line in result_text(skill, payload).splitlines() if line.strip()]
+            slides.append({'title': skill, 'content': '\n'.join(lines[:SLIDE_POINTS])})
+    if links:
+        slides.append({'title': '資料來源', 'content': '\n'.join(links[:10])})
+    return slides
+
+
+def sections_from(sources):
+    """create_docx content (# / ## / - markup) from (skill, payload) pairs."""
+    parts = []
+    for skill, payload in sources:
+        hits = payload.get('results') or []
+        parts.append(f"## {payload.get('query') or skill}")
+        if hits:
+            for h in hits:
+                parts.append(f"- {h.get('title', '').strip()}：{h.get('body', '').strip()}")
+                if h.get('href'):
+                    parts.append(f"- 來源：{h['href']}")
+        else:
+            parts.extend(f'- {line}' for line in result_text(skill, payload).splitlines() if line.strip())
+    return '\n'.join(parts)
+
+
+def resolve(skill, args, done):
+    """Substitute references in args with finished results (done: id -> (skill, payload))."""
+    def value(key, v):
+        if isinstance(v, str):
+            return _REF.sub(lambda m: result_text(*done[m.group(1)]) if m.group(1) in done else m.group(0), v)
+        if isinstance(v, dict) and set(v) == {'from'}:
+            ids = v['from'] if isinstance(v['from'], list) else [v['from']]
+            sources = [done[str(i)] for i in ids]
+            if skill == 'create_ppt' and key == 'slides_json':
+                return slides_from(sources)
+            if skill in ('create_docx', 'create_documents') and key == 'content':
+                return sections_from(sources)
+            return '\n\n'.join(result_text(*s) for s in sources)
+        if isinstance(v, dict):
+            return {k: value(k, x) for k, x in v.items()}
+        if isinstance(v, list):
+            return [value(key, x) for x in v]
+        return v
+    return {k: value(k, v) for k, v in args.items()}
+
+
+class PlanRunner:
+    """Runs a plan's steps on a thread pool in dependency order; see the module docstring."""
+
+    def __init__(self, call, max_workers=DEFAULT_WORKERS, skills=SKILLS):
+        self.call = call   # (skill, args dict) -> payload dict ({'success', 'message', ...})
+        self.max_workers = max_workers
+        self.skills = skills
+
+    def run(self, steps):
+        start = time.perf_counter()
+        order = parse_steps(steps, self.skills)
+        by_id = {s['id']: s for s in order}
+        pending = dict(by_id)
+        done, failed, records, running = {}, set(), {}, {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(order))),
+                                thread_name_prefix='plan') as pool:
+            while pending or running:
+                for step_id, step in list(pending.items()):   # dependency order, so skips cascade
+                    if any(d in failed for d in step['after']):
+                        del pending[step_id]
+                        failed.add(step_id)
+                        records[step_id] = {'state': 'skipped', 'ms': 0.0, 'message': '前置步驟失敗，已略過'}
+                    elif all(d in done for d in step['after']):
+                        del pending[step_id]
+                        args = resolve(step['skill'], step['args'], done)
+                        running[pool.submit(self._run_step, step['skill'], args)] = step_id
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step_id = running.pop(future)
+                    payload, ms = future.result()
+                    skill = by_id[step_id]['skill']
+                    if payload.get('success'):
+                        done[step_id] = (skill, payload)
+                    else:
+                        failed.add(step_id)
+                    records[step_id] = {'state': 'done' if payload.get('success') else 'failed', 'ms': round(ms, 1),
+                                        'message': result_text(skill, payload)}
+
+        out = [dict(id=s['id'], skill=s['skill'], after=s['after'], **records[s['id']]) for s in order]
+        elapsed = (time.perf_counter() - start) * 1000
+        serial = sum(r['ms'] for r in out)
+        return {'success': not failed, 'message': self.summary(order, out, elapsed, serial),
+                'steps': out, 'elapsed_ms': round(elapsed, 1), 'serial_ms': round(serial, 1)}
+
+    def _run_step(self, skill, args):
+        start = time.perf_counter()
+        try:
+            payload = self.call(skill, args)
+            if not isinstance(payload, dict):
+                payload = {'success': False, 'message': f'技能回傳格式錯誤: {payload!r}'}
+        except Exception as e:
+            payload = {'success': False, 'message': f'技能執行失敗: {e}'}
+        return payload, (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def summary(order, out, elapsed_ms, serial_ms):
+        """One message for the whole plan. Search results no later step consumed are
+        appended in full, so they reach the conversation like a lone fetch_news."""
+        ok = sum(r['state'] == 'done' for r in out)
+        lines = [f'已完成 {ok}/{len(out)} 個步驟（耗時 {elapsed_ms / 1000:.1f} 秒，逐一執行約需 {serial_ms / 1000:.1f} 秒）']
+        mark = {'done': '✓', 'failed': '✗', 'skipped': '-'}
+        for r in out:
+            first = r['message'].strip().splitlines()[0][:80] if r['message'].strip() else ''
+            lines.append(f"{mark[r['state']]} [{r['id']}] {r['skill']}: {first}")
+        used = set().union(*(set(s['after']) for s in order))
+        for r in out:
+            if r['skill'] == 'fetch_news' and r['state'] == 'done' and r['id'] not in used:
+                lines.append(f"\n[{r['id']}] 搜尋結果：\n{r['message']}")
+        return '\n'.join(lines)
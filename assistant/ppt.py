@@ -0,0 +1,244 @@
+"""
+Template-cached PowerPoint rendering for create_ppt.
+
+Each theme is built once into an in-memory .pptx template:
+
+- the slide master carries the theme background,
+- three slide layouts carry the static artwork (accent bars, divider, content
+  card) for the title, content and end slides,
+- prototype text boxes (title, page number, body paragraph, ...) are rendered
+  once with their fonts and colours and kept as XML.
+
+A deck is then the cached template plus one add_slide() per slide and a
+deep copy of the prototype text boxes with only the text filled in, instead
+of rebuilding every shape through python-pptx's object layer.
+
+    prs = render_deck('AI 新聞', [{'title': '...', 'content': '...'}], theme='ocean')
+    prs.save(path)
+"""
+import copy
+import datetime
+import io
+import threading
+
+from pptx import Presentation
+from pptx.dml.color import RGBColor
+from pptx.enum.text import PP_ALIGN
+from pptx.text.text import _Paragraph
+from pptx.util import Inches, Pt
+
+FONT = 'Microsoft JhengHei'
+
+THEMES = {
+    'dark': {
+        'bg': (0x1A, 0x1A, 0x2E), 'card': (0x16, 0x21, 0x3E),
+        'accent': (0x53, 0x3C, 0xD4), 'accent2': (0x7C, 0x6A, 0xF0),
+        'text': (0xFF, 0xFF, 0xFF), 'sub': (0xA0, 0xA0, 0xB8), 'light': (0xE0, 0xE0, 0xEE),
+    },
+    'corporate': {
+        'bg': (0xFF, 0xFF, 0xFF), 'card': (0xF0, 0xF2, 0xF5),
+        'accent': (0x00, 0x52, 0xCC), 'accent2': (0x33, 0x7A, 0xFF),
+        'text': (0x1A, 0x1A, 0x2E), 'sub': (0x66, 0x66, 0x80), 'light': (0x33, 0x33, 0x44),
+    },
+    'nature': {
+        'bg': (0xF5, 0xF0, 0xEB), 'card': (0xE8, 0xE0, 0xD5),
+        'accent': (0x2D, 0x6A, 0x4F), 'accent2': (0x52, 0xB7, 0x88),
+        'text': (0x2D, 0x2D, 0x2D), 'sub': (0x6B, 0x70, 0x5C), 'light': (0x3D, 0x3D, 0x3D),
+    },
+    'warm': {
+        'bg': (0x2D, 0x1B, 0x1B), 'card': (0x3D, 0x25, 0x25),
+        'accent': (0xE8, 0x6C, 0x3A), 'accent2': (0xFF, 0x9A, 0x6C),
+        'text': (0xFF, 0xFF, 0xFF), 'sub': (0xB0, 0x98, 0x90), 'light': (0xE8, 0xDB, 0xD5),
+    },
+    'ocean': {
+        'bg': (0x0B, 0x1D, 0x33), 'card': (0x12, 0x2A, 0x45),
+        'accent': (0x00, 0xB4, 0xD8), 'accent2': (0x48, 0xCA, 0xE4),
+        'text': (0xFF, 0xFF, 0xFF), 'sub': (0x90, 0xBC, 0xD0), 'light': (0xCA, 0xE9, 0xF5),
+    },
+    'minimal': {
+        'bg': (0xFF, 0xFF, 0xFF), 'card': (0xF8, 0xF8, 0xF8),
+        'accent': (0x22, 0x22, 0x22), 'accent2': (0x55, 0x55, 0x55),
+        'text': (0x11, 0x11, 0x11), 'sub': (0x88, 0x88, 0x88), 'light': (0x33, 0x33, 0x33),
+    },
+}
+DEFAULT_THEME = 'dark'
+
+# Layout indices in the default template that are rebuilt as our three layouts
+_TITLE, _CONTENT, _END = 0, 1, 2
+
+
+class _Template:
+    """One theme, ready to clone: template bytes + prototype text boxes."""
+
+    __slots__ = ('blob', 'protos', 'para')
+
+    def __init__(self, blob, protos, para):
+        self.blob = blob       # .pptx bytes (master background + three layouts)
+        self.protos = protos   # name -> p:sp element of a formatted text box
+        self.para = para       # a:p prototype for one body line
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def theme_names():
+    return list(THEMES)
+
+
+def get_template(theme):
+    """Build (once) and return the cached template for theme."""
+    theme = theme if theme in THEMES else DEFAULT_THEME
+    with _lock:
+        tpl = _cache.get(theme)
+        if tpl is None:
+            tpl = _cache[theme] = _build_template(THEMES[theme])
+        return tpl
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def render_deck(title, slides, theme=DEFAULT_THEME, date=None, progress=None):
+    """Return a Presentation: title slide, one slide per {'title','content'}, end slide.
+
+    progress(done, total) is called after each content slide."""
+    tpl = get_template(theme)
+    prs = Presentation(io.BytesIO(tpl.blob))
+    layouts = prs.slide_layouts
+    date = date or datetime.datetime.now().strftime('%Y . %m . %d')
+
+    # ── Title Slide ──
+    slide = prs.slides.add_slide(layouts[_TITLE])
+    _place(slide, tpl.protos['cover_title'], title)
+    _place(slide, tpl.protos['cover_date'], date)
+
+    # ── Content Slides ──
+    for idx, s in enumerate(slides):
+        slide = prs.slides.add_slide(layouts[_CONTENT])
+        _place(slide, tpl.protos['number'], f'{idx + 1:02d}')
+        _place(slide, tpl.protos['heading'], s.get('title', ''))
+        body = _place(slide, tpl.protos['body'], None)
+        txBody = body.find('{*}txBody')
+        lines = [l.strip() for l in str(s.get('content', '')).split('\n') if l.strip()]
+        for line in lines:
+            p = copy.deepcopy(tpl.para)
+            _Paragraph(p, None).text = f'  {line.lstrip("-*> ")}' if line.startswith(('-', '*', '>')) else f'  {line}'
+            txBody.append(p)
+        if not lines:
+            txBody.append(copy.deepcopy(tpl.para))
+        if progress:
+            progress(idx + 1, len(slides))
+
+    # ── End Slide ──
+    slide = prs.slides.add_slide(layouts[_END])
+    _place(slide, tpl.protos['end_title'], 'Thank You')
+    _place(slide, tpl.protos['end_sub'], title)
+    return prs
+
+
+# --- internals ---
+def _place(slide, proto, text):
+    """Append a copy of a prototype text box to slide, with its text replaced."""
+    sp = copy.deepcopy(proto)
+    if text is not None:
+        _Paragraph(sp.find('{*}txBody').find('{*}p'), None).text = text
+    tree = slide.shapes._spTree
+    sp.find('{*}nvSpPr').find('{*}cNvPr').set('id', str(len(tree) + 1))
+    tree.append(sp)
+    return sp
+
+
+def _build_template(t):
+    BG = RGBColor(*t['bg'])
+    CARD = RGBColor(*t['card'])
+    ACCENT = RGBColor(*t['accent'])
+    ACCENT_LIGHT = RGBColor(*t['accent2'])
+    WHITE = RGBColor(*t['text'])
+    GRAY = RGBColor(*t['sub'])
+    LIGHT = RGBColor(*t['light'])
+
+    prs = Presentation()
+    prs.slide_width = Inches(13.333)
+    prs.slide_height = Inches(7.5)
+
+    fill = prs.slide_master.background.fill
+    fill.solid()
+    fill.fore_color.rgb = BG
+
+    # Shapes are drawn on a scratch slide (layouts have no add_shape) and
+    # their XML is moved onto the layouts
+    scratch = prs.slides.add_slide(prs.slide_layouts[6])
+
+    def add_shape(tree, left, top, w, h, fill_color):
+        shape = scratch.shapes.add_shape(1, left, top, w, h)   # MSO_SHAPE.RECTANGLE
+        shape.fill.solid()
+        shape.fill.fore_color.rgb = fill_color
+        shape.line.fill.background()
+        shape._element.find('{*}nvSpPr').find('{*}cNvPr').set('id', str(len(tree) + 1))
+        tree.append(shape._element)
+        return shape
+
+    def layout(index, name):
+        lay = prs.slide_layouts[index]
+        for ph in list(lay.placeholders):
+            ph._element.getparent().remove(ph._element)
+        lay.name = name
+        return lay.shapes._spTree
+
+    # Static artwork lives on the layouts
+    tree = layout(_TITLE, 'Assistant Title')
+    add_shape(tree, Inches(0), Inches(0), Inches(0.15), Inches(7.5), ACCENT)
+    add_shape(tree, Inches(1.5), Inches(3.8), Inches(3), Pt(3), ACCENT_LIGHT)
+
+    tree = layout(_CONTENT, 'Assistant Content')
+    add_shape(tree, Inches(0), Inches(0), Inches(13.333), Pt(4), ACCENT)
+    add_shape(tree, Inches(0.8), Inches(1.5), Inches(2), Pt(3), ACCENT_LIGHT)
+    add_shape(tree, Inches(0.6), Inches(1.9), Inches(12), Inches(5.0), CARD).shadow.inherit = False
+
+    tree = layout(_END, 'Assistant End')
+    add_shape(tree, Inches(0), Inches(0), Inches(13.333), Pt(4), ACCENT)
+
+    # Prototype text boxes, rendered once on the same scratch slide
+    protos = {}
+
+    def textbox(name, left, top, w, h, size, color, bold=False, align=PP_ALIGN.LEFT):
+        box = scratch.shapes.add_textbox(left, top, w, h)
+        tf = box.text_frame
+        tf.word_wrap = True
+        p = tf.paragraphs[0]
+        p.font.size = Pt(size)
+        p.font.color.rgb = color
+        p.font.bold = bold
+        p.font.name = FONT
+        p.alignment = align
+        protos[name] = box._element
+        return tf
+
+    textbox('cover_title', Inches(1.5), Inches(2.2), Inches(10), Inches(1.5), 44, WHITE, bold=True)
+    textbox('cover_date', Inches(1.5), Inches(4.0), Inches(10), Inches(0.6), 16, GRAY)
+    textbox('number', Inches(11.8), Inches(0.3), Inches(1), Inches(0.5), 14, GRAY, align=PP_ALIGN.RIGHT)
+    textbox('heading', Inches(0.8), Inches(0.5), Inches(11), Inches(1.0), 32, WHITE, bold=True)
+    body = textbox('body', Inches(1.1), Inches(2.2), Inches(11), Inches(4.5), 18, LIGHT)
+    textbox('end_title', Inches(2), Inches(2.8), Inches(9), Inches(1.5), 48, WHITE, bold=True, align=PP_ALIGN.CENTER)
+    textbox('end_sub', Inches(2), Inches(4.3), Inches(9), Inches(0.6), 18, GRAY, align=PP_ALIGN.CENTER)
+
+    # Body lines are appended per slide, so keep the paragraph separately
+    body.paragraphs[0].space_after = Pt(10)
+    para = body.paragraphs[0]._p
+    para.getparent().remove(para)
+
+    protos = {name: copy.deepcopy(el) for name, el in protos.items()}
+    para = copy.deepcopy(para)
+
+    # Drop the scratch slide before serialising the template
+    sld_ids = prs.slides._sldIdLst
+    rid = sld_ids[0].rId
+    prs.part.drop_rel(rid)
+    sld_ids.remove(sld_ids[0])
+
+    buf = io.BytesIO()
+    prs.save(buf)
+    return _Template(buf.getvalue(), protos, para)
@@ -0,0 +1,473 @@
+"""
+Background shell commands with streamed output, for run_command.
+
+    procs = ProcessManager(emit=lambda payload: api._emit('command', payload))
+    cmd_id = procs.start('pip install -r requirements.txt')
+    procs.tail(cmd_id, since=0)   # {'lines': [[seq, 'out' | 'err', text], ...], 'next': seq, 'dropped': n,
+                                  #  'partial': {'out': unfinished line}}
+    procs.poll(cmd_id)            # {'id', 'state', 'returncode', 'elapsed_ms', 'cpu_ms', 'peak_rss_kb', ...}
+    procs.kill(cmd_id)
+
+There is no timeout: a command runs until it exits or is killed. Each one
+gets a watcher thread and one reader thread per pipe. Output goes into a
+bounded ring buffer (BUFFER_LINES lines of at most MAX_LINE characters),
+so a chatty build cannot grow memory. Pipes are read in chunks as they
+arrive and decoded incrementally. The line still being written (e.g. a
+'\\r' progress bar, which keeps only its latest state) is the buffer's
+partial line until its '\\n' arrives, so progress shows while it runs.
+
+Events (emit payloads), batched to one 'output' per OUTPUT_INTERVAL:
+{'type': 'started' | 'output' | 'exit', 'id', ...}. 'output' carries
+'lines' and 'partial' ({stream: unfinished line}); 'exit' carries the
+final poll() snapshot.
+
+Resource use covers the whole process tree:
+- POSIX: the command runs in its own session. The watcher reaps it with
+  os.wait4, whose rusage includes every waited-for descendant. While it
+  runs, RSS and CPU time are sampled from /proc. kill() signals the process
+  group.
+- Windows: the command is put in a Job Object. It is queried for CPU time
+  and peak memory, and terminated as a whole. Commands left running die
+  with the app (KILL_ON_JOB_CLOSE).
+"""
+import codecs
+import collections
+import itertools
+import locale
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+MAX_RUNNING = 8            # concurrent commands
+KEEP_FINISHED = 20         # finished commands kept for poll / tail
+BUFFER_LINES = 2000        # output lines kept per command
+MAX_LINE = 4000            # characters kept per line
+READ_CHUNK = 65536         # bytes per pipe read
+OUTPUT_INTERVAL = 0.1      # s between 'output' events for one command
+EVENT_LINES = 200          # lines per 'output' event; older ones stay readable through tail()
+KILL_GRACE = 2.0           # s between SIGTERM and SIGKILL
+
+WINDOWS = sys.platform == 'win32'
+
+
+class TooManyCommands(Exception):
+    pass
+
+
+class StreamDecoder:
+    """Incremental decoder for console output: UTF-8 until a chunk proves
+    otherwise, then the ANSI/OEM code page (cp950 on zh-TW Windows). A
+    multi-byte character split across reads waits for its remaining bytes."""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._fallback = False
+
+    def decode(self, raw, final=False):
+        if not self._fallback:
+            try:
+                return self._decoder.decode(raw, final)
+            except UnicodeDecodeError:
+                raw = self._decoder.getstate()[0] + raw   # bytes held back from earlier reads
+                self._fallback = True
+                self._decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))(errors='replace')
+        return self._decoder.decode(raw, final)
+
+
+class OutputBuffer:
+    """Ring buffer of numbered output lines; seq keeps counting past evicted lines."""
+
+    def __init__(self, max_lines=BUFFER_LINES):
+        self.lines = collections.deque(maxlen=max_lines)   # (seq, stream, text)
+        self.next = 0
+        self.partial = {}   # stream -> line still being written (latest '\r' state)
+        self._lock = threading.Lock()
+
+    def append(self, stream, text):
+        with self._lock:
+            self.lines.append((self.next, stream, text[:MAX_LINE]))
+            self.next += 1
+
+    def set_partial(self, stream, text):
+        with self._lock:
+            if text:
+                self.partial[stream] = text[:MAX_LINE]
+            else:
+                self.partial.pop(stream, None)
+
+    def partials(self):
+        with self._lock:
+            return dict(self.partial)
+
+    def since(self, seq, limit=None):
+        """Lines with seq >= seq (the newest limit of them) -> (lines, next, dropped)."""
+        with self._lock:
+            first = self.next - len(self.lines)
+            start = max(seq, first)
+            if limit is not None:
+                start = max(start, self.next - limit)
+            out = [list(line) for line in itertools.islice(self.lines, start - first, None)]
+            return out, self.next, max(0, start - seq)
+
+
+class Command:
+    __slots__ = ('id', 'command', 'cwd', 'popen', 'state', 'returncode', 'started', 'finished',
+                 'output', 'cpu_ms', 'rss_kb', 'peak_rss_kb', 'job', 'kill_requested', 'sent', 'sent_partial',
+                 'done', 'fork_rss_kb')
+
+    def __init__(self, cmd_id, command, cwd):
+        self.id = cmd_id
+        self.command = command
+        self.cwd = cwd
+        self.popen = None
+        self.state = 'running'     # running -> exited | killed | failed
+        self.returncode = None
+        self.started = time.time()
+        self.finished = None
+        self.output = OutputBuffer()
+        self.cpu_ms = 0.0
+        self.rss_kb = 0
+        self.peak_rss_kb = 0
+        self.job = None            # Windows Job Object handle
+        self.kill_requested = False
+        self.sent = 0              # output seq already pushed as events
+        self.sent_partial = {}     # partial lines already pushed as events
+        self.done = threading.Event()
+        self.fork_rss_kb = 0       # POSIX: our own peak RSS when the command was forked
+
+    def snapshot(self):
+        return {
+            'id': self.id, 'command': self.command, 'state': self.state,
+            'pid': self.popen.pid if self.popen else None, 'returncode': self.returncode,
+            'elapsed_ms': round(((self.finished or time.time()) - self.started) * 1000, 1),
+            'cpu_ms': round(self.cpu_ms, 1), 'rss_kb': self.rss_kb, 'peak_rss_kb': self.peak_rss_kb,
+            'output_lines': self.output.next,
+        }
+
+
+class ProcessManager:
+    """Runs shell commands in the background; see the module docstring."""
+
+    def __init__(self, emit=None, max_running=MAX_RUNNING):
+        self.emit = emit or (lambda payload: None)
+        self.max_running = max_running
+        self.commands = collections.OrderedDict()   # id -> Command, oldest first
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # --- public ---
+    def start(self, command, cwd=None):
+        with self._lock:
+            running = sum(1 for c in self.commands.values() if c.state == 'running')
+            if running >= self.max_running:
+                raise TooManyCommands(f'已有 {running} 個指令在執行，請先等待或終止其中一個')
+            cmd = Command(f'cmd{next(self._ids)}', command, cwd)
+            self.commands[cmd.id] = cmd
+            self._trim()
+        try:
+            cmd.popen = _spawn(command, cwd)
+        except OSError as e:
+            cmd.state, cmd.finished = 'failed', time.time()
+            cmd.output.append('err', str(e))
+            cmd.done.set()
+            self.emit({'type': 'exit', **cmd.snapshot()})
+            raise
+        if WINDOWS:
+            cmd.job = _win_job(cmd.popen)
+        else:
+            import resource
+            cmd.fork_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        readers = [threading.Thread(target=self._read, args=(cmd, pipe, stream), daemon=True,
+                                    name=f'{cmd.id}-{stream}')
+                   for pipe, stream in ((cmd.popen.stdout, 'out'), (cmd.popen.stderr, 'err'))]
+        for reader in readers:
+            reader.start()
+        self.emit({'type': 'started', 'id': cmd.id, 'command': command, 'pid': cmd.popen.pid})
+        threading.Thread(target=self._watch, args=(cmd, readers), daemon=True, name=f'{cmd.id}-watch').start()
+        return cmd.id
+
+    def poll(self, cmd_id):
+        cmd = self.commands.get(cmd_id)
+        return cmd.snapshot() if cmd else None
+
+    def list(self):
+        return [cmd.snapshot() for cmd in list(self.commands.values())]
+
+    def tail(self, cmd_id, since=0, limit=200):
+        """Output lines from seq since on, at most limit (the newest). since < 0
+        counts back from the end, so tail(id, -20) is the last 20 lines."""
+        cmd = self.commands.get(cmd_id)
+        if cmd is None:
+            return None
+        if since < 0:
+            since = max(0, cmd.output.next + since)
+        lines, nxt, dropped = cmd.output.since(since, limit)
+        return {'id': cmd_id, 'state': cmd.state, 'lines': lines, 'next': nxt, 'dropped': dropped,
+                'partial': cmd.output.partials()}
+
+    def text(self, cmd_id, limit=200):
+        """The last limit lines as one string (stderr lines and unfinished lines included)."""
+        out = self.tail(cmd_id, -limit, limit)
+        return '\n'.join([line[2] for line in out['lines']] + list(out['partial'].values())) if out else ''
+
+    def wait(self, cmd_id, timeout=None):
+        """Block until the command finishes or timeout s pass -> its snapshot."""
+        cmd = self.commands.get(cmd_id)
+        if cmd is None:
+            return None
+        cmd.done.wait(timeout)
+        return cmd.snapshot()
+
+    def kill(self, cmd_id):
+        """Terminate the command and everything it started."""
+        cmd = self.commands.get(cmd_id)
+        if cmd is None or cmd.state != 'running' or cmd.popen is None:
+            return False
+        cmd.kill_requested = True
+        if WINDOWS:
+            _win_terminate(cmd)
+            return True
+        try:
+            os.killpg(cmd.popen.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return True
+
+        def force():
+            if cmd.state == 'running':
+                try:
+                    os.killpg(cmd.popen.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        timer = threading.Timer(KILL_GRACE, force)
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def shutdown(self):
+        for cmd in list(self.commands.values()):
+            self.kill(cmd.id)
+
+    # --- internals ---
+    def _trim(self):
+        finished = [c.id for c in self.commands.values() if c.state != 'running']
+        for cmd_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.commands[cmd_id]
+
+    @staticmethod
+    def _read(cmd, pipe, stream):
+        """Split the pipe into lines on '\\n'; a '\\r' starts the current line over."""
+        decoder = StreamDecoder()
+        line = ''
+        restart = False   # a '\r' was seen: the next text replaces the line
+        with pipe:
+            while True:
+                raw = pipe.read(READ_CHUNK)   # unbuffered pipe: whatever has arrived
+                for piece in re.split(r'(\r|\n)', decoder.decode(raw, final=not raw)):
+                    if piece == '\n':
+                        cmd.output.append(stream, line)
+                        line, restart = '', False
+                    elif piece == '\r':
+                        restart = True
+                    elif piece:
+                        line = piece if restart else line + piece
+                        restart = False
+                        while len(line) > MAX_LINE:
+                            cmd.output.append(stream, line[:MAX_LINE])
+                            line = line[MAX_LINE:]
+                if not raw:
+                    break
+                cmd.output.set_partial(stream, line)
+        if line:
+            cmd.output.append(stream, line)
+        cmd.output.set_partial(stream, '')
+
+    def _watch(self, cmd, readers):
+        last_emit = 0.0
+        while True:
+            done = _reap(cmd) if not WINDOWS else cmd.popen.poll() is not None
+            _sample(cmd)
+            if done:
+                break
+            if time.monotonic() - last_emit >= OUTPUT_INTERVAL:
+                self._flush(cmd)
+                last_emit = time.monotonic()
+            time.sleep(OUTPUT_INTERVAL / 2)
+        for reader in readers:
+            reader.join(timeout=1.0)   # a grandchild holding the pipe open must not hang us
+        cmd.returncode = cmd.popen.returncode
+        cmd.finished = time.time()
+        if WINDOWS:
+            _win_close(cmd)
+        cmd.state = 'killed' if cmd.kill_requested else 'exited'
+        cmd.done.set()
+        self._flush(cmd)
+        self.emit({'type': 'exit', **cmd.snapshot()})
+
+    def _flush(self, cmd):
+        lines, nxt, dropped = cmd.output.since(cmd.sent, EVENT_LINES)
+        partial = cmd.output.partials()
+        if lines or partial != cmd.sent_partial:
+            cmd.sent, cmd.sent_partial = nxt, partial
+            self.emit({'type': 'output', 'id': cmd.id, 'lines': lines, 'dropped': dropped, 'partial': partial})
+
+
+# ===== Platform helpers =====
+
+def _spawn(command, cwd):
+    kwargs = dict(shell=True, cwd=cwd or None, stdin=subprocess.DEVNULL,
+                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+    if WINDOWS:
+        kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True   # own process group for killpg
+    return subprocess.Popen(command, **kwargs)
+
+
+def _reap(cmd):
+    """POSIX: wait4 without blocking; records the exit code and the tree's rusage."""
+    try:
+        pid, status, usage = os.wait4(cmd.popen.pid, os.WNOHANG)
+    except ChildProcessError:   # already reaped elsewhere
+        if cmd.popen.returncode is None:
+            cmd.popen.returncode = -1
+        return True
+    if pid == 0:
+        return False
+    cmd.popen.returncode = os.waitstatus_to_exitcode(status)
+    cmd.cpu_ms = (usage.ru_utime + usage.ru_stime) * 1000
+    # Linux carries the forking process's high-water mark across exec, so a
+    # maxrss not above our own peak at fork time may be just that copy of us;
+    # the /proc samples are used then. (macOS reports bytes, not KiB.)
+    maxrss = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    if maxrss > cmd.fork_rss_kb:
+        cmd.peak_rss_kb = max(cmd.peak_rss_kb, maxrss)
+    return True
+
+
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') and not WINDOWS else 100
+
+
+def _sample(cmd):
+    """Live CPU time and RSS of the command's top process (Linux /proc; Windows job totals)."""
+    if cmd.popen.returncode is not None and not WINDOWS:
+        return
+    if WINDOWS:
+        usage = _win_usage(cmd.job)
+        if usage:
+            cmd.cpu_ms, cmd.peak_rss_kb = usage
+        return
+    try:
+        with open(f'/proc/{cmd.popen.pid}/stat', 'rb') as f:
+            fields = f.read().rsplit(b')', 1)[1].split()
+        with open(f'/proc/{cmd.popen.pid}/status', 'rb') as f:
+            status = f.read()
+    except OSError:   # no /proc (macOS), or the process just exited
+        return
+    # utime, stime, cutime, cstime: fields 14-17 of stat, 12-15 after the comm field
+    cmd.cpu_ms = max(cmd.cpu_ms, sum(int(v) for v in fields[11:15]) * 1000 / _CLK_TCK)
+    for line in status.splitlines():
+        if line.startswith((b'VmRSS:', b'VmHWM:')):
+            kb = int(line.split()[1])
+            if line.startswith(b'VmRSS:'):
+                cmd.rss_kb = kb
+            cmd.peak_rss_kb = max(cmd.peak_rss_kb, kb)
+
+
+# --- Windows Job Objects (ctypes; Windows only) ---
+
+def _win_api():
+    import ctypes
+    from ctypes import wintypes
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+            'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+    class BASIC_LIMIT(ctypes.Structure):
+        _fields_ = [('PerProcessUserTimeLimit', ctypes.c_int64), ('PerJobUserTimeLimit', ctypes.c_int64),
+                    ('LimitFlags', wintypes.DWORD), ('MinimumWorkingSetSize', ctypes.c_size_t),
+                    ('MaximumWorkingSetSize', ctypes.c_size_t), ('ActiveProcessLimit', wintypes.DWORD),
+                    ('Affinity', ctypes.c_size_t), ('PriorityClass', wintypes.DWORD),
+                    ('SchedulingClass', wintypes.DWORD)]
+
+    class EXTENDED_LIMIT(ctypes.Structure):
+        _fields_ = [('BasicLimitInformation', BASIC_LIMIT), ('IoInfo', IO_COUNTERS),
+                    ('ProcessMemoryLimit', ctypes.c_size_t), ('JobMemoryLimit', ctypes.c_size_t),
+                    ('PeakProcessMemoryUsed', ctypes.c_size_t), ('PeakJobMemoryUsed', ctypes.c_size_t)]
+
+    class BASIC_ACCOUNTING(ctypes.Structure):
+        _fields_ = [('TotalUserTime', ctypes.c_int64), ('TotalKernelTime', ctypes.c_int64),
+                    ('ThisPeriodTotalUserTime', ctypes.c_int64), ('ThisPeriodTotalKernelTime', ctypes.c_int64),
+                    ('TotalPageFaultCount', wintypes.DWORD), ('TotalProcesses', wintypes.DWORD),
+                    ('ActiveProcesses', wintypes.DWORD), ('TotalTerminatedProcesses', wintypes.DWORD)]
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    kernel32.CreateJobObjectW.argtypes = (wintypes.LPVOID, wintypes.LPCWSTR)
+    kernel32.AssignProcessToJobObject.argtypes = (wintypes.HANDLE, wintypes.HANDLE)
+    kernel32.TerminateJobObject.argtypes = (wintypes.HANDLE, wintypes.UINT)
+    kernel32.SetInformationJobObject.argtypes = (wintypes.HANDLE, ctypes.c_int, wintypes.LPVOID, wintypes.DWORD)
+    kernel32.QueryInformationJobObject.argtypes = (wintypes.HANDLE, ctypes.c_int, wintypes.LPVOID,
+                                                   wintypes.DWORD, wintypes.LPVOID)
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    return ctypes, kernel32, EXTENDED_LIMIT, BASIC_ACCOUNTING
+
+
+_win = None
+JOB_BASIC_ACCOUNTING, JOB_EXTENDED_LIMIT = 1, 9
+KILL_ON_JOB_CLOSE = 0x2000
+
+
+def _win_job(popen):
+    """A Job Object holding the command's process tree, or None if that fails.
+    Children started before the assignment (a few ms after spawn) escape it."""
+    global _win
+    try:
+        _win = _win or _win_api()
+        ctypes, kernel32, EXTENDED_LIMIT, _ = _win
+        job = kernel32.CreateJobObjectW(None, None)
+        if not job:
+            return None
+        info = EXTENDED_LIMIT()
+        info.BasicLimitInformation.LimitFlags = KILL_ON_JOB_CLOSE
+        kernel32.SetInformationJobObject(job, JOB_EXTENDED_LIMIT, ctypes.byref(info), ctypes.sizeof(info))
+        if not kernel32.AssignProcessToJobObject(job, int(popen._handle)):
+            kernel32.CloseHandle(job)
+            return None
+        return job
+    except (OSError, AttributeError):
+        return None
+
+
+def _win_usage(job):
+    """-> (cpu_ms, peak_kb) for the whole job, or None."""
+    if not job:
+        return None
+    ctypes, kernel32, EXTENDED_LIMIT, BASIC_ACCOUNTING = _win
+    acct, limit = BASIC_ACCOUNTING(), EXTENDED_LIMIT()
+    if not kernel32.QueryInformationJobObject(job, JOB_BASIC_ACCOUNTING, ctypes.byref(acct), ctypes.sizeof(acct), None):
+        return None
+    kernel32.QueryInformationJobObject(job, JOB_EXTENDED_LIMIT, ctypes.byref(limit), ctypes.sizeof(limit), None)
+    return (acct.TotalUserTime + acct.TotalKernelTime) / 10000, limit.PeakJobMemoryUsed // 1024
+
+
+def _win_terminate(cmd):
+    if cmd.job:
+        _win[1].TerminateJobObject(cmd.job, 1)
+    else:   # no job: kill the tree by pid
+        subprocess.run(f'taskkill /T /F /PID {cmd.popen.pid}', shell=True, capture_output=True,
+                       creationflags=subprocess.CREATE_NO_WINDOW)
+
+
+def _win_close(cmd):
+    if cmd.job:
+        usage = _win_usage(cmd.job)
+        if usage:
+            cmd.cpu_ms, cmd.peak_rss_kb = usage
+        _win[1].CloseHandle(cmd.job)
+        cmd.job = None
@@ -0,0 +1,399 @@
+"""
+Routes chat requests across several LLM backends.
+
+settings['apiUrl'] plus settings['apiUrls'] list the backends: the Colab
+tunnel, a local CPU server running the notebook's API, or any
+OpenAI-compatible server (llama.cpp, Ollama, vLLM, ...):
+
+    "apiUrls": ["http://127.0.0.1:8000",
+                {"url": "http://127.0.0.1:11434", "kind": "openai", "model": "qwen2.5:7b", "name": "ollama"}]
+
+- A daemon thread probes every backend's /health (/v1/models for the
+  openai kind) every PROBE_INTERVAL seconds. A refused connection, or
+  DOWN_AFTER failures in a row from probes or real requests, marks a
+  backend down; one success brings it back.
+- Each backend keeps an EWMA of its latency per path (/chat, and time to
+  headers for /chat/stream) and of its error rate. A request goes to the up
+  backend with the lowest latency x (1 + ERROR_PENALTY x error rate) x
+  (1 + requests in flight). A backend with no history for the path is
+  ranked by its probe round trip, so it gets tried and measured; latency
+  that no request has refreshed since the last probe decays toward the
+  round trip, so a backend skipped after one slow reply is tried again.
+- Failover: a connection error, timeout or 5xx moves the request on to the
+  next backend. The UI sends the whole conversation with every request, so
+  the next backend simply carries on with it.
+- Hedging: if the first backend has not answered (response headers, for
+  a stream) within the hedge delay, the same request also goes to the next
+  one; whichever answers first wins. The loser's connection is shut down
+  (http_pool.CancelHandle), so its server drops the request instead of
+  generating a reply nobody reads. The delay is hedgeMs, or HEDGE_FACTOR x
+  the first backend's latency EWMA.
+
+    router = BackendRouter(parse_specs(api_url, api_urls), PooledClient).start()
+    backend, response, timing = router.request('POST', '/chat', json=payload, timeout=30)
+    reply = backend.reply(response)
+    router.summary()      # per backend: up, latency, error rate, requests served
+
+    python -m assistant.router http://127.0.0.1:8765 http://127.0.0.1:8766   # probe and print
+"""
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+
+from assistant.http_pool import CancelHandle
+from assistant.streaming import parse_reply
+
+PROBE_INTERVAL = 15.0      # s between /health rounds
+PROBE_TIMEOUT = 5.0
+DOWN_AFTER = 2             # failures in a row before a backend is skipped
+ALPHA = 0.3                # EWMA weight of the newest observation
+OUTLIER = 2.0              # one reply counts as at most OUTLIER x the EWMA (stalls are hedging's job)
+ERROR_PENALTY = 4.0        # a backend failing every request ranks 5x slower
+HEDGE_FACTOR = 3.0         # auto hedge delay = HEDGE_FACTOR x latency EWMA ...
+HEDGE_MIN_MS = 500.0       # ... but never below this
+
+# Prompt for OpenAI-compatible backends, which don't have the notebook's
+# SYSTEM_PROMPT: same reply contract, shortened
+OPENAI_SYSTEM = ('你是一個桌面數位助理，運行在使用者的電腦上。永遠用繁體中文回答，回答要簡潔。\n'
+                 '回覆必須是一個合法 JSON 物件：\n'
+                 '需要執行技能時 {"text": "說明文字", "skill": "技能名稱", "args": {參數}}，'
+                 '只是聊天時 {"text": "回答內容", "skill": "", "args": {}}\n\n'
+                 '可用技能:\n')
+
+
+def parse_specs(*entries):
+    """Backend specs from apiUrl / apiUrls: URLs (a string may hold several,
+    comma or newline separated) or {'url', 'kind', 'name', 'model'} dicts.
+    Empty entries and repeated URLs are dropped."""
+    specs, seen = [], set()
+    for entry in entries:
+        if isinstance(entry, str):
+            items = re.split(r'[\s,]+', entry)
+        elif isinstance(entry, dict):
+            items = [entry]
+        elif isinstance(entry, (list, tuple)):
+            items = entry
+        else:
+            continue
+        for item in items:
+            spec = dict(item) if isinstance(item, dict) else {'url': item}
+            url = str(spec.get('url') or '').strip().rstrip('/')
+            if url and url not in seen:
+                seen.add(url)
+                specs.append(dict(spec, url=url))
+    return specs
+
+
+class Backend:
+    """One endpoint, its HTTP client and its running statistics (guarded by the router's lock)."""
+
+    def __init__(self, url, client, kind='assistant', name='', model=''):
+        self.url = url.rstrip('/')
+        self.client = client
+        self.kind = kind           # 'assistant' (the notebook's API) | 'openai'
+        self.name = name or urlsplit(self.url).netloc or self.url
+        self.model = model
+        self.healthy = None        # unknown until the first probe or request
+        self.failures = 0          # in a row
+        self.errors = 0.0          # EWMA of failures, 0..1
+        self.rtt_ms = None         # EWMA of the health probe round trip
+        self.latency = {}          # path -> EWMA ms of successful requests
+        self.fresh = set()         # paths measured since the last probe
+        self.inflight = 0
+        self.requests = 0
+        self.served = 0            # requests this backend won
+        self.last_error = ''
+        self.checked = None        # time of the last probe
+
+    @property
+    def health_path(self):
+        return '/v1/models' if self.kind == 'openai' else '/health'
+
+    def serves(self, path):
+        return self.kind != 'openai' or path == '/chat'
+
+    def score(self, path):
+        latency = self.latency.get(path, self.rtt_ms)
+        return (latency or 0.0) * (1 + ERROR_PENALTY * self.errors) * (1 + self.inflight)
+
+    def adapt(self, path, kwargs):
+        """-> (path, kwargs) in this backend's protocol."""
+        if self.kind != 'openai':
+            return path, kwargs
+        payload = kwargs.get('json') or {}
+        skills = '\n'.join(f"- {s['name']}: {s.get('description', '')} (params: {s.get('params', {})})"
+                           for s in payload.get('skills') or []) or '(無可用技能)'
+        messages = [{'role': 'system', 'content': OPENAI_SYSTEM + skills}] + list(payload.get('messages') or [])
+        body = {'messages': messages, 'response_format': {'type': 'json_object'}}
+        if self.model:
+            body['model'] = self.model
+        return '/v1/chat/completions', dict(kwargs, json=body)
+
+    def reply(self, response):
+        """The {'text', 'skill', 'args'} reply from a successful /chat response."""
+        data = response.json()
+        if self.kind != 'openai':
+            return data
+        reply = parse_reply(data['choices'][0]['message'].get('content') or '')
+        reply.setdefault('skill', '')
+        reply.setdefault('args', {})
+        return reply
+
+    def model_from_health(self, data):
+        if self.kind == 'openai':
+            models = data.get('data') or [{}]
+            return self.model or models[0].get('id', '')
+        return data.get('model', '')
+
+    def snapshot(self):
+        return {
+            'name': self.name, 'url': self.url, 'kind': self.kind, 'model': self.model,
+            'healthy': self.healthy, 'failures': self.failures, 'error_rate': round(self.errors, 3),
+            'rtt_ms': None if self.rtt_ms is None else round(self.rtt_ms, 1),
+            'latency_ms': {path: round(ms, 1) for path, ms in self.latency.items()},
+            'inflight': self.inflight, 'requests': self.requests, 'served': self.served,
+            'last_error': self.last_error, 'checked': self.checked,
+        }
+
+
+def _ewma(prev, value):
+    return value if prev is None else prev + ALPHA * (value - prev)
+
+
+def _close_response(future):
+    response = future.result()[1]
+    if response is not None:
+        response.close()
+
+
+class BackendRouter:
+    """Health-probed, latency-ranked pool of backends with failover and hedging.
+
+    client_factory(url) builds the HTTP client (PooledClient) for a backend.
+    hedge_ms: None = never hedge, 0 = automatic delay, > 0 = fixed delay in ms.
+    """
+
+    def __init__(self, specs, client_factory, probe_interval=PROBE_INTERVAL, hedge_ms=0):
+        self.backends = [Backend(s['url'], client_factory(s['url']), kind=s.get('kind') or 'assistant',
+                                 name=s.get('name', ''), model=s.get('model', ''))
+                         for s in specs]
+        self.probe_interval = probe_interval
+        self.hedge_ms = hedge_ms
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # requests, hedges and probes run here; the caller just waits
+        self._pool = ThreadPoolExecutor(max_workers=2 * len(self.backends) + 2, thread_name_prefix='router')
+
+    def start(self):
+        if self._thread is None and self.backends:
+            self._thread = threading.Thread(target=self._run, name='router-probe', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False)
+        for backend in self.backends:
+            backend.client.close()
+
+    # --- ranking ---
+    def ranked(self, path='/chat', exclude=()):
+        """Backends serving path, best first; the ones marked down go last, as a last resort."""
+        with self._lock:
+            live = [b for b in self.backends if b not in exclude and b.serves(path)]
+            up = sorted((b for b in live if b.healthy is not False), key=lambda b: b.score(path))
+            down = sorted((b for b in live if b.healthy is False), key=lambda b: b.score(path))
+        return up + down
+
+    def best(self, path='/chat'):
+        ranked = self.ranked(path)
+        return ranked[0] if ranked else None
+
+    def hedge_delay(self, backend, path):
+        """Seconds to wait on backend before hedging, or None."""
+        if self.hedge_ms is None:
+            return None
+        if self.hedge_ms > 0:
+            return self.hedge_ms / 1000
+        latency = backend.latency.get(path)
+        if latency is None:
+            return None   # nothing to compare against yet
+        return max(HEDGE_MIN_MS, HEDGE_FACTOR * latency) / 1000
+
+    # --- requests ---
+    def request(self, method, path, stream=False, exclude=(), **kwargs):
+        """Send to the best backend, hedging and failing over; -> (backend, response, timing).
+
+        With stream=True the body is left unread (PooledClient.open_stream).
+        timing gains 'backend', plus 'attempts' and 'hedged' when more than one
+        backend was tried. If every backend failed, the last 5xx response is
+        returned so the caller can report it, or else the last exception is raised.
+        """
+        queue = self.ranked(path, exclude)
+        if not queue:
+            raise requests.exceptions.ConnectionError(f'沒有可處理 {path} 的後端')
+        first = queue[0]
+        pending = {}   # future -> backend
+        cancels = {}   # future -> CancelHandle
+        attempts = 0
+        hedged = False
+        failed = None
+
+        def launch():
+            nonlocal attempts
+            attempts += 1
+            backend = queue.pop(0)
+            handle = CancelHandle()
+            future = self._pool.submit(self._send, backend, method, path, stream, kwargs, handle)
+            pending[future], cancels[future] = backend, handle
+
+        launch()
+        while pending:
+            delay = None
+            if not hedged and queue and len(pending) == 1:
+                delay = self.hedge_delay(next(iter(pending.values())), path)
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                launch()
+                continue
+            winner = None
+            for future in done:
+                del pending[future]
+                result = future.result()
+                if result[3] is None and winner is None:
+                    winner = result
+                elif result[3] is None:
+                    result[1].close()
+                else:
+                    failed = result
+            if winner is not None:
+                backend, response, timing, _ = winner
+                for other in pending:
+                    # Abort the slower hedge so its server can drop the request, and
+                    # close its response in case it landed in the meantime
+                    cancels[other].cancel()
+                    other.add_done_callback(_close_response)
+                with self._lock:
+                    backend.served += 1
+                    self.stats['requests'] += 1
+                    self.stats['hedged'] += hedged
+                    self.stats['hedge_wins'] += hedged and backend is not first
+                    self.stats['failovers'] += failed is not None or bool(exclude)
+                timing['backend'] = backend.name
+                if attempts > 1:
+                    timing['attempts'] = attempts
+                    timing['hedged'] = hedged
+                return backend, response, timing
+            if not pending and queue:
+                launch()   # fail over
+        backend, response, timing, error = failed
+        if response is not None:
+            return backend, response, dict(timing or {}, backend=backend.name, attempts=attempts)
+        raise error
+
+    def _send(self, backend, method, path, stream, kwargs, cancel=None):
+        """-> (backend, response, timing, error); error is None on success."""
+        send_path, send_kwargs = backend.adapt(path, kwargs)
+        with self._lock:
+            backend.inflight += 1
+            backend.requests += 1
+        try:
+            if stream:
+                response, timing = backend.client.open_stream(method, send_path, cancel=cancel, **send_kwargs)
+            else:
+                response, timing = backend.client.request(method, send_path, cancel=cancel, **send_kwargs)
+        except requests.exceptions.RequestException as e:
+            if cancel is None or not cancel.cancelled:   # a hedge we aborted is not the backend's fault
+                self.fail(backend, e)
+            return backend, None, None, e
+        finally:
+            with self._lock:
+                backend.inflight -= 1
+        if response.status_code >= 500:
+            if stream:
+                response.content   # let the connection go back to the pool
+            self.fail(backend, f'HTTP {response.status_code}')
+            return backend, response, timing, f'HTTP {response.status_code}'
+        self._succeed(backend, path, timing['ttfb'] if stream else timing['total'], response.ok)
+        return backend, response, timing, None
+
+    def _succeed(self, backend, path, ms, measured=True):
+        with self._lock:
+            backend.healthy = True
+            backend.failures = 0
+            backend.errors *= 1 - ALPHA
+            if measured:   # a quick 404 says nothing about how fast replies are
+                prev = backend.latency.get(path)
+                backend.latency[path] = _ewma(prev, ms if prev is None else min(ms, OUTLIER * prev))
+                backend.fresh.add(path)
+
+    def fail(self, backend, error):
+        """Count a failure against backend (also used for a stream cut off midway)."""
+        with self._lock:
+            backend.failures += 1
+            backend.errors += ALPHA * (1 - backend.errors)
+            backend.last_error = str(error)[:200]
+            refused = isinstance(error, requests.exceptions.ConnectionError)
+            if refused or backend.failures >= DOWN_AFTER:
+                backend.healthy = False
+
+    # --- health ---
+    def probe(self, backend):
+        """One health check; -> True when the backend answered."""
+        try:
+            response, timing = backend.client.get(backend.health_path, timeout=PROBE_TIMEOUT)
+            if not response.ok:
+                raise requests.exceptions.HTTPError(f'HTTP {response.status_code}')
+            model = backend.model_from_health(response.json())
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.fail(backend, e)
+            with self._lock:
+                backend.checked = time.time()
+            return False
+        with self._lock:
+            backend.healthy = True
+            backend.failures = 0
+            backend.rtt_ms = _ewma(backend.rtt_ms, timing['total'])
+            for path in backend.latency.keys() - backend.fresh:
+                backend.latency[path] = _ewma(backend.latency[path], backend.rtt_ms)
+            backend.fresh.clear()
+            backend.model = model or backend.model
+            backend.checked = time.time()
+        return True
+
+    def probe_all(self):
+        """Probe every backend in parallel; -> [bool, ...] in backend order."""
+        futures = [self._pool.submit(self.probe, b) for b in self.backends]
+        return [f.result() for f in futures]
+
+    def summary(self):
+        with self._lock:
+            return {'backends': [b.snapshot() for b in self.backends], 'stats': dict(self.stats),
+                    'hedge_ms': self.hedge_ms, 'probe_interval': self.probe_interval}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except RuntimeError:
+                return   # pool shut down by close()
+            self._stop.wait(self.probe_interval)
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    from assistant.http_pool import PooledClient
+
+    router = BackendRouter(parse_specs(sys.argv[1:]), PooledClient)
+    router.probe_all()
+    print(json.dumps(router.summary(), ensure_ascii=False, indent=2))
+    router.close()
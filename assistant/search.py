@@ -0,0 +1,323 @@
+"""
+Web search for the fetch_news skill.
+
+NewsSearcher turns one user query into a few normalised variants, runs them
+concurrently against a pluggable backend, de-duplicates the hits on title and
+URL, and keeps the merged result in an on-disk SQLite cache keyed on
+(normalised query, max_results). A repeated "搜尋最新AI新聞然後做成簡報"
+is then answered from the cache in a few milliseconds.
+
+    searcher = NewsSearcher(cache_path='search_cache.db')
+    out = searcher.search('最新 AI 新聞', 5)
+    # {'results': [{'title', 'body', 'href'}, ...], 'query': ..., 'cached': bool, 'elapsed_ms': ...}
+
+A backend is any object with text(query, max_results) -> [{'title', 'body',
+'href'}, ...]. DuckDuckGoBackend is the default; StaticBackend serves canned
+results for tests and benchmarks.
+
+Run as a script (python -m assistant.search "query" 5) it prints the same JSON
+as AssistantAPI.fetch_news.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_TTL = 15 * 60       # seconds; news goes stale quickly
+DEFAULT_WORKERS = 4
+MAX_VARIANTS = 3
+
+# Command words the model or the user tends to leave around the query. They
+# are only stripped where they stand: as a leading command ("請幫我搜尋…"),
+# a trailing "相關" or an explicit follow-up ("…然後做成簡報"), never inside a
+# word ("申請", "並購", "再生能源").
+_LEADING = re.compile(r'^(?:(?:請幫我|幫我|請|麻煩)\s*)*(?:(?:搜尋一下|搜尋|搜索|查詢|查一下|找一下)\s*)?')
+_TRAILING = re.compile(r'\s*[,，、]?\s*(?:然後|接著|並且|再|並)\s*(?:幫我|請)?\s*'
+                       r'(?:做成|製作|整理成|整理|寫成|生成|產生|建立|存成|轉成|做一份|寫一份)\S*$')
+_RELATED = re.compile(r'\s*的?相關的?(?:資料|資訊|消息)?$')
+_TRACKING = re.compile(r'[?&](utm_[^=&]+|fbclid|gclid)=[^&]*')
+
+
+def normalize_query(query):
+    """Canonical form used for the cache key: NFKC, lower-case, single spaces."""
+    text = unicodedata.normalize('NFKC', query or '')
+    return ' '.join(text.lower().split())
+
+
+def _core(base):
+    """Strip a leading command, a trailing "相關" and a "然後做成簡報" style follow-up."""
+    core = _TRAILING.sub('', base)
+    core = _RELATED.sub('', _LEADING.sub('', core))
+    return ' '.join(core.split())
+
+
+def _spaced(text):
+    """Space out CJK / latin boundaries ("最新ai新聞" -> "最新 ai 新聞")."""
+    return re.sub(r'(?<=[\u4e00-\u9fff])(?=[a-z0-9])|(?<=[a-z0-9])(?=[\u4e00-\u9fff])', ' ', text)
+
+
+def query_variants(query):
+    """The normalised query plus up to two cleaned-up variants, in priority order."""
+    base = normalize_query(query)
+    variants = [base]
+    core = _core(base)
+    if core:
+        variants.append(core)
+        variants.append(_spaced(core))
+
+    unique = []
+    for v in variants:
+        if v and v not in unique:
+            unique.append(v)
+    return unique[:MAX_VARIANTS]
+
+
+def _url_key(href):
+    href = _TRACKING.sub('', (href or '').strip())
+    href = re.sub(r'^https?://(www\.)?', '', href, flags=re.I)
+    return href.rstrip('/').lower()
+
+
+def _title_key(title):
+    return ' '.join(normalize_query(title).split())
+
+
+def merge_results(batches, max_results):
+    """Round-robin over the variant result lists, dropping duplicate titles/URLs."""
+    merged, seen = [], set()
+    for row in range(max((len(b) for b in batches), default=0)):
+        for batch in batches:
+            if row >= len(batch):
+                continue
+            r = batch[row]
+            keys = {('t', _title_key(r.get('title'))), ('u', _url_key(r.get('href')))}
+            keys.discard(('t', ''))
+            keys.discard(('u', ''))
+            if not keys or keys & seen:
+                continue
+            seen |= keys
+            merged.append({
+                'title': r.get('title', ''),
+                'body': r.get('body', ''),
+                'href': r.get('href', ''),
+            })
+            if len(merged) >= max_results:
+                return merged
+    return merged
+
+
+def format_results(results):
+    """The text block fetch_news hands back to the model."""
+    return '\n\n'.join(f"[{i}] {r['title']}\n{r['body']}\n來源: {r['href']}"
+                       for i, r in enumerate(results, 1))
+
+
+# ===== Backends =====
+
+class DuckDuckGoBackend:
+    """duckduckgo_search, with one DDGS session kept per worker thread."""
+
+    name = 'duckduckgo'
+
+    def __init__(self, region='wt-wt', timeout=10):
+        self.region = region
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        ddgs = getattr(self._local, 'ddgs', None)
+        if ddgs is None:
+            from duckduckgo_search import DDGS
+            ddgs = self._local.ddgs = DDGS(timeout=self.timeout)
+        return ddgs
+
+    def text(self, query, max_results):
+        try:
+            return list(self._session().text(query, region=self.region, max_results=max_results) or [])
+        except Exception:
+            self._local.ddgs = None   # drop a broken session; the next call opens a new one
+            raise
+
+
+class StaticBackend:
+    """Canned results for tests: {query: [results]} or a callable(query, n)."""
+
+    name = 'static'
+
+    def __init__(self, results=None, delay=0.0):
+        self.results = results or {}
+        self.delay = delay
+        self.calls = 0
+
+    def text(self, query, max_results):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if callable(self.results):
+            return list(self.results(query, max_results))[:max_results]
+        return list(self.results.get(query, []))[:max_results]
+
+
+BACKENDS = {
+    'duckduckgo': DuckDuckGoBackend,
+    'static': StaticBackend,
+}
+
+
+# ===== Cache =====
+
+class SearchCache:
+    """SQLite TTL cache: key -> JSON results. Safe to share between threads."""
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'key TEXT PRIMARY KEY, query TEXT, max_results INTEGER, '
+                         'created REAL, payload TEXT)')
+
+    @staticmethod
+    def make_key(backend, query, max_results):
+        raw = f'{backend}\0{normalize_query(query)}\0{int(max_results)}'
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT created, payload FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return json.loads(row[1])
+
+    def put(self, key, query, max_results, results):
+        payload = json.dumps(results, ensure_ascii=False)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                             (key, normalize_query(query), int(max_results), time.time(), payload))
+
+    def purge(self):
+        """Delete expired rows; returns how many were removed."""
+        with self._lock:
+            cur = self._db.execute('DELETE FROM results WHERE created < ?', (time.time() - self.ttl,))
+        return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ===== Searcher =====
+
+class NewsSearcher:
+    """Cached, concurrent search over query variants.
+
+    backend:    object with text(query, max_results), or a BACKENDS name
+    cache_path: SQLite file for the result cache (None = no cache)
+    ttl:        seconds a cached result stays fresh
+    """
+
+    def __init__(self, backend='duckduckgo', cache_path=None, ttl=DEFAULT_TTL, max_workers=DEFAULT_WORKERS):
+        self.backend = BACKENDS[backend]() if isinstance(backend, str) else backend
+        self.cache = SearchCache(cache_path, ttl) if cache_path else None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='search')
+        self._inflight = {}   # cache key -> Future, so concurrent identical searches share one fan-out
+        self._lock = threading.Lock()
+        self.stats = {'searches': 0, 'cache_hits': 0, 'backend_calls': 0, 'backend_errors': 0}
+
+    def search(self, query, max_results=5):
+        start = time.perf_counter()
+        max_results = max(1, int(max_results))
+        self.stats['searches'] += 1
+        key = SearchCache.make_key(getattr(self.backend, 'name', type(self.backend).__name__), query, max_results)
+
+        results = self.cache.get(key) if self.cache else None
+        cached = results is not None
+        if cached:
+            self.stats['cache_hits'] += 1
+        else:
+            with self._lock:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = Future()
+            if owner:
+                try:
+                    results = self._fan_out(query, max_results)
+                    if results and self.cache:
+                        self.cache.put(key, query, max_results, results)
+                    future.set_result(results)
+                except Exception as e:
+                    future.set_exception(e)
+                    raise
+                finally:
+                    with self._lock:
+                        self._inflight.pop(key, None)
+            else:
+                results = future.result()
+
+        return {
+            'results': results,
+            'query': query,
+            'cached': cached,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        if self.cache:
+            self.cache.close()
+
+    # --- internals ---
+    def _query_backend(self, variant, max_results):
+        self.stats['backend_calls'] += 1
+        try:
+            return self.backend.text(variant, max_results)
+        except Exception as e:
+            self.stats['backend_errors'] += 1
+            return e
+
+    def _fan_out(self, query, max_results):
+        variants = query_variants(query) or [query]
+        futures = [self.executor.submit(self._query_backend, v, max_results) for v in variants]
+        batches = [f.result() for f in futures]
+        ok = [b for b in batches if not isinstance(b, Exception)]
+        if not ok:
+            raise batches[0]   # every variant failed: surface the backend's error
+        return merge_results(ok, max_results)
+
+
+def fetch_news_payload(searcher, query, max_results='5'):
+    """fetch_news' JSON contract, shared by the PyWebView API and the CLI."""
+    try:
+        out = searcher.search(query, int(max_results))
+    except Exception as e:
+        return {'success': False, 'message': f'搜尋失敗: {str(e)}'}
+    if not out['results']:
+        return {'success': False, 'message': f'找不到關於「{query}」的結果'}
+    return {
+        'success': True,
+        'message': format_results(out['results']),
+        'results': out['results'],
+        'query': query,
+        'cached': out['cached'],
+        'elapsed_ms': out['elapsed_ms'],
+    }
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    searcher = NewsSearcher(cache_path=os.path.join(root, 'search_cache.db'))
+    payload = fetch_news_payload(searcher, sys.argv[1] if len(sys.argv) > 1 else '',
+                                 sys.argv[2] if len(sys.argv) > 2 else '5')
+    sys.stdout.buffer.write(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+    searcher.close()
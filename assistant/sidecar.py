@@ -0,0 +1,154 @@
+"""
+Persistent Python skill worker for the Electron shell.
+
+    python -u -m assistant.sidecar
+
+One warm AssistantAPI is served over stdio as newline-delimited JSON-RPC, so
+app/main.js (through app/sidecar.js) and tests can call any public method
+without starting a new interpreter per call:
+
+    -> {"id": 1, "method": "fetch_news", "params": ["AI", "5"]}
+    <- {"id": 1, "result": "{\"success\": true, ...}"}
+    <- {"id": 2, "error": {"code": "method_not_found", "message": "..."}}
+
+Calls run concurrently on a thread pool and may complete out of order; match
+responses on "id". Lines without an "id" are notifications:
+
+    <- {"event": "ready", "pid": ..., "startup_ms": {...}, "methods": [...]}
+    <- {"event": "chat", "payload": {...}}          (AssistantAPI._emit)
+
+Built-in methods: ping, methods, shutdown. They are answered on the reading
+thread, never queued behind skill calls, so a pool busy with long calls
+(stream_chat, start_listening) still answers health pings.
+
+Only the protocol is written to stdout; anything a skill prints goes to
+stderr. main.py is imported without webview, so no GUI toolkit is loaded.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_T0 = time.perf_counter()
+
+MAX_WORKERS = 8
+GUI_METHODS = ('close_window', 'minimize_window')   # need the pywebview window
+
+
+class Sidecar:
+    def __init__(self, api, out, max_workers=MAX_WORKERS):
+        self.api = api
+        self.out = out
+        self.started = time.time()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sidecar')
+        self._write_lock = threading.Lock()
+        self._inflight = 0
+        self._count_lock = threading.Lock()
+        self.stats = {'calls': 0, 'errors': 0}
+        # Route UI events (stream_chat deltas etc.) to the client as notifications
+        api._emit = lambda channel, payload: self.send({'event': channel, 'payload': payload})
+
+    # --- protocol ---
+    def send(self, message):
+        line = json.dumps(message, ensure_ascii=False) + '\n'
+        with self._write_lock:
+            self.out.write(line)
+            self.out.flush()
+
+    def ping(self):
+        with self._count_lock:
+            return {'pong': True, 'pid': os.getpid(), 'uptime_s': round(time.time() - self.started, 1),
+                    'inflight': self._inflight, **self.stats}
+
+    def methods(self):
+        return sorted(name for name in dir(self.api)
+                      if not name.startswith('_') and name not in GUI_METHODS
+                      and callable(getattr(self.api, name)))
+
+    def serve(self, inp):
+        for line in inp:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                self.send({'id': None, 'error': {'code': 'parse_error', 'message': str(e)}})
+                continue
+            method = request.get('method')
+            if method == 'shutdown':
+                self.send({'id': request.get('id'), 'result': True})
+                break
+            if method in ('ping', 'methods'):
+                self.send({'id': request.get('id'), 'result': self.ping() if method == 'ping' else self.methods()})
+                continue
+            with self._count_lock:
+                self._inflight += 1
+            self.executor.submit(self._handle, request)
+        self.executor.shutdown(wait=True)
+
+    # --- internals ---
+    def _handle(self, request):
+        req_id = request.get('id')
+        method = request.get('method') or ''
+        params = request.get('params') or []
+        try:
+            if method.startswith('_') or method in GUI_METHODS or not callable(getattr(self.api, method, None)):
+                self.send({'id': req_id, 'error': {'code': 'method_not_found', 'message': f'未知的方法: {method}'}})
+                return
+            else:
+                with self._count_lock:
+                    self.stats['calls'] += 1
+                fn = getattr(self.api, method)
+                result = fn(**params) if isinstance(params, dict) else fn(*params)
+            self.send({'id': req_id, 'result': result})
+        except Exception as e:
+            with self._count_lock:
+                self.stats['errors'] += 1
+            self.send({'id': req_id, 'error': {'code': type(e).__name__, 'message': str(e)}})
+        finally:
+            with self._count_lock:
+                self._inflight -= 1
+
+
+def main():
+    # Keep the real stdout for the protocol; stray prints go to stderr
+    out = open(sys.stdout.fileno(), 'w', encoding='utf-8', buffering=1, closefd=False)
+    sys.stdout = sys.stderr
+    inp = open(sys.stdin.fileno(), 'r', encoding='utf-8', closefd=False)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+    t_import = time.perf_counter()
+    from main import AssistantAPI
+    from assistant import startup
+    t_init = time.perf_counter()
+    api = AssistantAPI()
+    t_ready = time.perf_counter()
+
+    sidecar = Sidecar(api, out)
+    sidecar.send({
+        'event': 'ready',
+        'pid': os.getpid(),
+        'python': sys.version.split()[0],
+        'startup_ms': {
+            'bootstrap': round((t_import - _T0) * 1000, 1),
+            'import_main': round((t_init - t_import) * 1000, 1),
+            'init_api': round((t_ready - t_init) * 1000, 1),
+            'total': round((t_ready - _T0) * 1000, 1),
+        },
+        'gui_loaded': 'webview' in sys.modules,
+        'methods': sidecar.methods(),
+    })
+    startup.prewarm()   # document libraries, while waiting for the first call
+    api.warm_telemetry()
+    api.warm_mcp()
+    sidecar.serve(inp)
+
+
+if __name__ == '__main__':
+    main()
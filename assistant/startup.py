@@ -0,0 +1,136 @@
+"""
+Startup helpers for main.py.
+
+- prewarm():          import heavy libraries (python-pptx, python-docx,
+                      openpyxl, requests) on a background thread once the
+                      window is up, so the first document skill doesn't pay
+                      for them
+- profile_startup():  re-run main.py under `python -X importtime`, close the
+                      window as soon as it is shown and print the slowest
+                      imports plus wall-clock time to first window
+
+    python main.py --profile-startup
+"""
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PREWARM_MODULES = (
+    'requests',
+    'assistant.http_pool',
+    'assistant.search',
+    'pptx',
+    'assistant.ppt',
+    'docx',
+    'openpyxl',
+)
+
+PROFILE_ENV = 'ASSISTANT_PROFILE_STARTUP'   # set in the profiled child process
+MARK_PREFIX = '[startup] '                  # child -> parent timing lines on stderr
+
+_prewarm_stats = {}
+
+
+def prewarm(modules=PREWARM_MODULES, on_done=None):
+    """Import modules on a daemon thread; returns the thread.
+
+    A skill that needs one of them meanwhile simply waits on the module's
+    import lock instead of importing it a second time.
+    """
+    def run():
+        start = time.perf_counter()
+        for name in modules:
+            t = time.perf_counter()
+            try:
+                importlib.import_module(name)
+                _prewarm_stats[name] = round((time.perf_counter() - t) * 1000, 1)
+            except Exception as e:   # optional dependency not installed
+                _prewarm_stats[name] = f'unavailable: {type(e).__name__}'
+        _prewarm_stats['total'] = round((time.perf_counter() - start) * 1000, 1)
+        if on_done:
+            on_done(dict(_prewarm_stats))
+
+    thread = threading.Thread(target=run, name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def prewarm_stats():
+    return dict(_prewarm_stats)
+
+
+def mark(name, t_start):
+    """In the profiled child, report ms since t_start to the parent."""
+    if os.environ.get(PROFILE_ENV):
+        sys.stderr.write(f'{MARK_PREFIX}{name} {(time.perf_counter() - t_start) * 1000:.1f}\n')
+        sys.stderr.flush()
+
+
+def profiling():
+    return bool(os.environ.get(PROFILE_ENV))
+
+
+# ===== -X importtime report =====
+
+def parse_importtime(text):
+    """-> [(self_us, cumulative_us, depth, module)] from `-X importtime` stderr."""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len('import time:'):].split('|')
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((int(self_us), int(cum_us), depth, name.strip()))
+    return rows
+
+
+def format_report(rows, marks, top=20):
+    # Grouped by top-level package on self time: the pre-warm thread imports
+    # concurrently, so the nesting (cumulative) column is not reliable.
+    packages = {}
+    for self_us, _, _, name in rows:
+        pkg = name.split('.')[0]
+        count, us = packages.get(pkg, (0, 0))
+        packages[pkg] = (count + 1, us + self_us)
+    total_us = sum(r[0] for r in rows)
+
+    lines = [f'imports: {len(rows)} modules, {total_us / 1000:.1f} ms total', '', 'by package:']
+    for pkg, (count, us) in sorted(packages.items(), key=lambda kv: -kv[1][1])[:top]:
+        lines.append(f'  {us / 1000:8.1f} ms  {pkg} ({count} modules)')
+    lines += ['', 'slowest modules:']
+    for self_us, _, _, name in sorted(rows, key=lambda r: -r[0])[:top]:
+        lines.append(f'  {self_us / 1000:8.1f} ms  {name}')
+    if marks:
+        lines += ['', 'wall clock:']
+        for name, ms in marks:
+            lines.append(f'  {ms:8.1f} ms  {name}')
+    return '\n'.join(lines)
+
+
+def profile_startup(script, args=(), top=20, timeout=120):
+    """Run script under -X importtime in a child process and print the report."""
+    env = dict(os.environ, **{PROFILE_ENV: '1'})
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', script, *args],
+                          env=env, capture_output=True, text=True, encoding='utf-8',
+                          errors='replace', timeout=timeout)
+    wall = (time.perf_counter() - start) * 1000
+
+    marks = []
+    for line in proc.stderr.splitlines():
+        if line.startswith(MARK_PREFIX):
+            name, _, ms = line[len(MARK_PREFIX):].rpartition(' ')
+            marks.append((name, float(ms)))
+    marks.append(('process exit (incl. interpreter start)', wall))
+
+    print(format_report(parse_importtime(proc.stderr), marks, top=top))
+    if proc.returncode:
+        print(f'\nchild exited with {proc.returncode}:')
+        print('\n'.join(l for l in proc.stderr.splitlines()[-15:] if not l.startswith('import time:')))
+    return proc.returncode
@@ -0,0 +1,245 @@
+"""
+Streaming helpers for /chat/stream.
+
+- iter_sse():          parse a text/event-stream response into (event, data) pairs
+- ReplyStreamParser:   incrementally parse the model's {"text", "skill", "args"}
+                       reply so the UI can show text as it arrives and a skill
+                       can start as soon as its args object is closed
+"""
+import json
+
+
+def iter_sse(response):
+    """Yield (event, data) from a streamed requests.Response (SSE framing)."""
+    response.encoding = 'utf-8'   # SSE is always UTF-8; requests would guess latin-1 for text/*
+    event, data = 'message', []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, '\n'.join(data)
+            event, data = 'message', []
+        elif line.startswith(':'):
+            continue   # comment / keep-alive ping
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data.append(line[5:].lstrip(' '))
+    if data:
+        yield event, '\n'.join(data)
+
+
+def parse_reply(raw):
+    """Same fallback rules as the server's parse_ai_response."""
+    try:
+        parsed = json.loads(raw)
+        if isinstance(parsed, dict) and 'text' in parsed:
+            return parsed
+    except ValueError:
+        pass
+
+    depth = 0
+    start = -1
+    for i, ch in enumerate(raw):
+        if ch == '{':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0 and start >= 0:
+                try:
+                    parsed = json.loads(raw[start:i + 1])
+                    if isinstance(parsed, dict) and 'text' in parsed:
+                        return parsed
+                except ValueError:
+                    continue
+
+    return {'text': raw, 'skill': '', 'args': {}}
+
+
+def _complete(text):
+    """Length of text that is safe to emit: a trailing high surrogate (half of a
+    split \\ud83d\\ude00 pair) waits for the rest of the pair in the next chunk."""
+    return len(text) - 1 if text and '\ud800' <= text[-1] <= '\udbff' else len(text)
+
+
+class ReplyStreamParser:
+    """Single-pass scanner over the streamed reply.
+
+    feed(chunk) returns a list of events:
+        {'type': 'delta', 'text': str}                   new visible text
+        {'type': 'skill', 'skill': str, 'args': dict}    skill + args complete
+    finish() returns the final reply dict.
+
+    Only top-level keys are tracked; nested values are sliced out and
+    json-decoded once their closing bracket arrives. While "text" streams,
+    only the raw characters after the last emitted delta are decoded, so
+    total work stays linear in the reply length.
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.pos = 0
+        self.mode = None          # 'json' | 'plain', decided on first real char
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+        self.str_start = -1
+        self.last_key = None      # last string seen at depth 1 (key candidate)
+        self.value_key = None     # key whose value is being read
+        self.value_start = -1
+        self.values = {}
+        self.text_sent = 0        # decoded chars of "text" already emitted
+        self.text_raw = 0         # raw (escaped) chars of "text" those came from
+        self.skill_sent = False
+        self.closed = False
+
+    # --- public ---
+    def feed(self, chunk):
+        self.buf += chunk
+        events = []
+        if self.mode is None and not self._detect_mode():
+            return events
+        if self.mode == 'plain':
+            end = _complete(self.buf)
+            if self.pos < end:
+                events.append({'type': 'delta', 'text': self.buf[self.pos:end]})
+                self.pos = end
+            return events
+        self._scan(events)
+        return events
+
+    def finish(self):
+        if self.mode == 'json' and self.closed and 'text' in self.values:
+            reply = dict(self.values)
+        else:
+            reply = parse_reply(self.buf.strip().strip('`'))
+        reply.setdefault('skill', '')
+        reply.setdefault('args', {})
+        return reply
+
+    # --- internals ---
+    def _detect_mode(self):
+        stripped = self.buf.lstrip()
+        if not stripped:
+            return False
+        if stripped.startswith('`'):
+            # ```json fence: wait for the end of the fence line
+            if '\n' not in stripped:
+                return False
+            body = stripped.split('\n', 1)[1].lstrip()
+            if not body:
+                return False
+            stripped = body
+        if stripped.startswith('{'):
+            self.mode = 'json'
+            self.pos = len(self.buf) - len(stripped)
+        else:
+            self.mode = 'plain'
+            self.pos = len(self.buf) - len(stripped)
+        return True
+
+    def _scan(self, events):
+        buf = self.buf
+        i = self.pos
+        n = len(buf)
+        while i < n and not self.closed:
+            ch = buf[i]
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == '\\':
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+                    self._end_string(i, events)
+            elif ch == '"':
+                self.in_str = True
+                self.str_start = i
+                if self.depth == 1 and self.value_key is not None and self.value_start < 0:
+                    self.value_start = i
+            elif ch in '{[':
+                self.depth += 1
+                if self.depth == 2 and self.value_key is not None and self.value_start < 0:
+                    self.value_start = i
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 1 and self.value_key is not None and self.value_start >= 0:
+                    self._set_value(buf[self.value_start:i + 1], events)
+                elif self.depth == 0:
+                    if self.value_key is not None and self.value_start >= 0:
+                        self._set_value(buf[self.value_start:i].strip(), events)
+                    self.closed = True
+            elif self.depth == 1:
+                if ch == ':':
+                    self.value_key = self.last_key
+                    self.value_start = -1
+                elif ch == ',':
+                    if self.value_key is not None and self.value_start >= 0:
+                        self._set_value(buf[self.value_start:i].strip(), events)
+                elif not ch.isspace() and self.value_key is not None and self.value_start < 0:
+                    self.value_start = i   # number / true / false / null
+            i += 1
+        self.pos = i
+
+        if self.in_str and self.value_key == 'text' and self.value_start == self.str_start:
+            self._emit_text(self.value_start + 1, i, events)
+
+    def _end_string(self, i, events):
+        if self.depth != 1:
+            return
+        if self.value_key is not None and self.value_start == self.str_start:
+            self._set_value(self.buf[self.value_start:i + 1], events)
+        else:
+            try:
+                self.last_key = json.loads(self.buf[self.str_start:i + 1])
+            except ValueError:
+                self.last_key = None
+
+    def _set_value(self, raw, events):
+        key = self.value_key
+        self.value_key = None
+        self.value_start = -1
+        try:
+            value = json.loads(raw, strict=False)
+        except ValueError:
+            return
+        self.values[key] = value
+        if key == 'text' and isinstance(value, str):
+            if len(value) > self.text_sent:
+                events.append({'type': 'delta', 'text': value[self.text_sent:]})
+                self.text_sent = len(value)
+        self._maybe_skill(events)
+
+    def _emit_text(self, start, stop, events):
+        """Emit the text between the raw cursor and buf[stop] (the string body starts at start)."""
+        frag = self.buf[start + self.text_raw:stop]
+        # Cut back to before a dangling escape so the fragment decodes cleanly
+        cut = frag.rfind('\\', max(0, len(frag) - 6))
+        for end in ((len(frag),) if cut < 0 else (len(frag), cut)):
+            try:
+                text = json.loads(f'"{frag[:end]}"', strict=False)
+                break
+            except ValueError:
+                continue
+        else:
+            return
+        if _complete(text) < len(text):
+            # a high surrogate waits for its pair: \ud83d and \ude00 decoded apart would not join
+            text = text[:-1]
+            end -= 6 if frag[max(0, end - 6):end].startswith('\\u') else 1
+        if text:
+            events.append({'type': 'delta', 'text': text})
+            self.text_sent += len(text)
+        self.text_raw += end
+
+    def _maybe_skill(self, events):
+        if self.skill_sent:
+            return
+        skill = self.values.get('skill')
+        args = self.values.get('args')
+        if skill and isinstance(skill, str) and isinstance(args, dict):
+            self.skill_sent = True
+            events.append({'type': 'skill', 'skill': skill, 'args': args})
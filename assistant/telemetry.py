@@ -0,0 +1,328 @@
+"""
+Background system telemetry for system_info.
+
+A daemon thread samples CPU, memory, disk and load every INTERVAL seconds
+straight from the platform, with no shell-outs:
+
+- Linux:   /proc/stat (CPU), /proc/meminfo, /proc/loadavg, statvfs (disk)
+- Windows: GetSystemTimes, GlobalMemoryStatusEx (ctypes), disk_usage of the system drive
+- other:   os.getloadavg and disk_usage only
+
+Each metric is a fixed-size ring buffer of (time, value), sized from the
+interval to hold HISTORY seconds, so memory stays constant however long
+the app runs. A metric whose reading fails (a missing /proc file, an
+unexpected format) is logged and left out of that sample; the others and
+the thread carry on. system_info reads the latest sample
+and min / avg / max over the last 1, 5 and 15 minutes. It never waits:
+before the first tick it takes one sample on the spot.
+
+    sampler = Sampler(interval=2.0).start()
+    sampler.latest()      # {'time', 'cpu', 'memory', 'memory_used', 'disk', 'load'}
+    sampler.summary()     # {'cpu': {'1m': {'min', 'avg', 'max', 'n'}, '5m': ..., '15m': ...}, ...}
+    sampler.snapshot()    # static info + latest + summary, what system_info returns
+
+    python -m assistant.telemetry   # print a few samples and the sampling cost
+"""
+import array
+import logging
+import math
+import os
+import platform
+import shutil
+import socket
+import sys
+import threading
+import time
+
+INTERVAL = 2.0             # s between samples
+HISTORY = 900              # s of samples kept per metric (the longest window)
+WINDOWS = (('1m', 60), ('5m', 300), ('15m', 900))
+METRICS = ('cpu', 'memory', 'disk', 'load')   # percent, percent, percent, 1-min load average
+
+log = logging.getLogger(__name__)
+
+
+def history_size(interval, seconds=HISTORY):
+    """Ring size holding seconds of samples taken every interval s."""
+    return math.ceil(seconds / interval) + 1
+
+
+class Series:
+    """Ring buffer of (timestamp, value) pairs in two flat double arrays."""
+
+    __slots__ = ('times', 'values', 'size', 'count', 'head')
+
+    def __init__(self, size=history_size(INTERVAL)):
+        self.times = array.array('d', bytes(8 * size))
+        self.values = array.array('d', bytes(8 * size))
+        self.size = size
+        self.count = 0
+        self.head = 0          # next slot to write
+
+    def append(self, t, value):
+        self.times[self.head] = t
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def latest(self):
+        if not self.count:
+            return None
+        return self.values[(self.head - 1) % self.size]
+
+    def window(self, seconds, now=None):
+        """min / avg / max of the samples from the last seconds, newest first until one is older."""
+        cutoff = (now or time.time()) - seconds
+        lo, hi, total, n = float('inf'), float('-inf'), 0.0, 0
+        i = self.head
+        for _ in range(self.count):
+            i = (i - 1) % self.size
+            if self.times[i] < cutoff:
+                break
+            v = self.values[i]
+            lo, hi, total, n = min(lo, v), max(hi, v), total + v, n + 1
+        if not n:
+            return None
+        return {'min': round(lo, 1), 'avg': round(total / n, 1), 'max': round(hi, 1), 'n': n}
+
+
+# ===== Platform sources =====
+
+def _disk_root():
+    return (os.environ.get('SystemDrive', 'C:') + '\\') if sys.platform == 'win32' else '/'
+
+
+class _Source:
+    """read() -> dict of raw readings; CPU is turned into a percentage between two reads."""
+
+    def __init__(self):
+        self.disk_root = _disk_root()
+        self.errors = {}       # metric -> its last error, while it keeps failing
+        self._cpu_prev = None
+        self._cpu_last = None
+
+    def cpu_times(self):
+        """(idle, total) in any unit, or None."""
+        return None
+
+    def memory(self):
+        """(total_bytes, available_bytes), or None."""
+        return None
+
+    def load(self):
+        try:
+            return os.getloadavg()[0]
+        except (AttributeError, OSError):
+            return None
+
+    def read(self):
+        out = {}
+        for name, part in (('cpu', self._read_cpu), ('memory', self._read_memory),
+                           ('disk', self._read_disk), ('load', self._read_load)):
+            try:
+                part(out)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+                if self.errors.get(name) != error:   # once per distinct failure, not every tick
+                    log.warning('telemetry: reading %s failed: %s', name, error, exc_info=True)
+                self.errors[name] = error
+            else:
+                self.errors.pop(name, None)
+        return out
+
+    def _read_cpu(self, out):
+        times = self.cpu_times()
+        if times is not None:
+            prev = self._cpu_prev
+            if prev is None or times[1] > prev[1]:   # counters moved on since the last read
+                self._cpu_prev = times
+                if prev is not None:
+                    busy = (times[1] - prev[1]) - (times[0] - prev[0])
+                    self._cpu_last = 100.0 * busy / (times[1] - prev[1])
+            if self._cpu_last is not None:
+                out['cpu'] = self._cpu_last
+
+    def _read_memory(self, out):
+        mem = self.memory()
+        if mem:
+            total, available = mem
+            out['memory_total'] = total
+            out['memory_used'] = total - available
+            out['memory'] = 100.0 * (total - available) / total
+
+    def _read_disk(self, out):
+        disk = shutil.disk_usage(self.disk_root)
+        out['disk_total'] = disk.total
+        out['disk'] = 100.0 * disk.used / disk.total
+
+    def _read_load(self, out):
+        load = self.load()
+        if load is not None:
+            out['load'] = load
+
+
+class _LinuxSource(_Source):
+    def cpu_times(self):
+        with open('/proc/stat', 'rb') as f:
+            fields = [int(v) for v in f.readline().split()[1:9]]   # user nice system idle iowait irq softirq steal
+        return fields[3] + fields[4], sum(fields)
+
+    def memory(self):
+        values = {}
+        with open('/proc/meminfo', 'rb') as f:
+            for line in f:
+                key, _, rest = line.partition(b':')
+                if key in (b'MemTotal', b'MemAvailable', b'MemFree', b'Buffers', b'Cached'):
+                    values[key] = int(rest.split()[0]) * 1024
+                    if len(values) == 5:
+                        break
+        # MemAvailable appeared in Linux 3.14
+        available = values.get(b'MemAvailable',
+                               values.get(b'MemFree', 0) + values.get(b'Buffers', 0) + values.get(b'Cached', 0))
+        return values[b'MemTotal'], available
+
+    def load(self):
+        with open('/proc/loadavg', 'rb') as f:
+            return float(f.read().split()[0])
+
+
+class _WindowsSource(_Source):
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        from ctypes import wintypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [('dwLength', wintypes.DWORD), ('dwMemoryLoad', wintypes.DWORD),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        self._ctypes = ctypes
+        self._kernel32 = ctypes.WinDLL('kernel32')
+        self._status = MEMORYSTATUSEX()
+        self._status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        self._filetimes = [ctypes.c_ulonglong() for _ in range(3)]   # idle, kernel (includes idle), user
+
+    def cpu_times(self):
+        idle, kernel, user = self._filetimes
+        byref = self._ctypes.byref
+        if not self._kernel32.GetSystemTimes(byref(idle), byref(kernel), byref(user)):
+            return None
+        return idle.value, kernel.value + user.value
+
+    def memory(self):
+        if not self._kernel32.GlobalMemoryStatusEx(self._ctypes.byref(self._status)):
+            return None
+        return self._status.ullTotalPhys, self._status.ullAvailPhys
+
+
+def make_source():
+    if sys.platform.startswith('linux') and os.path.exists('/proc/stat'):
+        return _LinuxSource()
+    if sys.platform == 'win32':
+        return _WindowsSource()
+    return _Source()
+
+
+# ===== Sampler =====
+
+class Sampler:
+    """Samples the platform source on a daemon thread into one Series per metric."""
+
+    def __init__(self, interval=INTERVAL, history=None, source=None):
+        self.interval = max(0.2, float(interval))
+        self.source = source or make_source()
+        self.series = {name: Series(history or history_size(self.interval)) for name in METRICS}
+        self.static = {
+            'platform': platform.system(),
+            'hostname': socket.gethostname(),
+            'cpus': os.cpu_count(),
+            'version': platform.version(),
+            'boot_time': _boot_time(),
+        }
+        self.last = {}
+        self.stats = {'samples': 0, 'sample_us': 0.0}   # sampling cost, for the benchmark line
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()   # the source keeps CPU counters between reads
+        self._stop = threading.Event()
+        self._thread = None
+        self.sample()   # CPU baseline, so the next sample already has a percentage
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def sample(self):
+        start = time.perf_counter()
+        try:
+            with self._read_lock:
+                reading = self.source.read()
+        except Exception:
+            log.exception('telemetry: sampling failed')
+            return self.last
+        now = time.time()
+        reading['time'] = now
+        with self._lock:
+            for name in METRICS:
+                if name in reading:
+                    self.series[name].append(now, reading[name])
+            self.last = reading
+            self.stats['samples'] += 1
+            self.stats['sample_us'] += (time.perf_counter() - start) * 1e6
+        return reading
+
+    def latest(self):
+        """The newest sample; taken on the spot if the thread has not produced one with CPU yet."""
+        with self._lock:
+            last = dict(self.last)
+        if 'cpu' not in last:
+            last = dict(self.sample())
+        return last
+
+    def summary(self, windows=WINDOWS):
+        now = time.time()
+        with self._lock:
+            return {name: {label: self.series[name].window(seconds, now) for label, seconds in windows}
+                    for name in METRICS if self.series[name].count}
+
+    def snapshot(self):
+        info = dict(self.static)
+        info['latest'] = {k: round(v, 1) if isinstance(v, float) else v for k, v in self.latest().items()}
+        info['windows'] = self.summary()
+        info['interval'] = self.interval
+        return info
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+def _boot_time():
+    try:
+        with open('/proc/stat', 'rb') as f:
+            for line in f:
+                if line.startswith(b'btime'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        ctypes.windll.kernel32.GetTickCount64.restype = ctypes.c_ulonglong
+        return int(time.time() - ctypes.windll.kernel32.GetTickCount64() / 1000)
+    return None
+
+
+if __name__ == '__main__':
+    sampler = Sampler(interval=0.5).start()
+    for _ in range(6):
+        time.sleep(0.5)
+        print({k: round(v, 1) if isinstance(v, float) else v for k, v in sampler.latest().items()})
+    print(sampler.summary())
+    print(f"{sampler.stats['sample_us'] / sampler.stats['samples']:.0f} µs per sample")
@@ -0,0 +1,250 @@
+"""
+Hot-path tracing and latency histograms for a chat turn.
+
+public/app.js creates a trace id in sendMessage. The id goes through
+chat_with_ai / stream_chat to /chat as the X-Trace-Id header. Every stage
+the turn passes through records a span under it:
+
+    ui.local_skill    tryLocalSkill (intent match + local skill)     app.js, via record_spans
+    ui.bridge         JS -> Python -> JS round trip minus the Python time
+    api.<method>      every public AssistantAPI method               @trace_methods
+    http.chat         POST /chat (or /chat/stream) through the tunnel
+    tunnel            http.chat minus the server's own time
+    server.queue / server.prefill / server.decode / server.parse    reported by the server
+    ui.skill.<name>   the skill that ran on the reply
+    ui.turn           sendMessage start to finish
+
+Spans feed one Histogram per stage. Buckets are log-spaced, so recording
+is O(1) and p50/p95/p99 come out without keeping samples. The tracer also
+keeps a ring of recent traces:
+
+    tracer = Tracer()
+    with tracer.span('http.chat', trace_id):
+        ...
+    tracer.record('server.prefill', 412.0, trace_id)
+    tracer.snapshot()   # {'stages': {name: {'count', 'p50', 'p95', 'p99', 'max', ...}}, 'traces': [...]}
+
+The Colab server keeps its own Metrics, with the same Histogram, behind
+/metrics. To print p50/p95 per stage from a snapshot file or a server:
+
+    python -m assistant.tracing https://xxx.trycloudflare.com/metrics
+"""
+import functools
+import math
+import os
+import threading
+import time
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MIN_VALUE = 0.01            # smallest resolved value (ms, tokens, ...)
+GROWTH = 1.08               # bucket width: ~4% error on a percentile
+RECENT_TRACES = 50
+_LOG_GROWTH = math.log(GROWTH)
+_CO_GENERATOR = 0x20   # inspect.CO_GENERATOR, without importing inspect at startup
+
+
+def new_trace_id():
+    return os.urandom(8).hex()
+
+
+class Histogram:
+    """Log-bucketed histogram of non-negative values (not thread-safe; Metrics locks)."""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    @staticmethod
+    def bucket(value):
+        return 0 if value <= MIN_VALUE else int(math.log(value / MIN_VALUE) / _LOG_GROWTH) + 1
+
+    @staticmethod
+    def bucket_value(index):
+        """Geometric middle of a bucket."""
+        return 0.0 if index == 0 else MIN_VALUE * GROWTH ** (index - 0.5)
+
+    def add(self, value):
+        value = max(float(value), 0.0)
+        b = self.bucket(value)
+        self.counts[b] = self.counts.get(b, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def merge(self, other):
+        for b, n in other.counts.items():
+            self.counts[b] = self.counts.get(b, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for b in sorted(self.counts):
+            seen += self.counts[b]
+            if seen >= rank:
+                return min(max(self.bucket_value(b), self.min), self.max)
+        return self.max
+
+    def summary(self):
+        r = lambda v: None if v is None else round(v, 2)
+        return {'count': self.count, 'mean': r(self.total / self.count) if self.count else None,
+                'p50': r(self.percentile(50)), 'p95': r(self.percentile(95)), 'p99': r(self.percentile(99)),
+                'min': r(self.min), 'max': r(self.max), 'sum': r(self.total)}
+
+
+class Metrics:
+    """Named histograms, safe to share between threads."""
+
+    def __init__(self):
+        self._hists = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, name, value):
+        with self._lock:
+            hist = self._hists.get(name)
+            if hist is None:
+                hist = self._hists[name] = Histogram()
+            hist.add(value)
+
+    def summary(self):
+        with self._lock:
+            stages = {name: h.summary() for name, h in sorted(self._hists.items())}
+        return {'uptime_s': round(time.time() - self.started, 1), 'stages': stages}
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+
+
+class Tracer:
+    """Metrics plus a ring of recent traces (trace id -> spans)."""
+
+    def __init__(self, recent=RECENT_TRACES):
+        self.metrics = Metrics()
+        self.recent = recent
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def current(self):
+        """Trace id bound to this thread (see bind), or None."""
+        return getattr(self._local, 'trace_id', None)
+
+    @contextmanager
+    def bind(self, trace_id):
+        """Make trace_id the default for spans recorded on this thread."""
+        previous = self.current
+        self._local.trace_id = trace_id or previous
+        try:
+            yield self._local.trace_id
+        finally:
+            self._local.trace_id = previous
+
+    def record(self, name, ms, trace_id=None):
+        self.metrics.observe(name, ms)
+        trace_id = trace_id or self.current
+        if not trace_id:
+            return
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                while len(self._traces) > self.recent:
+                    self._traces.popitem(last=False)
+            spans.append([name, round(ms, 2)])
+
+    @contextmanager
+    def span(self, name, trace_id=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, trace_id)
+
+    def trace(self, trace_id):
+        with self._lock:
+            return list(self._traces.get(trace_id, ()))
+
+    def snapshot(self, traces=10):
+        out = self.metrics.summary()
+        with self._lock:
+            recent = list(self._traces.items())[-traces:] if traces else []
+        out['traces'] = [{'id': tid, 'spans': spans} for tid, spans in reversed(recent)]
+        return out
+
+
+def trace_methods(cls):
+    """Class decorator: time every public method of cls as 'api.<name>' on self._tracer.
+
+    Generator methods are left alone (they would only time their creation),
+    and so is anything named in cls.UNTRACED."""
+    skip = set(getattr(cls, 'UNTRACED', ()))
+    for name, fn in list(vars(cls).items()):
+        if name.startswith('_') or name in skip or not isinstance(fn, types.FunctionType) \
+                or fn.__code__.co_flags & _CO_GENERATOR:
+            continue
+        setattr(cls, name, _timed(fn, f'api.{name}'))
+    return cls
+
+
+def _timed(fn, stage):
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        tracer = getattr(self, '_tracer', None)
+        if tracer is None:
+            return fn(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(self, *args, **kwargs)
+        finally:
+            tracer.record(stage, (time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def format_table(snapshot, stages=None):
+    """Snapshot -> aligned text table of count / p50 / p95 / p99 / max per stage."""
+    rows = [(name, s) for name, s in snapshot.get('stages', {}).items() if not stages or name in stages]
+    width = max([len(name) for name, _ in rows] + [5])
+    lines = [f'{"stage":<{width}} {"n":>6} {"p50":>9} {"p95":>9} {"p99":>9} {"max":>9}']
+    fmt = lambda v: '-' if v is None else f'{v:.1f}'
+    for name, s in rows:
+        lines.append(f'{name:<{width}} {s["count"]:>6} {fmt(s["p50"]):>9} {fmt(s["p95"]):>9} '
+                     f'{fmt(s["p99"]):>9} {fmt(s["max"]):>9}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description='Print p50/p95 per stage from a metrics snapshot.')
+    ap.add_argument('source', help='JSON file (get_metrics output) or a server /metrics URL')
+    args = ap.parse_args()
+    if args.source.startswith(('http://', 'https://')):
+        import requests
+        data = requests.get(args.source, timeout=10).json()
+    else:
+        with open(args.source, encoding='utf-8') as f:
+            data = json.load(f)
+    for section in ('local', 'server'):
+        if section in data:   # get_metrics(include_server=True) output
+            print(f'[{section}]')
+            print(format_table(data[section]))
+    if 'stages' in data:
+        print(format_table(data))
@@ -0,0 +1,321 @@
+"""
+Persistent, incremental index of the assistant's workspace (AssistantOutput).
+
+    ws = WorkspaceIndex(root, db_path)
+    ws.refresh()                                   # scandir + mtime diff, only changed files re-read
+    ws.list(offset=0, limit=50, sort='mtime')      # {'items': [...], 'total': N}
+    ws.search('AI 新聞', kind='ppt', days=7)        # ranked, with snippets
+
+The index lives in SQLite (same setup as the search cache): one row per file
+with size, mtime, kind and its extracted text (zlib-compressed), plus an
+inverted index term -> (file, tf). Text is pulled straight out of the Office
+XML parts for .pptx/.docx/.xlsx (no python-pptx/docx/openpyxl load) and from
+the head of plain-text files.
+
+Terms are lower-cased ASCII words and overlapping CJK bigrams, so "簡報"
+matches inside "AI新聞簡報" without a word segmenter. A query is tokenised
+the same way; every term must match and files are ranked by tf-idf, with
+hits in the file name weighted up.
+"""
+import html
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from assistant.filereader import BinaryFile, detect_encoding
+
+MAX_TEXT = 50_000          # characters of text indexed per file
+MAX_READ = 256 * 1024      # bytes read from a plain-text file
+SCAN_INTERVAL = 5.0        # s; list/search trigger a background rescan when the last one is older
+NAME_WEIGHT = 5            # tf bonus for terms in the file name
+SNIPPET = 80               # characters of context around a hit
+EXTRACT_WORKERS = 4
+
+KINDS = {
+    'ppt': ('.pptx', '.ppt'),
+    'doc': ('.docx', '.doc', '.pdf', '.rtf'),
+    'sheet': ('.xlsx', '.xls', '.csv', '.tsv'),
+    'text': ('.txt', '.md', '.json', '.ndjson', '.jsonl', '.log', '.py', '.js', '.html', '.css', '.xml', '.yaml', '.yml', '.ini'),
+    'image': ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'),
+}
+_KIND_OF = {ext: kind for kind, exts in KINDS.items() for ext in exts}
+TEXT_EXTS = set(KINDS['text']) | {'.csv', '.tsv'}
+SORTS = {'name': 'name COLLATE NOCASE', 'mtime': 'mtime', 'size': 'size', 'kind': 'kind, name COLLATE NOCASE'}
+
+_TOKEN = re.compile(r'[0-9a-z]+|[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+_PPTX_TEXT = re.compile(r'<a:t>([^<]*)</a:t>')
+_DOCX_TEXT = re.compile(r'<w:t(?: [^>]*)?>([^<]*)</w:t>|</w:p>')
+_XLSX_TEXT = re.compile(r'<t(?: [^>]*)?>([^<]*)</t>')
+_SLIDE_NO = re.compile(r'ppt/slides/slide(\d+)\.xml$')
+
+
+def kind_of(name):
+    return _KIND_OF.get(os.path.splitext(name)[1].lower(), 'other')
+
+
+def tokenize(text):
+    """ASCII words and CJK bigrams (a lone CJK character stays a unigram)."""
+    for match in _TOKEN.finditer(text.lower()):
+        word = match.group()
+        if word.isascii():
+            yield word[:32]
+        elif len(word) == 1:
+            yield word
+        else:
+            for i in range(len(word) - 1):
+                yield word[i:i + 2]
+
+
+# ===== Text extraction =====
+
+def _zip_text(path, ext):
+    with zipfile.ZipFile(path) as z:
+        names = z.namelist()
+        if ext == '.pptx':
+            slides = sorted((int(m.group(1)), n) for n in names if (m := _SLIDE_NO.match(n)))
+            parts = [z.read(n).decode('utf-8', 'replace') for _, n in slides]
+            return '\n'.join(' '.join(_PPTX_TEXT.findall(p)) for p in parts)
+        if ext == '.docx':
+            xml = z.read('word/document.xml').decode('utf-8', 'replace')
+            return ''.join(m.group(1) if m.group(1) is not None else '\n' for m in _DOCX_TEXT.finditer(xml))
+        if ext == '.xlsx':
+            if 'xl/sharedStrings.xml' in names:
+                xml = z.read('xl/sharedStrings.xml').decode('utf-8', 'replace')
+            else:   # openpyxl write-only sheets use inline strings
+                xml = ''.join(z.read(n).decode('utf-8', 'replace')[:MAX_TEXT * 4]
+                              for n in names if n.startswith('xl/worksheets/sheet'))
+            return '\n'.join(_XLSX_TEXT.findall(xml))
+    return ''
+
+
+def extract_text(path):
+    """Searchable text of a file ('' when it has none)."""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in ('.pptx', '.docx', '.xlsx'):
+            return html.unescape(_zip_text(path, ext))[:MAX_TEXT]
+        if ext in TEXT_EXTS:
+            with open(path, 'rb') as f:
+                data = f.read(MAX_READ)
+            encoding, bom = detect_encoding(data)
+            return data[bom:].decode(encoding.replace('-sig', ''), errors='replace')[:MAX_TEXT]
+    except (OSError, zipfile.BadZipFile, KeyError, BinaryFile):
+        pass
+    return ''
+
+
+# ===== Index =====
+
+class WorkspaceIndex:
+    """scandir-driven file index with full-text search. Safe to share between threads."""
+
+    def __init__(self, root, db_path, scan_interval=SCAN_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.scan_interval = scan_interval
+        self.last_scan = 0.0
+        self.root_mtime = None
+        self.stats = {'scans': 0, 'indexed': 0, 'removed': 0, 'scan_ms': 0.0}
+        self._lock = threading.RLock()
+        self._scan_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY, path TEXT UNIQUE, name TEXT, kind TEXT,
+                size INTEGER, mtime INTEGER, text BLOB);
+            CREATE INDEX IF NOT EXISTS files_mtime ON files(mtime);
+            CREATE INDEX IF NOT EXISTS files_name ON files(name COLLATE NOCASE);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT, file_id INTEGER, tf INTEGER, PRIMARY KEY (term, file_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_file ON postings(file_id);
+        ''')
+
+    # --- scanning ---
+    def scan(self):
+        """-> {path: (size, mtime_ns)} for every file under root (hidden and ~$ lock files skipped)."""
+        found = {}
+        stack = [self.root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.name.startswith(('.', '~$')):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file():
+                                st = entry.stat()
+                                found[os.path.relpath(entry.path, self.root)] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return found
+
+    def refresh(self, force=False):
+        """Rescan root and re-index new or changed files; returns what changed."""
+        if not force and not self._stale():
+            return None
+        with self._scan_lock:
+            if not force and not self._stale():
+                return None
+            start = time.perf_counter()
+            self.root_mtime = self._root_mtime()
+            on_disk = self.scan()
+            with self._lock:
+                known = {path: (size, mtime, fid) for fid, path, size, mtime
+                         in self._db.execute('SELECT id, path, size, mtime FROM files')}
+            changed = [p for p, key in on_disk.items() if known.get(p, (None, None))[:2] != key]
+            removed = [known[p][2] for p in known.keys() - on_disk.keys()]
+
+            with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as pool:
+                texts = pool.map(lambda p: extract_text(os.path.join(self.root, p)), changed)
+                rows = [(p, on_disk[p], t) for p, t in zip(changed, texts)]
+
+            with self._lock:
+                self._db.execute('BEGIN')
+                try:
+                    for fid in removed:
+                        self._delete(fid)
+                    for path, (size, mtime), text in rows:
+                        self._upsert(path, size, mtime, text, known.get(path, (None, None, None))[2])
+                    self._db.execute('COMMIT')
+                except BaseException:
+                    self._db.execute('ROLLBACK')
+                    raise
+            elapsed = (time.perf_counter() - start) * 1000
+            self.last_scan = time.monotonic()
+            self.stats['scans'] += 1
+            self.stats['indexed'] += len(rows)
+            self.stats['removed'] += len(removed)
+            self.stats['scan_ms'] = round(elapsed, 1)
+            return {'files': len(on_disk), 'indexed': len(rows), 'removed': len(removed),
+                    'elapsed_ms': round(elapsed, 1)}
+
+    def _root_mtime(self):
+        try:
+            return os.stat(self.root).st_mtime_ns
+        except OSError:
+            return None
+
+    def _stale(self):
+        # A file created or deleted in root (where the skills save) changes the
+        # directory's mtime, so new documents show up without waiting out the interval.
+        return (time.monotonic() - self.last_scan >= self.scan_interval
+                or self._root_mtime() != self.root_mtime)
+
+    def _maybe_refresh(self):
+        """Before a query: scan synchronously the first time or when root changed,
+        otherwise rescan in the background and answer from the current index."""
+        if not self.last_scan or self._root_mtime() != self.root_mtime:
+            self.refresh()
+        elif time.monotonic() - self.last_scan >= self.scan_interval and not self._scan_lock.locked():
+            threading.Thread(target=self.refresh, name='workspace-scan', daemon=True).start()
+
+    def _delete(self, fid):
+        self._db.execute('DELETE FROM postings WHERE file_id = ?', (fid,))
+        self._db.execute('DELETE FROM files WHERE id = ?', (fid,))
+
+    def _upsert(self, path, size, mtime, text, fid):
+        name = os.path.basename(path)
+        blob = zlib.compress(text.encode('utf-8')) if text else None
+        if fid is None:
+            fid = self._db.execute('INSERT INTO files (path, name, kind, size, mtime, text) VALUES (?, ?, ?, ?, ?, ?)',
+                                   (path, name, kind_of(name), size, mtime, blob)).lastrowid
+        else:
+            self._db.execute('DELETE FROM postings WHERE file_id = ?', (fid,))
+            self._db.execute('UPDATE files SET size = ?, mtime = ?, text = ? WHERE id = ?', (size, mtime, blob, fid))
+        tf = Counter(tokenize(text))
+        for term in tokenize(os.path.splitext(path)[0].replace(os.sep, ' ')):
+            tf[term] += NAME_WEIGHT
+        self._db.executemany('INSERT INTO postings VALUES (?, ?, ?)', ((t, fid, n) for t, n in tf.items()))
+
+    # --- queries ---
+    def list(self, offset=0, limit=50, sort='mtime', descending=None, kind=''):
+        """A page of indexed files, newest first by default."""
+        self._maybe_refresh()
+        order = SORTS.get(sort, SORTS['mtime'])
+        if descending is None:
+            descending = sort in ('mtime', 'size') or sort not in SORTS
+        where, args = ('WHERE kind = ?', [kind]) if kind else ('', [])
+        with self._lock:
+            total = self._db.execute(f'SELECT COUNT(*) FROM files {where}', args).fetchone()[0]
+            rows = self._db.execute(
+                f'SELECT path, kind, size, mtime FROM files {where} '
+                f'ORDER BY {order} {"DESC" if descending else "ASC"} LIMIT ? OFFSET ?',
+                args + [int(limit), int(offset)]).fetchall()
+        return {'items': [self._item(*r) for r in rows], 'total': total,
+                'offset': int(offset), 'limit': int(limit)}
+
+    def search(self, query, limit=20, kind='', days=0):
+        """Files containing every query term, best tf-idf first."""
+        self._maybe_refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return {'items': [], 'total': 0, 'terms': []}
+        start = time.perf_counter()
+        with self._lock:
+            n_files = self._db.execute('SELECT COUNT(*) FROM files').fetchone()[0] or 1
+            scores = None
+            for term in terms:
+                hits = dict(self._postings(term))
+                if not hits:
+                    scores = {}
+                    break
+                idf = math.log(1 + n_files / len(hits))
+                if scores is None:
+                    scores = {fid: (1 + math.log(tf)) * idf for fid, tf in hits.items()}
+                else:
+                    scores = {fid: s + (1 + math.log(hits[fid])) * idf for fid, s in scores.items() if fid in hits}
+            if kind or days:
+                cutoff = time.time_ns() - int(float(days) * 86400e9) if days else 0
+                allowed = {fid for (fid,) in self._db.execute(
+                    'SELECT id FROM files WHERE mtime >= ?' + (' AND kind = ?' if kind else ''),
+                    (cutoff, kind) if kind else (cutoff,))}
+                scores = {fid: s for fid, s in scores.items() if fid in allowed}
+            ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+
+            items = []
+            for fid, score in ranked[:int(limit)]:
+                path, kind_, size, mtime, blob = self._db.execute(
+                    'SELECT path, kind, size, mtime, text FROM files WHERE id = ?', (fid,)).fetchone()
+                item = self._item(path, kind_, size, mtime)
+                item['score'] = round(score, 2)
+                item['snippet'] = _snippet(zlib.decompress(blob).decode('utf-8') if blob else '', terms)
+                items.append(item)
+        return {'items': items, 'total': len(ranked), 'terms': terms,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    def _postings(self, term):
+        if len(term) > 1:
+            return self._db.execute('SELECT file_id, tf FROM postings WHERE term = ?', (term,)).fetchall()
+        # a single character (one CJK char or digit): every term that starts with it
+        return self._db.execute('SELECT file_id, SUM(tf) FROM postings WHERE term >= ? AND term < ? '
+                                'GROUP BY file_id', (term, term + '\uffff')).fetchall()
+
+    def _item(self, path, kind, size, mtime):
+        return {'path': os.path.join(self.root, path), 'name': path, 'kind': kind, 'size': size,
+                'modified': time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime / 1e9))}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _snippet(text, terms):
+    if not text:
+        return ''
+    lower = text.lower()
+    pos = min((i for i in (lower.find(t) for t in terms) if i >= 0), default=0)
+    begin = max(0, pos - SNIPPET // 2)
+    snippet = ' '.join(text[begin:begin + SNIPPET].split())
+    return ('…' if begin else '') + snippet + ('…' if begin + SNIPPET < len(text) else '')
@@ -0,0 +1,138 @@
+"""
+Backend router benchmark: AssistantAPI against several faulty stub LLM servers.
+
+Each scenario starts bench/stub_llm.py servers with injected latency and
+failures and sends the same sequence of turns three ways:
+
+- single:  only apiUrl, as before the router (no failover, no hedging);
+- router:  apiUrl + apiUrls, latency ranking and failover, hedging off;
+- hedged:  the same with automatic hedging.
+
+Scenarios:
+- tail:    the fastest server stalls on --stall-rate of replies, a second one is slower but steady;
+- flaky:   the fastest server fails --fail-rate of requests with a 503;
+- outage:  streaming turns; the primary goes down for the middle third of
+           the run and comes back (probes every --probe-interval seconds).
+
+It reports p50 / p95 / p99 / max turn latency, errors and which backend
+served the turns.
+
+    python bench/backend_router.py --turns 60 --json router.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+from main import AssistantAPI  # noqa: E402
+from stub_llm import StubLLM  # noqa: E402
+
+MESSAGES = json.dumps([{'role': 'user', 'content': '用三句話解釋量子電腦'}], ensure_ascii=False)
+MODES = {'single': None, 'router': 'off', 'hedged': 0}
+
+
+class RouterAPI(AssistantAPI):
+    """AssistantAPI with in-memory settings (never saved) and the reply cache off."""
+
+    def __init__(self, settings):
+        super().__init__()
+        self._settings = dict(settings, llmCache='off')
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def servers(name, args):
+    """(primary, others) stub servers for a scenario; every scenario has a steady second server."""
+    steady = StubLLM(prefill_ms=args.prefill_ms * 2, tps=args.tps, seed=2)
+    if name == 'tail':
+        primary = StubLLM(prefill_ms=args.prefill_ms, tps=args.tps, stall_rate=args.stall_rate,
+                          stall_ms=args.stall_ms, seed=1)
+    elif name == 'flaky':
+        primary = StubLLM(prefill_ms=args.prefill_ms, tps=args.tps, fail_rate=args.fail_rate, seed=1)
+    else:
+        primary = StubLLM(prefill_ms=args.prefill_ms, tps=args.tps, fail_mode='drop', seed=1)
+    return primary.start(), [steady.start()]
+
+
+def run(name, mode, args):
+    primary, others = servers(name, args)
+    settings = {'apiUrl': primary.url, 'probeInterval': args.probe_interval}
+    if mode != 'single':
+        settings.update(apiUrls=[s.url for s in others], hedgeMs=MODES[mode])
+    api = RouterAPI(settings)
+    api.check_health()
+    names = {primary.url.split('//')[1]: 'primary', **{s.url.split('//')[1]: 'steady' for s in others}}
+    latencies, errors, served = [], 0, {}
+    try:
+        for turn in range(args.turns):
+            if name == 'outage':
+                primary.down = args.turns // 3 <= turn < 2 * args.turns // 3
+                if turn == 2 * args.turns // 3:
+                    time.sleep(args.probe_interval)   # give the probe a round to see it back
+            start = time.perf_counter()
+            if name == 'outage':
+                reply = None
+                for event in api.chat_with_ai_stream(MESSAGES, '[]'):
+                    if event['type'] == 'done':
+                        reply = dict(event['reply'], timing=event.get('timing') or {})
+            else:
+                reply = json.loads(api.chat_with_ai(MESSAGES, '[]'))
+            latencies.append((time.perf_counter() - start) * 1000)
+            if reply['text'].startswith('[Error]'):
+                errors += 1
+            else:
+                who = names.get((reply.get('timing') or {}).get('backend'), 'primary')
+                served[who] = served.get(who, 0) + 1
+        stats = api._get_router().summary()['stats']
+    finally:
+        api._reset_router()
+        for server in [primary] + others:
+            server.stop()
+    return {
+        'scenario': name, 'mode': mode, 'turns': args.turns, 'errors': errors, 'served': served,
+        'p50_ms': round(statistics.median(latencies), 1), 'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1), 'max_ms': round(max(latencies), 1),
+        'hedged': stats['hedged'], 'hedge_wins': stats['hedge_wins'], 'failovers': stats['failovers'],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--scenarios', nargs='+', default=['tail', 'flaky', 'outage'],
+                    choices=['tail', 'flaky', 'outage'])
+    ap.add_argument('--turns', type=int, default=60)
+    ap.add_argument('--prefill-ms', type=float, default=40.0)
+    ap.add_argument('--tps', type=float, default=2000.0)
+    ap.add_argument('--stall-rate', type=float, default=0.1)
+    ap.add_argument('--stall-ms', type=float, default=1500.0)
+    ap.add_argument('--fail-rate', type=float, default=0.3)
+    ap.add_argument('--probe-interval', type=float, default=1.0)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    rows = []
+    print(f'{"scenario":8s} {"mode":7s} {"p50 ms":>8s} {"p95 ms":>8s} {"p99 ms":>8s} {"max ms":>8s} '
+          f'{"errors":>6s} {"hedged":>6s} {"failover":>8s}  served')
+    for name in args.scenarios:
+        for mode in MODES:
+            row = run(name, mode, args)
+            rows.append(row)
+            print(f'{name:8s} {mode:7s} {row["p50_ms"]:8.1f} {row["p95_ms"]:8.1f} {row["p99_ms"]:8.1f} '
+                  f'{row["max_ms"]:8.1f} {row["errors"]:6d} {row["hedged"]:6d} {row["failovers"]:8d}  '
+                  f'{json.dumps(row["served"])}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'runs': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Multi-format export benchmark for assistant/documents.py.
+
+Renders one report (N sections of bullets plus a small table each) to pptx,
+docx, xlsx, md and html two ways and reports wall-clock time:
+
+- serial:   every format one after another in this process (what calling
+            create_ppt / create_docx / create_xlsx in turn costs);
+- pipeline: DocumentPipeline with warm worker processes, heavy formats in
+            parallel; the first (cold) call, which starts the workers, is
+            reported separately.
+
+It also times the pre-styled docx base against styling a fresh Document()
+for every file.
+
+    python bench/document_pipeline.py --sections 10 60 --repeat 3
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from assistant import documents  # noqa: E402
+
+FORMATS = ['pptx', 'docx', 'xlsx', 'md', 'html']
+
+
+def sample_content(sections):
+    """A fetch_news-style report with one table per section."""
+    parts = []
+    for i in range(sections):
+        parts.append(f'# 第 {i + 1} 章：AI 產業動態')
+        parts += [f'- 重點 {j + 1}：大型語言模型在企業應用的導入持續加速，相關投資逐季成長' for j in range(6)]
+        parts += ['| 公司 | 營收（億） | 年增 |', '|---|---:|---:|', '| 甲公司 | 2,161 | 33.9% |', '| 乙公司 | 609 | 126% |']
+    return '\n'.join(parts)
+
+
+def serial(title, content, directory):
+    blocks = documents.parse(content)
+    for fmt in FORMATS:
+        documents.render(fmt, title, blocks, os.path.join(directory, f'serial.{fmt}'))
+
+
+def docx_base_ms(repeat):
+    """(fresh Document() styled per file, copy of the cached base) in ms."""
+    from docx import Document
+
+    fresh, cached = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Document(io.BytesIO(documents._build_docx_base()))
+        fresh.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        Document(io.BytesIO(documents.docx_base()))
+        cached.append((time.perf_counter() - start) * 1000)
+    return statistics.median(fresh), statistics.median(cached)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--sections', type=int, nargs='+', default=[10, 60])
+    ap.add_argument('--workers', type=int, default=3)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='docbench_')
+    pipeline = documents.DocumentPipeline(max_workers=args.workers)
+    results = {'workers': args.workers, 'cpus': os.cpu_count(), 'runs': []}
+    try:
+        start = time.perf_counter()
+        pipeline.export('warm-up', '# x', FORMATS, directory, stem='cold')
+        results['cold_start_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        print(f'cold pipeline call (starts {args.workers} workers on {os.cpu_count()} CPUs): '
+              f'{results["cold_start_ms"]:.0f} ms')
+
+        serial('warm-up', '# x', directory)   # imports and templates for the serial path
+        print(f'{"sections":>8s} {"serial ms":>10s} {"pipeline ms":>12s} {"slowest ms":>11s} {"speedup":>8s}')
+        for n in args.sections:
+            content = sample_content(n)
+            s_ms, p_ms, slowest = [], [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                serial('AI 報告', content, directory)
+                s_ms.append((time.perf_counter() - start) * 1000)
+                out = pipeline.export('AI 報告', content, FORMATS, directory, stem='pipeline')
+                failed = [f for f in out['files'] if 'error' in f]
+                if failed:
+                    raise SystemExit(f'{n} sections: {failed}')
+                p_ms.append(out['elapsed_ms'])
+                slowest.append(max(f['ms'] for f in out['files']))
+            row = {'sections': n, 'serial_ms': round(statistics.median(s_ms), 1),
+                   'pipeline_ms': round(statistics.median(p_ms), 1), 'slowest_ms': round(statistics.median(slowest), 1)}
+            row['speedup'] = round(row['serial_ms'] / row['pipeline_ms'], 2)
+            results['runs'].append(row)
+            print(f'{n:8d} {row["serial_ms"]:10.1f} {row["pipeline_ms"]:12.1f} {row["slowest_ms"]:11.1f} '
+                  f'{row["speedup"]:7.2f}x')
+    finally:
+        pipeline.close()
+
+    fresh, cached = docx_base_ms(args.repeat)
+    results['docx_base'] = {'fresh_ms': round(fresh, 1), 'cached_ms': round(cached, 1)}
+    print(f'docx base document: styled from scratch {fresh:.1f} ms, cached copy {cached:.1f} ms')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""
+End-to-end benchmark: AssistantAPI driven headless against a stub LLM.
+
+Runs realistic multi-turn workflows the way public/app.js does: build the
+history, call chat_with_ai (or stream_chat), run the returned skill and feed
+fetch_news results back into the conversation. It reports:
+- per-turn latency (chat / skill / total);
+- throughput with N concurrent sessions;
+- peak RSS;
+- the size of every generated file.
+fetch_news is answered by a StaticBackend and generated files go to a
+temporary workspace, so a run needs no network and leaves nothing behind.
+
+    python bench/e2e.py --concurrency 1 4 8 --json e2e.json
+    python bench/e2e.py --json new.json --compare e2e.json   # flag regressions vs an earlier commit
+    python bench/e2e.py --url https://xxx.trycloudflare.com  # same workflows against the real server
+
+Without --url an in-process bench/stub_llm.py server is started; use
+--latency-scale 0 to measure only the client-side cost.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+from main import AssistantAPI  # noqa: E402
+from assistant.search import NewsSearcher, StaticBackend  # noqa: E402
+from stub_llm import StubLLM  # noqa: E402
+
+WORKFLOWS = {
+    'chat': ['你好', '用三句話解釋量子電腦', '謝謝你的說明'],
+    'ppt': ['幫我做一份關於AI的簡報'],
+    'docx': ['幫我寫一份環保報告'],
+    'xlsx': ['幫我做一個銷售表格'],
+    'news_ppt': ['幫我搜尋最新的AI新聞', '把剛剛的結果做成簡報'],
+}
+DOCUMENT_SKILLS = ('create_ppt', 'create_docx', 'create_xlsx')
+
+
+def skill_schemas():
+    """Skill list as sent by the UI (name + description parsed from public/app.js)."""
+    with open(os.path.join(ROOT, 'public', 'app.js'), encoding='utf-8') as f:
+        src = f.read()
+    block = src[src.index('getSkillSchemas() {'):]
+    block = block[:block.index('];')]
+    return [{'name': n, 'description': d, 'params': {}}
+            for n, d in re.findall(r"\{ name: '(\w+)', description: '([^']*)'", block)]
+
+
+def news_results(query, n):
+    return [{'title': f'{query} 第 {i + 1} 則', 'body': f'關於{query}的摘要內容 {i + 1}。' * 4,
+             'href': f'https://news.example.com/{i}'} for i in range(n)]
+
+
+class BenchAPI(AssistantAPI):
+    """AssistantAPI writing into a throwaway workspace, never opening files."""
+
+    def __init__(self, workspace, settings):
+        type(self).WORKSPACE = workspace
+        super().__init__()
+        self._settings = settings   # never saved: set_setting is not called
+        self._searcher = NewsSearcher(backend=StaticBackend(news_results))
+
+
+class Session:
+    """One conversation, replaying app.js' sendMessage / executeAISkill / recordSkillResult."""
+
+    def __init__(self, api, skills, stream=False, suffix=''):
+        self.api = api
+        self.skills_json = json.dumps(skills, ensure_ascii=False)
+        self.stream = stream
+        self.suffix = suffix
+        self.history = []
+
+    def chat(self, text):
+        self.history.append({'role': 'user', 'content': text})
+        messages = json.dumps(self.history, ensure_ascii=False)
+        if self.stream:
+            raw = self.api.stream_chat(f'bench{id(self)}', messages, self.skills_json)
+        else:
+            raw = self.api.chat_with_ai(messages, self.skills_json)
+        reply = json.loads(raw)
+        self.history.append({'role': 'assistant', 'content': reply.get('text', '')})
+        return reply
+
+    def run_skill(self, skill, args):
+        title = f"{args.get('title', 'bench')}{self.suffix}"   # concurrent sessions must not share a file
+        if skill == 'create_ppt':
+            slides = args.get('slides_json')
+            raw = self.api.create_ppt(title, slides if isinstance(slides, str) else json.dumps(slides),
+                                      args.get('theme') or 'dark')
+        elif skill == 'create_docx':
+            raw = self.api.create_docx(title, args.get('content', ''))
+        elif skill == 'create_xlsx':
+            data = args.get('data_json')
+            raw = self.api.create_xlsx(title, data if isinstance(data, str) else json.dumps(data))
+        elif skill == 'fetch_news':
+            raw = self.api.fetch_news(str(args.get('query', '')), str(args.get('max_results', 5)))
+        else:
+            raw = json.dumps({'success': True, 'message': f'(skipped {skill})'})
+        result = json.loads(raw)
+        if skill == 'fetch_news' and result.get('message'):
+            self.history.append({'role': 'assistant', 'content': f"已搜尋到以下資料：\n{result['message']}"})
+        return result
+
+    def turn(self, workflow, index, text):
+        start = time.perf_counter()
+        reply = self.chat(text)
+        chat_ms = (time.perf_counter() - start) * 1000
+        record = {'workflow': workflow, 'turn': index, 'skill': reply.get('skill') or '',
+                  'chat_ms': round(chat_ms, 1), 'skill_ms': 0.0, 'ok': not reply.get('text', '').startswith('[Error]'),
+                  'server_ms': (reply.get('server_timing') or {}).get('total_ms')}
+        if record['skill']:
+            t = time.perf_counter()
+            result = self.run_skill(record['skill'], reply.get('args') or {})
+            record['skill_ms'] = round((time.perf_counter() - t) * 1000, 1)
+            record['ok'] = record['ok'] and bool(result.get('success'))
+            if record['skill'] in DOCUMENT_SKILLS and ': ' in result.get('message', ''):
+                path = result['message'].split(': ', 1)[1].strip()
+                if os.path.exists(path):
+                    record['file_bytes'] = os.path.getsize(path)
+            if not result.get('success'):
+                record['error'] = result.get('message')
+        record['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+
+    def run(self, workflow):
+        return [self.turn(workflow, i, text) for i, text in enumerate(WORKFLOWS[workflow])]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))], 1) if values else None
+
+
+def summarize(turns):
+    totals = [t['total_ms'] for t in turns]
+    return {'turns': len(turns), 'errors': sum(not t['ok'] for t in turns),
+            'p50_ms': percentile(totals, 50), 'p95_ms': percentile(totals, 95),
+            'mean_ms': round(statistics.mean(totals), 1) if totals else None,
+            'chat_p50_ms': percentile([t['chat_ms'] for t in turns], 50),
+            'skill_p50_ms': percentile([t['skill_ms'] for t in turns if t['skill']], 50)}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1048576 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_concurrent(api, skills, workflows, sessions, stream):
+    turns, lock = [], threading.Lock()
+
+    def worker(n):
+        session = Session(api, skills, stream, suffix=f'_c{sessions}_{n}')
+        for name in workflows:
+            records = session.run(name)
+            with lock:
+                turns.extend(records)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    return dict(summarize(turns), sessions=sessions, wall_s=round(wall, 2),
+                turns_per_s=round(len(turns) / wall, 2))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# (path in results, label, True if higher is better)
+COMPARED = [
+    (('concurrency', '*', 'turns_per_s'), 'turns/s @{}', True),
+    (('concurrency', '*', 'p95_ms'), 'p95 ms @{}', False),
+    (('workflows', '*', 'p50_ms'), '{} p50 ms', False),
+    (('peak_rss_mb',), 'peak RSS MB', False),
+]
+
+
+def compare(old, new, tolerance):
+    """Print old/new/delta for the headline numbers; returns the regressed labels."""
+    def expand(results, path):
+        if '*' not in path:
+            value = results
+            for key in path:
+                value = (value or {}).get(key) if isinstance(value, dict) else None
+            return {None: value}
+        i = path.index('*')
+        container = results
+        for key in path[:i]:
+            container = container.get(key, {})
+        if isinstance(container, list):   # concurrency rows, keyed by session count
+            container = {str(row['sessions']): row for row in container}
+        return {k: v.get(path[i + 1]) for k, v in container.items()}
+
+    regressed = []
+    print(f'\n{"metric":28s} {"old":>10s} {"new":>10s} {"delta":>8s}')
+    for path, label, higher_better in COMPARED:
+        old_values, new_values = expand(old, path), expand(new, path)
+        for key, value in new_values.items():
+            before = old_values.get(key)
+            name = label.format(key)
+            if value is None or not before:
+                continue
+            delta = (value - before) / before * 100
+            worse = -delta if higher_better else delta
+            flag = '  REGRESSION' if worse > tolerance else ''
+            if flag:
+                regressed.append(name)
+            print(f'{name:28s} {before:10.1f} {value:10.1f} {delta:+7.1f}%{flag}')
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--url', help='benchmark a running server instead of the in-process stub')
+    ap.add_argument('--workflows', nargs='+', default=list(WORKFLOWS), choices=list(WORKFLOWS))
+    ap.add_argument('--repeat', type=int, default=3, help='sequential runs of each workflow')
+    ap.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    ap.add_argument('--stream', action='store_true', help='use stream_chat (/chat/stream) instead of chat_with_ai')
+    ap.add_argument('--cache', action='store_true', help='leave the client reply cache on')
+    ap.add_argument('--prefill-ms', type=float, default=300.0)
+    ap.add_argument('--tps', type=float, default=40.0)
+    ap.add_argument('--latency-scale', type=float, default=1.0)
+    ap.add_argument('--slots', type=int, default=8)
+    ap.add_argument('--json', help='write results to this file')
+    ap.add_argument('--compare', help='earlier --json output to compare against')
+    ap.add_argument('--tolerance', type=float, default=10.0, help='percent change counted as a regression')
+    args = ap.parse_args()
+
+    stub = None
+    url = args.url
+    if not url:
+        stub = StubLLM(prefill_ms=args.prefill_ms, tps=args.tps, latency_scale=args.latency_scale,
+                       slots=args.slots).start()
+        url = stub.url
+    # Headless: don't open every generated document (os.startfile is Windows-only anyway)
+    os.startfile = lambda path: None
+
+    workspace = tempfile.mkdtemp(prefix='assistant-e2e-')
+    settings = {'apiUrl': url, 'llmCache': 'on' if args.cache else 'off'}
+    api = BenchAPI(workspace, settings)
+    api.check_health()
+    skills = skill_schemas()
+    results = {
+        'meta': {'commit': git_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                 'python': platform.python_version(), 'platform': platform.platform(),
+                 'server': args.url or 'stub', 'args': vars(args)},
+    }
+    try:
+        # Warm-up: first imports of python-pptx / docx / openpyxl are not what we measure
+        Session(api, skills, args.stream, suffix='_warm').run('ppt')
+
+        turns = []
+        print(f'{"workflow":10s} {"turn":>4s} {"skill":12s} {"chat ms":>9s} {"skill ms":>9s} {"total ms":>9s} {"file KB":>8s}')
+        for rep in range(args.repeat):
+            for name in args.workflows:
+                for record in Session(api, skills, args.stream, suffix=f'_s{rep}').run(name):
+                    turns.append(record)
+                    if rep == 0:
+                        kb = f"{record['file_bytes'] / 1024:.1f}" if 'file_bytes' in record else ''
+                        print(f"{name:10s} {record['turn']:4d} {record['skill']:12s} {record['chat_ms']:9.1f} "
+                              f"{record['skill_ms']:9.1f} {record['total_ms']:9.1f} {kb:>8s}"
+                              f"{'  ERROR ' + str(record.get('error', '')) if not record['ok'] else ''}")
+        results['turns'] = turns
+        results['workflows'] = {name: summarize([t for t in turns if t['workflow'] == name])
+                                for name in args.workflows}
+        results['files'] = {f"{t['workflow']}.{t['skill']}": t['file_bytes']
+                            for t in turns if 'file_bytes' in t}
+        results['peak_rss_mb_sequential'] = peak_rss_mb()
+
+        results['concurrency'] = []
+        print(f'\n{"sessions":>8s} {"turns":>6s} {"wall s":>8s} {"turns/s":>8s} {"p50 ms":>9s} {"p95 ms":>9s} {"errors":>6s}')
+        for n in args.concurrency:
+            row = run_concurrent(api, skills, args.workflows, n, args.stream)
+            results['concurrency'].append(row)
+            print(f"{n:8d} {row['turns']:6d} {row['wall_s']:8.2f} {row['turns_per_s']:8.2f} "
+                  f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['errors']:6d}")
+        results['peak_rss_mb'] = peak_rss_mb()
+        results['stages'] = json.loads(api.get_metrics())['local']['stages']
+        print(f"\npeak RSS {results['peak_rss_mb']} MB; files: "
+              + ', '.join(f'{k} {v / 1024:.1f} KB' for k, v in results['files'].items()))
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+        if stub:
+            stub.stop()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressed = compare(json.load(f), results, args.tolerance)
+        if regressed:
+            raise SystemExit(f'{len(regressed)} regression(s): {", ".join(regressed)}')
+
+
+if __name__ == '__main__':
+    main()
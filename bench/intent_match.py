@@ -0,0 +1,168 @@
+"""
+Dispatch micro-benchmark for assistant/intents.py and public/intents.js.
+
+Times local-shortcut matching per message with the previous linear scan
+(`patterns.some(p => lower.includes(p))` per intent, then the search/URL
+regexes) and with the compiled Aho-Corasick table, for the built-in intents
+plus N synthetic custom shortcuts. Runs in Python and, when node is on PATH,
+in JS as well, and checks that both implementations pick the same intent.
+
+    python bench/intent_match.py --shortcuts 0 100 1000 --iterations 2000
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from assistant.intents import BUILTIN_INTENTS, DOC_FOLLOWUP, IntentMatcher  # noqa: E402
+
+MESSAGES = [
+    '幫我打開記事本', 'Open Spotify', '系統資訊', '現在幾點', '截圖', '搜尋 台北天氣',
+    '搜尋AI新聞然後做成簡報', '開啟 https://example.com/docs', '列出檔案',
+    # misses are the common case: every message that goes to the AI scans everything
+    '幫我寫一封信給老闆，說明下週的專案進度', 'What is the capital of France?',
+    '請幫我把這段話翻譯成英文：今天天氣很好', '用三句話解釋量子電腦', '我想做一份關於電動車市場的簡報',
+]
+
+
+def custom_shortcuts(n):
+    return [{'id': f'custom:{i}', 'skill': 'launch_app', 'args': {'name': f'app{i}'},
+             'patterns': [f'啟動工具{i}號', f'run tool {i}']} for i in range(n)]
+
+
+def linear_intents(custom):
+    return [[[p.lower() for p in i['patterns']], i['id'], i['skill']] for i in custom + BUILTIN_INTENTS]
+
+
+def linear_matcher(custom):
+    """The pre-table tryLocalSkill: one includes() scan per intent, in order."""
+    intents = linear_intents(custom)
+    doc_re = re.compile(DOC_FOLLOWUP, re.I)
+    search_re = re.compile(r'(?:搜尋|搜索|查詢|search|幫我查|幫我搜)\s*(.+)', re.I)
+    url_re = re.compile(r'(?:開啟|打開|open)\s*(https?://\S+)', re.I)
+
+    def match(text):
+        lower = text.lower()
+        for patterns, intent_id, skill in intents:
+            if skill == 'search_web':
+                if not doc_re.search(text) and search_re.search(text):
+                    return intent_id
+            elif skill == 'open_url':
+                if url_re.search(text):
+                    return intent_id
+            elif any(p in lower for p in patterns):
+                return intent_id
+        return None
+    return match
+
+
+def per_call_us(fn, messages, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in messages:
+            fn(text)
+    return (time.perf_counter() - start) * 1e6 / (iterations * len(messages))
+
+
+JS_HARNESS = r'''
+const fs = require('fs');
+const [src, dataPath, iterations] = process.argv.slice(1);
+const IntentMatcher = new Function(fs.readFileSync(src, 'utf8') + '; return IntentMatcher;')();
+const data = JSON.parse(fs.readFileSync(dataPath, 'utf8'));
+const matcher = new IntentMatcher(data.table);
+const linear = data.linear;
+const docRe = new RegExp(data.doc, 'i');
+const searchRe = /(?:搜尋|搜索|查詢|search|幫我查|幫我搜)\s*(.+)/i;
+const urlRe = /(?:開啟|打開|open)\s*(https?:\/\/\S+)/i;
+function linearMatch(text) {
+  const lower = text.toLowerCase();
+  for (const [patterns, id, skill] of linear) {
+    if (skill === 'search_web') {
+      if (!docRe.test(text) && searchRe.test(text)) return id;
+    } else if (skill === 'open_url') {
+      if (urlRe.test(text)) return id;
+    } else if (patterns.some(p => lower.includes(p))) {
+      return id;
+    }
+  }
+  return null;
+}
+function time(fn) {
+  for (let i = 0; i < 200; i++) data.messages.forEach(fn);   // warm up the JIT
+  const start = process.hrtime.bigint();
+  for (let i = 0; i < iterations; i++) data.messages.forEach(fn);
+  return Number(process.hrtime.bigint() - start) / 1000 / (iterations * data.messages.length);
+}
+console.log(JSON.stringify({
+  linear_us: time(linearMatch),
+  compiled_us: time(t => matcher.match(t)),
+  matches: data.messages.map(t => { const m = matcher.match(t); return m && [m.intent, m.args]; }),
+}));
+'''
+
+
+def run_js(matcher, custom, iterations):
+    node = shutil.which('node')
+    if not node:
+        return None
+    data = {'table': matcher.table, 'messages': MESSAGES, 'linear': linear_intents(custom), 'doc': DOC_FOLLOWUP}
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    try:
+        proc = subprocess.run([node, '-e', JS_HARNESS, os.path.join(ROOT, 'public', 'intents.js'), f.name,
+                               str(iterations)], capture_output=True, text=True, encoding='utf-8', check=True)
+    finally:
+        os.unlink(f.name)
+    return json.loads(proc.stdout)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--shortcuts', type=int, nargs='+', default=[0, 100, 1000])
+    ap.add_argument('--iterations', type=int, default=2000)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    results = []
+    print(f'{"shortcuts":>9s} {"states":>7s} {"py linear µs":>13s} {"py table µs":>12s} '
+          f'{"js linear µs":>13s} {"js table µs":>12s}')
+    for n in args.shortcuts:
+        custom = custom_shortcuts(n)
+        start = time.perf_counter()
+        matcher = IntentMatcher(custom)
+        build_ms = (time.perf_counter() - start) * 1000
+        linear = linear_matcher(custom)
+
+        expected = [linear(t) for t in MESSAGES]
+        got = [(m or {}).get('intent') for m in map(matcher.match, MESSAGES)]
+        if expected != got:
+            raise SystemExit(f'{n} shortcuts: linear scan and table disagree: {expected} != {got}')
+
+        row = {'shortcuts': n, 'states': len(matcher.table['goto']), 'build_ms': round(build_ms, 1),
+               'py_linear_us': round(per_call_us(linear, MESSAGES, args.iterations), 2),
+               'py_table_us': round(per_call_us(matcher.match, MESSAGES, args.iterations), 2)}
+        js = run_js(matcher, custom, args.iterations)
+        if js:
+            py_matches = [m and [m['intent'], m['args']] for m in map(matcher.match, MESSAGES)]
+            if js['matches'] != py_matches:
+                raise SystemExit(f'{n} shortcuts: intents.js and intents.py disagree')
+            row['js_linear_us'] = round(js['linear_us'], 2)
+            row['js_table_us'] = round(js['compiled_us'], 2)
+        results.append(row)
+        print(f'{n:9d} {row["states"]:7d} {row["py_linear_us"]:13.2f} {row["py_table_us"]:12.2f} '
+              f'{row.get("js_linear_us", float("nan")):13.2f} {row.get("js_table_us", float("nan")):12.2f}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
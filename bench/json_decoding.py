@@ -0,0 +1,130 @@
+"""
+CPU check for colab/json_grammar.py: constrained vs. free decoding.
+
+Generates replies for the PROMPTS of scheduler_throughput.py with sampling,
+through the real make_hf_batch_generate, once without and once with
+JSONLogitsProcessor, and reports:
+- how many replies parse as JSON on the first json.loads;
+- how many have the reply shape (text / known skill / args dict);
+- how many needed grammar.completion because max_new_tokens cut them off;
+- tokens per reply and the processor's share of the generation time.
+
+The tiny random Llama cannot produce JSON on its own, which makes it a
+strict test. Every constrained reply must still come out valid.
+
+    python bench/json_decoding.py
+    python bench/json_decoding.py --model Qwen/Qwen2.5-0.5B-Instruct --max-new-tokens 256
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'colab'))
+sys.path.insert(0, HERE)
+from json_grammar import JSONLogitsProcessor, TokenVocabulary, grammar_for  # noqa: E402
+from scheduler import make_hf_batch_generate  # noqa: E402
+from scheduler_throughput import PROMPTS, load_model  # noqa: E402
+
+
+def skill_schemas():
+    """getSkillSchemas() from public/app.js, params included."""
+    with open(os.path.join(HERE, '..', 'public', 'app.js'), encoding='utf-8') as f:
+        src = f.read()
+    block = src[src.index('getSkillSchemas() {'):]
+    block = block[:block.index('];')]
+    skills = []
+    for name, desc, params in re.findall(r"\{ name: '(\w+)', description: '([^']*)', params: \{(.*?)\} \}", block):
+        skills.append({'name': name, 'description': desc,
+                       'params': dict(re.findall(r"(\w+): '((?:[^'\\]|\\.)*)'", params))})
+    return skills
+
+
+def check(text, names):
+    """-> (parses, has the reply shape)"""
+    try:
+        reply = json.loads(text)
+    except ValueError:
+        return False, False
+    shaped = (isinstance(reply, dict) and list(reply) == ['text', 'skill', 'args']
+              and isinstance(reply['text'], str) and reply['skill'] in names and isinstance(reply['args'], dict))
+    return True, shaped
+
+
+def run(generate_batch, prompts, repeat, constrained, grammar, vocab, names):
+    rows = {'replies': 0, 'json': 0, 'shaped': 0, 'closed': 0, 'tokens': 0, 'elapsed_s': 0.0, 'grammar_ms': 0.0}
+    for _ in range(repeat):
+        kwargs = {}
+        if constrained:
+            from transformers import LogitsProcessorList
+            processor = JSONLogitsProcessor([grammar] * len(prompts), vocab)
+            kwargs['logits_processor'] = LogitsProcessorList([processor])
+        start = time.perf_counter()
+        results = generate_batch(prompts, **kwargs)
+        rows['elapsed_s'] += time.perf_counter() - start
+        if constrained:
+            rows['grammar_ms'] += processor.elapsed_ms
+        for result in results:
+            text = result['text']
+            if constrained:
+                tail = grammar.completion(text)
+                rows['closed'] += bool(tail)
+                text += tail
+            parses, shaped = check(text, names)
+            rows['replies'] += 1
+            rows['json'] += parses
+            rows['shaped'] += shaped
+            rows['tokens'] += result['tokens']
+    rows['tokens_per_reply'] = round(rows['tokens'] / rows['replies'], 1)
+    rows['ms_per_token'] = round(rows['elapsed_s'] * 1000 / max(rows['tokens'], 1), 2)
+    rows['grammar_share'] = round(rows['grammar_ms'] / 1000 / rows['elapsed_s'], 3) if rows['elapsed_s'] else 0
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--model', default='tiny', help="'tiny' (local random Llama) or a HF model id")
+    ap.add_argument('--max-new-tokens', type=int, default=96)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    import torch
+    torch.manual_seed(0)
+    model, tokenizer = load_model(args.model)
+    skills = skill_schemas()
+    names = {''} | {s['name'] for s in skills}
+
+    start = time.perf_counter()
+    vocab = TokenVocabulary(tokenizer, model.generation_config.eos_token_id)
+    vocab_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    grammar = grammar_for(skills)
+    compile_ms = (time.perf_counter() - start) * 1000
+    print(f'vocabulary {len(vocab.entries)} tokens in {vocab_ms:.0f} ms '
+          f'({len(vocab.special)} walked inside strings); grammar for {len(skills)} skills in {compile_ms:.1f} ms')
+
+    generate_batch = make_hf_batch_generate(model, tokenizer, max_new_tokens=args.max_new_tokens,
+                                            do_sample=True, temperature=0.7, top_p=0.9)
+    results = {'model': args.model, 'max_new_tokens': args.max_new_tokens, 'vocab_ms': round(vocab_ms, 1),
+               'compile_ms': round(compile_ms, 2)}
+    print(f"{'mode':12s} {'replies':>7s} {'json':>5s} {'shaped':>6s} {'closed':>6s} {'tok/reply':>9s} "
+          f"{'ms/tok':>7s} {'grammar':>7s}")
+    for mode in ('free', 'constrained'):
+        r = run(generate_batch, PROMPTS, args.repeat, mode == 'constrained', grammar, vocab, names)
+        results[mode] = r
+        print(f"{mode:12s} {r['replies']:7d} {r['json']:5d} {r['shaped']:6d} {r['closed']:6d} "
+              f"{r['tokens_per_reply']:9.1f} {r['ms_per_token']:7.2f} {r['grammar_share']:7.1%}")
+    results['grammar_stats'] = dict(grammar.stats)
+    print(f"mask walks {grammar.stats['walks']}, cache hits {grammar.stats['cache_hits']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+MCP host benchmark: persistent connections (assistant/mcp.py) against bench/stub_mcp.py.
+
+Measures:
+- connect:    start() to all servers initialized and their tools listed (servers connect in parallel);
+- call:       echo tool latency over the open stdio connection, p50 / p95,
+              against spawn-per-call (start the server, initialize, tools/list,
+              call, exit), which is what starting a server per tool use costs;
+- concurrent: --concurrency sleep(--sleep-ms) calls at once over one stdio
+              connection; the wall time stays near one call;
+- discovery:  the cached skills() against a tools/list round trip;
+- http:       echo latency over streamable HTTP on a keep-alive session.
+
+    python bench/mcp_host.py --calls 200 --servers 3 --json mcp.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+from assistant.mcp import Connection, MCPHost, StdioTransport  # noqa: E402
+
+STUB = os.path.join(HERE, 'stub_mcp.py')
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summary(samples):
+    return {'p50_ms': round(statistics.median(samples), 2), 'p95_ms': round(percentile(samples, 95), 2)}
+
+
+def stdio_config(args):
+    return {'command': sys.executable, 'args': [STUB, '--startup-ms', str(args.startup_ms)]}
+
+
+def timed(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def spawn_per_call(args):
+    config = stdio_config(args)
+    conn = Connection(lambda on_message, on_close: StdioTransport(config['command'], config['args'],
+                                                                  on_message=on_message, on_close=on_close))
+    conn.request('initialize', {'protocolVersion': '2025-03-26', 'capabilities': {}, 'clientInfo': {'name': 'bench'}})
+    conn.notify('notifications/initialized')
+    conn.request('tools/list')
+    conn.request('tools/call', {'name': 'echo', 'arguments': {'text': 'hi'}})
+    conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--calls', type=int, default=200, help='echo calls per persistent measurement')
+    ap.add_argument('--spawns', type=int, default=10, help='spawn-per-call samples')
+    ap.add_argument('--servers', type=int, default=3, help='stdio servers connected at once')
+    ap.add_argument('--startup-ms', type=float, default=200.0, help='simulated server start-up time')
+    ap.add_argument('--concurrency', type=int, default=16)
+    ap.add_argument('--sleep-ms', type=float, default=200.0)
+    ap.add_argument('--http-port', type=int, default=8790)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+    results = {}
+
+    start = time.perf_counter()
+    host = MCPHost({f's{i}': stdio_config(args) for i in range(args.servers)}).start()
+    host.wait(30)
+    results['connect'] = {'servers': args.servers, 'ms': round((time.perf_counter() - start) * 1000, 1),
+                          'per_server_ms': [s['connect_ms'] for s in host.status().values()]}
+    print(f"connect     {args.servers} servers in {results['connect']['ms']:.0f} ms "
+          f"(each {results['connect']['per_server_ms']} ms)")
+
+    try:
+        persistent = timed(lambda: host.call('mcp_s0_echo', {'text': 'hi'}), args.calls)
+        spawned = timed(lambda: spawn_per_call(args), args.spawns)
+        results['call'] = {'persistent': summary(persistent), 'spawn_per_call': summary(spawned)}
+        print(f"call        persistent p50 {results['call']['persistent']['p50_ms']:.2f} ms "
+              f"p95 {results['call']['persistent']['p95_ms']:.2f} ms | spawn-per-call "
+              f"p50 {results['call']['spawn_per_call']['p50_ms']:.0f} ms")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            replies = list(pool.map(lambda _: host.call('mcp_s0_sleep', {'ms': args.sleep_ms}), range(args.concurrency)))
+        wall = (time.perf_counter() - start) * 1000
+        results['concurrent'] = {'calls': args.concurrency, 'sleep_ms': args.sleep_ms, 'wall_ms': round(wall, 1),
+                                 'serial_ms': args.concurrency * args.sleep_ms,
+                                 'ok': sum(r['success'] for r in replies)}
+        print(f"concurrent  {args.concurrency} x sleep({args.sleep_ms:.0f}) on one connection: {wall:.0f} ms "
+              f"(serial {args.concurrency * args.sleep_ms:.0f} ms)")
+
+        conn = host.servers['s0'].connect()
+        cached = timed(host.skills, args.calls)
+        listed = timed(lambda: conn.request('tools/list'), args.calls)
+        results['discovery'] = {'cached': summary(cached), 'tools_list': summary(listed)}
+        print(f"discovery   cached skills() p50 {results['discovery']['cached']['p50_ms']:.3f} ms | "
+              f"tools/list p50 {results['discovery']['tools_list']['p50_ms']:.2f} ms")
+    finally:
+        host.close()
+
+    server = subprocess.Popen([sys.executable, STUB, '--http', str(args.http_port)], stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(0.5)
+        http = MCPHost({'web': {'url': f'http://127.0.0.1:{args.http_port}/mcp'}}).start()
+        http.wait(10)
+        samples = timed(lambda: http.call('mcp_web_echo', {'text': 'hi'}), args.calls)
+        results['http'] = summary(samples)
+        print(f"http        keep-alive p50 {results['http']['p50_ms']:.2f} ms p95 {results['http']['p95_ms']:.2f} ms")
+        http.close()
+    finally:
+        server.kill()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
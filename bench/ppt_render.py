@@ -0,0 +1,160 @@
+"""
+Deck-rendering benchmark for assistant/ppt.py.
+
+Times create_ppt-style decks (title slide + N content slides + end slide,
+saved to memory) for every theme and slide count, with the template-cached
+engine and with the previous per-shape python-pptx builder, and checks that
+both produce the same slide texts.
+
+    python bench/ppt_render.py --slides 10 50 100 200 --repeat 3
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from assistant import ppt  # noqa: E402
+
+
+def sample_slides(n):
+    """Slides shaped like a long fetch_news digest."""
+    return [{
+        'title': f'第 {i + 1} 則：AI 產業動態與市場分析',
+        'content': '\n'.join(f'- 重點 {j + 1}：大型語言模型在企業應用的導入持續加速，相關投資逐季成長'
+                             for j in range(5)),
+    } for i in range(n)]
+
+
+def legacy_deck(title, slides, theme='dark'):
+    """The pre-template create_ppt: every shape built through the object layer."""
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+    from pptx.enum.text import PP_ALIGN
+    from pptx.dml.color import RGBColor
+
+    t = ppt.THEMES.get(theme, ppt.THEMES['dark'])
+    prs = Presentation()
+    prs.slide_width = Inches(13.333)
+    prs.slide_height = Inches(7.5)
+    BG_DARK, BG_CARD = RGBColor(*t['bg']), RGBColor(*t['card'])
+    ACCENT, ACCENT_LIGHT = RGBColor(*t['accent']), RGBColor(*t['accent2'])
+    WHITE, GRAY, LIGHT = RGBColor(*t['text']), RGBColor(*t['sub']), RGBColor(*t['light'])
+
+    def add_bg(slide, color):
+        fill = slide.background.fill
+        fill.solid()
+        fill.fore_color.rgb = color
+
+    def add_shape(slide, left, top, w, h, fill_color):
+        shape = slide.shapes.add_shape(1, left, top, w, h)
+        shape.fill.solid()
+        shape.fill.fore_color.rgb = fill_color
+        shape.line.fill.background()
+        return shape
+
+    def set_text(tf, text, size=18, color=WHITE, bold=False, align=PP_ALIGN.LEFT):
+        tf.clear()
+        tf.word_wrap = True
+        p = tf.paragraphs[0]
+        p.text = text
+        p.font.size = Pt(size)
+        p.font.color.rgb = color
+        p.font.bold = bold
+        p.font.name = 'Microsoft JhengHei'
+        p.alignment = align
+
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    add_bg(slide, BG_DARK)
+    add_shape(slide, Inches(0), Inches(0), Inches(0.15), Inches(7.5), ACCENT)
+    box = slide.shapes.add_textbox(Inches(1.5), Inches(2.2), Inches(10), Inches(1.5))
+    set_text(box.text_frame, title, size=44, bold=True)
+    box = slide.shapes.add_textbox(Inches(1.5), Inches(4.0), Inches(10), Inches(0.6))
+    set_text(box.text_frame, datetime.datetime.now().strftime('%Y . %m . %d'), size=16, color=GRAY)
+    add_shape(slide, Inches(1.5), Inches(3.8), Inches(3), Pt(3), ACCENT_LIGHT)
+
+    for idx, s in enumerate(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        add_bg(slide, BG_DARK)
+        add_shape(slide, Inches(0), Inches(0), Inches(13.333), Pt(4), ACCENT)
+        box = slide.shapes.add_textbox(Inches(11.8), Inches(0.3), Inches(1), Inches(0.5))
+        set_text(box.text_frame, f'{idx + 1:02d}', size=14, color=GRAY, align=PP_ALIGN.RIGHT)
+        box = slide.shapes.add_textbox(Inches(0.8), Inches(0.5), Inches(11), Inches(1.0))
+        set_text(box.text_frame, s.get('title', ''), size=32, bold=True)
+        add_shape(slide, Inches(0.8), Inches(1.5), Inches(2), Pt(3), ACCENT_LIGHT)
+        add_shape(slide, Inches(0.6), Inches(1.9), Inches(12), Inches(5.0), BG_CARD).shadow.inherit = False
+        tf = slide.shapes.add_textbox(Inches(1.1), Inches(2.2), Inches(11), Inches(4.5)).text_frame
+        tf.word_wrap = True
+        lines = [l.strip() for l in s.get('content', '').split('\n') if l.strip()]
+        for i, line in enumerate(lines):
+            p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
+            p.text = f'  {line.lstrip("-*> ")}' if line.startswith(('-', '*', '>')) else f'  {line}'
+            p.font.size = Pt(18)
+            p.font.color.rgb = LIGHT
+            p.font.name = 'Microsoft JhengHei'
+            p.space_after = Pt(10)
+
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    add_bg(slide, BG_DARK)
+    add_shape(slide, Inches(0), Inches(0), Inches(13.333), Pt(4), ACCENT)
+    box = slide.shapes.add_textbox(Inches(2), Inches(2.8), Inches(9), Inches(1.5))
+    set_text(box.text_frame, 'Thank You', size=48, bold=True, align=PP_ALIGN.CENTER)
+    box = slide.shapes.add_textbox(Inches(2), Inches(4.3), Inches(9), Inches(0.6))
+    set_text(box.text_frame, title, size=18, color=GRAY, align=PP_ALIGN.CENTER)
+    return prs
+
+
+def slide_texts(prs):
+    return [[sh.text_frame.text for sh in slide.shapes if sh.has_text_frame and sh.text_frame.text]
+            for slide in prs.slides]
+
+
+def timed(build, title, slides, theme):
+    start = time.perf_counter()
+    prs = build(title, slides, theme)
+    prs.save(io.BytesIO())
+    return (time.perf_counter() - start) * 1000, prs
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--slides', type=int, nargs='+', default=[10, 50, 100, 200])
+    ap.add_argument('--themes', nargs='+', default=ppt.theme_names())
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    results = []
+    print(f'{"theme":10s} {"slides":>6s} {"legacy ms":>10s} {"cached ms":>10s} {"speedup":>8s}  template build')
+    for theme in args.themes:
+        start = time.perf_counter()
+        ppt.get_template(theme)
+        build_ms = (time.perf_counter() - start) * 1000
+        for n in args.slides:
+            slides = sample_slides(n)
+            legacy, cached = [], []
+            for _ in range(args.repeat):
+                ms, old = timed(legacy_deck, 'AI 新聞摘要', slides, theme)
+                legacy.append(ms)
+                ms, new = timed(ppt.render_deck, 'AI 新聞摘要', slides, theme)
+                cached.append(ms)
+            if slide_texts(old) != slide_texts(new):
+                raise SystemExit(f'{theme}/{n}: slide texts differ between builders')
+            row = {'theme': theme, 'slides': n, 'legacy_ms': round(statistics.median(legacy), 1),
+                   'cached_ms': round(statistics.median(cached), 1), 'template_build_ms': round(build_ms, 1)}
+            row['speedup'] = round(row['legacy_ms'] / row['cached_ms'], 2)
+            results.append(row)
+            print(f'{theme:10s} {n:6d} {row["legacy_ms"]:10.1f} {row["cached_ms"]:10.1f} '
+                  f'{row["speedup"]:7.2f}x  {build_ms:.1f} ms')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
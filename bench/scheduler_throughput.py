@@ -0,0 +1,150 @@
+"""
+CPU throughput harness for colab/scheduler.py.
+
+Runs the real GenerationScheduler + make_hf_batch_generate against a tiny
+randomly-initialised Llama (built locally, no download) and reports
+requests/s, tokens/s and latency at several client concurrencies, with
+batching on and off. A probe coroutine stands in for /health and records
+event-loop lag while generation is running.
+
+    python bench/scheduler_throughput.py
+    python bench/scheduler_throughput.py --clients 1 4 16 --max-batch-size 8 --json out.json
+    python bench/scheduler_throughput.py --model hf-internal-testing/tiny-random-LlamaForCausalLM
+
+Requires torch + transformers (CPU builds are fine).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'colab'))
+from scheduler import GenerationScheduler, make_hf_batch_generate  # noqa: E402
+
+PROMPTS = [
+    '<|im_start|>system\n你是一個桌面數位助理<|im_end|>\n<|im_start|>user\n你好<|im_end|>\n<|im_start|>assistant\n',
+    '<|im_start|>system\n你是一個桌面數位助理<|im_end|>\n<|im_start|>user\n幫我做一份關於AI的簡報<|im_end|>\n<|im_start|>assistant\n',
+    '<|im_start|>system\n你是一個桌面數位助理<|im_end|>\n<|im_start|>user\nWhat time is it now?<|im_end|>\n<|im_start|>assistant\n',
+    '<|im_start|>system\n你是一個桌面數位助理<|im_end|>\n<|im_start|>user\n搜尋最新的AI新聞然後做成簡報<|im_end|>\n<|im_start|>assistant\n',
+]
+
+
+def tiny_model(max_positions=1024):
+    """Byte-level tokenizer + 2-layer Llama with random weights."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    alphabet = pre_tokenizers.ByteLevel.alphabet()
+    vocab = {ch: i for i, ch in enumerate(sorted(alphabet))}
+    vocab['<pad>'] = len(vocab)
+    vocab['<eos>'] = len(vocab)
+    tok = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, pad_token='<pad>', eos_token='<eos>')
+
+    config = LlamaConfig(
+        vocab_size=len(vocab), hidden_size=128, intermediate_size=256,
+        num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=4,
+        max_position_embeddings=max_positions,
+        pad_token_id=vocab['<pad>'], eos_token_id=vocab['<eos>'], bos_token_id=vocab['<eos>'],
+    )
+    model = LlamaForCausalLM(config).eval()
+    return model, tokenizer
+
+
+def load_model(name):
+    if name == 'tiny':
+        return tiny_model()
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    return AutoModelForCausalLM.from_pretrained(name).eval(), AutoTokenizer.from_pretrained(name)
+
+
+def pct(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def run_level(generate_batch, clients, per_client, max_batch_size, max_wait_ms):
+    scheduler = GenerationScheduler(generate_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    latencies, lags = [], []
+    tokens = 0
+    done = asyncio.Event()
+
+    async def client(idx):
+        nonlocal tokens
+        for j in range(per_client):
+            start = time.perf_counter()
+            result = await scheduler.submit(PROMPTS[(idx + j) % len(PROMPTS)])
+            latencies.append(time.perf_counter() - start)
+            tokens += result['tokens']
+
+    async def health_probe():
+        # What a /health handler would experience while batches run
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.05)
+            lags.append(max(0.0, time.perf_counter() - start - 0.05))
+
+    probe = asyncio.ensure_future(health_probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe
+    snap = scheduler.snapshot()
+    await scheduler.close()
+
+    requests = clients * per_client
+    return {
+        'clients': clients,
+        'requests': requests,
+        'max_batch_size': max_batch_size,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(requests / elapsed, 2),
+        'tokens_per_s': round(tokens / elapsed, 1),
+        'latency_p50_ms': round(pct(latencies, 0.5) * 1000, 1),
+        'latency_p95_ms': round(pct(latencies, 0.95) * 1000, 1),
+        'avg_batch': snap['avg_batch'],
+        'loop_lag_p95_ms': round(pct(lags, 0.95) * 1000, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--model', default='tiny', help="'tiny' (local random Llama) or a HF model id")
+    ap.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    ap.add_argument('--requests-per-client', type=int, default=4)
+    ap.add_argument('--max-batch-size', type=int, default=8)
+    ap.add_argument('--max-wait-ms', type=float, default=20)
+    ap.add_argument('--max-new-tokens', type=int, default=32)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    import torch
+    torch.manual_seed(0)
+    model, tokenizer = load_model(args.model)
+    generate_batch = make_hf_batch_generate(
+        model, tokenizer, max_new_tokens=args.max_new_tokens, do_sample=False)
+    generate_batch(PROMPTS[:1])   # warm-up
+
+    results = []
+    print(f"{'clients':>7} {'batch':>5} {'req/s':>8} {'tok/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg bs':>6} {'lag p95':>8}")
+    for clients in args.clients:
+        for max_bs in (1, args.max_batch_size):
+            r = asyncio.run(run_level(generate_batch, clients, args.requests_per_client, max_bs, args.max_wait_ms))
+            results.append(r)
+            print(f"{r['clients']:>7} {r['max_batch_size']:>5} {r['requests_per_s']:>8} {r['tokens_per_s']:>8} "
+                  f"{r['latency_p50_ms']:>8} {r['latency_p95_ms']:>8} {r['avg_batch']:>6} {r['loop_lag_p95_ms']:>8}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'max_new_tokens': args.max_new_tokens, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Call-latency benchmark for assistant/sidecar.py.
+
+Compares the old Electron path (a fresh `python -c "from main import
+AssistantAPI ..."` per call) with one warm sidecar answering the same calls
+over stdio, sequentially and with many calls in flight, and reports the
+sidecar's own startup breakdown.
+
+    python bench/sidecar_latency.py --calls 50 --method get_datetime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+class Client:
+    """Minimal stdio JSON-RPC client (same protocol as app/sidecar.js)."""
+
+    def __init__(self):
+        start = time.perf_counter()
+        self.proc = subprocess.Popen([sys.executable, '-u', '-m', 'assistant.sidecar'], cwd=ROOT,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     encoding='utf-8', bufsize=1)
+        self.ready = json.loads(self.proc.stdout.readline())
+        self.ready['startup_ms']['spawn_to_ready'] = round((time.perf_counter() - start) * 1000, 1)
+        self.pending = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            msg = json.loads(line)
+            waiter = self.pending.pop(msg.get('id'), None)
+            if waiter:
+                waiter[1] = msg
+                waiter[0].set()
+
+    def call(self, method, *params):
+        with self.lock:
+            req_id = self.next_id
+            self.next_id += 1
+            waiter = self.pending[req_id] = [threading.Event(), None]
+            self.proc.stdin.write(json.dumps({'id': req_id, 'method': method, 'params': params}) + '\n')
+        waiter[0].wait(60)
+        return waiter[1]
+
+    def close(self):
+        self.proc.stdin.write(json.dumps({'id': 0, 'method': 'shutdown'}) + '\n')
+        self.proc.wait(10)
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {'p50_ms': round(statistics.median(samples), 2),
+            'p95_ms': round(samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0], 2),
+            'mean_ms': round(statistics.mean(samples), 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--calls', type=int, default=50)
+    ap.add_argument('--spawn-calls', type=int, default=5, help='per-call interpreter runs (slow)')
+    ap.add_argument('--method', default='get_datetime')
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    results = {}
+
+    spawn = []
+    code = f'from main import AssistantAPI; print(AssistantAPI().{args.method}())'
+    for _ in range(args.spawn_calls):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, check=True)
+        spawn.append((time.perf_counter() - start) * 1000)
+    results['spawn_per_call'] = summarize(spawn)
+
+    client = Client()
+    results['sidecar_startup_ms'] = client.ready['startup_ms']
+    results['gui_loaded'] = client.ready['gui_loaded']
+
+    warm = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        client.call(args.method)
+        warm.append((time.perf_counter() - start) * 1000)
+    results['sidecar_sequential'] = summarize(warm)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client.call, args=(args.method,)) for _ in range(args.calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = (time.perf_counter() - start) * 1000
+    results['sidecar_concurrent'] = {'calls': args.calls, 'wall_ms': round(wall, 1)}
+    client.close()
+
+    for name, value in results.items():
+        print(f'{name:20s} {value}')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Local stand-in for the Colab notebook's HTTP API (/health, /chat, /chat/stream, /metrics).
+
+It replays scripted (or recorded) replies with a simulated prefill + decode
+delay, so AssistantAPI runs without a GPU. Each rule matches a regex
+against the last user message:
+
+    [{"match": "簡報", "reply": {"text": "...", "skill": "create_ppt", "args": {...}}}, ...]
+
+The first matching rule wins; a rule without "match" is the fallback. With
+--script, the rules come from a JSON file, e.g. replies captured from the
+real server. Otherwise SCRIPT below is used, which covers chat, create_ppt,
+create_docx, create_xlsx and fetch_news.
+
+The reply delay is prefill_ms plus (reply length / chars_per_token) / tps.
+--latency-scale scales it, so 0 leaves only client-side overhead. At most
+`slots` requests generate at once, like the notebook's batch limit. Replies
+carry the same server_timing block as the real server, so tracing works
+against the stub too.
+
+Faults can be injected for the backend router (assistant/router.py):
+--delay-ms adds network latency to every request, /health included;
+--stall-rate makes that fraction of chats take --stall-ms longer (tail
+latency); --fail-rate makes that fraction fail, either with a 503 or, with
+--fail-mode drop, by closing the connection (a stream is cut halfway).
+Setting stub.down = True makes every request fail until it is cleared.
+
+    python bench/stub_llm.py --port 8765 --prefill-ms 300 --tps 40
+    python bench/stub_llm.py --port 8766 --delay-ms 80 --fail-rate 0.2 --fail-mode drop
+    # or in-process:  server = StubLLM(...).start(); server.url
+"""
+import argparse
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODEL = 'stub-llm'
+
+
+def _slides(topic, n=6):
+    return [{'title': f'{topic}：重點 {i + 1}',
+             'content': '\n'.join(f'{topic}的第 {i + 1}-{j + 1} 個要點，說明其背景、現況與影響' for j in range(4))}
+            for i in range(n)]
+
+
+def _report(topic, sections=8):
+    parts = [f'# {topic}', '本報告整理現況、挑戰與建議。']
+    for i in range(sections):
+        parts.append(f'## 第 {i + 1} 節')
+        parts.extend(f'- {topic} 相關要點 {i + 1}.{j + 1}：具體數據與說明' for j in range(5))
+    return '\n'.join(parts)
+
+
+def _table(rows=40):
+    data = [['日期', '地區', '產品', '數量', '單價', '金額']]
+    for i in range(rows):
+        qty, price = 10 + i % 37, 99.5 + i % 11
+        data.append([f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}', ['北區', '中區', '南區'][i % 3],
+                     f'產品{i % 20:02d}', qty, price, round(qty * price, 2)])
+    return data
+
+
+# Default script: rules are tried in order on the last user message
+SCRIPT = [
+    {'match': r'做成簡報|製作簡報',
+     'reply': {'text': '已根據搜尋結果建立簡報', 'skill': 'create_ppt',
+               'args': {'title': 'AI新聞整理', 'theme': 'dark', 'slides_json': _slides('AI 新聞', 8)}}},
+    {'match': r'搜尋|新聞',
+     'reply': {'text': '正在搜尋最新的AI新聞...', 'skill': 'fetch_news',
+               'args': {'query': '最新的AI新聞', 'max_results': 8}}},
+    {'match': r'簡報|PPT|ppt',
+     'reply': {'text': '好的，已為你建立AI簡報', 'skill': 'create_ppt',
+               'args': {'title': '人工智慧簡介', 'theme': 'dark', 'slides_json': _slides('人工智慧')}}},
+    {'match': r'報告|文件|Word',
+     'reply': {'text': '好的，已建立環保報告', 'skill': 'create_docx',
+               'args': {'title': '環境保護報告', 'content': _report('環境保護')}}},
+    {'match': r'表格|試算表|Excel',
+     'reply': {'text': '已建立銷售表格', 'skill': 'create_xlsx',
+               'args': {'title': '銷售資料', 'data_json': _table()}}},
+    {'reply': {'text': '量子電腦利用量子位元的疊加與糾纏同時處理大量狀態。'
+                       '它在特定問題上（如因數分解、分子模擬）可望遠快於傳統電腦。'
+                       '目前仍受限於雜訊與錯誤更正，距離大規模實用還有一段路。',
+               'skill': '', 'args': {}}},
+]
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):   # a client hanging up (e.g. a cancelled hedge)
+            super().handle_error(request, client_address)
+
+
+class StubLLM:
+    """Threaded HTTP server replaying rules with simulated generation latency."""
+
+    def __init__(self, rules=None, host='127.0.0.1', port=0, prefill_ms=300.0, tps=40.0,
+                 chars_per_token=2.0, latency_scale=1.0, slots=8, chunk_chars=8,
+                 delay_ms=0.0, stall_rate=0.0, stall_ms=2000.0, fail_rate=0.0, fail_mode='503', seed=None):
+        self.rules = [dict(r, _re=re.compile(r['match'], re.I) if r.get('match') else None)
+                      for r in (rules if rules is not None else SCRIPT)]
+        self.prefill_ms = prefill_ms
+        self.tps = tps
+        self.chars_per_token = chars_per_token
+        self.latency_scale = latency_scale
+        self.chunk_chars = chunk_chars
+        self.delay_ms = delay_ms
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.fail_rate = fail_rate
+        self.fail_mode = fail_mode
+        self.down = False
+        self.random = random.Random(seed)
+        self.slots = threading.Semaphore(slots)
+        self.stats = {'requests': 0, 'streams': 0, 'busy_ms': 0.0, 'failed': 0, 'stalled': 0}
+        self._lock = threading.Lock()
+        self.httpd = _QuietServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='stub-llm', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # --- generation model ---
+    def reply_for(self, messages):
+        last = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        for rule in self.rules:
+            if rule['_re'] is None or rule['_re'].search(last):
+                return rule['reply'], rule
+        return {'text': '', 'skill': '', 'args': {}}, {}
+
+    def timing_for(self, body, rule):
+        tokens = max(1, int(len(body) / self.chars_per_token))
+        prefill = float(rule.get('prefill_ms', self.prefill_ms)) * self.latency_scale
+        decode = tokens / float(rule.get('tps', self.tps)) * 1000 * self.latency_scale
+        return tokens, prefill, decode
+
+    def fault(self):
+        """-> (fail, stall_ms) for the next chat request."""
+        with self._lock:
+            fail = self.down or self.random.random() < self.fail_rate
+            stall = not fail and self.random.random() < self.stall_rate
+            self.stats['failed'] += fail
+            self.stats['stalled'] += stall
+        return fail, (self.stall_ms if stall else 0.0)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True   # headers and body are separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chunk(self, text):
+                data = text.encode('utf-8')
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+            def _drop(self):
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR)   # the client sees a reset / truncated body
+
+            def do_GET(self):
+                if stub.delay_ms:
+                    time.sleep(stub.delay_ms / 1000)
+                if stub.down:
+                    self._drop() if stub.fail_mode == 'drop' else self._json(503, {'detail': 'down'})
+                elif self.path == '/health':
+                    self._json(200, {'status': 'ok', 'model': MODEL, 'gpu': 'none (stub)'})
+                elif self.path == '/metrics':
+                    self._json(200, dict(stub.stats))
+                else:
+                    self._json(404, {'detail': 'Not Found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if self.path not in ('/chat', '/chat/stream'):
+                    self._json(404, {'detail': 'Not Found'})
+                    return
+                start = time.perf_counter()
+                if stub.delay_ms:
+                    time.sleep(stub.delay_ms / 1000)
+                fail, stall = stub.fault()
+                if fail and (stub.down or stub.fail_mode != 'drop' or self.path == '/chat'):
+                    self._drop() if stub.fail_mode == 'drop' else self._json(503, {'detail': 'injected failure'})
+                    return
+                reply, rule = stub.reply_for(request.get('messages', []))
+                body = json.dumps(reply, ensure_ascii=False)
+                tokens, prefill, decode = stub.timing_for(body, rule)
+                stub.slots.acquire()
+                try:
+                    queue_ms = (time.perf_counter() - start) * 1000
+                    time.sleep((prefill + stall) / 1000)
+                    if self.path == '/chat':
+                        time.sleep(decode / 1000)
+                    elif not self._stream(body, decode, cut=fail):
+                        return
+                finally:
+                    stub.slots.release()
+                timing = {'queue_ms': round(queue_ms, 1), 'prefill_ms': round(prefill, 1),
+                          'decode_ms': round(decode, 1), 'parse_ms': 0.0, 'tokens': tokens,
+                          'total_ms': round((time.perf_counter() - start) * 1000, 1),
+                          'trace_id': self.headers.get('X-Trace-Id', '')}
+                with stub._lock:
+                    stub.stats['requests'] += 1
+                    stub.stats['streams'] += self.path != '/chat'
+                    stub.stats['busy_ms'] += prefill + decode
+                out = dict(reply, server_timing=timing)
+                if self.path == '/chat':
+                    self._json(200, out)
+                else:
+                    self._chunk(f'event: done\ndata: {json.dumps(out, ensure_ascii=False)}\n\n')
+                    self.wfile.write(b'0\r\n\r\n')
+
+            def _stream(self, body, decode_ms, cut=False):
+                """Send the deltas; with cut, drop the connection halfway and return False."""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                pieces = [body[i:i + stub.chunk_chars] for i in range(0, len(body), stub.chunk_chars)]
+                pause = decode_ms / 1000 / max(len(pieces), 1)
+                for i, piece in enumerate(pieces):
+                    if cut and i == len(pieces) // 2:
+                        self._drop()
+                        return False
+                    if pause:
+                        time.sleep(pause)
+                    self._chunk(f'event: delta\ndata: {json.dumps({"delta": piece}, ensure_ascii=False)}\n\n')
+                return True
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--script', help='JSON file with [{"match", "reply"}, ...] rules')
+    ap.add_argument('--prefill-ms', type=float, default=300.0)
+    ap.add_argument('--tps', type=float, default=40.0, help='simulated decode tokens per second')
+    ap.add_argument('--latency-scale', type=float, default=1.0)
+    ap.add_argument('--slots', type=int, default=8, help='requests generating at once')
+    ap.add_argument('--delay-ms', type=float, default=0.0, help='added network latency, /health included')
+    ap.add_argument('--stall-rate', type=float, default=0.0, help='fraction of chats delayed by --stall-ms')
+    ap.add_argument('--stall-ms', type=float, default=2000.0)
+    ap.add_argument('--fail-rate', type=float, default=0.0, help='fraction of chats that fail')
+    ap.add_argument('--fail-mode', choices=['503', 'drop'], default='503')
+    ap.add_argument('--seed', type=int)
+    args = ap.parse_args()
+
+    rules = None
+    if args.script:
+        with open(args.script, encoding='utf-8') as f:
+            rules = json.load(f)
+    stub = StubLLM(rules, args.host, args.port, args.prefill_ms, args.tps,
+                   latency_scale=args.latency_scale, slots=args.slots, delay_ms=args.delay_ms,
+                   stall_rate=args.stall_rate, stall_ms=args.stall_ms, fail_rate=args.fail_rate,
+                   fail_mode=args.fail_mode, seed=args.seed)
+    print(f'stub LLM on {stub.url} ({len(stub.rules)} rules); Ctrl+C to stop')
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
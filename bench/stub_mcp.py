@@ -0,0 +1,194 @@
+"""
+Stub MCP server for tests and bench/mcp_host.py.
+
+It speaks MCP JSON-RPC over stdio (one message per line, the default) or,
+with --http PORT, over streamable HTTP (POST /mcp, JSON replies, an
+Mcp-Session-Id header). Every tools/call runs on its own thread, so
+concurrent calls over one connection overlap and replies can arrive out of
+order. Tools:
+
+- echo(text):        returns the text;
+- add(a, b):         returns a + b;
+- sleep(ms):         waits ms milliseconds, then returns 'slept <ms>';
+- fail(message):     returns an isError result;
+- crash():           exits the process without replying (stdio only);
+- add_tool(name):    adds an echo-like tool and sends notifications/tools/list_changed (stdio only).
+
+--delay-ms adds latency to every reply; --startup-ms delays the first read,
+like a server that loads something before it is ready.
+
+    python bench/stub_mcp.py                  # stdio, e.g. "command": "python", "args": ["bench/stub_mcp.py"]
+    python bench/stub_mcp.py --http 8790      # "url": "http://127.0.0.1:8790/mcp"
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOOLS = [
+    {'name': 'echo', 'description': 'Echo the text back',
+     'inputSchema': {'type': 'object', 'properties': {'text': {'type': 'string', 'description': 'text to echo'}},
+                     'required': ['text']}},
+    {'name': 'add', 'description': 'Add two numbers',
+     'inputSchema': {'type': 'object', 'properties': {'a': {'type': 'number'}, 'b': {'type': 'number'}},
+                     'required': ['a', 'b']}},
+    {'name': 'sleep', 'description': 'Wait, then reply',
+     'inputSchema': {'type': 'object', 'properties': {'ms': {'type': 'integer', 'description': 'milliseconds'}}}},
+    {'name': 'fail', 'description': 'Always fails',
+     'inputSchema': {'type': 'object', 'properties': {'message': {'type': 'string'}}}},
+    {'name': 'crash', 'description': 'Exit the server', 'inputSchema': {'type': 'object', 'properties': {}}},
+    {'name': 'add_tool', 'description': 'Register another tool',
+     'inputSchema': {'type': 'object', 'properties': {'name': {'type': 'string'}}, 'required': ['name']}},
+]
+
+
+class StubMCP:
+    """Protocol handling shared by both transports; send(message) writes one message."""
+
+    def __init__(self, send, delay_ms=0.0):
+        self.send = send
+        self.delay_ms = delay_ms
+        self.tools = list(TOOLS)
+        self.added = set()   # tools from add_tool; they behave like echo
+
+    def handle(self, message):
+        """-> reply dict, or None for notifications and replies to our own requests."""
+        if 'method' not in message or 'id' not in message:
+            return None
+        method, params = message['method'], message.get('params') or {}
+        if method == 'initialize':
+            result = {'protocolVersion': params.get('protocolVersion', '2025-03-26'),
+                      'capabilities': {'tools': {'listChanged': True}},
+                      'serverInfo': {'name': 'stub-mcp', 'version': '1.0'}}
+        elif method == 'ping':
+            result = {}
+        elif method == 'tools/list':
+            result = {'tools': self.tools}
+        elif method == 'tools/call':
+            try:
+                result = self.call(params.get('name'), params.get('arguments') or {})
+            except KeyError as e:
+                return {'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': -32602, 'message': f'Unknown tool: {e}'}}
+        else:
+            return {'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': -32601, 'message': f'Method not found: {method}'}}
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        return {'jsonrpc': '2.0', 'id': message['id'], 'result': result}
+
+    def call(self, name, args):
+        text = lambda s: {'content': [{'type': 'text', 'text': str(s)}]}  # noqa: E731
+        if name == 'echo' or name in self.added:
+            return text(args.get('text', ''))
+        if name == 'add':
+            return text(args['a'] + args['b'])
+        if name == 'sleep':
+            time.sleep(float(args.get('ms', 100)) / 1000)
+            return text(f"slept {args.get('ms', 100)}")
+        if name == 'fail':
+            return {**text(args.get('message', 'failed')), 'isError': True}
+        if name == 'crash':
+            os._exit(3)
+        if name == 'add_tool':
+            self.added.add(args['name'])
+            self.tools.append({'name': args['name'], 'description': 'Added at runtime',
+                               'inputSchema': TOOLS[0]['inputSchema']})
+            self.send({'jsonrpc': '2.0', 'method': 'notifications/tools/list_changed'})
+            return text(f"added {args['name']}")
+        raise KeyError(name)
+
+
+def serve_stdio(delay_ms=0.0, startup_ms=0.0):
+    lock = threading.Lock()
+    out = sys.stdout.buffer
+
+    def send(message):
+        with lock:
+            out.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+            out.flush()
+
+    def run(message):
+        reply = stub.handle(message)
+        if reply is not None:
+            send(reply)
+
+    stub = StubMCP(send, delay_ms)
+    time.sleep(startup_ms / 1000)
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        if message.get('method') == 'tools/call':
+            threading.Thread(target=run, args=(message,), daemon=True).start()
+        else:
+            run(message)   # initialize / tools/list in order
+
+
+def serve_http(port, host='127.0.0.1', delay_ms=0.0):
+    sessions = {}   # Mcp-Session-Id -> StubMCP
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'   # keep-alive
+        disable_nagle_algorithm = True   # headers and body go out as separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body=None, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else b''
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            if body is not None:
+                self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            message = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            session = self.headers.get('Mcp-Session-Id')
+            headers = {}
+            if message.get('method') == 'initialize':
+                session = uuid.uuid4().hex
+                sessions[session] = StubMCP(lambda m: None, delay_ms)
+                headers['Mcp-Session-Id'] = session
+            elif session not in sessions:
+                return self._reply(404, {'jsonrpc': '2.0', 'error': {'code': -32001, 'message': 'Session not found'}})
+            reply = sessions[session].handle(message)
+            if reply is None:
+                return self._reply(202)
+            self._reply(200, reply, headers)
+
+        def do_DELETE(self):
+            sessions.pop(self.headers.get('Mcp-Session-Id'), None)
+            self._reply(200)
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    print(f'stub MCP on http://{host}:{httpd.server_address[1]}/mcp; Ctrl+C to stop', file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        httpd.shutdown()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--http', type=int, metavar='PORT', help='serve streamable HTTP instead of stdio')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--delay-ms', type=float, default=0.0, help='added latency per reply')
+    ap.add_argument('--startup-ms', type=float, default=0.0, help='delay before reading the first message')
+    args = ap.parse_args()
+    if args.http is not None:
+        time.sleep(args.startup_ms / 1000)
+        serve_http(args.http, args.host, args.delay_ms)
+    else:
+        serve_stdio(args.delay_ms, args.startup_ms)
+
+
+if __name__ == '__main__':
+    main()
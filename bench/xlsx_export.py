@@ -0,0 +1,139 @@
+"""
+Memory and wall-time benchmark for assistant/xlsx_export.py.
+
+Writes the same generated table (id, name, amount, qty, date, note) to .xlsx
+at each row count with:
+
+- legacy:       the previous create_xlsx (one JSON string -> json.loads ->
+                regular Workbook, every cell kept in memory until save)
+- stream-json:  export_rows() fed the same JSON string
+- stream-csv:   export_rows() streaming a CSV file
+- stream-ndjson: export_rows() streaming an NDJSON file
+
+Each run happens in its own child process so peak RSS (ru_maxrss) belongs to
+that run alone.
+
+    python bench/xlsx_export.py --rows 10000 100000 1000000 --legacy-max 100000
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+MODES = ('legacy', 'stream-json', 'stream-csv', 'stream-ndjson')
+HEADER = ['id', 'name', 'amount', 'qty', 'date', 'note']
+
+
+def sample_row(i):
+    day = datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 365)
+    return [i, f'產品 {i % 1000:03d}', round(i * 1.37 % 10000, 2), i % 97,
+            day.isoformat(), 'ok' if i % 3 else '需追蹤']
+
+
+def write_inputs(directory, n):
+    """Generate the table as .json, .csv and .ndjson; returns {ext: path}."""
+    paths = {ext: os.path.join(directory, f'rows_{n}.{ext}') for ext in ('json', 'csv', 'ndjson')}
+    with open(paths['csv'], 'w', newline='', encoding='utf-8') as f_csv, \
+            open(paths['ndjson'], 'w', encoding='utf-8') as f_nd, \
+            open(paths['json'], 'w', encoding='utf-8') as f_json:
+        w = csv.writer(f_csv)
+        w.writerow(HEADER)
+        f_nd.write(json.dumps(HEADER, ensure_ascii=False) + '\n')
+        f_json.write('[' + json.dumps(HEADER, ensure_ascii=False))
+        for i in range(n):
+            row = sample_row(i)
+            w.writerow(row)
+            line = json.dumps(row, ensure_ascii=False)
+            f_nd.write(line + '\n')
+            f_json.write(',' + line)
+        f_json.write(']')
+    return paths
+
+
+def peak_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024   # bytes on macOS, KiB elsewhere
+
+
+def legacy_export(path, data_json, title):
+    from openpyxl import Workbook
+    data = json.loads(data_json)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+    for row in data:
+        ws.append(row)
+    wb.save(path)
+
+
+def child(mode, inputs, out):
+    """Run one export in this process and print {'wall_ms', 'peak_rss_mb', ...}."""
+    from assistant.xlsx_export import export_rows
+    import openpyxl  # noqa: F401  (import cost is not part of the export)
+
+    inputs = json.loads(inputs)
+    if mode in ('legacy', 'stream-json'):
+        with open(inputs['json'], encoding='utf-8') as f:
+            source = f.read()   # what create_xlsx receives over the JS bridge
+    else:
+        source = inputs[mode.split('-')[1]]
+    base_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        legacy_export(out, source, 'bench')
+    else:
+        export_rows(out, source, title='bench')
+    wall = (time.perf_counter() - start) * 1000
+    print(json.dumps({'wall_ms': round(wall, 1), 'peak_rss_mb': round(peak_rss_mb(), 1),
+                      'base_rss_mb': round(base_rss, 1), 'file_mb': round(os.path.getsize(out) / 2**20, 2)}))
+
+
+def run(mode, inputs, out):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, json.dumps(inputs), out],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode:
+        raise SystemExit(f'{mode} failed:\n{proc.stderr}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        return child(*sys.argv[2:5])
+
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    ap.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    ap.add_argument('--legacy-max', type=int, default=100_000,
+                    help='skip the legacy writer above this many rows (it keeps every cell in memory)')
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args()
+
+    results = []
+    print(f'{"rows":>9s} {"mode":14s} {"wall ms":>10s} {"peak RSS MB":>12s} {"file MB":>8s}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.rows:
+            inputs = write_inputs(tmp, n)
+            for mode in args.modes:
+                if mode == 'legacy' and n > args.legacy_max:
+                    continue
+                row = dict(rows=n, mode=mode, **run(mode, inputs, os.path.join(tmp, f'{mode}_{n}.xlsx')))
+                results.append(row)
+                print(f'{n:9,d} {mode:14s} {row["wall_ms"]:10.1f} {row["peak_rss_mb"]:12.1f} {row["file_mb"]:8.2f}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,608 @@
+"""
+Grammar-constrained JSON decoding for the /chat reply format.
+
+The model must answer {"text": ..., "skill": ..., "args": {...}}. Asking for
+that in the prompt is not enough: replies drift into prose or ```json
+fences, or run past the closing brace. Instead, a logits processor masks
+every token that could not continue a valid reply, so the decoded text is
+always JSON of exactly this shape:
+
+- the keys are "text", "skill" and "args", in that order;
+- "skill" is "" or the name of one of the submitted skills;
+- "args" takes that skill's params as keys. 'string' / 'number' / 'a|b|c'
+  specs constrain the value type; anything else (e.g. slides_json) accepts
+  any JSON value;
+- nothing but EOS may follow the closing brace.
+
+The grammar is a byte-level pushdown automaton, so it works with any
+tokenizer whose tokens map to bytes (byte-level BPE such as Qwen, or
+sentencepiece). The allowed-token set for a parser state is found by
+walking the byte-sorted vocabulary and skipping every token that shares a
+rejected prefix. Inside a free string, tokens without quote, backslash or
+control bytes are always allowed and are not walked. Results are memoised
+per state, so a long string or a repeated slide object costs one walk.
+
+    vocab = TokenVocabulary(tokenizer)              # once per tokenizer
+    grammar = grammar_for(skills)                   # compiled once per skills hash
+    processor = JSONLogitsProcessor([grammar], vocab)
+    out = model.generate(..., logits_processor=LogitsProcessorList([processor]))
+    text += grammar.completion(text)                # closes a reply cut off by max_new_tokens
+
+Everything but JSONLogitsProcessor.__call__ is plain Python. That method
+runs on CPU with the tiny model from bench/scheduler_throughput.py (see
+bench/json_decoding.py).
+"""
+import json
+import re
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from prefix_cache import skills_key
+
+MAX_WHITESPACE = 16     # consecutive whitespace bytes between JSON tokens
+MAX_NUMBER = 24         # bytes in one number literal
+MASK_CACHE = 4096       # parser states whose allowed tokens are memoised
+GRAMMAR_CACHE = 16      # compiled skills lists
+
+# Node kinds
+STRING, NUMBER, ANY, OBJECT, DICT, ARRAY, SWITCH = 'string', 'number', 'any', 'object', 'dict', 'array', 'switch'
+
+_WS = frozenset(b' \t\n\r')
+_HEX = frozenset(b'0123456789abcdefABCDEF')
+_ESCAPES = frozenset(b'"\\/bfnrt')
+_DIGITS = frozenset(b'0123456789')
+_QUOTE, _BACKSLASH, _COLON, _COMMA = ord('"'), ord('\\'), ord(':'), ord(',')
+_LBRACE, _RBRACE, _LBRACKET, _RBRACKET = ord('{'), ord('}'), ord('['), ord(']')
+_LITERALS = {ord('t'): b'rue', ord('f'): b'alse', ord('n'): b'ull'}
+_STRUCTURAL = frozenset(('val', 'rec', 'dict', 'arr', 'num'))   # frames where whitespace is insignificant
+_NUM_ACCEPT = frozenset((1, 2, 4, 7))
+_STR = ('str',)   # inside a free string; shared so the state stays equal while text is generated
+_DONE = ()
+
+
+class Node:
+    """One schema element. Compared by identity, so parser states hash cheaply."""
+
+    __slots__ = ('kind', 'options', 'props', 'capture', 'keys', 'values', 'default', 'item', 'cases')
+
+    def __init__(self, kind, options=None, props=(), capture=None, keys=None, values=None,
+                 default=None, item=None, cases=None):
+        self.kind = kind
+        self.options = options      # STRING: allowed raw values (bytes), None = any string
+        self.props = props          # OBJECT: ((b'"key"', node), ...), all required, in order
+        self.capture = capture      # OBJECT: index of the prop whose value selects a SWITCH
+        self.keys = keys            # DICT: allowed keys (Node STRING), None = any key
+        self.values = values or {}  # DICT: key -> value node
+        self.default = default      # DICT: node for other keys; SWITCH: node for unknown cases
+        self.item = item            # ARRAY: item node
+        self.cases = cases or {}    # SWITCH: captured value -> node
+
+    def value_for(self, key):
+        return self.values.get(key, self.default)
+
+    def pick(self, captured):
+        return self.cases.get(captured, self.default)
+
+
+ANY_VALUE = Node(ANY)
+ANY_OBJECT = Node(DICT, default=ANY_VALUE)
+ANY_ARRAY = Node(ARRAY, item=ANY_VALUE)
+FREE_STRING = Node(STRING)
+NO_ARGS = Node(DICT, keys=Node(STRING, options=()))
+
+
+def _raw(value):
+    """JSON string contents of value, as bytes (no quotes)."""
+    return json.dumps(str(value), ensure_ascii=False)[1:-1].encode('utf-8')
+
+
+def param_node(spec):
+    """Schema node for one app.js param spec ('string', 'number(預設5)', 'name|mtime', '[{...}]')."""
+    base = str(spec).split('(')[0].strip()
+    if base.startswith('string'):
+        return FREE_STRING
+    if base.startswith(('number', 'integer', 'int')):
+        return Node(NUMBER)
+    if re.fullmatch(r'[\w-]+(\|[\w-]+)+', base):
+        return Node(STRING, options=tuple(_raw(v) for v in base.split('|')))
+    return ANY_VALUE
+
+
+def compile_grammar(skills):
+    """Reply grammar for a skills list as sent by the desktop app."""
+    cases = {'': NO_ARGS}
+    for skill in skills or []:
+        name = skill.get('name')
+        if not name:
+            continue
+        params = skill.get('params')
+        if not isinstance(params, dict):
+            cases[name] = ANY_OBJECT
+            continue
+        keys = Node(STRING, options=tuple(_raw(k) for k in params))
+        cases[name] = Node(DICT, keys=keys, values={k: param_node(v) for k, v in params.items()},
+                           default=ANY_VALUE)
+    skill_node = Node(STRING, options=tuple(_raw(name) for name in cases))
+    root = Node(OBJECT, capture=1, props=(
+        (b'"text"', FREE_STRING),
+        (b'"skill"', skill_node),
+        (b'"args"', Node(SWITCH, cases=cases, default=ANY_OBJECT)),
+    ))
+    return JSONGrammar(root)
+
+
+_grammars = OrderedDict()
+
+
+def grammar_for(skills):
+    """compile_grammar, cached on the skills hash (the same key as the prefix KV cache)."""
+    key = skills_key(skills)
+    grammar = _grammars.get(key)
+    if grammar is None:
+        grammar = _grammars[key] = compile_grammar(skills)
+        while len(_grammars) > GRAMMAR_CACHE:
+            _grammars.popitem(last=False)
+    _grammars.move_to_end(key)
+    return grammar
+
+
+class JSONGrammar:
+    """Byte-level pushdown automaton for one schema.
+
+    A state is (stack, whitespace_run); stack is a linked list of frame
+    tuples, () once the document is complete. advance() returns the next
+    state, or None if the byte cannot continue a valid document.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.initial = ((('val', root), _DONE), 0)
+        self.stats = {'walks': 0, 'cache_hits': 0}
+        self._allowed = {}   # vocab -> OrderedDict(state -> (in_free_string, token ids))
+
+    # --- bytes ---
+    def advance(self, state, b):
+        stack, ws = state
+        if not stack:
+            return None
+        structural = b in _WS and stack[0][0] in _STRUCTURAL
+        if structural and ws >= MAX_WHITESPACE:
+            return None
+        stack = self._step(stack, b)
+        if stack is None:
+            return None
+        return stack, ws + 1 if structural else 0
+
+    def feed(self, state, data):
+        for b in data:
+            state = self.advance(state, b)
+            if state is None:
+                return None
+        return state
+
+    @staticmethod
+    def is_done(state):
+        return state is not None and not state[0]
+
+    def completion(self, text):
+        """Shortest suffix that turns text (a possibly truncated reply) into a valid document.
+
+        Returns '' if text is complete, or if it already broke the grammar (the
+        caller's parser then decides)."""
+        state = self.feed(self.initial, text.encode('utf-8'))
+        if state is None or not state[0]:
+            return ''
+        return self._close(state[0]).decode('utf-8')
+
+    def _step(self, stack, b):
+        frame, parent = stack
+        kind = frame[0]
+        if kind == 'str':
+            if b == _QUOTE:
+                return self._done(parent, None)
+            if b == _BACKSLASH:
+                return ('esc',), parent
+            return None if b < 0x20 else stack
+        if kind == 'esc':
+            if b in _ESCAPES:
+                return _STR, parent
+            return (('hex', 4), parent) if b == ord('u') else None
+        if kind == 'hex':
+            if b not in _HEX:
+                return None
+            return (_STR, parent) if frame[1] == 1 else (('hex', frame[1] - 1), parent)
+        if kind == 'enum':
+            options, buf = frame[1].options, frame[2]
+            if b == _QUOTE:
+                return self._done(parent, buf.decode('utf-8')) if buf in options else None
+            buf += bytes((b,))
+            return (('enum', frame[1], buf), parent) if any(o.startswith(buf) for o in options) else None
+        if kind == 'lit':
+            rest = frame[1]
+            if b != rest[0]:
+                return None
+            return self._done(parent, None) if len(rest) == 1 else (('lit', rest[1:]), parent)
+        if kind == 'num':
+            phase = _number_next(frame[1], b)
+            if phase is not None:
+                return (('num', phase, frame[2] + 1), parent) if frame[2] < MAX_NUMBER else None
+            if frame[1] not in _NUM_ACCEPT:
+                return None
+            parent = self._done(parent, None)   # the number ended; b belongs to the parent
+            return self._step(parent, b) if parent else None
+        if b in _WS:
+            return stack
+        if kind == 'val':
+            return self._start(frame[1], b, parent)
+        if kind == 'rec':
+            return self._record(frame, parent, b)
+        if kind == 'dict':
+            return self._dict(frame, parent, b)
+        return self._array(frame, parent, b)
+
+    def _start(self, node, b, parent):
+        kind = node.kind
+        if kind == STRING:
+            if b != _QUOTE:
+                return None
+            return (_STR if node.options is None else ('enum', node, b'')), parent
+        if kind == NUMBER:
+            return _number_start(b, parent)
+        if kind == OBJECT:
+            return (('rec', node, 0, 'key', None), parent) if b == _LBRACE else None
+        if kind == DICT:
+            return (('dict', node, 'first', None), parent) if b == _LBRACE else None
+        if kind == ARRAY:
+            return (('arr', node, 'first'), parent) if b == _LBRACKET else None
+        # ANY
+        if b == _QUOTE:
+            return _STR, parent
+        if b == _LBRACE:
+            return ('dict', ANY_OBJECT, 'first', None), parent
+        if b == _LBRACKET:
+            return ('arr', ANY_ARRAY, 'first'), parent
+        if b in _LITERALS:
+            return ('lit', _LITERALS[b]), parent
+        return _number_start(b, parent)
+
+    def _record(self, frame, parent, b):
+        _, node, i, phase, captured = frame
+        if phase == 'key':
+            if b != _QUOTE:
+                return None
+            return ('lit', node.props[i][0][1:]), (('rec', node, i, 'colon', captured), parent)
+        if phase == 'colon':
+            if b != _COLON:
+                return None
+            child = node.props[i][1]
+            if child.kind == SWITCH:
+                child = child.pick(captured)
+            return ('val', child), (('rec', node, i, 'after', captured), parent)
+        if i + 1 < len(node.props):
+            return (('rec', node, i + 1, 'key', captured), parent) if b == _COMMA else None
+        return self._done(parent, None) if b == _RBRACE else None
+
+    def _dict(self, frame, parent, b):
+        _, node, phase, key = frame
+        if phase in ('first', 'key'):
+            if b == _RBRACE and phase == 'first':
+                return self._done(parent, None)
+            if b != _QUOTE:
+                return None
+            if node.keys is None:
+                key_frame = _STR
+            elif not node.keys.options:
+                return None
+            else:
+                key_frame = ('enum', node.keys, b'')
+            return key_frame, (('dict', node, 'colon', None), parent)
+        if phase == 'colon':
+            if b != _COLON:
+                return None
+            return ('val', node.value_for(key)), (('dict', node, 'after', None), parent)
+        if b == _COMMA:
+            return ('dict', node, 'key', None), parent
+        return self._done(parent, None) if b == _RBRACE else None
+
+    def _array(self, frame, parent, b):
+        _, node, phase = frame
+        if b == _RBRACKET and phase != 'item':
+            return self._done(parent, None)
+        if phase == 'after':
+            return (('arr', node, 'item'), parent) if b == _COMMA else None
+        return self._start(node.item, b, (('arr', node, 'after'), parent))
+
+    @staticmethod
+    def _done(stack, value):
+        """A child value finished; hand its value (enum strings only) to the enclosing frame."""
+        if not stack or value is None:
+            return stack
+        frame, parent = stack
+        if frame[0] == 'rec' and frame[1].capture == frame[2]:
+            return (frame[:4] + (value,)), parent
+        if frame[0] == 'dict' and frame[2] == 'colon':
+            return (frame[:3] + (value,)), parent
+        return stack
+
+    # --- closing a truncated reply ---
+    def _close(self, stack):
+        out = []
+        closed = None   # value of an enum string finished here (a dict key, or the skill)
+        while stack:
+            frame, stack = stack
+            kind = frame[0]
+            if kind == 'str':
+                out.append(b'"')
+            elif kind == 'esc':
+                out.append(b'n"')
+            elif kind == 'hex':
+                out.append(b'0' * frame[1] + b'"')
+            elif kind == 'enum':
+                option = next(o for o in frame[1].options if o.startswith(frame[2]))
+                out.append(option[len(frame[2]):] + b'"')
+                closed = option.decode('utf-8')
+                continue
+            elif kind == 'lit':
+                out.append(frame[1])
+            elif kind == 'num':
+                out.append(b'' if frame[1] in _NUM_ACCEPT else b'0')
+            elif kind == 'val':
+                out.append(self._default(frame[1]))
+            elif kind == 'rec':
+                _, node, i, phase, captured = frame
+                if captured is None and node.capture == i:
+                    captured = closed
+                if phase == 'colon':
+                    out.append(b':' + self._default(node.props[i][1], captured))
+                elif phase == 'key':
+                    out.append(node.props[i][0] + b':' + self._default(node.props[i][1], captured))
+                out.extend(b',' + k + b':' + self._default(n, captured) for k, n in node.props[i + 1:])
+                out.append(b'}')
+            elif kind == 'dict':
+                _, node, phase, key = frame
+                if phase == 'colon':
+                    out.append(b':' + self._default(node.value_for(key if key is not None else closed)))
+                elif phase == 'key':
+                    name = node.keys.options[0] if node.keys is not None else b'_'
+                    out.append(b'"' + name + b'":' + self._default(node.value_for(name.decode('utf-8'))))
+                out.append(b'}')
+            else:
+                out.append((self._default(frame[1].item) if frame[2] == 'item' else b'') + b']')
+            closed = None
+        return b''.join(out)
+
+    def _default(self, node, captured=None):
+        kind = node.kind
+        if kind == STRING:
+            return b'""' if node.options is None else b'"' + node.options[0] + b'"'
+        if kind == NUMBER:
+            return b'0'
+        if kind == DICT:
+            return b'{}'
+        if kind == ARRAY:
+            return b'[]'
+        if kind == SWITCH:
+            return self._default(node.pick(captured))
+        if kind == OBJECT:
+            return b'{' + b','.join(k + b':' + self._default(n, captured) for k, n in node.props) + b'}'
+        return b'null'
+
+    # --- tokens ---
+    def allowed(self, state, vocab):
+        """-> (in_free_string, token ids). When in_free_string is true, every plain
+        token (vocab.plain_ids) is allowed too and is not listed."""
+        cache = self._allowed.get(vocab)
+        if cache is None:
+            cache = self._allowed[vocab] = OrderedDict()
+        hit = cache.get(state)
+        if hit is not None:
+            cache.move_to_end(state)
+            self.stats['cache_hits'] += 1
+            return hit
+        free = state[0][0] is _STR
+        entries, keys = (vocab.special, vocab.special_keys) if free else (vocab.entries, vocab.keys)
+        hit = cache[state] = (free, self._walk(state, entries, keys))
+        self.stats['walks'] += 1
+        while len(cache) > MASK_CACHE:
+            cache.popitem(last=False)
+        return hit
+
+    def _walk(self, state, entries, keys):
+        """Ids of the tokens in entries (sorted by bytes) that keep state valid."""
+        advance = self.advance
+        ids = []
+        states = [state]   # states[k]: state after the first k bytes of prev
+        prev = b''
+        i, n = 0, len(entries)
+        while i < n:
+            piece, token_id = entries[i]
+            k, limit = 0, min(len(prev), len(piece), len(states) - 1)
+            while k < limit and prev[k] == piece[k]:
+                k += 1
+            del states[k + 1:]
+            st = states[k]
+            for j in range(k, len(piece)):
+                st = advance(st, piece[j])
+                if st is None:
+                    upper = _successor(piece[:j + 1])   # skip every token with this prefix
+                    i = n if upper is None else bisect_left(keys, upper, i + 1)
+                    break
+                states.append(st)
+            else:
+                ids.append(token_id)
+                i += 1
+            prev = piece
+        return ids
+
+
+def _number_start(b, parent):
+    if b == ord('-'):
+        return ('num', 0, 1), parent
+    if b == ord('0'):
+        return ('num', 1, 1), parent
+    return (('num', 2, 1), parent) if b in _DIGITS else None
+
+
+def _number_next(phase, b):
+    """JSON number: -? (0 | [1-9][0-9]*) (. [0-9]+)? ([eE] [+-]? [0-9]+)?  Phases 1, 2, 4, 7 accept."""
+    digit = b in _DIGITS
+    if phase == 0:
+        return (1 if b == ord('0') else 2) if digit else None
+    if phase in (1, 2, 4) and b in b'eE':
+        return 5
+    if phase in (1, 2) and b == ord('.'):
+        return 3
+    if phase in (2, 3, 4):
+        return (2 if phase == 2 else 4) if digit else None
+    if phase == 5 and b in b'+-':
+        return 6
+    if phase in (5, 6, 7):
+        return 7 if digit else None
+    return None
+
+
+def _successor(prefix):
+    """Smallest byte string sorting after every string that starts with prefix."""
+    p = bytearray(prefix)
+    while p and p[-1] == 0xFF:
+        p.pop()
+    if not p:
+        return None
+    p[-1] += 1
+    return bytes(p)
+
+
+def _bytes_to_unicode():
+    """GPT-2 byte-level BPE alphabet: byte -> printable character."""
+    bs = list(range(ord('!'), ord('~') + 1)) + list(range(ord('¡'), ord('¬') + 1)) + list(range(ord('®'), ord('ÿ') + 1))
+    cs = bs[:]
+    n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b)
+            cs.append(256 + n)
+            n += 1
+    return dict(zip(bs, map(chr, cs)))
+
+
+def is_byte_level(tokenizer, vocab):
+    """True for byte-level BPE (GPT-2, Qwen), whose tokens spell bytes in the
+    _bytes_to_unicode alphabet. sentencepiece vocabularies mark spaces with
+    '▁' and hold real text, Latin-1 letters included."""
+    if getattr(tokenizer, 'byte_decoder', None) is not None:   # slow GPT-2 style tokenizers
+        return True
+    return any('Ġ' in t for t in vocab) and not any('▁' in t for t in vocab)
+
+
+def token_bytes(tokenizer):
+    """{token id: bytes} for every regular token; special and added tokens are left out."""
+    byte_of = {c: b for b, c in _bytes_to_unicode().items()}
+    special = set(tokenizer.all_special_ids) | set(getattr(tokenizer, 'added_tokens_decoder', None) or ())
+    vocab = tokenizer.get_vocab()
+    byte_level = is_byte_level(tokenizer, vocab)
+    out = {}
+    for token, token_id in vocab.items():
+        if token_id in special:
+            continue
+        if byte_level and all(c in byte_of for c in token):
+            out[token_id] = bytes(byte_of[c] for c in token)
+        elif len(token) == 6 and token.startswith('<0x') and token.endswith('>'):   # sentencepiece byte fallback
+            out[token_id] = bytes((int(token[3:5], 16),))
+        else:
+            out[token_id] = token.replace('▁', ' ').encode('utf-8')
+    return out
+
+
+class TokenVocabulary:
+    """A tokenizer's tokens as bytes, sorted for prefix walks, plus cached mask tensors."""
+
+    def __init__(self, tokenizer, eos_ids=None):
+        self.pieces = pieces = token_bytes(tokenizer)
+        self.entries = sorted((piece, i) for i, piece in pieces.items() if piece)
+        self.keys = [piece for piece, _ in self.entries]
+        special = [(p, i) for p, i in self.entries if b'"' in p or b'\\' in p or min(p) < 0x20]
+        self.special = special
+        self.special_keys = [p for p, _ in special]
+        special_ids = {i for _, i in special}
+        self.plain_ids = [i for _, i in self.entries if i not in special_ids]
+        if eos_ids is None:
+            eos_ids = tokenizer.eos_token_id
+        self.eos_ids = [eos_ids] if isinstance(eos_ids, int) else list(eos_ids or ())
+        self._masks = {}
+        self._index = OrderedDict()   # id(ids list) -> (ids, tensor)
+
+    def index(self, ids, device):
+        """Index tensor for an allowed-ids list from JSONGrammar.allowed (cached per list)."""
+        key = (id(ids), str(device))
+        hit = self._index.get(key)
+        if hit is None or hit[0] is not ids:
+            import torch
+            hit = self._index[key] = (ids, torch.tensor(ids, device=device))
+            while len(self._index) > MASK_CACHE:
+                self._index.popitem(last=False)
+        return hit[1]
+
+    def blocked(self, kind, width, device):
+        """Bool tensor, True = blocked: 'all', 'plain' (all but the plain tokens) or 'eos' (all but EOS)."""
+        key = (kind, width, str(device))
+        mask = self._masks.get(key)
+        if mask is None:
+            import torch
+            mask = torch.ones(width, dtype=torch.bool, device=device)
+            ids = {'all': [], 'plain': self.plain_ids, 'eos': self.eos_ids}[kind]
+            ids = [i for i in ids if i < width]
+            if ids:
+                mask[torch.tensor(ids, device=device)] = False
+            self._masks[key] = mask
+        return mask
+
+
+class JSONLogitsProcessor:
+    """transformers logits processor; grammars[row] constrains batch row `row`.
+
+    The prompt length is taken from the first call, so it works with padded
+    batches and with past_key_values (prefix cache) alike. A row whose
+    sampled token somehow breaks its grammar (e.g. a special token) is left
+    unconstrained from then on, rather than masking everything.
+    """
+
+    def __init__(self, grammars, vocab):
+        self.grammars = list(grammars)
+        self.vocab = vocab
+        self.states = [g.initial for g in self.grammars]
+        self.start = None     # prompt length, set on the first call
+        self.fed = 0          # generated tokens already fed to the grammars
+        self.elapsed_ms = 0.0
+
+    def __call__(self, input_ids, scores):
+        t0 = time.perf_counter()
+        if self.start is None:
+            self.start = input_ids.shape[1]
+        new = input_ids[:, self.start + self.fed:].tolist()
+        self.fed = input_ids.shape[1] - self.start
+        width = scores.shape[-1]
+        for row, grammar in enumerate(self.grammars):
+            state = self.states[row]
+            for token_id in new[row]:
+                if state is None or not state[0]:
+                    break
+                piece = self.vocab.pieces.get(token_id)
+                state = grammar.feed(state, piece) if piece is not None else None
+            self.states[row] = state
+            if state is None:
+                continue
+            if not state[0]:
+                blocked = self.vocab.blocked('eos', width, scores.device)
+            else:
+                free, ids = grammar.allowed(state, self.vocab)
+                if not ids and not free:
+                    self.states[row] = None
+                    continue
+                blocked = self.vocab.blocked('plain' if free else 'all', width, scores.device)
+                if ids:
+                    blocked = blocked.clone()
+                    blocked[self.vocab.index(ids, scores.device)] = False
+            scores[row].masked_fill_(blocked, float('-inf'))
+        self.elapsed_ms += (time.perf_counter() - t0) * 1000
+        return scores
@@ -0,0 +1,203 @@
+"""
+Prefix KV-cache reuse for the Colab AI server.
+
+Every /chat prompt starts with the same SYSTEM_PROMPT (rules, theme guide,
+examples, skills block) followed by a conversation that only grows by a
+couple of messages per turn. PrefixKVCache keeps the KV state of
+
+- the system prompt, keyed on a hash of the submitted skills list, and
+- each conversation's last prompt, keyed on its token ids,
+
+and hands model.generate a copy of the longest matching prefix so only the
+new tokens are prefilled. Entries are evicted LRU once their tensors exceed
+the memory budget.
+
+All methods are meant to run on the scheduler's single generate thread.
+"""
+import copy
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import torch
+
+from token_timer import TokenTimer
+
+
+def skills_key(skills):
+    """Stable hash of the skills list sent by the desktop app."""
+    blob = json.dumps(skills or [], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:16]
+
+
+def _cache_tensors(cache):
+    if hasattr(cache, 'layers'):               # transformers >= 4.56
+        for layer in cache.layers:
+            for t in (getattr(layer, 'keys', None), getattr(layer, 'values', None)):
+                if t is not None:
+                    yield t
+    else:                                      # older DynamicCache
+        yield from cache.key_cache
+        yield from cache.value_cache
+
+
+def _cache_nbytes(cache):
+    return sum(t.numel() * t.element_size() for t in _cache_tensors(cache))
+
+
+def _crop(cache, length):
+    extra = cache.get_seq_length() - length
+    if extra > 0:
+        cache.crop(-extra)   # negative = drop that many trailing tokens (all versions)
+    return cache
+
+
+def _common_prefix(a, b):
+    n = min(a.shape[0], b.shape[0])
+    if n == 0:
+        return 0
+    diff = (a[:n] != b[:n]).nonzero()
+    return int(diff[0]) if diff.numel() else n
+
+
+class _Entry:
+    __slots__ = ('ids', 'cache', 'nbytes')
+
+    def __init__(self, ids, cache):
+        self.ids = ids
+        self.cache = cache
+        self.nbytes = _cache_nbytes(cache)
+
+
+class PrefixKVCache:
+    """LRU store of prompt KV states, bounded by budget_mb of tensor memory."""
+
+    def __init__(self, model, tokenizer, budget_mb=4096):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()   # key -> _Entry, most recently used last
+        self.nbytes = 0
+        self.stats = {'requests': 0, 'hits': 0, 'prompt_tokens': 0, 'cached_tokens': 0,
+                      'system_prefill_s': 0.0, 'evictions': 0}
+
+    # --- public ---
+    def generate(self, prompt, system_prompt=None, system_key=None, streamer=None, **generation_kwargs):
+        """Generate for one chat-template-rendered prompt, reusing cached prefixes.
+
+        system_prompt is the rendered system block alone (a string prefix of
+        prompt); it is prefilled once per system_key and shared by every
+        conversation that uses the same skills list.
+        """
+        timer = TokenTimer(streamer)   # prefill_ms includes the system prefill below
+        ids = self._encode(prompt)
+        if system_prompt and system_key:
+            self._ensure_system(system_key, system_prompt, ids)
+
+        cache, cached = self._lookup(ids)
+        self.stats['requests'] += 1
+        self.stats['prompt_tokens'] += ids.shape[0]
+        self.stats['cached_tokens'] += cached
+        if cached:
+            self.stats['hits'] += 1
+
+        input_ids = ids.unsqueeze(0).to(self.model.device)
+        kwargs = dict(generation_kwargs, streamer=timer)
+        if cache is not None:
+            kwargs['past_key_values'] = cache
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                return_dict_in_generate=True,
+                **kwargs,
+            )
+
+        # The cache now covers prompt + reply; keep the prompt part for next turn
+        new_cache = getattr(outputs, 'past_key_values', None)
+        if new_cache is not None:
+            self._store(self._conv_key(ids), ids, _crop(new_cache, ids.shape[0]))
+
+        new_tokens = outputs.sequences[0][ids.shape[0]:]
+        return {
+            'text': self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip(),
+            'tokens': int(new_tokens.shape[0]),
+            'prompt_tokens': int(ids.shape[0]),
+            'cached_tokens': cached,
+            **timer.timing(),
+        }
+
+    def snapshot(self):
+        s = dict(self.stats)
+        s['entries'] = len(self.entries)
+        s['used_mb'] = round(self.nbytes / 1048576, 1)
+        s['budget_mb'] = round(self.budget / 1048576, 1)
+        s['hit_rate'] = round(s['hits'] / s['requests'], 3) if s['requests'] else 0
+        s['prefill_saved'] = round(s['cached_tokens'] / s['prompt_tokens'], 3) if s['prompt_tokens'] else 0
+        s['system_prefill_s'] = round(s['system_prefill_s'], 3)
+        return s
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    # --- internals ---
+    def _encode(self, text):
+        return self.tokenizer(text, return_tensors='pt', add_special_tokens=False)['input_ids'][0]
+
+    def _ensure_system(self, key, system_prompt, prompt_ids):
+        entry_key = ('sys', key)
+        if entry_key in self.entries:
+            self.entries.move_to_end(entry_key)
+            return
+        sys_ids = self._encode(system_prompt)
+        # Only useful if it tokenizes to a prefix of the real prompt
+        if _common_prefix(sys_ids, prompt_ids) != sys_ids.shape[0] or sys_ids.shape[0] >= prompt_ids.shape[0]:
+            return
+        start = time.perf_counter()
+        with torch.no_grad():
+            out = self.model(input_ids=sys_ids.unsqueeze(0).to(self.model.device), use_cache=True)
+        self.stats['system_prefill_s'] += time.perf_counter() - start
+        self._store(entry_key, sys_ids, out.past_key_values)
+
+    def _lookup(self, ids):
+        best_key, best_len = None, 0
+        for key, entry in self.entries.items():
+            n = _common_prefix(entry.ids, ids)
+            if n > best_len:
+                best_key, best_len = key, n
+        # generate needs at least one uncached token to produce logits
+        best_len = min(best_len, ids.shape[0] - 1)
+        if best_key is None or best_len <= 0:
+            return None, 0
+        self.entries.move_to_end(best_key)
+        # generate() extends the cache in place, so hand it a private copy
+        cache = _crop(copy.deepcopy(self.entries[best_key].cache), best_len)
+        return cache, best_len
+
+    @staticmethod
+    def _conv_key(ids):
+        return ('conv', hashlib.sha1(ids.numpy().tobytes()).hexdigest())
+
+    def _store(self, key, ids, cache):
+        if key[0] == 'conv':
+            # A conversation's new prompt supersedes its previous one
+            for old_key in [k for k, e in self.entries.items()
+                            if k[0] == 'conv' and e.ids.shape[0] <= ids.shape[0]
+                            and _common_prefix(e.ids, ids) == e.ids.shape[0]]:
+                self._drop(old_key)
+        if key in self.entries:
+            self._drop(key)
+        entry = _Entry(ids, cache)
+        if entry.nbytes > self.budget:
+            return
+        self.entries[key] = entry
+        self.nbytes += entry.nbytes
+        while self.nbytes > self.budget and self.entries:
+            self._drop(next(iter(self.entries)))
+            self.stats['evictions'] += 1
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.nbytes -= entry.nbytes
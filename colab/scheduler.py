@@ -0,0 +1,168 @@
+"""
+Generation scheduler for the Colab AI server.
+
+Requests are queued on the event loop and grouped into padded batches that
+share a single model.generate call. Generation runs on one dedicated worker
+thread, so /health and request parsing never wait behind the GPU.
+
+    scheduler = GenerationScheduler(make_hf_batch_generate(model, tokenizer, **kw),
+                                    max_batch_size=8, max_wait_ms=20)
+    result = await scheduler.submit(prompt_text)   # {'text': ..., 'tokens': ..., 'queue_ms': ...}
+
+queue_ms is how long the request waited for the GPU (batch collection plus
+any batch or stream already running); generate_batch may add its own timing
+keys (prefill_ms, decode_ms, ...) to each result.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from token_timer import TokenTimer
+
+
+class GenerationScheduler:
+    """Dynamic batching over an asyncio queue.
+
+    generate_batch(prompts) -> [{'text': str, 'tokens': int}, ...] (same order)
+    max_batch_size: upper bound on prompts per generate call
+    max_wait_ms:    how long the first queued request waits for company
+    """
+
+    def __init__(self, generate_batch, max_batch_size=8, max_wait_ms=20):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # Single worker: the GPU runs one batch at a time; anything else that
+        # needs the model (e.g. streaming generate) should use this executor too.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='generate')
+        self._queue = None
+        self._task = None
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'tokens': 0, 'busy_s': 0.0, 'max_batch': 0}
+
+    # --- public ---
+    async def submit(self, prompt):
+        """Queue one prompt and wait for its generated result."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future, time.perf_counter()))
+        return await future
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def snapshot(self):
+        """Counters for /health; cheap and lock-free enough for a probe."""
+        s = dict(self.stats)
+        s['queue_depth'] = self.queue_depth
+        s['avg_batch'] = round(s['requests'] / s['batches'], 2) if s['batches'] else 0
+        s['max_batch_size'] = self.max_batch_size
+        s['max_wait_ms'] = self.max_wait_ms
+        return s
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.executor.shutdown(wait=False)
+
+    # --- internals ---
+    def _ensure_started(self):
+        with self._lock:
+            if self._task is None or self._task.done():
+                self._queue = asyncio.Queue()
+                self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already waiting without sleeping
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+            prompts = [p for p, _, _ in batch]
+            start = None
+
+            def generate():
+                nonlocal start
+                start = time.perf_counter()   # on the worker: waiting for a running stream counts as queue time
+                return self.generate_batch(prompts)
+
+            try:
+                results = await loop.run_in_executor(self.executor, generate)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats['busy_s'] += time.perf_counter() - start
+            self.stats['batches'] += 1
+            self.stats['requests'] += len(batch)
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            for (_, future, queued), result in zip(batch, results):
+                self.stats['tokens'] += result.get('tokens', 0)
+                result['queue_ms'] = round((start - queued) * 1000, 1)
+                if not future.done():
+                    future.set_result(result)
+
+
+def make_hf_batch_generate(model, tokenizer, **generation_kwargs):
+    """Wrap a transformers causal LM as a generate_batch function.
+
+    Prompts are chat-template-rendered strings; they are left-padded into one
+    batch so every sequence's new tokens start at the same column. Keyword
+    arguments given per call (e.g. a logits_processor built for this batch)
+    override generation_kwargs.
+    """
+    import torch
+
+    tokenizer.padding_side = 'left'
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    pad_id = tokenizer.pad_token_id
+
+    def generate_batch(prompts, **overrides):
+        timer = TokenTimer()
+        inputs = tokenizer(prompts, return_tensors='pt', padding=True).to(model.device)
+        with torch.no_grad():
+            outputs = model.generate(**inputs, pad_token_id=pad_id, streamer=timer,
+                                     **dict(generation_kwargs, **overrides))
+        timing = timer.timing()   # shared by the whole batch
+        prompt_len = inputs['input_ids'].shape[1]
+        results = []
+        for row in outputs:
+            new_tokens = row[prompt_len:]
+            count = int((new_tokens != pad_id).sum())
+            results.append({
+                'text': tokenizer.decode(new_tokens, skip_special_tokens=True).strip(),
+                'tokens': count,
+                **timing,
+            })
+        return results
+
+    return generate_batch
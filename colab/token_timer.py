@@ -0,0 +1,54 @@
+"""
+Prefill / decode timing for transformers' generate().
+
+generate() calls streamer.put(prompt_ids) once before the first forward
+pass, then streamer.put(next_tokens) for every decoding step, then
+streamer.end(). TokenTimer timestamps those calls and forwards them to an
+optional inner streamer (e.g. the TextIteratorStreamer behind /chat/stream):
+
+    timer = TokenTimer(streamer)
+    model.generate(..., streamer=timer)
+    timer.timing()   # {'prefill_ms': ..., 'decode_ms': ..., 'decode_tps': ...}
+
+prefill_ms runs from the timer's creation to the first new token, so it
+covers tokenization, system-prompt prefill and the prompt's forward pass.
+decode_ms covers the rest.
+"""
+import time
+
+
+class TokenTimer:
+    """Duck-typed transformers streamer (put/end) that records step times."""
+
+    def __init__(self, inner=None):
+        self.inner = inner
+        self.start = time.perf_counter()
+        self.first = None     # first generated token
+        self.done = None
+        self.steps = 0
+        self._prompt_seen = False
+
+    def put(self, value):
+        if self._prompt_seen:
+            if self.first is None:
+                self.first = time.perf_counter()
+            self.steps += 1
+        else:
+            self._prompt_seen = True
+        if self.inner is not None:
+            self.inner.put(value)
+
+    def end(self):
+        self.done = time.perf_counter()
+        if self.inner is not None:
+            self.inner.end()
+
+    def timing(self):
+        done = self.done or time.perf_counter()
+        first = self.first or done
+        decode_s = done - first
+        return {
+            'prefill_ms': round((first - self.start) * 1000, 1),
+            'decode_ms': round(decode_s * 1000, 1),
+            'decode_tps': round((self.steps - 1) / decode_s, 1) if self.steps > 1 and decode_s > 0 else None,
+        }
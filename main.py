@@ -1,26 +1,73 @@
 """
 Digital Assistant - Desktop AI Assistant
 Python + PyWebView + Colab LLM Backend
+
+GUI (webview) and the HTTP stack are imported lazily so AssistantAPI can be
+used headless (assistant/sidecar.py); document libraries are pre-warmed in the
+background once the window is shown. `python main.py --profile-startup`
+prints an import-time breakdown and time to first window.
 """
-import webview
+import time
+_T_START = time.perf_counter()
+
 import json
 import os
+import sys
 import subprocess
-import platform
 import threading
 import datetime
 import tempfile
 
+from assistant import startup
+from assistant.filereader import FileReader
+from assistant.history import compact_history, DEFAULT_BUDGET
+from assistant.intents import APP_COMMANDS, IntentMatcher, normalize_shortcuts
+from assistant.jobs import JobQueue, QueueFull, report
+from assistant.streaming import ReplyStreamParser, iter_sse
+from assistant.tracing import Tracer, new_trace_id, trace_methods
+
 # ===== System Skills API (exposed to JavaScript) =====
 
+@trace_methods
 class AssistantAPI:
     """Python backend exposed to the web UI via pywebview."""
 
     WORKSPACE = os.path.join(os.path.expanduser('~'), 'Desktop', 'AssistantOutput')
+    HTTP_SETTINGS = ('apiUrl', 'apiUrls', 'httpPoolSize', 'httpRetries', 'httpBackoff',
+                     'hedgeMs', 'probeInterval')   # rebuild the backend router on change
+    LLM_CACHE_SETTINGS = ('llmCache', 'llmCacheTtl', 'llmCacheSkills')
+    UNTRACED = ('record_spans', 'get_metrics')   # called by the metrics panel itself
+    JOB_KINDS = {'ppt': 'create_ppt', 'docx': 'create_docx', 'xlsx': 'create_xlsx', 'documents': 'create_documents'}
+    SKILL_ARG_NAMES = {('launch_app', 'name'): 'app_name', ('tail_command', 'id'): 'cmd_id',
+                       ('kill_command', 'id'): 'cmd_id'}   # skill schema arg -> method parameter
 
     def __init__(self):
         self._settings_path = os.path.join(os.path.dirname(__file__), 'settings.json')
         self._settings = self._load_settings()
+        self._router = None   # BackendRouter over apiUrl + apiUrls
+        self._router_lock = threading.Lock()
+        self._window = None   # set by __main__, used to push events into the UI
+        self._tracer = Tracer()   # per-stage latency histograms (get_metrics)
+        self._searcher = None
+        self._search_lock = threading.Lock()
+        self._llm_cache = None
+        self._llm_cache_lock = threading.Lock()
+        self._jobs = None
+        self._jobs_lock = threading.Lock()
+        self._documents = None   # DocumentPipeline, worker processes started on first use
+        self._documents_lock = threading.Lock()
+        self._procs = None   # ProcessManager for run_command / start_command
+        self._procs_lock = threading.Lock()
+        self._telemetry = None   # background telemetry Sampler for system_info
+        self._telemetry_lock = threading.Lock()
+        self._mcp = None   # MCPHost over src/mcp/mcp-config.json (assistant/mcp.py)
+        self._mcp_lock = threading.Lock()
+        self._files = FileReader()   # cached line indexes for read_lines
+        self._workspace = None
+        self._workspace_lock = threading.Lock()
+        self._intents = None   # IntentMatcher over built-ins + settings['shortcuts']
+        self._listener = None   # background SpeechListener, microphone kept open
+        self._listener_lock = threading.Lock()
         os.makedirs(self.WORKSPACE, exist_ok=True)
 
     # --- Settings ---
@@ -41,26 +88,86 @@ class AssistantAPI:
     def set_setting(self, key, value):
         self._settings[key] = value
         self._save_settings()
+        if key in self.HTTP_SETTINGS:
+            self._reset_router()
+        if key == 'shortcuts':
+            self._intents = None
+        if key in self.LLM_CACHE_SETTINGS:
+            self._reset_llm_cache()
+        if key == 'listenMode' and self._listener is not None:
+            self._listener.mode = value or 'ptt'
+        if key == 'micDevice':
+            self.stop_listener()
+
+    # --- History budget ---
+    def _compact_messages(self, messages):
+        """Enforce the history token budget before posting to /chat."""
+        budget = int(self._settings.get('historyTokenBudget') or DEFAULT_BUDGET)
+        return compact_history(messages, budget=budget)
+
+    # --- UI events ---
+    def _emit(self, channel, payload):
+        """Push an event to public/app.js (window.onAssistantEvent)."""
+        if self._window is None:
+            return
+        try:
+            self._window.evaluate_js(
+                f'window.onAssistantEvent && window.onAssistantEvent('
+                f'{json.dumps(channel)}, {json.dumps(payload, ensure_ascii=False)})'
+            )
+        except Exception:
+            pass
+
+    # --- LLM backends (Colab and others), one pooled client each ---
+    def _get_router(self):
+        """Return the router over apiUrl + apiUrls, starting its health probes on first use."""
+        from assistant.http_pool import PooledClient   # pulls in requests; pre-warmed after startup
+        from assistant.router import PROBE_INTERVAL, BackendRouter, parse_specs
+
+        with self._router_lock:
+            if self._router is None:
+                specs = parse_specs(self._settings.get('apiUrl', ''), self._settings.get('apiUrls') or [])
+                pool_size = int(self._settings.get('httpPoolSize') or 4)
+                # with a second backend to fail over to, retrying a dead one only adds delay
+                retries = int(self._settings.get('httpRetries') or 2) if len(specs) == 1 else 0
+                backoff = float(self._settings.get('httpBackoff') or 0.3)
+                hedge = self._settings.get('hedgeMs')
+                self._router = BackendRouter(
+                    specs,
+                    lambda url: PooledClient(url, pool_size=pool_size, retries=retries, backoff=backoff),
+                    probe_interval=float(self._settings.get('probeInterval') or PROBE_INTERVAL),
+                    hedge_ms=None if hedge is False or hedge == 'off' else float(hedge or 0),
+                ).start()
+            return self._router
+
+    def _reset_router(self):
+        with self._router_lock:
+            if self._router is not None:
+                self._router.close()
+                self._router = None
+
+    # --- Local Intents (skill shortcuts) ---
+    def _get_intents(self):
+        if self._intents is None:
+            self._intents = IntentMatcher(normalize_shortcuts(self._settings.get('shortcuts')))
+        return self._intents
+
+    def get_intent_table(self, shortcuts=None):
+        """Compiled intent table for public/intents.js. shortcuts overrides the
+        'shortcuts' setting (the Electron shell keeps its own settings)."""
+        try:
+            matcher = self._get_intents() if shortcuts is None else IntentMatcher(normalize_shortcuts(shortcuts))
+            return json.dumps(matcher.table, ensure_ascii=False)
+        except Exception as e:
+            return json.dumps({'success': False, 'message': f'捷徑設定錯誤: {e}'}, ensure_ascii=False)
+
+    def match_intent(self, text):
+        """The local shortcut text would trigger, or null."""
+        return json.dumps(self._get_intents().match(text), ensure_ascii=False)
 
     # --- Launch App ---
     def launch_app(self, app_name):
-        app_map = {
-            'notepad': 'notepad.exe',
-            '記事本': 'notepad.exe',
-            'calculator': 'calc.exe',
-            '計算機': 'calc.exe',
-            'browser': 'start https://www.google.com',
-            '瀏覽器': 'start https://www.google.com',
-            'explorer': 'explorer.exe',
-            '檔案總管': 'explorer.exe',
-            'cmd': 'cmd.exe',
-            'terminal': 'wt.exe',
-            '終端機': 'wt.exe',
-            'vscode': 'code',
-            'spotify': 'start spotify:',
-            'discord': 'start discord:',
-        }
-        cmd = app_map.get(app_name.lower(), app_name)
+        cmd = APP_COMMANDS.get(app_name.lower(), app_name)
         try:
             subprocess.Popen(f'start "" "{cmd}"', shell=True)
             return json.dumps({'success': True, 'message': f'已啟動: {app_name}'})
@@ -85,37 +192,92 @@ class AssistantAPI:
 
     # --- Run Command ---
     def run_command(self, command):
+        """Run a shell command and wait up to commandWaitSeconds for it. A command
+        still running then is left running (nothing is killed): the result
+        carries its id and the output keeps streaming as 'command' events."""
         try:
-            result = subprocess.run(
-                command, shell=True, capture_output=True,
-                text=True, timeout=15, encoding='utf-8', errors='replace'
-            )
-            output = result.stdout.strip() or result.stderr.strip()
-            return json.dumps({'success': result.returncode == 0, 'message': output})
-        except subprocess.TimeoutExpired:
-            return json.dumps({'success': False, 'message': '指令逾時 (15秒)'})
+            procs = self._get_procs()
+            cmd_id = procs.start(command)
+            status = procs.wait(cmd_id, float(self._settings.get('commandWaitSeconds') or 15))
+            output = procs.text(cmd_id).strip()
+            if status['state'] == 'running':
+                return json.dumps(dict(status, success=True, running=True,
+                                       message=f'指令仍在執行（{cmd_id}），輸出會持續顯示\n{output}'.strip()),
+                                  ensure_ascii=False)
+            return json.dumps(dict(status, success=status['returncode'] == 0, message=output), ensure_ascii=False)
         except Exception as e:
-            return json.dumps({'success': False, 'message': str(e)})
+            return json.dumps({'success': False, 'message': str(e)}, ensure_ascii=False)
+
+    # --- Background Commands (assistant/processes.py) ---
+    def _get_procs(self):
+        with self._procs_lock:
+            if self._procs is None:
+                from assistant.processes import ProcessManager
+                self._procs = ProcessManager(emit=lambda payload: self._emit('command', payload))
+            return self._procs
+
+    def start_command(self, command, cwd=''):
+        """Start a shell command without waiting. Output arrives as 'command'
+        events ('started' / 'output' / 'exit') and through tail_command."""
+        try:
+            cmd_id = self._get_procs().start(command, cwd or None)
+            return json.dumps({'success': True, 'id': cmd_id, 'message': f'已開始執行: {cmd_id}'})
+        except Exception as e:   # TooManyCommands, or the shell could not be started
+            return json.dumps({'success': False, 'message': str(e)}, ensure_ascii=False)
+
+    def poll_command(self, cmd_id=''):
+        """State, exit code, elapsed / CPU time and peak RSS of one command, or of all recent ones."""
+        procs = self._get_procs()
+        if not cmd_id:
+            return json.dumps({'success': True, 'commands': procs.list()}, ensure_ascii=False)
+        status = procs.poll(cmd_id)
+        if status is None:
+            return json.dumps({'success': False, 'message': f'找不到指令: {cmd_id}'}, ensure_ascii=False)
+        return json.dumps(dict(status, success=True), ensure_ascii=False)
+
+    def tail_command(self, cmd_id, since=0, limit=200, lines=None):
+        """Output lines [seq, 'out' | 'err', text] from seq since on (negative: the last -since lines).
+        lines is the skill schema's form: the last n lines, i.e. since=-n, limit=n."""
+        if lines:
+            since, limit = -int(lines), int(lines)
+        out = self._get_procs().tail(cmd_id, int(since), int(limit))
+        if out is None:
+            return json.dumps({'success': False, 'message': f'找不到指令: {cmd_id}'}, ensure_ascii=False)
+        out['message'] = '\n'.join([line[2] for line in out['lines']] + list(out['partial'].values()))
+        return json.dumps(dict(out, success=True), ensure_ascii=False)
+
+    def kill_command(self, cmd_id):
+        if self._get_procs().kill(cmd_id):
+            return json.dumps({'success': True, 'message': f'已終止: {cmd_id}'}, ensure_ascii=False)
+        return json.dumps({'success': False, 'message': f'無法終止（不存在或已結束）: {cmd_id}'}, ensure_ascii=False)
 
     # --- System Info ---
     def system_info(self):
-        mem = os.popen('wmic OS get FreePhysicalMemory,TotalVisibleMemorySize /Value').read()
-        info = {
-            'platform': platform.system(),
-            'hostname': platform.node(),
-            'cpus': os.cpu_count(),
-            'version': platform.version(),
-        }
-        for line in mem.strip().split('\n'):
-            line = line.strip()
-            if line.startswith('TotalVisibleMemorySize='):
-                total_kb = int(line.split('=')[1])
-                info['totalMemory'] = f'{total_kb / 1048576:.1f} GB'
-            elif line.startswith('FreePhysicalMemory='):
-                free_kb = int(line.split('=')[1])
-                info['freeMemory'] = f'{free_kb / 1048576:.1f} GB'
+        """Latest CPU / memory / disk sample and min / avg / max over the last
+        1, 5 and 15 minutes, from the background sampler (assistant/telemetry.py)."""
+        info = self._get_telemetry().snapshot()
+        latest = info['latest']
+        if 'memory_total' in latest:   # the fields app.js has always shown
+            info['totalMemory'] = f"{latest['memory_total'] / 2 ** 30:.1f} GB"
+            info['freeMemory'] = f"{(latest['memory_total'] - latest['memory_used']) / 2 ** 30:.1f} GB"
         return json.dumps({'success': True, 'message': json.dumps(info, ensure_ascii=False)})
 
+    def _get_telemetry(self):
+        with self._telemetry_lock:
+            if self._telemetry is None:
+                from assistant.telemetry import INTERVAL, Sampler
+                self._telemetry = Sampler(interval=float(self._settings.get('telemetryInterval') or INTERVAL))
+                if self._settings.get('telemetry') not in (False, 'off'):
+                    self._telemetry.start()
+            return self._telemetry
+
+    def warm_telemetry(self):
+        """Start sampling at launch so system_info has history to summarise."""
+        try:
+            self._get_telemetry()
+        except Exception:
+            pass   # system_info retries and reports it
+
     # --- Clipboard ---
     def clipboard_read(self):
         try:
@@ -145,170 +307,15 @@ class AssistantAPI:
         """Create a styled PowerPoint file. slides_json = [{"title":"...", "content":"..."}]
         theme: dark, corporate, nature, warm, ocean, minimal"""
         try:
-            from pptx import Presentation
-            from pptx.util import Inches, Pt, Emu
-            from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
-            from pptx.dml.color import RGBColor
+            from assistant.documents import output_stem
+            from assistant.ppt import render_deck   # cached per-theme templates
 
             slides = json.loads(slides_json) if isinstance(slides_json, str) else slides_json
+            prs = render_deck(title, slides, theme,
+                              progress=lambda done, total: report(0.9 * done / total, f'第 {done} / {total} 頁'))
 
-            # Theme palettes
-            THEMES = {
-                'dark': {
-                    'bg': (0x1A, 0x1A, 0x2E), 'card': (0x16, 0x21, 0x3E),
-                    'accent': (0x53, 0x3C, 0xD4), 'accent2': (0x7C, 0x6A, 0xF0),
-                    'text': (0xFF, 0xFF, 0xFF), 'sub': (0xA0, 0xA0, 0xB8), 'light': (0xE0, 0xE0, 0xEE),
-                },
-                'corporate': {
-                    'bg': (0xFF, 0xFF, 0xFF), 'card': (0xF0, 0xF2, 0xF5),
-                    'accent': (0x00, 0x52, 0xCC), 'accent2': (0x33, 0x7A, 0xFF),
-                    'text': (0x1A, 0x1A, 0x2E), 'sub': (0x66, 0x66, 0x80), 'light': (0x33, 0x33, 0x44),
-                },
-                'nature': {
-                    'bg': (0xF5, 0xF0, 0xEB), 'card': (0xE8, 0xE0, 0xD5),
-                    'accent': (0x2D, 0x6A, 0x4F), 'accent2': (0x52, 0xB7, 0x88),
-                    'text': (0x2D, 0x2D, 0x2D), 'sub': (0x6B, 0x70, 0x5C), 'light': (0x3D, 0x3D, 0x3D),
-                },
-                'warm': {
-                    'bg': (0x2D, 0x1B, 0x1B), 'card': (0x3D, 0x25, 0x25),
-                    'accent': (0xE8, 0x6C, 0x3A), 'accent2': (0xFF, 0x9A, 0x6C),
-                    'text': (0xFF, 0xFF, 0xFF), 'sub': (0xB0, 0x98, 0x90), 'light': (0xE8, 0xDB, 0xD5),
-                },
-                'ocean': {
-                    'bg': (0x0B, 0x1D, 0x33), 'card': (0x12, 0x2A, 0x45),
-                    'accent': (0x00, 0xB4, 0xD8), 'accent2': (0x48, 0xCA, 0xE4),
-                    'text': (0xFF, 0xFF, 0xFF), 'sub': (0x90, 0xBC, 0xD0), 'light': (0xCA, 0xE9, 0xF5),
-                },
-                'minimal': {
-                    'bg': (0xFF, 0xFF, 0xFF), 'card': (0xF8, 0xF8, 0xF8),
-                    'accent': (0x22, 0x22, 0x22), 'accent2': (0x55, 0x55, 0x55),
-                    'text': (0x11, 0x11, 0x11), 'sub': (0x88, 0x88, 0x88), 'light': (0x33, 0x33, 0x33),
-                },
-            }
-            t = THEMES.get(theme, THEMES['dark'])
-            prs = Presentation()
-            prs.slide_width = Inches(13.333)
-            prs.slide_height = Inches(7.5)
-
-            # Color palette from theme
-            BG_DARK = RGBColor(*t['bg'])
-            BG_CARD = RGBColor(*t['card'])
-            ACCENT = RGBColor(*t['accent'])
-            ACCENT_LIGHT = RGBColor(*t['accent2'])
-            WHITE = RGBColor(*t['text'])
-            GRAY = RGBColor(*t['sub'])
-            LIGHT = RGBColor(*t['light'])
-
-            def add_bg(slide, color):
-                bg = slide.background
-                fill = bg.fill
-                fill.solid()
-                fill.fore_color.rgb = color
-
-            def add_shape(slide, left, top, w, h, fill_color, radius=None):
-                shape = slide.shapes.add_shape(
-                    1, left, top, w, h  # MSO_SHAPE.RECTANGLE
-                )
-                shape.fill.solid()
-                shape.fill.fore_color.rgb = fill_color
-                shape.line.fill.background()
-                return shape
-
-            def set_text(tf, text, size=18, color=WHITE, bold=False, align=PP_ALIGN.LEFT):
-                tf.clear()
-                tf.word_wrap = True
-                p = tf.paragraphs[0]
-                p.text = text
-                p.font.size = Pt(size)
-                p.font.color.rgb = color
-                p.font.bold = bold
-                p.font.name = 'Microsoft JhengHei'
-                p.alignment = align
-
-            # ── Title Slide ──
-            slide = prs.slides.add_slide(prs.slide_layouts[6])  # blank
-            add_bg(slide, BG_DARK)
-
-            # Accent bar left
-            add_shape(slide, Inches(0), Inches(0), Inches(0.15), Inches(7.5), ACCENT)
-
-            # Title
-            txBox = slide.shapes.add_textbox(Inches(1.5), Inches(2.2), Inches(10), Inches(1.5))
-            tf = txBox.text_frame
-            tf.word_wrap = True
-            p = tf.paragraphs[0]
-            p.text = title
-            p.font.size = Pt(44)
-            p.font.bold = True
-            p.font.color.rgb = WHITE
-            p.font.name = 'Microsoft JhengHei'
-
-            # Subtitle / date
-            txBox2 = slide.shapes.add_textbox(Inches(1.5), Inches(4.0), Inches(10), Inches(0.6))
-            set_text(txBox2.text_frame,
-                     datetime.datetime.now().strftime('%Y . %m . %d'),
-                     size=16, color=GRAY)
-
-            # Decorative line
-            add_shape(slide, Inches(1.5), Inches(3.8), Inches(3), Pt(3), ACCENT_LIGHT)
-
-            # ── Content Slides ──
-            for idx, s in enumerate(slides):
-                slide = prs.slides.add_slide(prs.slide_layouts[6])  # blank
-                add_bg(slide, BG_DARK)
-
-                # Top accent bar
-                add_shape(slide, Inches(0), Inches(0), Inches(13.333), Pt(4), ACCENT)
-
-                # Slide number
-                txNum = slide.shapes.add_textbox(Inches(11.8), Inches(0.3), Inches(1), Inches(0.5))
-                set_text(txNum.text_frame, f'{idx + 1:02d}', size=14, color=GRAY, align=PP_ALIGN.RIGHT)
-
-                # Section title
-                txTitle = slide.shapes.add_textbox(Inches(0.8), Inches(0.5), Inches(11), Inches(1.0))
-                set_text(txTitle.text_frame, s.get('title', ''), size=32, color=WHITE, bold=True)
-
-                # Divider
-                add_shape(slide, Inches(0.8), Inches(1.5), Inches(2), Pt(3), ACCENT_LIGHT)
-
-                # Content card
-                card = add_shape(slide, Inches(0.6), Inches(1.9), Inches(12), Inches(5.0), BG_CARD)
-                card.shadow.inherit = False
-
-                # Content text with bullet points
-                content_text = s.get('content', '')
-                txContent = slide.shapes.add_textbox(Inches(1.1), Inches(2.2), Inches(11), Inches(4.5))
-                tf = txContent.text_frame
-                tf.word_wrap = True
-
-                lines = [l.strip() for l in content_text.split('\n') if l.strip()]
-                for i, line in enumerate(lines):
-                    if i == 0:
-                        p = tf.paragraphs[0]
-                    else:
-                        p = tf.add_paragraph()
-                    # Add bullet marker if not already present
-                    if not line.startswith(('-', '*', '>')):
-                        p.text = f'  {line}'
-                    else:
-                        p.text = f'  {line.lstrip("-*> ")}'
-                    p.font.size = Pt(18)
-                    p.font.color.rgb = LIGHT
-                    p.font.name = 'Microsoft JhengHei'
-                    p.space_after = Pt(10)
-
-            # ── End Slide ──
-            slide = prs.slides.add_slide(prs.slide_layouts[6])
-            add_bg(slide, BG_DARK)
-            add_shape(slide, Inches(0), Inches(0), Inches(13.333), Pt(4), ACCENT)
-
-            txEnd = slide.shapes.add_textbox(Inches(2), Inches(2.8), Inches(9), Inches(1.5))
-            set_text(txEnd.text_frame, 'Thank You', size=48, color=WHITE, bold=True, align=PP_ALIGN.CENTER)
-
-            txSub = slide.shapes.add_textbox(Inches(2), Inches(4.3), Inches(9), Inches(0.6))
-            set_text(txSub.text_frame, title, size=18, color=GRAY, align=PP_ALIGN.CENTER)
-
-            filename = f"{title.replace(' ', '_')}_{datetime.datetime.now().strftime('%H%M%S')}.pptx"
+            report(0.95, '儲存中')
+            filename = f"{output_stem(self.WORKSPACE, title, ['pptx'])}.pptx"
             filepath = os.path.join(self.WORKSPACE, filename)
             prs.save(filepath)
             os.startfile(filepath)
@@ -318,136 +325,176 @@ class AssistantAPI:
 
     # --- Create Word Document ---
     def create_docx(self, title, content):
-        """Create a styled Word document."""
-        try:
-            from docx import Document
-            from docx.shared import Inches, Pt, Cm, RGBColor
-            from docx.enum.text import WD_ALIGN_PARAGRAPH
-            from docx.enum.section import WD_ORIENT
-
-            doc = Document()
-
-            # Page setup
-            section = doc.sections[0]
-            section.top_margin = Cm(2.5)
-            section.bottom_margin = Cm(2.5)
-            section.left_margin = Cm(2.8)
-            section.right_margin = Cm(2.8)
-
-            # Style: Normal
-            style_normal = doc.styles['Normal']
-            style_normal.font.name = 'Microsoft JhengHei'
-            style_normal.font.size = Pt(11)
-            style_normal.font.color.rgb = RGBColor(0x33, 0x33, 0x33)
-            style_normal.paragraph_format.space_after = Pt(6)
-            style_normal.paragraph_format.line_spacing = 1.5
-
-            # Style: Title
-            style_title = doc.styles['Title']
-            style_title.font.name = 'Microsoft JhengHei'
-            style_title.font.size = Pt(26)
-            style_title.font.bold = True
-            style_title.font.color.rgb = RGBColor(0x1A, 0x1A, 0x2E)
-            style_title.paragraph_format.space_after = Pt(4)
-
-            # Style: Headings
-            for level in range(1, 4):
-                h_style = doc.styles[f'Heading {level}']
-                h_style.font.name = 'Microsoft JhengHei'
-                h_style.font.color.rgb = RGBColor(0x2D, 0x2D, 0x5E)
-                h_style.font.bold = True
-                sizes = {1: 20, 2: 16, 3: 13}
-                h_style.font.size = Pt(sizes[level])
-                h_style.paragraph_format.space_before = Pt(18 if level == 1 else 12)
-                h_style.paragraph_format.space_after = Pt(8)
-
-            # ── Cover section ──
-            # Add some top spacing
-            for _ in range(3):
-                doc.add_paragraph('')
-
-            # Title
-            p_title = doc.add_paragraph(title, style='Title')
-            p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-            # Accent line
-            p_line = doc.add_paragraph()
-            p_line.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p_line.add_run('━' * 30)
-            run.font.color.rgb = RGBColor(0x53, 0x3C, 0xD4)
-            run.font.size = Pt(10)
-
-            # Date
-            p_date = doc.add_paragraph()
-            p_date.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p_date.add_run(datetime.datetime.now().strftime('%Y-%m-%d'))
-            run.font.size = Pt(11)
-            run.font.color.rgb = RGBColor(0x88, 0x88, 0x99)
-
-            # Page break after cover
-            doc.add_page_break()
-
-            # ── Content ──
-            lines = content.split('\n')
-            for line in lines:
-                stripped = line.strip()
-                if not stripped:
-                    continue
+        """Create a styled Word document (# / ## / ### headings, - bullets, | tables |)."""
+        try:
+            from assistant.documents import output_stem, parse, render
 
-                # Detect headings by markers
-                if stripped.startswith('# '):
-                    doc.add_heading(stripped[2:], level=1)
-                elif stripped.startswith('## '):
-                    doc.add_heading(stripped[3:], level=2)
-                elif stripped.startswith('### '):
-                    doc.add_heading(stripped[4:], level=3)
-                elif stripped.startswith(('-', '*', '>')):
-                    # Bullet point
-                    text = stripped.lstrip('-*> ').strip()
-                    p = doc.add_paragraph(text, style='List Bullet')
-                    p.paragraph_format.left_indent = Cm(1)
-                else:
-                    p = doc.add_paragraph(stripped)
-
-            # ── Footer ──
-            footer_section = doc.sections[0]
-            footer = footer_section.footer
-            footer_para = footer.paragraphs[0]
-            footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = footer_para.add_run(f'{title}  |  Generated by Digital Assistant')
-            run.font.size = Pt(8)
-            run.font.color.rgb = RGBColor(0xAA, 0xAA, 0xBB)
-            run.font.name = 'Microsoft JhengHei'
-
-            filename = f"{title.replace(' ', '_')}_{datetime.datetime.now().strftime('%H%M%S')}.docx"
+            filename = f"{output_stem(self.WORKSPACE, title, ['docx'])}.docx"
             filepath = os.path.join(self.WORKSPACE, filename)
-            doc.save(filepath)
+            render('docx', title, parse(content), filepath,
+                   progress=lambda done, total: report(0.9 * done / total, f'第 {done + 1} / {total} 段'))
             os.startfile(filepath)
             return json.dumps({'success': True, 'message': f'已建立並開啟: {filepath}'})
         except Exception as e:
             return json.dumps({'success': False, 'message': str(e)})
 
+    # --- Same Content, Several Formats ---
+    def _get_documents(self):
+        with self._documents_lock:
+            if self._documents is None:
+                from assistant.documents import DEFAULT_WORKERS, DocumentPipeline
+                self._documents = DocumentPipeline(
+                    max_workers=int(self._settings.get('documentWorkers') or DEFAULT_WORKERS))
+            return self._documents
+
+    def create_documents(self, title, content, formats='pptx,docx', theme='dark'):
+        """Export one content (create_docx markup) to several formats at once:
+        pptx, docx, xlsx (tables), md, html. Content is parsed once and the
+        formats render in parallel worker processes (assistant/documents.py)."""
+        try:
+            report(0.1, '產生文件中')
+            out = self._get_documents().export(title, content, formats, self.WORKSPACE, theme=theme)
+            made = [f for f in out['files'] if 'error' not in f]
+            for f in made:
+                os.startfile(f['path'])
+            lines = [f"已建立 {len(made)}/{len(out['files'])} 個檔案（{out['elapsed_ms'] / 1000:.1f} 秒）:"]
+            lines += [f"- {f['path']}" if 'error' not in f else f"- {f['format']} 失敗: {f['error']}"
+                      for f in out['files']]
+            return json.dumps({'success': bool(made), 'message': '\n'.join(lines), **out}, ensure_ascii=False)
+        except Exception as e:
+            return json.dumps({'success': False, 'message': str(e)}, ensure_ascii=False)
+
     # --- Create Excel ---
-    def create_xlsx(self, title, data_json):
-        """Create an Excel file. data_json = [["col1","col2"],["val1","val2"]]"""
+    def create_xlsx(self, title, data_json, header=True):
+        """Create an Excel file. data_json = [["col1","col2"],["val1","val2"]], a list
+        of rows, or the path of a .csv/.tsv/.ndjson/.jsonl file streamed row by row."""
         try:
-            from openpyxl import Workbook
+            from assistant.documents import output_stem
+            from assistant.xlsx_export import export_rows
 
-            data = json.loads(data_json) if isinstance(data_json, str) else data_json
-            wb = Workbook()
-            ws = wb.active
-            ws.title = title
-            for row in data:
-                ws.append(row)
+            def progress(done, fraction):
+                report(0.95 * (fraction or 0), f'已寫入 {done:,} 列')
 
-            filename = f"{title.replace(' ', '_')}_{datetime.datetime.now().strftime('%H%M%S')}.xlsx"
+            filename = f"{output_stem(self.WORKSPACE, title, ['xlsx'])}.xlsx"
             filepath = os.path.join(self.WORKSPACE, filename)
-            wb.save(filepath)
+            stats = export_rows(filepath, data_json, title=title, header=header, progress=progress)
             os.startfile(filepath)
-            return json.dumps({'success': True, 'message': f'已建立並開啟: {filepath}'})
+            return json.dumps({'success': True, 'message': f'已建立並開啟: {filepath}',
+                               'rows': stats['rows'], 'types': stats['types']})
         except Exception as e:
             return json.dumps({'success': False, 'message': str(e)})
 
+    # --- Background Jobs (document generation) ---
+    def _get_jobs(self):
+        with self._jobs_lock:
+            if self._jobs is None:
+                self._jobs = JobQueue(
+                    emit=lambda payload: self._emit('job', payload),
+                    max_workers=int(self._settings.get('jobWorkers') or 2),
+                )
+            return self._jobs
+
+    def submit_job(self, kind, args):
+        """Run a document skill in the background. kind: ppt/docx/xlsx/documents (or the
+        method name), args: its keyword arguments as a dict or JSON string.
+        Progress and the final {'success', 'message'} arrive as 'job' events."""
+        method = self.JOB_KINDS.get(kind, kind)
+        if method not in self.JOB_KINDS.values():
+            return json.dumps({'success': False, 'message': f'不支援的工作類型: {kind}'})
+        try:
+            kwargs = json.loads(args) if isinstance(args, str) else dict(args or {})
+            job_id = self._get_jobs().submit(kind, getattr(self, method), **kwargs)
+            return json.dumps({'success': True, 'id': job_id, 'message': f'已排入工作: {job_id}'})
+        except QueueFull as e:
+            return json.dumps({'success': False, 'message': str(e)}, ensure_ascii=False)
+        except Exception as e:
+            return json.dumps({'success': False, 'message': str(e)})
+
+    def job_status(self, job_id=''):
+        """Status of one job, or of all recent jobs when job_id is empty."""
+        jobs = self._get_jobs()
+        if not job_id:
+            return json.dumps({'success': True, 'jobs': jobs.list()}, ensure_ascii=False)
+        status = jobs.status(job_id)
+        if status is None:
+            return json.dumps({'success': False, 'message': f'找不到工作: {job_id}'}, ensure_ascii=False)
+        return json.dumps(dict(status, success=True), ensure_ascii=False)
+
+    def cancel_job(self, job_id):
+        if self._get_jobs().cancel(job_id):
+            return json.dumps({'success': True, 'message': f'已要求取消: {job_id}'}, ensure_ascii=False)
+        return json.dumps({'success': False, 'message': f'無法取消: {job_id}'}, ensure_ascii=False)
+
+    # --- Multi-skill Plans (run_plan) ---
+    def _call_skill(self, skill, args):
+        """Run one skill with the model's args dict, like app.js executeAISkill -> parsed payload."""
+        from assistant.mcp import SKILL_PREFIX
+
+        if skill.startswith(SKILL_PREFIX):
+            return self._get_mcp().call(skill, args)
+        fn = getattr(self, skill)
+        code = getattr(fn, '__wrapped__', fn).__code__   # past @trace_methods
+        params = code.co_varnames[1:code.co_argcount]
+        kwargs = {}
+        for key, value in args.items():
+            key = self.SKILL_ARG_NAMES.get((skill, key), key)
+            if key in params:
+                kwargs[key] = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+        return json.loads(fn(**kwargs))
+
+    def run_plan(self, steps_json):
+        """Run a list of skill steps with dependencies (assistant/plan.py); independent
+        steps run in parallel. Returns one {'success', 'message', 'steps', ...} result."""
+        from assistant.plan import DEFAULT_WORKERS, SKILLS, PlanRunner
+
+        mcp_skills = {tool['skill'] for tool in self._mcp.tools()} if self._mcp is not None else set()
+        runner = PlanRunner(self._call_skill, max_workers=int(self._settings.get('planWorkers') or DEFAULT_WORKERS),
+                            skills=SKILLS | mcp_skills)
+        try:
+            return json.dumps(runner.run(steps_json), ensure_ascii=False)
+        except ValueError as e:   # PlanError, or steps_json is not JSON
+            return json.dumps({'success': False, 'message': f'計畫無效: {e}'}, ensure_ascii=False)
+
+    # --- MCP Tools (assistant/mcp.py) ---
+    def _get_mcp(self):
+        """Return the MCP host, connecting every configured server in the background on first use."""
+        from assistant.mcp import MCPHost
+
+        with self._mcp_lock:
+            if self._mcp is None:
+                path = self._settings.get('mcpConfig') or os.path.join(
+                    os.path.dirname(os.path.abspath(__file__)), 'src', 'mcp', 'mcp-config.json')
+                on_change = lambda: self._emit('mcp', {'type': 'tools'})  # noqa: E731
+                if self._settings.get('mcp') in (False, 'off') or not os.path.exists(path):
+                    self._mcp = MCPHost({}, on_change)
+                else:
+                    self._mcp = MCPHost.from_file(path, on_change).start()
+            return self._mcp
+
+    def warm_mcp(self):
+        """Connect the MCP servers at launch so their tools are listed before the first chat."""
+        try:
+            self._get_mcp()
+        except Exception:
+            pass   # mcp_tools retries and reports it
+
+    def mcp_tools(self):
+        """Cached tools of the connected MCP servers as skill schemas, plus per-server status."""
+        try:
+            host = self._get_mcp()
+        except Exception as e:
+            return json.dumps({'success': False, 'message': f'MCP 設定錯誤: {e}', 'skills': []}, ensure_ascii=False)
+        return json.dumps({'success': True, 'skills': host.skills(), 'tools': host.tools(),
+                           'servers': host.status()}, ensure_ascii=False)
+
+    def mcp_call(self, name, args_json='{}'):
+        """Run MCP tool skill `name` (mcp_<server>_<tool>) with a JSON object of arguments."""
+        try:
+            args = json.loads(args_json) if isinstance(args_json, str) else args_json
+        except ValueError as e:
+            return json.dumps({'success': False, 'message': f'參數不是 JSON: {e}'}, ensure_ascii=False)
+        return json.dumps(self._get_mcp().call(name, args or {}), ensure_ascii=False)
+
     # --- Write Text File ---
     def write_file(self, filename, content):
         """Write content to a text file in workspace."""
@@ -460,27 +507,96 @@ class AssistantAPI:
             return json.dumps({'success': False, 'message': str(e)})
 
     # --- Read File ---
-    def read_file(self, filepath):
-        """Read content from a file."""
+    def read_file(self, filepath, offset=0, length=10000):
+        """Read length bytes of a file from byte offset (negative: from the end).
+        Large files are memory-mapped, never loaded whole."""
         try:
-            with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read(10000)  # max 10k chars
-            return json.dumps({'success': True, 'message': content})
+            page = self._files.read(filepath, int(offset or 0), int(length or 10000))
+            message = page.pop('text')
+            if not page['eof'] or int(offset or 0):
+                message += (f"\n\n[位元組 {page['offset']:,}–{page['next_offset']:,} / {page['size']:,}"
+                            + ('' if page['eof'] else f"，可用 offset={page['next_offset']} 繼續讀取") + ']')
+            return json.dumps(dict(page, success=True, message=message))
         except Exception as e:
             return json.dumps({'success': False, 'message': str(e)})
 
-    # --- List Files ---
-    def list_files(self, directory):
-        """List files in a directory."""
+    def read_lines(self, filepath, start=1, count=100):
+        """Read count lines from 1-based line start (negative: from the end)."""
         try:
+            page = self._files.lines(filepath, int(start or 1), int(count or 100))
+            width = len(str(page['end'])) if page['lines'] else 1
+            body = '\n'.join(f"{n:>{width}} | {line}" for n, line in enumerate(page['lines'], page['start']))
+            message = f"{body}\n\n[第 {page['start']:,}–{page['end']:,} 行，共 {page['total_lines']:,} 行]"
+            return json.dumps(dict(page, success=True, message=message))
+        except Exception as e:
+            return json.dumps({'success': False, 'message': str(e)})
+
+    def tail_file(self, filepath, lines=50):
+        """Last lines of a file (e.g. a growing log) without indexing it."""
+        try:
+            page = self._files.tail(filepath, int(lines or 50))
+            return json.dumps(dict(page, success=True, message='\n'.join(page['lines']) or '(empty)'))
+        except Exception as e:
+            return json.dumps({'success': False, 'message': str(e)})
+
+    # --- List / Search Files ---
+    def _get_workspace(self):
+        from assistant.workspace import WorkspaceIndex
+
+        with self._workspace_lock:
+            if self._workspace is None:
+                self._workspace = WorkspaceIndex(
+                    self.WORKSPACE, os.path.join(os.path.dirname(__file__), 'workspace_index.db'))
+            return self._workspace
+
+    def list_files(self, directory='', offset=0, limit=50, sort=''):
+        """List files page by page. The workspace comes from the persistent index
+        (newest first); other directories are read with one scandir pass.
+        sort: name / mtime / size / kind."""
+        try:
+            offset, limit = max(0, int(offset or 0)), max(1, min(int(limit or 50), 500))
             path = directory or self.WORKSPACE
-            items = []
-            for name in os.listdir(path)[:50]:
-                full = os.path.join(path, name)
-                is_dir = os.path.isdir(full)
-                size = os.path.getsize(full) if not is_dir else 0
-                items.append(f"{'[DIR]' if is_dir else f'{size:>8}'} {name}")
-            return json.dumps({'success': True, 'message': '\n'.join(items) or '(empty)'})
+            if os.path.abspath(path) == os.path.abspath(self.WORKSPACE):
+                page = self._get_workspace().list(offset, limit, sort or 'mtime')
+                lines = [f"{i['size']:>8} {i['modified']}  {i['name']}" for i in page['items']]
+                items, total = page['items'], page['total']
+            else:
+                entries = []
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            st = entry.stat()
+                            is_dir = entry.is_dir()
+                        except OSError:   # broken link, no permission, removed meanwhile: listed as unreadable
+                            entries.append((entry.name, False, None, 0.0))
+                            continue
+                        entries.append((entry.name, is_dir, 0 if is_dir else st.st_size, st.st_mtime))
+                keys = {'mtime': lambda e: -e[3], 'size': lambda e: -(e[2] or 0)}
+                entries.sort(key=lambda e: (not e[1], keys.get(sort, lambda e: e[0].lower())(e)))
+                total = len(entries)
+                entries = entries[offset:offset + limit]
+                lines = [f"{'[DIR]' if d else '[?]' if size is None else f'{size:>8}'} {name}"
+                         for name, d, size, _ in entries]
+                items = [{'name': name, 'dir': d, 'size': size} for name, d, size, _ in entries]
+            message = '\n'.join(lines) or '(empty)'
+            if total > offset + len(lines) or offset:
+                message += f'\n\n[第 {offset + 1}–{offset + len(lines)} 項，共 {total} 項]'
+            return json.dumps({'success': True, 'message': message, 'items': items, 'total': total,
+                               'offset': offset}, ensure_ascii=False)
+        except Exception as e:
+            return json.dumps({'success': False, 'message': str(e)})
+
+    def search_files(self, query, kind='', days=0, limit=10):
+        """Full-text search over the workspace (file names plus text inside
+        pptx/docx/xlsx and text files). kind: ppt/doc/sheet/text/image,
+        days: only files modified in the last N days."""
+        try:
+            result = self._get_workspace().search(query, int(limit or 10), kind or '', float(days or 0))
+            if not result['items']:
+                message = f'找不到符合「{query}」的檔案'
+            else:
+                message = '\n\n'.join(f"{i['name']}  ({i['modified']})\n{i['snippet']}" for i in result['items'])
+            return json.dumps(dict(result, success=True, message=message), ensure_ascii=False)
         except Exception as e:
             return json.dumps({'success': False, 'message': str(e)})
 
@@ -489,8 +605,11 @@ class AssistantAPI:
         """Take a screenshot and save to workspace."""
         try:
             from PIL import ImageGrab
+
+            from assistant.documents import output_stem
+
             img = ImageGrab.grab()
-            filename = f"screenshot_{datetime.datetime.now().strftime('%H%M%S')}.png"
+            filename = f"{output_stem(self.WORKSPACE, 'screenshot', ['png'])}.png"
             filepath = os.path.join(self.WORKSPACE, filename)
             img.save(filepath)
             return json.dumps({'success': True, 'message': f'已截圖: {filepath}'})
@@ -520,53 +639,26 @@ class AssistantAPI:
             return json.dumps({'success': False, 'message': str(e)})
 
     # --- Fetch News / Web Search Results ---
+    def _get_searcher(self):
+        from assistant.search import DEFAULT_TTL, NewsSearcher
+
+        with self._search_lock:
+            if self._searcher is None:
+                self._searcher = NewsSearcher(
+                    cache_path=os.path.join(os.path.dirname(__file__), 'search_cache.db'),
+                    ttl=int(self._settings.get('searchCacheTtl') or DEFAULT_TTL),
+                )
+            return self._searcher
+
     def fetch_news(self, query, max_results='5'):
         """Search the web and return actual content summaries using DuckDuckGo."""
+        from assistant.search import fetch_news_payload
+
         try:
-            from duckduckgo_search import DDGS
-            max_r = int(max_results)
-            results = []
-            
-            # Use query as-is, let AI decide what to search
-            # Only do minimal cleanup: remove extra spaces
-            clean_query = ' '.join(query.split()).strip()
-
-            with DDGS() as ddgs:
-                seen_titles = set()
-                for search_q in search_queries:
-                    for r in ddgs.text(search_q, max_results=max_r):
-                        title = r.get('title', '')
-                        # Skip duplicates
-                        if title in seen_titles:
-                            continue
-                        seen_titles.add(title)
-                        results.append({
-                            'title': r.get('title', ''),
-                            'body': r.get('body', ''),
-                            'href': r.get('href', ''),
-                        })
-                        if len(results) >= max_r:
-                            break
-                    if len(results) >= max_r:
-                        break
-
-            if not results:
-                return json.dumps({'success': False, 'message': f'找不到關於「{query}」的結果'})
-
-            # Format as readable text for AI to process
-            formatted = []
-            for i, r in enumerate(results, 1):
-                formatted.append(f"[{i}] {r['title']}\n{r['body']}\n來源: {r['href']}")
-
-            summary = '\n\n'.join(formatted)
-            return json.dumps({
-                'success': True,
-                'message': summary,
-                'results': results,
-                'query': query
-            }, ensure_ascii=False)
+            searcher = self._get_searcher()
         except Exception as e:
             return json.dumps({'success': False, 'message': f'搜尋失敗: {str(e)}'})
+        return json.dumps(fetch_news_payload(searcher, query, max_results), ensure_ascii=False)
 
     # --- Kill Process ---
     def kill_process(self, process_name):
@@ -615,52 +707,162 @@ class AssistantAPI:
             return json.dumps({'success': False, 'message': str(e)})
 
     # ===== Speech Recognition (Python-side) =====
+    def _get_listener(self):
+        """Return the running background listener, opening the microphone on first use."""
+        from assistant.listener import GoogleRecognizer, MicrophoneSource, SpeechListener
+
+        with self._listener_lock:
+            if self._listener is None or not self._listener.running:
+                device = self._settings.get('micDevice')
+                self._listener = SpeechListener(
+                    MicrophoneSource(device_index=int(device) if device not in (None, '') else None),
+                    emit=lambda event: self._emit('speech', event),
+                    recognizer=GoogleRecognizer(),
+                    mode=self._settings.get('listenMode') or 'ptt',
+                ).start()
+            return self._listener
+
+    def warm_listener(self):
+        """Open the microphone in the background so the first press is instant. Only when
+        settings['micAlwaysOn'] is on or listenMode is 'always'; otherwise the first press opens it."""
+        if self._settings.get('micAlwaysOn') not in (True, 'on') and self._settings.get('listenMode') != 'always':
+            return
+        try:
+            self._get_listener()
+        except Exception:
+            pass   # no microphone / PyAudio; start_listening reports it when pressed
+
+    def listen_start(self, lang='zh-TW'):
+        """Push-to-talk press: returns at once; partial/final transcripts arrive on the 'speech' channel."""
+        try:
+            self._get_listener().press(lang)
+            return json.dumps({'success': True})
+        except Exception as e:
+            return json.dumps({'success': False, 'error': f'無法開啟麥克風: {e}'})
+
+    def listen_stop(self):
+        """Push-to-talk release: close the current utterance now."""
+        if self._listener is not None:
+            self._listener.release()
+        return json.dumps({'success': True})
+
+    def listener_status(self):
+        return json.dumps(self._listener.status() if self._listener is not None else {'running': False})
+
+    def stop_listener(self):
+        """Close the microphone (it is reopened on the next press)."""
+        with self._listener_lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+        return json.dumps({'success': True})
+
     def start_listening(self, lang):
-        """Record from microphone and return recognized text using Google Speech API."""
-        try:
-            import speech_recognition as sr
-            recognizer = sr.Recognizer()
-            recognizer.energy_threshold = 300
-            recognizer.dynamic_energy_threshold = True
-            recognizer.pause_threshold = 1.5      # wait 1.5s of silence before stopping
-            recognizer.phrase_threshold = 0.3
-            recognizer.non_speaking_duration = 0.8
-
-            with sr.Microphone() as source:
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio = recognizer.listen(source, timeout=10, phrase_time_limit=30)
-
-            text = recognizer.recognize_google(audio, language=lang)
-            return json.dumps({'success': True, 'text': text})
+        """Transcribe the next utterance and return it (blocking form of listen_start)."""
+        try:
+            listener = self._get_listener()
         except Exception as e:
-            error_msg = str(e)
-            if 'timed out' in error_msg.lower():
-                return json.dumps({'success': False, 'text': '', 'error': '未偵測到語音'})
-            return json.dumps({'success': False, 'text': '', 'error': error_msg})
+            return json.dumps({'success': False, 'text': '', 'error': f'無法開啟麥克風: {e}'})
+        final = listener.wait_final(listener.press(lang))
+        if final is None:
+            return json.dumps({'success': False, 'text': '', 'error': '未偵測到語音'})
+        return json.dumps({'success': bool(final['text']), 'text': final['text'], 'error': final.get('error')})
 
     # ===== AI Chat (calls Colab) =====
-    def chat_with_ai(self, messages_json, skills_json):
+    def _get_llm_cache(self):
+        """Return the reply cache, or None when settings['llmCache'] is 'off'."""
+        from assistant.llm_cache import DEFAULT_TTL, ResponseCache
+
+        if self._settings.get('llmCache') in (False, 'off'):
+            return None
+        with self._llm_cache_lock:
+            if self._llm_cache is None:
+                skills = self._settings.get('llmCacheSkills') or []
+                self._llm_cache = ResponseCache(
+                    os.path.join(os.path.dirname(__file__), 'llm_cache.db'),
+                    ttl=int(self._settings.get('llmCacheTtl') or DEFAULT_TTL),
+                    cacheable_skills=skills.split(',') if isinstance(skills, str) else skills,
+                )
+            return self._llm_cache
+
+    def _reset_llm_cache(self):
+        with self._llm_cache_lock:
+            if self._llm_cache is not None:
+                self._llm_cache.close()
+                self._llm_cache = None
+
+    @staticmethod
+    def _cache_model(backend):
+        """Model part of the reply cache key: the model of the backend that answers."""
+        return (backend.model or backend.name) if backend is not None else ''
+
+    def _cached_reply(self, messages, skills, backend):
+        """-> (cache, reply): reply is backend's cached one, or None on a miss / cache off.
+
+        backend is the one the router would pick now; the reply is stored under
+        the backend that actually answered (_cache_reply), so a failover or
+        hedge winner's reply is never served as the primary model's."""
+        try:
+            cache = self._get_llm_cache()
+            if cache is None:
+                return None, None
+            return cache, cache.get(cache.make_key(messages, skills, self._cache_model(backend)))
+        except Exception:
+            return None, None   # a broken cache must never block the chat
+
+    def _cache_reply(self, cache, messages, skills, backend, reply, ms):
+        cache.put(cache.make_key(messages, skills, self._cache_model(backend)), reply, ms)
+
+    def llm_cache_stats(self):
+        cache = self._get_llm_cache()
+        return json.dumps(cache.summary() if cache else {'enabled': False})
+
+    def clear_llm_cache(self):
+        cache = self._get_llm_cache()
+        if cache:
+            cache.clear()
+        return json.dumps({'success': True})
+
+    def chat_with_ai(self, messages_json, skills_json, trace_id=''):
         import requests
 
-        api_url = self._settings.get('apiUrl', '')
-        if not api_url:
+        trace_id = trace_id or new_trace_id()
+        router = self._get_router()
+        if not router.backends:
             return json.dumps({'text': '[Error] 尚未設定 Colab API URL，請點擊齒輪設定。'})
 
         try:
-            messages = json.loads(messages_json)
+            start = time.perf_counter()
+            messages, history = self._compact_messages(json.loads(messages_json))
             skills = json.loads(skills_json)
-
-            response = requests.post(
-                f'{api_url}/chat',
+            cache, reply = self._cached_reply(messages, skills, router.best('/chat'))
+            if reply is not None:
+                elapsed = round((time.perf_counter() - start) * 1000, 1)
+                reply['timing'] = {'total': elapsed, 'api': elapsed, 'cached': True}
+                reply['history'] = history
+                reply['trace_id'] = trace_id
+                self._tracer.record('llm_cache.hit', elapsed, trace_id)
+                return json.dumps(reply, ensure_ascii=False)
+
+            backend, response, timing = router.request(
+                'POST', '/chat',
                 json={'messages': messages, 'skills': skills},
                 timeout=30,
-                headers={'Content-Type': 'application/json'}
+                headers={'Content-Type': 'application/json', 'X-Trace-Id': trace_id}
             )
 
             if response.ok:
-                return json.dumps(response.json(), ensure_ascii=False)
+                data = backend.reply(response)
+                self._observe_chat(trace_id, timing, data.get('server_timing'))
+                if cache is not None:
+                    self._cache_reply(cache, messages, skills, backend, data, timing.get('total'))
+                timing['api'] = round((time.perf_counter() - start) * 1000, 1)
+                data['timing'] = timing
+                data['trace_id'] = trace_id
+                data['history'] = history
+                return json.dumps(data, ensure_ascii=False)
             else:
-                return json.dumps({'text': f'[Error] API: {response.status_code}'})
+                return json.dumps({'text': f'[Error] API: {response.status_code}', 'timing': timing})
 
         except requests.exceptions.Timeout:
             return json.dumps({'text': '[Error] AI 回應逾時，請確認 Colab 是否仍在運行。'})
@@ -669,25 +871,212 @@ class AssistantAPI:
         except Exception as e:
             return json.dumps({'text': f'[Error] {str(e)}'})
 
+    # --- Streaming Chat ---
+    def chat_with_ai_stream(self, messages_json, skills_json, trace_id=''):
+        """Generator over /chat/stream. Yields events:
+        {'type': 'delta', 'text'}, {'type': 'skill', 'skill', 'args'} (as soon as
+        args are complete) and finally {'type': 'done', 'reply', 'timing'}.
+
+        If the stream breaks before a skill was sent, the turn restarts on the
+        next backend after a {'type': 'reset'} event (the UI drops the partial text)."""
+        import requests
+
+        router = self._get_router()
+        if not router.backends:
+            yield {'type': 'done', 'reply': {'text': '[Error] 尚未設定 Colab API URL，請點擊齒輪設定。'}}
+            return
+        if not router.ranked('/chat/stream'):
+            # only OpenAI-compatible backends: one-shot /chat
+            yield from self._one_shot_events(messages_json, skills_json, trace_id)
+            return
+
+        start = time.perf_counter()
+        try:
+            messages, history = self._compact_messages(json.loads(messages_json))
+            skills = json.loads(skills_json)
+            cache, cached = self._cached_reply(messages, skills, router.best('/chat/stream'))
+            if cached is not None:
+                # Replay as one delta (+ skill) so the UI path is the same as a live stream
+                cached['history'] = history
+                yield {'type': 'delta', 'text': cached.get('text', '')}
+                if cached.get('skill'):
+                    yield {'type': 'skill', 'skill': cached['skill'], 'args': cached.get('args') or {}}
+                elapsed = round((time.perf_counter() - start) * 1000, 1)
+                self._tracer.record('llm_cache.hit', elapsed, trace_id)
+                yield {'type': 'done', 'reply': cached, 'timing': {'total': elapsed, 'cached': True}}
+                return
+
+            request = dict(
+                json={'messages': messages, 'skills': skills},
+                timeout=(10, 60),
+                headers={'Content-Type': 'application/json', 'Accept': 'text/event-stream', 'X-Trace-Id': trace_id}
+            )
+            backend, response, timing = router.request('POST', '/chat/stream', stream=True, **request)
+        except requests.exceptions.Timeout:
+            yield {'type': 'done', 'reply': {'text': '[Error] AI 回應逾時，請確認 Colab 是否仍在運行。'}}
+            return
+        except requests.exceptions.ConnectionError:
+            yield {'type': 'done', 'reply': {'text': '[Error] 無法連線到 AI 後端，請確認 Colab 是否已啟動。'}}
+            return
+        except Exception as e:
+            yield {'type': 'done', 'reply': {'text': f'[Error] {str(e)}'}}
+            return
+
+        tried = []
+        while True:
+            with response:
+                if response.status_code == 404:
+                    # Older notebook without /chat/stream: fall back to one-shot /chat
+                    yield from self._one_shot_events(messages_json, skills_json, trace_id)
+                    return
+                if not response.ok:
+                    yield {'type': 'done', 'reply': {'text': f'[Error] API: {response.status_code}'}, 'timing': timing}
+                    return
+
+                parser = ReplyStreamParser()
+                reply = None
+                broken = None
+                try:
+                    for event, data in iter_sse(response):
+                        payload = json.loads(data)
+                        if event == 'done':
+                            reply = payload
+                            break
+                        if event == 'error':
+                            reply = {'text': f"[Error] {payload.get('message', '')}"}
+                            break
+                        if 'first_token' not in timing:
+                            timing['first_token'] = round((time.perf_counter() - start) * 1000, 1)
+                        for ev in parser.feed(payload.get('delta', '')):
+                            yield ev
+                except requests.exceptions.RequestException as e:
+                    broken = e
+                except ValueError as e:   # an event that isn't JSON: end the turn, don't crash the generator
+                    reply = {'text': f'[Error] 串流資料無法解析: {str(e)}'}
+            if broken is None:
+                break
+            # Cut off midway: carry the turn over to the next backend unless a skill already started
+            router.fail(backend, broken)
+            tried.append(backend)
+            reply = {'text': f'[Error] 串流中斷: {str(broken)}'}
+            if parser.skill_sent:
+                break
+            try:
+                backend, response, retry_timing = router.request('POST', '/chat/stream', stream=True,
+                                                                 exclude=tried, **request)
+            except requests.exceptions.RequestException:
+                break
+            timing = dict(retry_timing, first_token=timing.get('first_token'), failover=len(tried))
+            yield {'type': 'reset', 'backend': backend.name}
+
+        final = parser.finish()
+        if reply is None or not isinstance(reply, dict) or 'text' not in reply:
+            reply = final
+        reply.setdefault('skill', '')
+        reply.setdefault('args', {})
+        if reply.get('skill') and not parser.skill_sent:
+            # skill only became parseable at the end (e.g. JSON after prose)
+            yield {'type': 'skill', 'skill': reply['skill'], 'args': reply.get('args') or {}}
+        timing['total'] = round((time.perf_counter() - start) * 1000, 1)
+        self._observe_chat(trace_id, timing, reply.get('server_timing'))
+        if cache is not None and reply is not final:
+            self._cache_reply(cache, messages, skills, backend, reply, timing['total'])
+        reply['history'] = history
+        yield {'type': 'done', 'reply': reply, 'timing': timing}
+
+    def _one_shot_events(self, messages_json, skills_json, trace_id):
+        """A one-shot /chat reply as stream events, for backends that can't stream."""
+        reply = json.loads(self.chat_with_ai(messages_json, skills_json, trace_id))
+        fallback_timing = reply.pop('timing', None)
+        yield {'type': 'delta', 'text': reply.get('text', '')}
+        yield {'type': 'done', 'reply': reply, 'timing': fallback_timing}
+
+    def stream_chat(self, stream_id, messages_json, skills_json, trace_id=''):
+        """JS entry point: push stream events to the UI, return the final reply JSON.
+
+        Deltas are coalesced (~30 ms) so evaluate_js isn't called per token."""
+        pending = ''
+        last_flush = time.perf_counter()
+        start = time.perf_counter()
+        trace_id = trace_id or new_trace_id()
+        done = {'reply': {'text': ''}}
+        for event in self.chat_with_ai_stream(messages_json, skills_json, trace_id):
+            if event['type'] == 'delta':
+                pending += event['text']
+                if time.perf_counter() - last_flush < 0.03:
+                    continue
+            if pending:
+                self._emit('chat', {'id': stream_id, 'type': 'delta', 'text': pending})
+                pending = ''
+                last_flush = time.perf_counter()
+            if event['type'] in ('skill', 'reset'):
+                self._emit('chat', dict(event, id=stream_id))
+            elif event['type'] == 'done':
+                done = event
+        reply = dict(done['reply'])
+        reply['timing'] = dict(done.get('timing') or {}, api=round((time.perf_counter() - start) * 1000, 1))
+        reply['trace_id'] = trace_id
+        return json.dumps(reply, ensure_ascii=False)
+
+    # --- Tracing / Metrics ---
+    def _observe_chat(self, trace_id, timing, server):
+        """Record the HTTP leg of a turn and the stages the server reported for it."""
+        record = self._tracer.record
+        if timing.get('total') is not None:
+            record('http.chat', timing['total'], trace_id)
+        if timing.get('first_token') is not None:
+            record('http.first_token', timing['first_token'], trace_id)
+        if not server:
+            return
+        for stage in ('queue', 'prefill', 'decode', 'parse'):
+            if server.get(f'{stage}_ms') is not None:
+                record(f'server.{stage}', server[f'{stage}_ms'], trace_id)
+        if server.get('total_ms') is not None and timing.get('total') is not None:
+            record('tunnel', max(timing['total'] - server['total_ms'], 0.0), trace_id)
+
+    def record_spans(self, spans_json):
+        """UI-side spans: [[trace_id, stage, ms], ...] from public/app.js."""
+        for trace_id, stage, ms in json.loads(spans_json):
+            self._tracer.record(str(stage), float(ms), trace_id or None)
+        return json.dumps({'success': True})
+
+    def get_metrics(self, include_server=False):
+        """p50/p95/p99 per stage (UI, AssistantAPI, HTTP, server) plus recent traces."""
+        out = {'local': self._tracer.snapshot()}
+        router = self._get_router()
+        if router.backends:
+            out['backends'] = router.summary()
+        best = router.best('/metrics')
+        if include_server and best is not None:
+            try:
+                response, _ = best.client.get('/metrics', timeout=5)
+                if response.ok:
+                    out['server'] = response.json()
+            except Exception as e:
+                out['server_error'] = str(e)
+        return json.dumps(out, ensure_ascii=False)
+
     # --- Health Check ---
     def check_health(self):
-        import requests
-        api_url = self._settings.get('apiUrl', '')
-        if not api_url:
+        """Connection status from the router's background probes; probes now
+        only if none has finished yet (right after launch or a settings change)."""
+        router = self._get_router()
+        if not router.backends:
             return json.dumps({'connected': False, 'message': '未設定'})
 
-        try:
-            response = requests.get(f'{api_url}/health', timeout=5)
-            if response.ok:
-                data = response.json()
-                return json.dumps({
-                    'connected': True,
-                    'message': f"已連線 - {data.get('model', 'AI Ready')}"
-                })
-        except:
-            pass
+        if all(b.checked is None for b in router.backends):
+            router.probe_all()
+        backends = router.summary()['backends']
+        up = [b for b in backends if b['healthy']]
+        if up:
+            best = router.best()
+            status = f"已連線 - {best.model or 'AI Ready'}"
+            if len(backends) > 1:
+                status += f'（{len(up)}/{len(backends)} 個後端，使用 {best.name}）'
+            return json.dumps({'connected': True, 'message': status, 'backends': backends}, ensure_ascii=False)
 
-        return json.dumps({'connected': False, 'message': '未連線 - 請啟動 Colab'})
+        return json.dumps({'connected': False, 'message': '未連線 - 請啟動 Colab', 'backends': backends},
+                          ensure_ascii=False)
 
     # --- Window Controls ---
     def close_window(self):
@@ -705,6 +1094,13 @@ class AssistantAPI:
 
 # ===== Launch =====
 if __name__ == '__main__':
+    if '--profile-startup' in sys.argv and not startup.profiling():
+        sys.exit(startup.profile_startup(__file__, ['--profile-startup']))
+
+    startup.mark('main.py imported', _T_START)
+    import webview
+    startup.mark('webview imported', _T_START)
+
     api = AssistantAPI()
 
     window = webview.create_window(
@@ -719,5 +1115,20 @@ if __name__ == '__main__':
         easy_drag=True,
         background_color='#0e0f14',
     )
-
-    webview.start(debug='--dev' in os.sys.argv)
+    api._window = window
+
+    def on_prewarmed(stats):
+        startup.mark('document libraries pre-warmed', _T_START)
+        if startup.profiling():
+            window.destroy()
+
+    def on_shown():
+        startup.mark('first window shown', _T_START)
+        startup.prewarm(on_done=on_prewarmed)
+        api.warm_telemetry()
+        if not startup.profiling():
+            api.warm_mcp()
+            threading.Thread(target=api.warm_listener, daemon=True).start()
+
+    window.events.shown += on_shown
+    webview.start(debug='--dev' in sys.argv)
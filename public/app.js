@@ -14,15 +14,23 @@ function createUnifiedAPI() {
       open_url: async (url) => { await window.electronAPI.openUrl(url); return JSON.stringify({ success: true, message: `已開啟: ${url}` }); },
       open_path: async (path) => { await window.electronAPI.openPath(path); return JSON.stringify({ success: true, message: `已開啟: ${path}` }); },
       run_command: async (cmd) => JSON.stringify(await window.electronAPI.runCommand(cmd)),
+      start_command: async (cmd, cwd) => JSON.stringify(await window.electronAPI.start_command(cmd, cwd)),
+      poll_command: async (id) => JSON.stringify(await window.electronAPI.poll_command(id)),
+      tail_command: async (id, since, limit) => JSON.stringify(await window.electronAPI.tail_command(id, since, limit)),
+      kill_command: async (id) => JSON.stringify(await window.electronAPI.kill_command(id)),
       clipboard_read: async () => JSON.stringify(await window.electronAPI.clipboardRead()),
       clipboard_write: async (text) => JSON.stringify(await window.electronAPI.clipboardWrite(text)),
       system_info: async () => JSON.stringify(await window.electronAPI.systemInfo()),
       create_docx: async (title, content) => JSON.stringify(await window.electronAPI.create_docx(title, content)),
-      create_ppt: async (title, slidesJson) => JSON.stringify(await window.electronAPI.create_ppt(title, slidesJson)),
+      create_ppt: async (title, slidesJson, theme) => JSON.stringify(await window.electronAPI.create_ppt(title, slidesJson, theme)),
       create_xlsx: async (title, dataJson) => JSON.stringify(await window.electronAPI.create_xlsx(title, dataJson)),
+      create_documents: async (title, content, formats, theme) => JSON.stringify(await window.electronAPI.create_documents(title, content, formats, theme)),
       write_file: async (filename, content) => JSON.stringify(await window.electronAPI.write_file(filename, content)),
-      read_file: async (filepath) => JSON.stringify(await window.electronAPI.read_file(filepath)),
-      list_files: async (directory) => JSON.stringify(await window.electronAPI.list_files(directory)),
+      read_file: async (filepath, offset, length) => JSON.stringify(await window.electronAPI.read_file(filepath, offset, length)),
+      read_lines: async (filepath, start, count) => JSON.stringify(await window.electronAPI.read_lines(filepath, start, count)),
+      tail_file: async (filepath, lines) => JSON.stringify(await window.electronAPI.tail_file(filepath, lines)),
+      list_files: async (directory, offset, limit, sort) => JSON.stringify(await window.electronAPI.list_files(directory, offset, limit, sort)),
+      search_files: async (query, kind, days, limit) => JSON.stringify(await window.electronAPI.search_files(query, kind, days, limit)),
       take_screenshot: async () => JSON.stringify(await window.electronAPI.take_screenshot()),
       get_datetime: async () => JSON.stringify(await window.electronAPI.get_datetime()),
       search_web: async (query) => JSON.stringify(await window.electronAPI.search_web(query)),
@@ -30,8 +38,12 @@ function createUnifiedAPI() {
       kill_process: async (name) => JSON.stringify(await window.electronAPI.kill_process(name)),
       set_volume: async (level) => JSON.stringify(await window.electronAPI.set_volume(level)),
       notify: async (title, message) => JSON.stringify(await window.electronAPI.notify(title, message)),
-      chat_with_ai: async (messagesJson, skillsJson) => await window.electronAPI.chat_with_ai(messagesJson, skillsJson),
+      run_plan: async (stepsJson) => JSON.stringify(await window.electronAPI.run_plan(stepsJson)),
+      mcp_tools: async () => JSON.stringify(await window.electronAPI.mcpTools()),
+      mcp_call: async (name, argsJson) => JSON.stringify(await window.electronAPI.mcpCall(name, argsJson)),
+      chat_with_ai: async (messagesJson, skillsJson, traceId) => await window.electronAPI.chat_with_ai(messagesJson, skillsJson, traceId),
       check_health: async () => await window.electronAPI.check_health(),
+      get_intent_table: async () => await window.electronAPI.get_intent_table(),
     };
   } else if (isPyWebView) {
     // PyWebView API (direct access)
@@ -55,6 +67,8 @@ async function waitForAPI() {
   });
 }
 
+const COMMAND_LINES = 200; // output lines kept in a running command's message
+
 class DigitalAssistant {
   constructor() {
     this.api = null; // Unified API reference
@@ -65,7 +79,18 @@ class DigitalAssistant {
     this.ttsEnabled = true;
     this.lang = 'zh-TW';
     this.conversationHistory = [];
+    this.history = new HistoryManager();
+    this.mcpSkills = []; // tools of the MCP servers hosted by Python (assistant/mcp.py)
     this.isElectron = typeof window.electronAPI !== 'undefined';
+    this.streams = new Map(); // streamId -> { onDelta, onSkill, onReset }
+    this.jobs = new Map();    // jobId -> { resolve, el, label } for background documents
+    this.commands = new Map(); // cmdId -> { resolve, el, lines, next } for streamed run_command output
+    this.jobResults = new Map(); // 'done' events that arrived before submit_job returned
+    this.pendingSpans = [];      // [traceId, stage, ms] waiting for record_spans
+
+    // Python pushes events here via window.evaluate_js (see AssistantAPI._emit)
+    window.onAssistantEvent = (channel, payload) => this.onBackendEvent(channel, payload);
+    window.electronAPI?.onAssistantEvent?.((channel, payload) => this.onBackendEvent(channel, payload));
 
     this.start();
   }
@@ -84,12 +109,30 @@ class DigitalAssistant {
     this.apiUrl = await this.api.get_setting('apiUrl') || '';
     this.ttsEnabled = (await this.api.get_setting('tts')) !== 'off';
     this.lang = await this.api.get_setting('lang') || 'zh-TW';
+    this.history.setBudget(Number(await this.api.get_setting('historyTokenBudget')) || 0);
+    this.intents = await IntentMatcher.load(this.api).catch(err => {
+      console.warn('local shortcuts disabled:', err);
+      return null;
+    });
 
     this.bindEvents();
     this.initSpeechRecognition();
+    this.refreshMcpSkills();
     if (this.apiUrl) this.checkConnection();
   }
 
+  // MCP tool schemas are cached by the backend; it sends an 'mcp' event
+  // when a server connects, restarts or changes its tools
+  async refreshMcpSkills() {
+    if (typeof this.api.mcp_tools !== 'function') return;
+    try {
+      const data = JSON.parse(await this.api.mcp_tools());
+      this.mcpSkills = data.skills || [];
+    } catch (err) {
+      console.warn('MCP tools unavailable:', err);
+    }
+  }
+
   // ===== Event Binding =====
   bindEvents() {
     // Window controls
@@ -150,37 +193,58 @@ class DigitalAssistant {
   }
 
   async startRecording() {
-    if (this.isRecording) return;
+    if (this.isRecording) {
+      // Second click ends the utterance early (push-to-talk release)
+      if (this.api.listen_stop) await this.api.listen_stop();
+      return;
+    }
     this.isRecording = true;
     const micBtn = document.getElementById('micBtn');
     micBtn.classList.add('recording');
     document.getElementById('textInput').value = '聆聽中...';
 
     try {
+      if (this.api.listen_start) {
+        // Background listener: transcripts arrive as 'speech' events
+        const result = JSON.parse(await this.api.listen_start(this.lang));
+        if (!result.success) this.onSpeechEvent({ type: 'final', pressed: true, text: '', error: result.error });
+        return;
+      }
       const raw = await this.api.start_listening(this.lang);
       const result = JSON.parse(raw);
-      this.isRecording = false;
-      micBtn.classList.remove('recording');
+      this.onSpeechEvent({ type: 'final', pressed: true, text: result.success ? result.text : '', error: result.error });
+    } catch (err) {
+      this.onSpeechEvent({ type: 'final', pressed: true, text: '', error: `語音辨識失敗: ${err.message || err}` });
+    }
+  }
 
-      if (result.success && result.text) {
-        document.getElementById('textInput').value = result.text;
-        this.sendMessage(result.text);
+  onSpeechEvent(event) {
+    const input = document.getElementById('textInput');
+    if (event.type === 'partial' && this.isRecording) {
+      input.value = event.text;
+    } else if (event.type === 'final') {
+      // Hands-free mode (listenMode=always) also delivers utterances nobody pressed for
+      if (!this.isRecording && !event.pressed && !event.text) return;
+      this.isRecording = false;
+      document.getElementById('micBtn').classList.remove('recording');
+      if (event.text) {
+        input.value = event.text;
+        this.sendMessage(event.text);
       } else {
-        document.getElementById('textInput').value = '';
-        if (result.error) {
-          this.addMessage('assistant', `語音辨識: ${result.error}`, true);
-        }
+        input.value = '';
+        if (event.error) this.addMessage('assistant', `語音辨識: ${event.error}`, true);
       }
-    } catch (err) {
+    } else if (event.type === 'error' || event.type === 'stopped') {
+      if (!this.isRecording) return;
       this.isRecording = false;
-      micBtn.classList.remove('recording');
-      document.getElementById('textInput').value = '';
-      this.addMessage('assistant', `語音辨識失敗: ${err.message || err}`, true);
+      document.getElementById('micBtn').classList.remove('recording');
+      input.value = '';
+      if (event.error) this.addMessage('assistant', event.error, true);
     }
   }
 
   stopRecording() {
-    // Python-side recording auto-stops after speech ends or timeout
+    // The listener closes the utterance itself after a pause (or on a second click)
   }
 
   // ===== TTS =====
@@ -197,11 +261,25 @@ class DigitalAssistant {
   async sendMessage(text) {
     if (!text) return;
     document.getElementById('textInput').value = '';
+    if (text === '/metrics') {
+      await this.showMetrics();
+      return;
+    }
 
     this.addMessage('user', text);
+    const trace = this.startTrace();
+    try {
+      await this.runTurn(text, trace);
+    } finally {
+      this.endTrace(trace);
+    }
+  }
 
+  async runTurn(text, trace) {
     // Check if it's a local skill command first
+    const start = performance.now();
     const skillResult = await this.tryLocalSkill(text);
+    this.traceSpan(trace, 'ui.local_skill', performance.now() - start);
     if (skillResult) {
       this.addMessage('assistant', skillResult.message, skillResult.isSkill);
       this.speak(skillResult.speakText || skillResult.message);
@@ -209,24 +287,21 @@ class DigitalAssistant {
     }
 
     // Send to AI backend via Python
+    if (this.canStream()) {
+      await this.sendMessageStreaming(text, trace);
+      return;
+    }
+
     this.showTyping();
     try {
-      const reply = await this.callAI(text);
+      const reply = await this.callAI(text, trace);
       this.hideTyping();
 
       if (reply.skill) {
-        const result = await this.executeAISkill(reply.skill, reply.args);
+        const result = await this.runSkill(reply.skill, reply.args, trace);
         this.addMessage('assistant', reply.text + (result ? `\n<div class="skill-result">${result}</div>` : ''));
         this.speak(reply.text);
-        
-        // If fetch_news was executed, add result to conversation history
-        // Let AI decide what to do next based on the original user request
-        if (reply.skill === 'fetch_news' && result) {
-          this.conversationHistory.push({
-            role: 'assistant',
-            content: `已搜尋到以下資料：\n${result}`
-          });
-        }
+        this.recordSkillResult(reply.skill, result);
       } else {
         this.addMessage('assistant', reply.text || reply);
         this.speak(reply.text || reply);
@@ -237,82 +312,199 @@ class DigitalAssistant {
     }
   }
 
-  // ===== Local Skill Detection =====
-  async tryLocalSkill(text) {
-    const lower = text.toLowerCase();
-
-    const launchPatterns = [
-      { patterns: ['開啟記事本', '打開記事本', 'open notepad'], app: 'notepad', name: '記事本' },
-      { patterns: ['開啟計算機', '打開計算機', 'open calculator'], app: 'calculator', name: '計算機' },
-      { patterns: ['開啟檔案總管', '打開檔案總管', 'open explorer'], app: 'explorer', name: '檔案總管' },
-      { patterns: ['開啟瀏覽器', '打開瀏覽器', 'open browser'], app: 'browser', name: '瀏覽器' },
-      { patterns: ['開啟vscode', '打開vscode', 'open vscode', '開啟編輯器'], app: 'vscode', name: 'VSCode' },
-      { patterns: ['開啟終端', '打開終端', 'open terminal'], app: 'terminal', name: '終端機' },
-      { patterns: ['開啟discord', '打開discord'], app: 'discord', name: 'Discord' },
-      { patterns: ['開啟spotify', '打開spotify'], app: 'spotify', name: 'Spotify' },
-    ];
+  // Streaming variant: text is rendered as it arrives and the skill starts
+  // as soon as its args are complete, while the rest of the reply streams in.
+  async sendMessageStreaming(text, trace) {
+    this.showTyping();
+    let content = null;
+    let shown = '';
+    let skillRun = null;
+
+    const render = (delta) => {
+      if (!content) {
+        this.hideTyping();
+        content = this.addMessage('assistant', '');
+      }
+      shown += delta;
+      content.textContent = shown;
+      this.scrollToBottom();
+    };
+    const startSkill = (skill, args) => {
+      if (!skillRun) skillRun = { skill, promise: this.runSkill(skill, args, trace) };
+    };
+    // The backend dropped mid-reply and another one starts over
+    const reset = () => {
+      shown = '';
+      if (content) content.textContent = '';
+    };
 
-    for (const item of launchPatterns) {
-      if (item.patterns.some(p => lower.includes(p))) {
-        await this.api.launch_app(item.app);
-        return { message: `已為你開啟 ${item.name}`, speakText: `已開啟${item.name}`, isSkill: true };
+    try {
+      const reply = await this.callAIStream(text, render, startSkill, trace, reset);
+      if (reply.skill) startSkill(reply.skill, reply.args);
+      if (!content) render('');
+
+      const finalText = reply.text || (reply.skill ? `正在執行: ${reply.skill}` : '');
+      if (!skillRun) {
+        content.textContent = finalText;
+        this.speak(finalText);
+        return;
       }
+      this.speak(finalText);
+      const result = await skillRun.promise;
+      content.innerHTML = this.escapeHtml(finalText) + (result ? `\n<div class="skill-result">${result}</div>` : '');
+      this.scrollToBottom();
+      this.recordSkillResult(skillRun.skill, result);
+    } catch (err) {
+      this.hideTyping();
+      this.addMessage('assistant', `[Error]無法連線到 AI 後端。\n${err.message || err}\n\n請確認 Colab 是否已啟動。`);
     }
+  }
 
-    if (['系統狀態', '系統資訊', 'system info', '電腦狀態'].some(p => lower.includes(p))) {
-      const raw = await this.api.system_info();
-      const result = JSON.parse(raw);
-      const info = JSON.parse(result.message);
-      const msg = `系統資訊\n主機: ${info.hostname}\nCPU: ${info.cpus} 核心\n記憶體: ${info.freeMemory || '?'} / ${info.totalMemory || '?'}`;
-      return { message: msg, speakText: `你的電腦有${info.cpus}個CPU核心`, isSkill: true };
-    }
+  // ===== Tracing =====
+  // One trace id per turn; it goes to chat_with_ai / stream_chat (and from
+  // there to /chat as X-Trace-Id). UI-side spans are batched and handed to
+  // AssistantAPI.record_spans when the turn ends. See assistant/tracing.py.
+  startTrace() {
+    return { id: Date.now().toString(16) + Math.random().toString(16).slice(2, 10), start: performance.now() };
+  }
 
-    if (['讀取剪貼簿', '剪貼簿內容', 'clipboard', '貼上內容'].some(p => lower.includes(p))) {
-      const raw = await this.api.clipboard_read();
-      const result = JSON.parse(raw);
-      return { message: `剪貼簿內容:\n${result.message || '(空)'}`, speakText: '已讀取剪貼簿', isSkill: true };
-    }
+  traceSpan(trace, stage, ms) {
+    if (trace) this.pendingSpans.push([trace.id, stage, Math.round(ms * 100) / 100]);
+  }
 
-    // Screenshot
-    if (['截圖', '螢幕截圖', 'screenshot', '截取畫面'].some(p => lower.includes(p))) {
-      const raw = await this.api.take_screenshot();
-      const result = JSON.parse(raw);
-      return { message: result.message, speakText: '已截圖', isSkill: true };
+  endTrace(trace) {
+    this.traceSpan(trace, 'ui.turn', performance.now() - trace.start);
+    if (!this.api.record_spans) {
+      this.pendingSpans = [];
+      return;
     }
+    const spans = JSON.stringify(this.pendingSpans);
+    this.pendingSpans = [];
+    Promise.resolve(this.api.record_spans(spans)).catch(() => {});
+  }
 
-    // Date/Time
-    if (['現在幾點', '目前時間', '今天日期', '幾號', 'what time', 'what date', '現在時間'].some(p => lower.includes(p))) {
-      const raw = await this.api.get_datetime();
-      const result = JSON.parse(raw);
-      const info = JSON.parse(result.message);
-      return { message: info.full, speakText: info.full, isSkill: true };
-    }
+  // Bridge cost = JS-observed round trip minus the time Python says it spent
+  traceBridge(trace, start, data) {
+    const pyMs = data && data.timing && data.timing.api;
+    if (typeof pyMs === 'number') this.traceSpan(trace, 'ui.bridge', Math.max(performance.now() - start - pyMs, 0));
+  }
 
-    // Search web (but NOT if user wants to create presentation/document)
-    // If user says "搜尋XX然後做成簡報/文件"， let AI handle it with fetch_news
-    if (!text.match(/(?:然後|再|接著|並|且).*(?:做成|製作|建立|產生).*(?:簡報|文件|報告|PPT|Word|Excel)/i)) {
-      const searchMatch = text.match(/(?:搜尋|搜索|查詢|search|幫我查|幫我搜)\s*(.+)/i);
-      if (searchMatch) {
-        await this.api.search_web(searchMatch[1]);
-        return { message: `已搜尋: ${searchMatch[1]}`, speakText: `已搜尋${searchMatch[1]}`, isSkill: true };
-      }
+  async runSkill(skill, args, trace) {
+    const start = performance.now();
+    try {
+      return await this.executeAISkill(skill, args);
+    } finally {
+      this.traceSpan(trace, `ui.skill.${skill}`, performance.now() - start);
     }
+  }
 
-    // List files
-    if (['列出檔案', '檔案列表', 'list files', '查看檔案'].some(p => lower.includes(p))) {
-      const raw = await this.api.list_files('');
-      const result = JSON.parse(raw);
-      return { message: `工作目錄檔案:\n${result.message}`, speakText: '已列出檔案', isSkill: true };
+  async showMetrics() {
+    if (!this.api.get_metrics) {
+      this.addMessage('assistant', '此版本不支援延遲統計', true);
+      return;
     }
+    const data = JSON.parse(await this.api.get_metrics(true));
+    const table = (title, snapshot) => {
+      const rows = Object.entries((snapshot && snapshot.stages) || {});
+      if (!rows.length) return `${title}: (尚無資料)`;
+      const width = Math.max(...rows.map(([name]) => name.length), 5);
+      const fmt = (v) => (v == null ? '-' : v.toFixed(1)).padStart(9);
+      return [`${title}`, `${'stage'.padEnd(width)}      n       p50       p95`,
+        ...rows.map(([name, s]) => `${name.padEnd(width)} ${String(s.count).padStart(6)}${fmt(s.p50)}${fmt(s.p95)}`)].join('\n');
+    };
+    let text = table('本機 (ms)', data.local);
+    if (data.server) text += '\n\n' + table('伺服器', data.server);
+    else if (data.server_error) text += `\n\n伺服器: ${data.server_error}`;
+    this.addMessage('assistant', `<div class="skill-result"><pre>${this.escapeHtml(text)}</pre></div>`);
+  }
 
-    // URL
-    const urlMatch = text.match(/(?:開啟|打開|open)\s*(https?:\/\/\S+)/i);
-    if (urlMatch) {
-      await this.api.open_url(urlMatch[1]);
-      return { message: `已開啟: ${urlMatch[1]}`, speakText: '已開啟連結', isSkill: true };
+  // If fetch_news was executed, add result to conversation history
+  // Let AI decide what to do next based on the original user request
+  // A plan's result lists every step and carries search results no later step used
+  recordSkillResult(skill, result) {
+    if (skill === 'fetch_news' && result) {
+      this.conversationHistory.push({
+        role: 'assistant',
+        content: `已搜尋到以下資料：\n${result}`
+      });
+    } else if (skill === 'run_plan' && result) {
+      this.conversationHistory.push({ role: 'assistant', content: `已執行計畫：\n${result}` });
     }
+  }
 
-    return null;
+  // system_info message: the latest sample plus the 5-minute average / peak
+  // from the telemetry sampler (older backends only send the memory strings)
+  formatSystemInfo(info) {
+    const latest = info.latest || {};
+    const win = (metric) => info.windows?.[metric]?.['5m'];
+    const pct = (v) => (v == null ? '?' : `${v}%`);
+    const lines = ['系統資訊', `主機: ${info.hostname}`];
+    const cpu = win('cpu');
+    lines.push(`CPU: ${info.cpus} 核心` + (latest.cpu != null
+      ? `，使用率 ${pct(latest.cpu)}` + (cpu ? `（5 分鐘平均 ${cpu.avg}%，最高 ${cpu.max}%）` : '')
+      : ''));
+    lines.push(`記憶體: ${info.freeMemory || '?'} 可用 / ${info.totalMemory || '?'}`
+      + (latest.memory != null ? `（已用 ${pct(latest.memory)}）` : ''));
+    if (latest.disk != null) lines.push(`磁碟: 已用 ${pct(latest.disk)}`);
+    if (latest.load != null) lines.push(`負載: ${latest.load}`);
+    return lines.join('\n');
+  }
+
+  // ===== Local Skill Detection =====
+  // One pass of the compiled intent table (intents.js) instead of a chain of
+  // includes()/regex checks; custom shortcuts from settings ride along.
+  async tryLocalSkill(text) {
+    const hit = this.intents && this.intents.match(text);
+    if (!hit) return null;
+    const { args } = hit;
+
+    switch (hit.skill) {
+      case 'launch_app': {
+        const name = hit.label || args.name;
+        await this.api.launch_app(args.name);
+        return { message: hit.reply || `已為你開啟 ${name}`, speakText: `已開啟${name}`, isSkill: true };
+      }
+      case 'system_info': {
+        const raw = await this.api.system_info();
+        const result = JSON.parse(raw);
+        const info = JSON.parse(result.message);
+        const cpu = info.latest?.cpu;
+        const speak = cpu != null ? `CPU使用率${Math.round(cpu)}%` : `你的電腦有${info.cpus}個CPU核心`;
+        return { message: this.formatSystemInfo(info), speakText: speak, isSkill: true };
+      }
+      case 'clipboard_read': {
+        const raw = await this.api.clipboard_read();
+        const result = JSON.parse(raw);
+        return { message: `剪貼簿內容:\n${result.message || '(空)'}`, speakText: '已讀取剪貼簿', isSkill: true };
+      }
+      case 'take_screenshot': {
+        const raw = await this.api.take_screenshot();
+        const result = JSON.parse(raw);
+        return { message: result.message, speakText: '已截圖', isSkill: true };
+      }
+      case 'get_datetime': {
+        const raw = await this.api.get_datetime();
+        const result = JSON.parse(raw);
+        const info = JSON.parse(result.message);
+        return { message: info.full, speakText: info.full, isSkill: true };
+      }
+      case 'search_web':
+        await this.api.search_web(args.query);
+        return { message: `已搜尋: ${args.query}`, speakText: `已搜尋${args.query}`, isSkill: true };
+      case 'list_files': {
+        const raw = await this.api.list_files('');
+        const result = JSON.parse(raw);
+        return { message: `工作目錄檔案:\n${result.message}`, speakText: '已列出檔案', isSkill: true };
+      }
+      case 'open_url':
+        await this.api.open_url(args.url);
+        return { message: `已開啟: ${args.url}`, speakText: '已開啟連結', isSkill: true };
+      default: {
+        // Custom shortcut bound to any other skill
+        const result = await this.executeAISkill(hit.skill, args);
+        return { message: hit.reply || result, speakText: hit.reply || hit.label || '已完成', isSkill: true };
+      }
+    }
   }
 
   // ===== AI Skill Execution =====
@@ -330,6 +522,9 @@ class DigitalAssistant {
           await this.api.open_path(args.path);
           return `已開啟 ${args.path}`;
         case 'run_command':
+          if (this.api.start_command) {
+            return await this.runCommandLive(args.command);
+          }
           raw = await this.api.run_command(args.command);
           return JSON.parse(raw).message;
         case 'clipboard_write':
@@ -343,25 +538,51 @@ class DigitalAssistant {
           return JSON.parse(raw).message;
         case 'create_ppt': {
           const slidesStr = typeof args.slides_json === 'string' ? args.slides_json : JSON.stringify(args.slides_json);
+          if (this.api.submit_job) {
+            return await this.runJob('ppt', { title: args.title, slides_json: slidesStr, theme: args.theme || 'dark' }, '簡報');
+          }
           raw = await this.api.create_ppt(args.title, slidesStr, args.theme || 'dark');
           return JSON.parse(raw).message;
         }
         case 'create_docx':
+          if (this.api.submit_job) {
+            return await this.runJob('docx', { title: args.title, content: args.content }, '文件');
+          }
           raw = await this.api.create_docx(args.title, args.content);
           return JSON.parse(raw).message;
         case 'create_xlsx': {
           const dataStr = typeof args.data_json === 'string' ? args.data_json : JSON.stringify(args.data_json);
+          if (this.api.submit_job) {
+            return await this.runJob('xlsx', { title: args.title, data_json: dataStr }, '試算表');
+          }
           raw = await this.api.create_xlsx(args.title, dataStr);
           return JSON.parse(raw).message;
         }
+        case 'create_documents': {
+          const formats = Array.isArray(args.formats) ? args.formats.join(',') : (args.formats || 'pptx,docx');
+          if (this.api.submit_job) {
+            return await this.runJob('documents', { title: args.title, content: args.content, formats, theme: args.theme || 'dark' }, '文件');
+          }
+          raw = await this.api.create_documents(args.title, args.content, formats, args.theme || 'dark');
+          return JSON.parse(raw).message;
+        }
         case 'write_file':
           raw = await this.api.write_file(args.filename, args.content);
           return JSON.parse(raw).message;
         case 'read_file':
-          raw = await this.api.read_file(args.filepath);
+          raw = await this.api.read_file(args.filepath, Number(args.offset) || 0, Number(args.length) || 10000);
+          return JSON.parse(raw).message;
+        case 'read_lines':
+          raw = await this.api.read_lines(args.filepath, Number(args.start) || 1, Number(args.count) || 100);
+          return JSON.parse(raw).message;
+        case 'tail_file':
+          raw = await this.api.tail_file(args.filepath, Number(args.lines) || 50);
           return JSON.parse(raw).message;
         case 'list_files':
-          raw = await this.api.list_files(args.directory || '');
+          raw = await this.api.list_files(args.directory || '', Number(args.offset) || 0, Number(args.limit) || 50, args.sort || '');
+          return JSON.parse(raw).message;
+        case 'search_files':
+          raw = await this.api.search_files(args.query, args.kind || '', Number(args.days) || 0, Number(args.limit) || 10);
           return JSON.parse(raw).message;
         case 'take_screenshot':
           raw = await this.api.take_screenshot();
@@ -384,7 +605,23 @@ class DigitalAssistant {
         case 'notify':
           raw = await this.api.notify(args.title, args.message);
           return JSON.parse(raw).message;
+        case 'tail_command': {
+          const n = Number(args.lines) || 50;
+          const tail = JSON.parse(await this.api.tail_command(args.id, -n, n));
+          return tail.success ? `${tail.message}\n（${tail.state}）`.trim() : tail.message;
+        }
+        case 'kill_command':
+          raw = await this.api.kill_command(args.id);
+          return JSON.parse(raw).message;
+        case 'run_plan':
+          // Several skills in one reply; independent steps run in parallel in Python
+          raw = await this.api.run_plan(JSON.stringify(args.steps || []));
+          return JSON.parse(raw).message;
         default:
+          if (this.mcpSkills.some((s) => s.name === skillName)) {
+            raw = await this.api.mcp_call(skillName, JSON.stringify(args || {}));
+            return JSON.parse(raw).message;
+          }
           return `未知技能: ${skillName}`;
       }
     } catch (err) {
@@ -392,6 +629,109 @@ class DigitalAssistant {
     }
   }
 
+  // ===== Background Jobs (PyWebView) =====
+  // Documents are built by AssistantAPI's job queue; progress arrives as 'job'
+  // events and the chat stays usable meanwhile. Resolves with the result message.
+  async runJob(kind, args, label) {
+    const submitted = JSON.parse(await this.api.submit_job(kind, JSON.stringify(args)));
+    if (!submitted.success) return submitted.message;
+    const id = submitted.id;
+
+    const el = this.addMessage('assistant', '');
+    el.innerHTML = `<div class="skill-result job-progress">
+      <div class="job-label">正在建立${label}…</div>
+      <div class="job-bar"><span></span></div>
+      <button class="job-cancel">取消</button>
+    </div>`;
+    el.querySelector('.job-cancel').addEventListener('click', () => this.api.cancel_job(id));
+
+    return new Promise((resolve) => {
+      this.jobs.set(id, { resolve, el, label });
+      const early = this.jobResults.get(id);
+      if (early) {
+        this.jobResults.delete(id);
+        this.onJobEvent(early);
+      }
+    });
+  }
+
+  onJobEvent(payload) {
+    const job = this.jobs.get(payload.id);
+    if (!job) {
+      if (payload.type === 'done') this.jobResults.set(payload.id, payload);
+      return;
+    }
+    if (payload.type === 'progress') {
+      const pct = Math.round(payload.progress * 100);
+      job.el.querySelector('.job-bar span').style.width = `${pct}%`;
+      job.el.querySelector('.job-label').textContent =
+        `正在建立${job.label}… ${pct}%${payload.stage ? ` · ${payload.stage}` : ''}`;
+    } else if (payload.type === 'done') {
+      this.jobs.delete(payload.id);
+      job.el.parentElement.remove();
+      job.resolve((payload.result && payload.result.message) || payload.state);
+    }
+  }
+
+  // ===== Background Commands =====
+  // run_command has no timeout: output streams into the message as 'command'
+  // events and the command can be stopped from there. Resolves with the last
+  // lines of output plus exit code and resource use once it ends.
+  async runCommandLive(command) {
+    const started = JSON.parse(await this.api.start_command(command, ''));
+    if (!started.success) return started.message;
+    const id = started.id;
+
+    const el = this.addMessage('assistant', '');
+    el.innerHTML = `<div class="skill-result job-progress">
+      <div class="job-label"></div>
+      <pre class="command-output"></pre>
+      <button class="job-cancel">終止</button>
+    </div>`;
+    el.querySelector('.job-label').textContent = `$ ${command}`;
+    el.querySelector('.job-cancel').addEventListener('click', () => this.api.kill_command(id));
+
+    const done = new Promise((resolve) => this.commands.set(id, { resolve, el, lines: [], partial: [], next: 0 }));
+    // Events sent before start_command returned were dropped: catch up from the buffer
+    const tail = JSON.parse(await this.api.tail_command(id, 0, COMMAND_LINES));
+    if (tail.success) this.appendCommandOutput(this.commands.get(id), tail.lines, tail.partial);
+    const status = JSON.parse(await this.api.poll_command(id));
+    if (status.success && status.state !== 'running') this.onCommandEvent({ ...status, type: 'exit' });
+    return await done;
+  }
+
+  // partial: {stream: line still being written}, e.g. a '\r' progress bar's latest state
+  appendCommandOutput(cmd, lines, partial) {
+    if (!cmd) return;
+    const fresh = lines.filter(([seq]) => seq >= cmd.next);
+    if (!fresh.length && !partial) return;
+    if (fresh.length) {
+      cmd.next = fresh[fresh.length - 1][0] + 1;
+      cmd.lines.push(...fresh.map(([, , text]) => text));
+      if (cmd.lines.length > COMMAND_LINES) cmd.lines.splice(0, cmd.lines.length - COMMAND_LINES);
+    }
+    if (partial) cmd.partial = Object.values(partial);
+    const pre = cmd.el.querySelector('.command-output');
+    pre.textContent = cmd.lines.concat(cmd.partial).join('\n');
+    pre.scrollTop = pre.scrollHeight;
+  }
+
+  onCommandEvent(payload) {
+    const cmd = this.commands.get(payload.id);
+    if (!cmd) return;
+    if (payload.type === 'output') {
+      this.appendCommandOutput(cmd, payload.lines, payload.partial);
+    } else if (payload.type === 'exit') {
+      this.commands.delete(payload.id);
+      cmd.el.parentElement.remove();
+      const usage = [`耗時 ${(payload.elapsed_ms / 1000).toFixed(1)} 秒`, `CPU ${(payload.cpu_ms / 1000).toFixed(1)} 秒`];
+      if (payload.peak_rss_kb) usage.push(`峰值記憶體 ${(payload.peak_rss_kb / 1024).toFixed(0)} MB`);
+      const status = payload.state === 'killed' ? '已終止' : `結束代碼 ${payload.returncode}`;
+      const output = cmd.lines.concat(cmd.partial).slice(-30).join('\n');
+      cmd.resolve(`${output}${output ? '\n' : ''}（${status}，${usage.join('，')}）`);
+    }
+  }
+
   // ===== Skill Button Execution =====
   async executeSkillButton(skill, arg) {
     switch (skill) {
@@ -403,10 +743,7 @@ class DigitalAssistant {
         const raw = await this.api.system_info();
         const result = JSON.parse(raw);
         const info = JSON.parse(result.message);
-        this.addMessage('assistant',
-          `系統資訊\n主機: ${info.hostname}\nCPU: ${info.cpus} 核心\n記憶體: ${info.freeMemory || '?'} / ${info.totalMemory || '?'}`,
-          true
-        );
+        this.addMessage('assistant', this.formatSystemInfo(info), true);
         break;
       }
       case 'clipboard-read': {
@@ -446,27 +783,38 @@ class DigitalAssistant {
   }
 
   // ===== AI Backend Communication =====
-  async callAI(userMessage) {
+  pushUserMessage(userMessage) {
     this.conversationHistory.push({ role: 'user', content: userMessage });
 
-    if (this.conversationHistory.length > 40) {
-      this.conversationHistory = this.conversationHistory.slice(-40);
+    // Keep the prompt under the token budget (see history.js)
+    const { messages, stats } = this.history.compact(this.conversationHistory);
+    this.conversationHistory = messages;
+    if (stats.saved > 0) {
+      console.info(`history: ${stats.before} -> ${stats.after} tokens (saved ${stats.saved})`);
     }
+  }
 
+  getSkillSchemas() {
     const skills = [
       { name: 'launch_app', description: '啟動應用程式', params: { name: 'string' } },
       { name: 'open_url', description: '開啟網址', params: { url: 'string' } },
       { name: 'open_path', description: '開啟檔案或資料夾', params: { path: 'string' } },
-      { name: 'run_command', description: '執行系統指令', params: { command: 'string' } },
+      { name: 'run_command', description: '執行系統指令(沒有時間限制，輸出會即時顯示)', params: { command: 'string' } },
+      { name: 'tail_command', description: '查看背景指令(例如 cmd1)最近的輸出與狀態', params: { id: 'string', lines: 'number(預設50)' } },
+      { name: 'kill_command', description: '終止背景指令', params: { id: 'string' } },
       { name: 'clipboard_write', description: '寫入剪貼簿', params: { text: 'string' } },
       { name: 'clipboard_read', description: '讀取剪貼簿', params: {} },
-      { name: 'system_info', description: '取得系統資訊', params: {} },
+      { name: 'system_info', description: '取得系統資訊與 CPU／記憶體／磁碟使用率（含 1、5、15 分鐘 min/avg/max）', params: {} },
       { name: 'create_ppt', description: '建立PowerPoint簡報。theme可選: dark(科技), corporate(商務白底), nature(自然綠), warm(暖色), ocean(海洋藍), minimal(極簡黑白)。根據主題自動選擇最適合的theme。', params: { title: 'string', slides_json: '[{"title":"...","content":"..."}]', theme: 'string' } },
       { name: 'create_docx', description: '建立Word文件', params: { title: 'string', content: 'string' } },
-      { name: 'create_xlsx', description: '建立Excel試算表', params: { title: 'string', data_json: '[["col1","col2"],["val1","val2"]]' } },
+      { name: 'create_xlsx', description: '建立Excel試算表', params: { title: 'string', data_json: '[["col1","col2"],["val1","val2"]] 或 .csv/.ndjson 檔案路徑' } },
+      { name: 'create_documents', description: '同一份內容一次輸出多種格式(簡報/Word/Excel表格/Markdown/網頁)，content 格式同 create_docx，表格用 | 欄 | 欄 |', params: { title: 'string', content: 'string', formats: 'pptx,docx,xlsx,md,html (逗號分隔)', theme: 'string' } },
       { name: 'write_file', description: '寫入文字檔案', params: { filename: 'string', content: 'string' } },
-      { name: 'read_file', description: '讀取檔案內容', params: { filepath: 'string' } },
-      { name: 'list_files', description: '列出目錄中的檔案', params: { directory: 'string' } },
+      { name: 'read_file', description: '讀取檔案內容(大檔案可分段：offset為位元組位置，負數從結尾算)', params: { filepath: 'string', offset: 'number(預設0)', length: 'number(預設10000)' } },
+      { name: 'read_lines', description: '讀取檔案指定行(行號從1開始，負數從結尾算)', params: { filepath: 'string', start: 'number', count: 'number(預設100)' } },
+      { name: 'tail_file', description: '讀取檔案最後幾行(適合查看日誌)', params: { filepath: 'string', lines: 'number(預設50)' } },
+      { name: 'list_files', description: '列出目錄中的檔案(分頁；工作目錄預設由新到舊)', params: { directory: 'string(空白=工作目錄)', offset: 'number(預設0)', limit: 'number(預設50)', sort: 'name|mtime|size|kind' } },
+      { name: 'search_files', description: '全文搜尋工作目錄中的檔案(含簡報/Word/Excel內文)', params: { query: 'string', kind: 'ppt|doc|sheet|text|image(可省略)', days: 'number(只找最近N天，可省略)' } },
       { name: 'take_screenshot', description: '截取螢幕截圖', params: {} },
       { name: 'get_datetime', description: '取得目前日期時間', params: {} },
       { name: 'search_web', description: '用瀏覽器搜尋網頁', params: { query: 'string' } },
@@ -474,16 +822,73 @@ class DigitalAssistant {
       { name: 'kill_process', description: '終止指定程序', params: { process_name: 'string' } },
       { name: 'set_volume', description: '設定系統音量(0-100)', params: { level: 'number' } },
       { name: 'notify', description: '發送Windows桌面通知', params: { title: 'string', message: 'string' } },
+      { name: 'run_plan', description: '一次執行多個技能(互不相依的步驟會平行執行)。步驟可用 after 指定前置步驟，參數字串中的 ${id} 會換成該步驟結果；create_ppt 的 slides_json 或 create_docx/create_documents 的 content 設為 {"from":["id",...]} 會以搜尋結果自動產生內容', params: { steps: '[{"id":"a","skill":"fetch_news","args":{"query":"..."}},{"id":"b","skill":"create_ppt","after":["a"],"args":{"title":"...","slides_json":{"from":["a"]}}}]' } },
     ];
+    return skills.concat(this.mcpSkills);
+  }
+
+  async callAI(userMessage, trace) {
+    this.pushUserMessage(userMessage);
 
     // Call backend which handles the HTTP request to Colab
+    const start = performance.now();
     const rawResponse = await this.api.chat_with_ai(
       JSON.stringify(this.conversationHistory),
-      JSON.stringify(skills)
+      JSON.stringify(this.getSkillSchemas()),
+      trace ? trace.id : ''
     );
 
-    let data = typeof rawResponse === 'string' ? JSON.parse(rawResponse) : rawResponse;
+    const data = this.normalizeReply(typeof rawResponse === 'string' ? JSON.parse(rawResponse) : rawResponse);
+    this.traceBridge(trace, start, data);
+    this.conversationHistory.push({ role: 'assistant', content: data.text || '' });
+    return data;
+  }
+
+  canStream() {
+    return !this.isElectron && typeof this.api.stream_chat === 'function';
+  }
+
+  async callAIStream(userMessage, onDelta, onSkill, trace, onReset = () => {}) {
+    this.pushUserMessage(userMessage);
+
+    const streamId = `s${Date.now()}${Math.random().toString(36).slice(2, 6)}`;
+    this.streams.set(streamId, { onDelta, onSkill, onReset });
+    try {
+      const start = performance.now();
+      const rawResponse = await this.api.stream_chat(
+        streamId,
+        JSON.stringify(this.conversationHistory),
+        JSON.stringify(this.getSkillSchemas()),
+        trace ? trace.id : ''
+      );
+      const data = this.normalizeReply(typeof rawResponse === 'string' ? JSON.parse(rawResponse) : rawResponse);
+      this.traceBridge(trace, start, data);
+      this.conversationHistory.push({ role: 'assistant', content: data.text || '' });
+      return data;
+    } finally {
+      this.streams.delete(streamId);
+    }
+  }
 
+  onBackendEvent(channel, payload) {
+    if (channel === 'chat') {
+      const stream = this.streams.get(payload.id);
+      if (!stream) return;
+      if (payload.type === 'delta') stream.onDelta(payload.text);
+      else if (payload.type === 'skill') stream.onSkill(payload.skill, payload.args || {});
+      else if (payload.type === 'reset') stream.onReset();
+    } else if (channel === 'job') {
+      this.onJobEvent(payload);
+    } else if (channel === 'speech') {
+      this.onSpeechEvent(payload);
+    } else if (channel === 'command') {
+      this.onCommandEvent(payload);
+    } else if (channel === 'mcp') {
+      this.refreshMcpSkills();
+    }
+  }
+
+  normalizeReply(data) {
     // Colab double-wraps: data.text may itself be a JSON string - unwrap it
     if (data.text && typeof data.text === 'string' && data.text.trimStart().startsWith('{')) {
       try {
@@ -512,7 +917,6 @@ class DigitalAssistant {
     // Empty string skill = no skill
     if (!data.skill) data.skill = null;
 
-    this.conversationHistory.push({ role: 'assistant', content: data.text || '' });
     return data;
   }
 
@@ -557,6 +961,12 @@ class DigitalAssistant {
     div.appendChild(content);
     container.appendChild(div);
     container.scrollTop = container.scrollHeight;
+    return content;
+  }
+
+  scrollToBottom() {
+    const container = document.getElementById('chatContainer');
+    container.scrollTop = container.scrollHeight;
   }
 
   showTyping() {
@@ -0,0 +1,130 @@
+// ===== Token-budgeted conversation history (UI side of assistant/history.py) =====
+// Keeps conversationHistory under a token budget instead of a fixed message
+// count: old fetch_news results are shrunk to titles + links, old turns are
+// rolled into one summary message, and turns are dropped only as a last
+// resort. Compaction goes down to a low-water mark so the rewritten prefix
+// stays stable for several turns. Keep in sync with assistant/history.py.
+
+const HISTORY_DEFAULTS = {
+  budget: 6000,          // approx. tokens for the whole history
+  keepRecent: 6,         // newest messages that are never shrunk or rolled
+  maxMessages: 20,       // the server only reads the last 20 messages
+  lowWater: 0.75,        // compact to 75% of the budget / message cap once triggered
+  summaryMaxLines: 30,
+  summaryLineChars: 80,
+};
+
+const TOOL_PREFIX = '已搜尋到以下資料';
+const SHRUNK_MARK = '（內文已省略）';
+const SUMMARY_PREFIX = '（先前對話摘要）';
+const CJK_RE = /[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]/g;
+
+class HistoryManager {
+  constructor(options = {}) {
+    this.opts = { ...HISTORY_DEFAULTS, ...options };
+  }
+
+  setBudget(budget) {
+    if (budget > 0) this.opts.budget = budget;
+  }
+
+  // ~1 token per CJK char, ~4 chars per token otherwise, + template overhead
+  static estimateTokens(text) {
+    text = text || '';
+    const cjk = (text.match(CJK_RE) || []).length;
+    return cjk + Math.ceil((text.length - cjk) / 4) + 4;
+  }
+
+  static isToolOutput(msg) {
+    return msg.role === 'assistant' && (msg.content || '').startsWith(TOOL_PREFIX);
+  }
+
+  static shrinkToolOutput(content) {
+    if (content.includes(SHRUNK_MARK)) return content;
+    const kept = [TOOL_PREFIX + SHRUNK_MARK];
+    for (let line of content.split('\n').slice(1)) {
+      line = line.trim();
+      if (/^\[\d+\]/.test(line) || line.startsWith('來源:')) kept.push(line);
+    }
+    return kept.join('\n');
+  }
+
+  summaryLine(msg) {
+    let content = msg.content || '';
+    const who = msg.role === 'user' ? '使用者' : '助理';
+    if (HistoryManager.isToolOutput(msg)) {
+      const titles = content.split('\n').filter(l => /^\s*\[\d+\]/.test(l)).map(l => l.trim());
+      content = '搜尋結果 ' + titles.map(t => t.split('] ').slice(1).join('] ') || t).join('；');
+    }
+    content = content.split(/\s+/).filter(Boolean).join(' ');
+    if (content.length > this.opts.summaryLineChars) {
+      content = content.slice(0, this.opts.summaryLineChars) + '…';
+    }
+    return `${who}: ${content}`;
+  }
+
+  static isSummary(msg) {
+    return (msg.content || '').startsWith(SUMMARY_PREFIX);
+  }
+
+  summaryMessage(lines) {
+    return { role: 'user', content: SUMMARY_PREFIX + '\n' + lines.slice(-this.opts.summaryMaxLines).join('\n') };
+  }
+
+  // Returns { messages, stats }; stats.saved = tokens removed by this call
+  compact(messages) {
+    const { budget, keepRecent, maxMessages, lowWater } = this.opts;
+    let msgs = messages.map(m => ({ ...m }));
+    const total = () => msgs.reduce((n, m) => n + HistoryManager.estimateTokens(m.content), 0);
+    const before = total();
+    const stats = { before, after: before, saved: 0, budget, shrunk: 0, summarized: 0, dropped: 0 };
+    if (before <= budget && msgs.length <= maxMessages) return { messages: msgs, stats };
+
+    const target = Math.floor(budget * lowWater);
+    const targetCount = Math.max(keepRecent + 1, Math.floor(maxMessages * lowWater));
+    const done = () => total() <= target && msgs.length <= targetCount;
+    const shrink = (list) => {
+      for (const m of list) {
+        if (HistoryManager.isToolOutput(m) && !m.content.includes(SHRUNK_MARK)) {
+          m.content = HistoryManager.shrinkToolOutput(m.content);
+          stats.shrunk++;
+        }
+      }
+    };
+
+    // 1. Shrink old tool outputs
+    shrink(msgs.slice(0, Math.max(0, msgs.length - keepRecent)));
+
+    // 2. Roll the oldest turns into the summary
+    if (!done()) {
+      let lines = [];
+      if (msgs.length && HistoryManager.isSummary(msgs[0])) {
+        lines = msgs.shift().content.split('\n').slice(1);
+      }
+      const headLen = Math.max(0, msgs.length - keepRecent);
+      const head = msgs.slice(0, headLen);
+      const tail = msgs.slice(headLen);
+      while (head.length) {
+        lines.push(this.summaryLine(head.shift()));
+        stats.summarized++;
+        msgs = [this.summaryMessage(lines), ...head, ...tail];
+        if (done()) break;
+      }
+      if (lines.length && !head.length) msgs = [this.summaryMessage(lines), ...tail];
+    }
+
+    // 3. Shrink recent tool outputs as well, except the latest message
+    if (!done()) shrink(msgs.slice(0, -1));
+
+    // 4. Last resort: drop turns after the summary, keeping the latest message
+    while (!done() && msgs.length > 1) {
+      if (HistoryManager.isSummary(msgs[0]) && msgs.length > 2) msgs.splice(1, 1);
+      else msgs.shift();
+      stats.dropped++;
+    }
+
+    stats.after = total();
+    stats.saved = before - stats.after;
+    return { messages: msgs, stats };
+  }
+}
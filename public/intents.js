@@ -0,0 +1,90 @@
+// ===== Local intent matching (UI side of assistant/intents.py) =====
+// Runs the Aho-Corasick table compiled by assistant/intents.py: one pass over
+// the message finds every trigger phrase, then the first-declared intent wins
+// (its captured argument and `unless` guard are checked the same way as in
+// Python). The table comes from AssistantAPI.get_intent_table() so custom
+// shortcuts from settings are included; intent_table.json is the built-in
+// fallback. Keep in sync with assistant/intents.py.
+
+function foldAscii(text) {
+  // Lower-case ASCII letters only, so offsets match the original text
+  return text.replace(/[A-Z]/g, c => String.fromCharCode(c.charCodeAt(0) + 32));
+}
+
+class IntentMatcher {
+  constructor(table) {
+    this.table = table;
+    this.hash = table.hash;
+    this.intents = table.intents;
+    this.patterns = table.patterns;
+    this.goto = table.goto;
+    this.fail = table.fail;
+    this.out = table.out;
+    this.regex = new Map();
+    for (const intent of this.intents) {
+      for (const key of ['arg_pattern', 'unless']) {
+        if (intent[key] && !this.regex.has(intent[key])) this.regex.set(intent[key], new RegExp(intent[key], 'i'));
+      }
+    }
+  }
+
+  static async load(api) {
+    try {
+      if (api && api.get_intent_table) {
+        const raw = await api.get_intent_table();
+        const table = typeof raw === 'string' ? JSON.parse(raw) : raw;
+        if (table && table.goto) return new IntentMatcher(table);
+      }
+    } catch (err) {
+      console.warn('intent table from backend unavailable:', err);
+    }
+    const res = await fetch('intent_table.json');
+    return new IntentMatcher(await res.json());
+  }
+
+  candidates(text) {
+    const { goto, fail, out, patterns } = this;
+    const found = [];
+    const folded = foldAscii(text);
+    let state = 0;
+    // Iterate UTF-16 code units: Python indexes code points, but every
+    // trigger phrase is BMP text, so the order of candidates is the same
+    for (let i = 0; i < folded.length; i++) {
+      const ch = folded[i];
+      while (state && !(ch in goto[state])) state = fail[state];
+      state = goto[state][ch] || 0;
+      for (const pid of out[state]) {
+        const [idx, length] = patterns[pid];
+        found.push([idx, i + 1 - length, i + 1]);
+      }
+    }
+    found.sort((a, b) => a[0] - b[0] || a[1] - b[1] || a[2] - b[2]);
+    return found;
+  }
+
+  match(text) {
+    const vetoed = new Set();
+    for (const [idx, start, end] of this.candidates(text)) {
+      if (vetoed.has(idx)) continue;
+      const intent = this.intents[idx];
+      if (intent.unless && this.regex.get(intent.unless).test(text)) {
+        vetoed.add(idx);
+        continue;
+      }
+      const args = { ...(intent.args || {}) };
+      if (intent.capture) {
+        let rest = text.slice(end);
+        if (intent.arg_pattern) {
+          const m = rest.match(this.regex.get(intent.arg_pattern));
+          if (!m) continue;
+          rest = m[1];
+        }
+        rest = rest.trim();
+        if (!rest) continue;
+        args[intent.capture] = rest;
+      }
+      return { intent: intent.id, skill: intent.skill, args, label: intent.label || '', reply: intent.reply || '', span: [start, end] };
+    }
+    return null;
+  }
+}
@@ -1,81 +1,49 @@
 /**
  * MCP (Model Context Protocol) Client
- * Connects to local MCP servers and exposes their tools as skills.
+ * Exposes the tools of local MCP servers as skills.
  *
- * MCP servers run as local processes and communicate via stdio or HTTP.
- * This client manages connections and translates MCP tools into assistant skills.
+ * The servers in src/mcp/mcp-config.json are hosted by the Python backend
+ * (assistant/mcp.py): it keeps one stdio or HTTP connection per server,
+ * connects them all at startup and caches their tool lists. This class is a
+ * thin view over that host through the assistant API (api.mcp_tools /
+ * api.mcp_call), so a tool call is one local round trip.
  */
 
 class MCPClient {
-  constructor() {
-    this.servers = new Map(); // serverId -> { config, tools, status }
+  constructor(api) {
+    this.api = api;       // window.pywebview.api, or app.js's Electron wrapper
+    this.skills = [];     // skill schemas for getSkillSchemas()
+    this.tools = [];      // [{ skill, server, tool }]
+    this.servers = {};    // serverId -> { name, status, tools, calls, ... }
   }
 
   /**
-   * Register an MCP server configuration.
-   * Config format:
-   * {
-   *   id: 'filesystem',
-   *   name: 'File System MCP',
-   *   command: 'npx',
-   *   args: ['-y', '@anthropic/mcp-filesystem'],
-   *   env: { ALLOWED_DIRS: 'C:\\Users' }
-   * }
+   * Fetch the cached tool lists and server status from the host.
+   * Call again when the backend sends an 'mcp' event (a server restarted
+   * or changed its tools).
    */
-  registerServer(config) {
-    this.servers.set(config.id, {
-      config,
-      tools: [],
-      status: 'registered',
-    });
+  async refresh() {
+    const data = JSON.parse(await this.api.mcp_tools());
+    this.skills = data.skills || [];
+    this.tools = data.tools || [];
+    this.servers = data.servers || {};
+    return this.skills;
   }
 
   /**
-   * Connect to an MCP server by starting its process.
-   * For MVP, we use HTTP-based MCP servers that expose /tools and /execute.
+   * Execute a tool on a specific MCP server.
    */
-  async connectServer(serverId) {
-    const server = this.servers.get(serverId);
-    if (!server) throw new Error(`MCP server not found: ${serverId}`);
-
-    server.status = 'connecting';
-
-    try {
-      // Start the MCP server process via Electron main process
-      const result = await window.electronAPI.runCommand(
-        `${server.config.command} ${(server.config.args || []).join(' ')}`
-      );
-
-      // For HTTP-based servers, discover tools
-      if (server.config.url) {
-        const response = await fetch(`${server.config.url}/tools`);
-        const data = await response.json();
-        server.tools = data.tools || [];
-      }
-
-      server.status = 'connected';
-      return server.tools;
-    } catch (err) {
-      server.status = 'error';
-      throw err;
-    }
+  async executeTool(serverId, toolName, args = {}) {
+    const entry = this.tools.find((t) => t.server === serverId && t.tool === toolName);
+    if (!entry) return { success: false, message: `MCP tool not found: ${serverId}/${toolName}` };
+    return this.executeSkill(entry.skill, args);
   }
 
   /**
-   * Execute a tool on a specific MCP server.
+   * Execute a tool by its skill name (mcp_<server>_<tool>).
    */
-  async executeTool(serverId, toolName, args = {}) {
-    const server = this.servers.get(serverId);
-    if (!server) throw new Error(`MCP server not found: ${serverId}`);
-    if (!server.config.url) throw new Error('MCP server has no URL endpoint');
-
-    const response = await fetch(`${server.config.url}/execute`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ tool: toolName, arguments: args }),
-    });
-
-    return response.json();
+  async executeSkill(skill, args = {}) {
+    return JSON.parse(await this.api.mcp_call(skill, JSON.stringify(args)));
   }
 
   /**
@@ -83,63 +51,24 @@ class MCPClient {
    * Returns them in a format suitable for the AI prompt.
    */
   getAllTools() {
-    const tools = [];
-    for (const [serverId, server] of this.servers) {
-      if (server.status !== 'connected') continue;
-      for (const tool of server.tools) {
-        tools.push({
-          server: serverId,
-          name: tool.name,
-          description: tool.description,
-          parameters: tool.inputSchema || tool.parameters || {},
-        });
-      }
-    }
-    return tools;
+    return this.skills;
   }
 
   /**
-   * Get status of all registered servers.
+   * Get status of all configured servers.
    */
   getStatus() {
     const status = {};
-    for (const [id, server] of this.servers) {
+    for (const [id, server] of Object.entries(this.servers)) {
       status[id] = {
-        name: server.config.name,
+        name: server.name,
         status: server.status,
-        toolCount: server.tools.length,
+        toolCount: server.tools,
+        error: server.error,
       };
     }
     return status;
   }
-
-  /**
-   * Load MCP server configs from a JSON file (like claude_desktop_config.json format).
-   */
-  async loadConfig(configPath) {
-    try {
-      const result = await window.electronAPI.runCommand(`type "${configPath}"`);
-      if (!result.success) return [];
-
-      const config = JSON.parse(result.message);
-      const servers = config.mcpServers || {};
-
-      for (const [id, serverConfig] of Object.entries(servers)) {
-        this.registerServer({
-          id,
-          name: serverConfig.name || id,
-          command: serverConfig.command,
-          args: serverConfig.args || [],
-          env: serverConfig.env || {},
-          url: serverConfig.url,
-        });
-      }
-
-      return Object.keys(servers);
-    } catch {
-      return [];
-    }
-  }
 }
 
 if (typeof module !== 'undefined') module.exports = MCPClient;
@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from assistant.documents import DocumentPipeline, output_stem
+
+
+def test_parallel_jobs_get_distinct_stems(tmp_path):
+    with ThreadPoolExecutor(8) as pool:
+        stems = list(pool.map(lambda _: output_stem(str(tmp_path), 'AI 報告', ['pptx']), range(8)))
+    assert len(set(stems)) == 8
+    assert all(s.startswith('AI_報告_') for s in stems)
+
+
+def test_existing_files_are_not_overwritten(tmp_path):
+    stem = output_stem(str(tmp_path), 'notes', ['md'])
+    (tmp_path / f'{stem}_2.html').write_text('keep')
+    (tmp_path / f'{stem}_3.md').write_text('keep')
+    for n in range(4, 6):   # later stems of the same second skip both
+        (tmp_path / f'{stem}_{n}.md').write_text('keep')
+    # a stem is only free when none of its formats exist
+    nxt = output_stem(str(tmp_path), 'notes', ['md', 'html'])
+    assert nxt not in (stem, f'{stem}_2', f'{stem}_3', f'{stem}_4', f'{stem}_5')
+
+
+def test_two_exports_in_the_same_second_keep_both(tmp_path):
+    pipeline = DocumentPipeline(max_workers=1)
+    first = pipeline.export('週報', '# 一\n內容', 'md,html', str(tmp_path))
+    second = pipeline.export('週報', '# 二\n內容', 'md,html', str(tmp_path))
+    paths = [f['path'] for f in first['files'] + second['files']]
+    assert len(set(paths)) == 4
+    assert '二' in open(second['files'][0]['path'], encoding='utf-8').read()
+    assert '一' in open(first['files'][0]['path'], encoding='utf-8').read()
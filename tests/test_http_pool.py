@@ -0,0 +1,53 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from urllib3.exceptions import ConnectTimeoutError
+
+from assistant.http_pool import PooledClient
+
+
+@pytest.fixture
+def gateway_error():
+    """Answers every request with a 503 and counts them per method."""
+    hits = {'GET': 0, 'POST': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _fail(self):
+            hits[self.command] += 1
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        do_GET = do_POST = _fail
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % server.server_address[1], hits
+    server.shutdown()
+
+
+def test_post_is_not_repeated_on_a_gateway_error(gateway_error):
+    url, hits = gateway_error
+    client = PooledClient(url, retries=2, backoff=0)
+    try:
+        assert client.post('/chat', json={'messages': []})[0].status_code == 503
+        assert hits['POST'] == 1
+        assert client.get('/health')[0].status_code == 503
+        assert hits['GET'] == 3
+    finally:
+        client.close()
+
+
+def test_post_is_retried_when_the_connection_fails():
+    client = PooledClient('http://127.0.0.1:9', retries=2, backoff=0)
+    retry = client.session.get_adapter(client.base_url).max_retries
+    # nothing was sent yet, so any method may try again
+    assert retry.increment(method='POST', url='/chat', error=ConnectTimeoutError()).connect == 1
+    client.close()
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'colab'))
+from json_grammar import JSONLogitsProcessor, TokenVocabulary, grammar_for, token_bytes  # noqa: E402
+
+SKILLS = [
+    {'name': 'open_url', 'params': {'url': 'string'}},
+    {'name': 'fetch_news', 'params': {'query': 'string', 'max_results': 'number(預設5)'}},
+    {'name': 'set_volume', 'params': {'level': 'number', 'mode': 'up|down'}},
+    {'name': 'create_ppt', 'params': {'title': 'string', 'slides_json': '[{"title":"...","content":"..."}]'}},
+]
+
+
+class FakeTokenizer:
+    def __init__(self, tokens, special=('<eos>',)):
+        self.vocab = {token: i for i, token in enumerate(list(special) + list(tokens))}
+        self.all_special_ids = list(range(len(special)))
+        self.eos_token_id = 0
+
+    def get_vocab(self):
+        return dict(self.vocab)
+
+
+def accepts(text, skills=SKILLS):
+    grammar = grammar_for(skills)
+    return grammar.is_done(grammar.feed(grammar.initial, text.encode('utf-8')))
+
+
+@pytest.mark.parametrize('text', [
+    '{"text": "你好", "skill": "", "args": {}}',
+    '{"text":"開啟網頁","skill":"open_url","args":{"url":"https://example.com"}}',
+    '{"text": "搜尋", "skill": "fetch_news", "args": {"query": "AI \\"晶片\\"", "max_results": 5}}',
+    '{"text": "", "skill": "set_volume", "args": {"mode": "down", "level": -1.5e2}}',
+    '{"text": "簡報", "skill": "create_ppt", "args": {"slides_json": [{"title": "a", "content": null}], "title": "t"}}',
+    '{\n  "text": "x",\n  "skill": "",\n  "args": {}\n}',
+])
+def test_accepts_valid_replies(text):
+    assert accepts(text)
+
+
+@pytest.mark.parametrize('text', [
+    'Sure! {"text": "hi", "skill": "", "args": {}}',                       # prose first
+    '```json\n{"text": "hi", "skill": "", "args": {}}',                    # fenced
+    '{"skill": "", "text": "hi", "args": {}}',                             # key order
+    '{"text": "hi", "skill": "rm_rf", "args": {}}',                        # unknown skill
+    '{"text": "hi", "skill": "", "args": {"x": 1}}',                       # no skill, no args
+    '{"text": "hi", "skill": "open_url", "args": {"path": "/"}}',          # param not in the schema
+    '{"text": "hi", "skill": "open_url", "args": {"url": 1}}',             # string param
+    '{"text": "hi", "skill": "fetch_news", "args": {"max_results": "5"}}',  # number param
+    '{"text": "hi", "skill": "set_volume", "args": {"mode": "loud"}}',     # enum param
+    '{"text": "hi", "skill": "", "args": {}} done',                        # trailing text
+    '{"text": "hi\nthere", "skill": "", "args": {}}',                      # raw control character
+])
+def test_rejects_invalid_replies(text):
+    grammar = grammar_for(SKILLS)
+    assert not grammar.is_done(grammar.feed(grammar.initial, text.encode('utf-8')))
+
+
+@pytest.mark.parametrize('text', [
+    '{"text": "說到一半',
+    '{"text": "搜尋", "skill": "fetch_news", "args": {"query": "AI", "max_results": 1',
+    '{"text": "a\\',
+    '{"text": "a", "skill": "set_volume", "args": {"level": -',
+    '{"text": "a", "skill": "create_ppt", "args": {"slides_json": [{"title": "x", "content": [1, {"k": tr',
+    '',
+])
+def test_completion_closes_a_truncated_reply(text):
+    grammar = grammar_for(SKILLS)
+    completed = text + grammar.completion(text)
+    assert accepts(completed)
+    reply = json.loads(completed)
+    assert list(reply) == ['text', 'skill', 'args']
+
+
+def test_completion_of_complete_or_broken_text_is_empty():
+    grammar = grammar_for(SKILLS)
+    assert grammar.completion('{"text": "hi", "skill": "", "args": {}}') == ''
+    assert grammar.completion('hello') == ''
+
+
+def test_byte_level_tokens_map_through_the_byte_alphabet():
+    # 'é' is bytes c3 a9, spelled 'Ã©' by byte-level BPE
+    tokenizer = FakeTokenizer(['Ġcaf', 'Ã©', 'ĠÃ©t'])
+    pieces, vocab = token_bytes(tokenizer), tokenizer.vocab
+    assert pieces[vocab['Ġcaf']] == b' caf'
+    assert pieces[vocab['Ã©']] == 'é'.encode('utf-8')
+    assert pieces[vocab['ĠÃ©t']] == ' ét'.encode('utf-8')
+
+
+def test_sentencepiece_tokens_keep_their_latin1_text():
+    tokenizer = FakeTokenizer(['▁café', 'é', '¿', '<0xE9>', 'Ġ'])
+    pieces = token_bytes(tokenizer)
+    assert pieces[tokenizer.vocab['▁café']] == ' café'.encode('utf-8')
+    assert pieces[tokenizer.vocab['é']] == 'é'.encode('utf-8')
+    assert pieces[tokenizer.vocab['¿']] == '¿'.encode('utf-8')
+    assert pieces[tokenizer.vocab['<0xE9>']] == b'\xe9'
+    assert 0 not in pieces   # special tokens are left out
+
+
+def test_processor_keeps_greedy_decoding_on_the_grammar():
+    torch = pytest.importorskip('torch')
+    tokens = ['{', '}', '"text"', '"skill"', '"args"', ':', ',', ' ', '"', '""', '{}', 'Ġhello', 'Sure', '```', '"open_url"']
+    tokenizer = FakeTokenizer(tokens)
+    vocab = TokenVocabulary(tokenizer)
+    grammar = grammar_for([{'name': 'open_url', 'params': {'url': 'string'}}])
+    processor = JSONLogitsProcessor([grammar], vocab)
+    preferred = [tokenizer.vocab[t] for t in ('Sure', '```', 'Ġhello', '}')]   # what a chatty model wants
+
+    ids = torch.tensor([[0, 0, 0]])   # prompt
+    text = b''
+    for _ in range(40):
+        scores = torch.zeros(1, len(tokenizer.vocab))
+        for rank, token_id in enumerate(preferred):
+            scores[0, token_id] = 10 - rank
+        scores = processor(ids, scores)
+        token_id = int(scores[0].argmax())
+        if token_id == tokenizer.eos_token_id:
+            break
+        text += vocab.pieces[token_id]
+        ids = torch.cat([ids, torch.tensor([[token_id]])], dim=1)
+    decoded = text.decode('utf-8')
+    assert not decoded.startswith(('Sure', '```'))
+    reply = json.loads(decoded + grammar.completion(decoded))
+    assert list(reply) == ['text', 'skill', 'args']
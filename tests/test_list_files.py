@@ -0,0 +1,20 @@
+import json
+import os
+
+import pytest
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason='needs symlinks')
+def test_unreadable_entries_do_not_fail_the_listing(tmp_path):
+    from main import AssistantAPI
+
+    (tmp_path / 'notes.txt').write_text('hello')
+    (tmp_path / 'sub').mkdir()
+    os.symlink(tmp_path / 'gone', tmp_path / 'broken')
+
+    out = json.loads(AssistantAPI().list_files(str(tmp_path), sort='size'))
+    assert out['success'] and out['total'] == 3
+    items = {i['name']: i for i in out['items']}
+    assert items['notes.txt']['size'] == 5
+    assert items['broken']['size'] is None
+    assert '[?] broken' in out['message']
@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+from array import array
+
+from assistant.listener import SAMPLE_RATE, SpeechListener
+
+FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000
+QUIET = array('h', [10, -10] * (FRAME_SAMPLES // 2)).tobytes()
+SPEECH = array('h', [3000, -3000] * (FRAME_SAMPLES // 2)).tobytes()
+
+
+class QueueSource:
+    """Frames pushed by the test; read() blocks for the next one."""
+
+    sample_rate = SAMPLE_RATE
+    frame_samples = FRAME_SAMPLES
+    frame_bytes = FRAME_SAMPLES * 2
+
+    def __init__(self):
+        self.frames = queue.Queue()
+        self.read_count = 0
+
+    def push(self, frame, n):
+        for _ in range(n):
+            self.frames.put(frame)
+
+    def read(self):
+        frame = self.frames.get()
+        self.read_count += 1
+        return frame
+
+    def close(self):
+        pass
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def make_listener(mode, recognizer, emit=None):
+    source = QueueSource()
+    events = []
+    listener = SpeechListener(source, emit=emit or events.append, recognizer=recognizer, mode=mode, partials=False)
+    listener.start()
+    source.push(QUIET, 20)   # calibration
+    return listener, source, events
+
+
+def speak(source):
+    source.push(SPEECH, 20)
+    source.push(QUIET, 30)   # longer than PAUSE_MS: the utterance closes
+
+
+def test_hands_free_final_does_not_answer_a_press():
+    gate = threading.Event()
+    texts = iter(['hands-free', 'pressed'])
+
+    def recognizer(pcm, rate, lang):
+        gate.wait(5)
+        return next(texts)
+
+    listener, source, events = make_listener('always', recognizer)
+    try:
+        speak(source)
+        assert wait_for(lambda: source.frames.empty() and listener.utterance is None and listener.stats['utterances'] == 0
+                        and any(e['type'] == 'speech_start' for e in events))
+        press = listener.press()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(listener.wait_final(press, timeout=5)))
+        waiter.start()
+        gate.set()
+        assert wait_for(lambda: any(e.get('text') == 'hands-free' for e in events))
+        assert not result
+        speak(source)
+        waiter.join(5)
+        assert result[0]['text'] == 'pressed' and result[0]['pressed']
+    finally:
+        gate.set()
+        source.push(b'', 1)
+        listener.stop()
+
+
+def test_release_without_speech_answers_the_press():
+    listener, source, events = make_listener('ptt', lambda pcm, rate, lang: 'x')
+    try:
+        press = listener.press()
+        listener.release()
+        final = listener.wait_final(press, timeout=1)
+        assert final['error'] and final['text'] == ''
+    finally:
+        source.push(b'', 1)
+        listener.stop()
+
+
+def test_events_are_emitted_outside_the_capture_lock():
+    held = []
+    listener = None
+
+    def emit(event):
+        acquired = listener._lock.acquire(timeout=1)   # would time out if this thread held it
+        held.append(not acquired)
+        if acquired:
+            listener._lock.release()
+
+    listener, source, _ = make_listener('ptt', lambda pcm, rate, lang: 'text', emit=emit)
+    try:
+        press = listener.press()
+        speak(source)
+        assert listener.wait_final(press, timeout=5)['text'] == 'text'
+        assert held and not any(held)
+    finally:
+        source.push(b'', 1)
+        listener.stop()
+
+
+def test_microphone_is_not_opened_at_launch_by_default():
+    from main import AssistantAPI
+
+    api = AssistantAPI()
+    api._settings = {}
+    api.warm_listener()
+    assert api._listener is None
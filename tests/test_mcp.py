@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from assistant.mcp import MCPHost, skill_name
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench', 'stub_mcp.py')
+STDIO = {'command': sys.executable, 'args': [STUB]}
+
+
+@pytest.fixture
+def host():
+    hosts = []
+
+    def make(servers):
+        hosts.append(MCPHost(servers).start())
+        assert hosts[-1].wait(20)
+        return hosts[-1]
+    yield make
+    for h in hosts:
+        h.close()
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_concurrent_calls_share_one_connection(host):
+    h = host({'stub': STDIO})
+    start = time.perf_counter()
+    with ThreadPoolExecutor(8) as pool:
+        replies = list(pool.map(lambda i: h.call('mcp_stub_sleep', {'ms': 300}), range(8)))
+    assert all(r == {'success': True, 'message': 'slept 300'} for r in replies)
+    assert time.perf_counter() - start < 8 * 0.3
+    assert h.call('mcp_stub_add', {'a': 2, 'b': 3})['message'] == '5'
+    assert h.call('mcp_stub_fail', {'message': 'nope'}) == {'success': False, 'message': 'nope'}
+
+
+def test_crashed_server_is_restarted(host):
+    h = host({'stub': STDIO})
+    assert not h.call('mcp_stub_crash', {}, timeout=5)['success']
+    assert wait_for(lambda: h.status()['stub']['status'] == 'connected' and h.status()['stub']['restarts'] == 1)
+    assert h.call('mcp_stub_echo', {'text': 'back'})['message'] == 'back'
+
+
+def test_list_changed_refreshes_the_cached_tools(host):
+    h = host({'stub': STDIO})
+    h.call('mcp_stub_add_tool', {'name': 'shout'})
+    assert wait_for(lambda: 'mcp_stub_shout' in {s['name'] for s in h.skills()})
+    assert h.call('mcp_stub_shout', {'text': 'hey'})['message'] == 'hey'
+
+
+def test_colliding_skill_names_are_disambiguated(host):
+    h = host({'a_b': STDIO, 'a': STDIO})
+    h.servers['a_b'].tools = [{'name': 'c'}]
+    h.servers['a'].tools = [{'name': 'b_c'}, {'name': 'echo'}]
+    h._server_changed(h.servers['a'])
+    names = {t['skill']: (t['server'], t['tool']) for t in h.tools()}
+    assert skill_name('a_b', 'c') not in names
+    assert names[skill_name('a_b', 'c', unique=True)] == ('a_b', 'c')
+    assert names[skill_name('a', 'b_c', unique=True)] == ('a', 'b_c')
+    assert names['mcp_a_echo'] == ('a', 'echo')   # no collision, no suffix
+
+
+def test_disabled_servers_are_not_started():
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'mcp', 'mcp-config.json')
+    with open(config, encoding='utf-8') as f:
+        shipped = json.load(f)['mcpServers']
+    assert MCPHost(shipped).servers == {}
+    assert list(MCPHost({'stub': STDIO, 'off': {**STDIO, 'disabled': True}}).servers) == ['stub']
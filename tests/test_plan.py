@@ -0,0 +1,40 @@
+import pytest
+
+from assistant.plan import PlanError, PlanRunner, parse_steps
+
+
+def test_shell_variables_are_not_step_references():
+    order = parse_steps([{'id': 'a', 'skill': 'run_command', 'args': {'command': 'echo ${HOME} ${PATH}'}}])
+    assert order[0]['after'] == []
+
+
+def test_step_references_imply_dependencies():
+    order = parse_steps([
+        {'id': 'b', 'skill': 'notify', 'args': {'title': '${a}', 'message': '${HOME}'}},
+        {'id': 'a', 'skill': 'get_datetime'},
+    ])
+    assert [s['id'] for s in order] == ['a', 'b']
+    assert order[1]['after'] == ['a']
+
+
+def test_missing_dependency_is_still_an_error():
+    with pytest.raises(PlanError):
+        parse_steps([{'id': 'a', 'skill': 'notify', 'after': ['nope']}])
+    with pytest.raises(PlanError):
+        parse_steps([{'id': 'a', 'skill': 'notify', 'args': {'message': {'from': ['nope']}}}])
+
+
+def test_unknown_placeholders_pass_through_to_the_skill():
+    calls = []
+
+    def call(skill, args):
+        calls.append((skill, args))
+        return {'success': True, 'message': 'ok' if skill == 'run_command' else 'done'}
+
+    result = PlanRunner(call).run([
+        {'id': 'a', 'skill': 'run_command', 'args': {'command': 'echo ${HOME}'}},
+        {'id': 'b', 'skill': 'notify', 'args': {'title': '${a} ${USER}'}},
+    ])
+    assert result['success']
+    assert calls[0] == ('run_command', {'command': 'echo ${HOME}'})
+    assert calls[1] == ('notify', {'title': 'ok ${USER}'})
@@ -0,0 +1,64 @@
+import sys
+import time
+
+from assistant.processes import ProcessManager, StreamDecoder
+
+
+def python(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_carriage_return_progress_shows_before_the_newline():
+    procs = ProcessManager()
+    cmd_id = procs.start(python("import sys, time; w = sys.stdout.write; w('10%'); sys.stdout.flush(); "
+                                "time.sleep(0.5); w(chr(13) + '100%' + chr(10)); sys.stdout.flush()"))
+    assert wait_for(lambda: procs.tail(cmd_id)['partial'].get('out') == '10%')
+    assert procs.tail(cmd_id)['lines'] == []
+    procs.wait(cmd_id, 10)
+    out = procs.tail(cmd_id)
+    assert [line[2] for line in out['lines']] == ['100%']
+    assert out['partial'] == {}
+
+
+def test_unterminated_last_line_is_kept():
+    procs = ProcessManager()
+    cmd_id = procs.start(python("import sys; sys.stdout.write('a' + chr(10) + 'b')"))
+    procs.wait(cmd_id, 10)
+    assert procs.text(cmd_id) == 'a\nb'
+
+
+def test_character_split_across_reads():
+    decoder = StreamDecoder()
+    raw = '進度完成'.encode('utf-8')
+    assert decoder.decode(raw[:4]) == '進'
+    assert decoder.decode(raw[4:8]) == '度'
+    assert decoder.decode(raw[8:]) == '完成'
+
+
+def test_character_split_across_writes():
+    procs = ProcessManager()
+    cmd_id = procs.start(python("import sys, time; raw = '中文'.encode('utf-8'); out = sys.stdout.buffer; "
+                                "out.write(raw[:2]); out.flush(); time.sleep(0.2); out.write(raw[2:]); out.flush()"))
+    procs.wait(cmd_id, 10)
+    assert procs.text(cmd_id) == '中文'
+
+
+def test_tail_command_lines_from_a_plan_step():
+    from main import AssistantAPI
+
+    api = AssistantAPI()
+    procs = api._get_procs()
+    cmd_id = procs.start(python("for i in range(10): print(i)"))
+    procs.wait(cmd_id, 10)
+    assert wait_for(lambda: procs.tail(cmd_id)['next'] == 10)
+    out = api._call_skill('tail_command', {'id': cmd_id, 'lines': 3})
+    assert out['message'] == '7\n8\n9'
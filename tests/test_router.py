@@ -0,0 +1,94 @@
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+from assistant.http_pool import PooledClient
+from assistant.llm_cache import ResponseCache
+from assistant.router import BackendRouter, parse_specs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+from stub_llm import StubLLM  # noqa: E402
+
+PAYLOAD = {'messages': [{'role': 'user', 'content': '你好'}], 'skills': []}
+
+
+class HangingServer:
+    """Accepts one request and never answers; records when the client hangs up."""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.closed = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.sock.getsockname()[1]
+
+    def _serve(self):
+        conn, _ = self.sock.accept()
+        with conn:
+            conn.settimeout(10)
+            try:
+                while conn.recv(65536):
+                    pass
+            except OSError:
+                pass
+        self.closed.set()
+
+
+@pytest.fixture
+def stub():
+    server = StubLLM(prefill_ms=0, tps=1e6).start()
+    yield server
+    server.stop()
+
+
+def test_hedge_loser_is_cancelled(stub):
+    slow = HangingServer()
+    router = BackendRouter(parse_specs(slow.url, [stub.url]), lambda url: PooledClient(url, retries=0), hedge_ms=50)
+    first, second = router.backends
+    first.latency['/chat'], second.latency['/chat'] = 1.0, 2.0   # rank the hanging server first
+    try:
+        backend, response, timing = router.request('POST', '/chat', json=PAYLOAD, timeout=10)
+        assert backend is second and response.ok and timing['hedged']
+        assert slow.closed.wait(2), 'the losing request was left running'
+        assert first.failures == 0   # aborting our own hedge is not the backend's fault
+    finally:
+        router.close()
+
+
+def test_failover_reply_is_cached_under_the_serving_model(stub):
+    from main import AssistantAPI
+
+    class API(AssistantAPI):
+        def __init__(self, settings):
+            super().__init__()
+            self._settings = settings
+            self._llm_cache = ResponseCache()   # in memory
+
+    primary = StubLLM(prefill_ms=0, tps=1e6, fail_rate=1.0).start()   # every chat fails with a 503
+    api = API({'apiUrl': primary.url, 'apiUrls': [stub.url], 'hedgeMs': 'off', 'probeInterval': 60})
+    try:
+        router = api._get_router()
+        router._stop.set()   # the background probe would put the stub's model name back
+        router._thread.join(5)
+        router.probe_all()
+        router.backends[0].model, router.backends[1].model = 'primary-model', 'fallback-model'
+        router.backends[0].latency['/chat'], router.backends[1].latency['/chat'] = 1.0, 2.0
+
+        reply = json.loads(api.chat_with_ai(json.dumps(PAYLOAD['messages']), '[]'))
+        assert reply['timing']['backend'] == router.backends[1].name
+
+        cache = api._llm_cache
+        messages, _ = api._compact_messages(PAYLOAD['messages'])
+        assert cache.get(cache.make_key(messages, [], 'primary-model')) is None
+        assert cache.get(cache.make_key(messages, [], 'fallback-model'))['text'] == reply['text']
+    finally:
+        api._reset_router()
+        primary.stop()
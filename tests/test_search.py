@@ -0,0 +1,46 @@
+import pytest
+
+from assistant.search import NewsSearcher, SearchCache, StaticBackend, normalize_query, query_variants
+
+
+@pytest.mark.parametrize('query, other', [
+    ('蘋果並購案', '蘋果'),
+    ('台灣再生能源政策', '台灣'),
+    ('申請美國簽證', '申 美國簽證'),
+    ('搜尋最新AI新聞然後做成簡報', '最新 AI 新聞'),
+])
+def test_different_queries_have_different_keys(query, other):
+    assert SearchCache.make_key('static', query, 5) != SearchCache.make_key('static', other, 5)
+
+
+def test_key_ignores_width_case_and_spacing():
+    assert SearchCache.make_key('static', 'ＡＩ  新聞', 5) == SearchCache.make_key('static', 'ai 新聞', 5)
+    assert normalize_query(' 最新  AI 新聞 ') == '最新 ai 新聞'
+
+
+@pytest.mark.parametrize('query', ['蘋果並購案', '台灣再生能源政策', '申請美國簽證', '再生醫學'])
+def test_words_are_not_split(query):
+    assert query_variants(query) == [normalize_query(query)]
+
+
+@pytest.mark.parametrize('query, core', [
+    ('請幫我搜尋最新AI新聞然後做成簡報', '最新ai新聞'),
+    ('最新 AI 新聞，並整理成報告', '最新 ai 新聞'),
+    ('查一下台積電相關', '台積電'),
+    ('搜尋電動車 再做成簡報', '電動車'),
+])
+def test_command_words_are_stripped_at_the_edges(query, core):
+    assert core in query_variants(query)
+
+
+def test_cache_separates_colliding_queries(tmp_path):
+    backend = StaticBackend(lambda query, n: [{'title': query, 'body': '', 'href': f'https://example.com/{query}'}])
+    searcher = NewsSearcher(backend=backend, cache_path=str(tmp_path / 'cache.db'))
+    try:
+        searcher.search('蘋果並購案', 3)
+        second = searcher.search('蘋果', 3)
+        assert not second['cached']
+        assert [r['title'] for r in second['results']] == ['蘋果']
+        assert searcher.search('蘋果並購案', 3)['cached']
+    finally:
+        searcher.close()
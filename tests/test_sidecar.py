@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import threading
+import time
+
+from assistant.sidecar import Sidecar
+
+
+class SlowAPI:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def wait(self):
+        self.release.wait(10)
+        return 'done'
+
+    def boom(self):
+        raise ValueError('nope')
+
+
+class Pipe(io.TextIOBase):
+    """stdin fed line by line from the test; iteration blocks for the next line."""
+
+    def __init__(self):
+        self.lines = []
+        self.cond = threading.Condition()
+
+    def put(self, message):
+        with self.cond:
+            self.lines.append(json.dumps(message) + '\n')
+            self.cond.notify()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.cond:
+            while not self.lines:
+                self.cond.wait()
+            return self.lines.pop(0)
+
+
+class Out(io.StringIO):
+    def replies(self):
+        return {m['id']: m for m in map(json.loads, self.getvalue().splitlines()) if 'id' in m}
+
+
+def test_ping_is_answered_while_every_worker_is_busy():
+    api, inp, out = SlowAPI(), Pipe(), Out()
+    sidecar = Sidecar(api, out, max_workers=2)
+    server = threading.Thread(target=sidecar.serve, args=(inp,), daemon=True)
+    server.start()
+    try:
+        for i in range(4):
+            inp.put({'id': i, 'method': 'wait'})
+        start = time.perf_counter()
+        inp.put({'id': 'p', 'method': 'ping'})
+        deadline = time.monotonic() + 2
+        while 'p' not in out.replies() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert time.perf_counter() - start < 1
+        pong = out.replies()['p']['result']
+        assert pong['pong'] and pong['pid'] == os.getpid() and pong['inflight'] == 4
+    finally:
+        api.release.set()
+        inp.put({'id': 's', 'method': 'shutdown'})
+        server.join(10)
+    replies = out.replies()
+    assert all(replies[i]['result'] == 'done' for i in range(4))
+
+
+def test_call_and_error_counts():
+    api, out = SlowAPI(), Out()
+    api.release.set()
+    sidecar = Sidecar(api, out, max_workers=4)
+    inp = Pipe()
+    for i in range(20):
+        inp.put({'id': i, 'method': 'boom' if i % 2 else 'wait'})
+    inp.put({'id': 's', 'method': 'shutdown'})
+    sidecar.serve(inp)
+    assert sidecar.stats == {'calls': 20, 'errors': 10}
@@ -0,0 +1,88 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from assistant.streaming import ReplyStreamParser
+
+
+def feed_all(chunks):
+    parser = ReplyStreamParser()
+    events = [ev for chunk in chunks for ev in parser.feed(chunk)]
+    return events, parser.finish()
+
+
+def test_split_surrogate_pair_is_held_back():
+    events, reply = feed_all(['{"text": "hi \\ud83d', '\\ude00 ok", "skill": "", "args": {}}'])
+    deltas = [ev['text'] for ev in events if ev['type'] == 'delta']
+    assert deltas == ['hi ', '\U0001F600 ok']
+    assert reply['text'] == 'hi \U0001F600 ok'
+
+
+def test_char_by_char_deltas_rebuild_the_text():
+    raw = json.dumps({'text': '換行\n引號"斜線\\ é \U0001F600 \t結束', 'skill': '', 'args': {}})
+    for ensure_ascii in (True, False):
+        raw = json.dumps(json.loads(raw), ensure_ascii=ensure_ascii)
+        events, reply = feed_all(list(raw))
+        assert ''.join(ev['text'] for ev in events if ev['type'] == 'delta') == reply['text']
+        assert reply['text'] == json.loads(raw)['text']
+
+
+def test_text_is_decoded_once(monkeypatch):
+    import assistant.streaming as streaming
+
+    decoded = []
+    real_loads = json.loads
+
+    def loads(s, **kwargs):
+        decoded.append(len(s))
+        return real_loads(s, **kwargs)
+
+    monkeypatch.setattr(streaming.json, 'loads', loads)
+    text = 'x' * 2000
+    feed_all([c for c in '{"text": "' + text] + ['", "skill": "", "args": {}}'])
+    assert sum(decoded) < 10 * len(text)   # re-decoding the whole prefix each chunk would be ~2,000,000
+
+
+def test_plain_text_holds_back_a_high_surrogate():
+    events, _ = feed_all(['plain \ud83d', '\ude00!'])
+    assert [ev['text'] for ev in events] == ['plain ', '\ud83d\ude00!']
+
+
+def test_skill_is_emitted_once_args_close():
+    events, reply = feed_all(['{"text": "好", "skill": "open_url", "args": {"url": ', '"https://example.com"}}'])
+    assert events[-1] == {'type': 'skill', 'skill': 'open_url', 'args': {'url': 'https://example.com'}}
+    assert reply['skill'] == 'open_url'
+
+
+def test_malformed_sse_event_ends_the_turn_with_an_error():
+    from main import AssistantAPI
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{"status": "ok", "model": "test"}')
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            self.wfile.write(b'event: delta\ndata: {"delta": "{\\"text\\": \\"hi"}\n\n'
+                             b'event: delta\ndata: {not json\n\n')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api = AssistantAPI()
+    api._settings = {'apiUrl': 'http://127.0.0.1:%d' % server.server_address[1], 'llmCache': 'off'}
+    try:
+        events = list(api.chat_with_ai_stream(json.dumps([{'role': 'user', 'content': 'hi'}]), '[]'))
+        assert events[-1]['type'] == 'done'
+        assert events[-1]['reply']['text'].startswith('[Error]')
+    finally:
+        api._reset_router()
+        server.shutdown()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from assistant.telemetry import HISTORY, Sampler, Series, _Source, history_size
+
+
+class FakeSource(_Source):
+    """CPU counters that advance on every read; memory fails until fixed."""
+
+    def __init__(self):
+        super().__init__()
+        self.ticks = 0
+        self.broken = True
+        self.active = 0
+        self.overlapped = False
+
+    def cpu_times(self):
+        self.active += 1
+        self.overlapped |= self.active > 1
+        time.sleep(0.001)
+        self.ticks += 100
+        self.active -= 1
+        return self.ticks // 2, self.ticks
+
+    def memory(self):
+        if self.broken:
+            raise ValueError('unexpected /proc/meminfo format')
+        return 1000, 250
+
+
+def test_history_covers_the_longest_window_at_any_interval():
+    for interval in (0.2, 0.5, 2.0, 5.0):
+        sampler = Sampler(interval=interval, source=FakeSource())
+        assert sampler.series['cpu'].size * sampler.interval >= HISTORY
+    series = Series(history_size(0.5))
+    for i in range(series.size):
+        series.append(1000.0 + i * 0.5, float(i))
+    assert series.window(HISTORY, now=1000.0 + (series.size - 1) * 0.5)['n'] == series.size
+
+
+def test_a_failing_metric_does_not_stop_the_others(caplog):
+    source = FakeSource()
+    sampler = Sampler(interval=0.2, source=source)
+    with caplog.at_level('WARNING', logger='assistant.telemetry'):
+        reading = sampler.sample()
+        sampler.sample()
+    assert 'memory' not in reading and 'cpu' in reading and 'disk' in reading
+    assert 'memory' in source.errors
+    assert len([r for r in caplog.records if 'memory' in r.getMessage()]) == 1   # logged once, not per tick
+    source.broken = False
+    assert sampler.sample()['memory'] == 75.0
+    assert source.errors == {}
+
+
+def test_the_sampling_thread_survives_a_broken_source():
+    class Broken(FakeSource):
+        def read(self):
+            raise RuntimeError('boom')
+
+    sampler = Sampler(interval=0.2, source=Broken()).start()
+    try:
+        time.sleep(0.5)
+        assert sampler._thread.is_alive()
+    finally:
+        sampler.stop()
+
+
+def test_reads_do_not_overlap():
+    source = FakeSource()
+    sampler = Sampler(interval=0.2, source=source)
+    threads = [threading.Thread(target=lambda: [sampler.sample() for _ in range(20)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not source.overlapped